@@ -0,0 +1,38 @@
+from typing import Optional
+
+
+# Parsed headers are cached on the ASGI scope so every layer (and the handlers,
+# via request.scope) shares one decode of the raw header list.
+SCOPE_HEADERS_KEY = "liner.headers"
+
+FORWARDED_IP_HEADERS = ("x-forwarded-for", "x-real-ip", "fly-client-ip")
+
+
+def scope_headers(scope) -> dict[str, str]:
+    """Lower-cased header name -> value; the first occurrence wins, like ``Headers.get``."""
+    cached = scope.get(SCOPE_HEADERS_KEY)
+    if cached is None:
+        cached = {}
+        for key, value in scope.get("headers", ()):
+            name = key.decode("latin-1").lower()
+            if name not in cached:
+                cached[name] = value.decode("latin-1")
+        scope[SCOPE_HEADERS_KEY] = cached
+    return cached
+
+
+def first_scope_header(scope, *names: str) -> Optional[str]:
+    headers = scope_headers(scope)
+    for name in names:
+        value = headers.get(name)
+        if value:
+            return value.strip()
+    return None
+
+
+def client_ip_from_scope(scope) -> str:
+    forwarded = first_scope_header(scope, *FORWARDED_IP_HEADERS)
+    if forwarded:
+        return forwarded.split(",")[0].strip()
+    client = scope.get("client")
+    return client[0] if client else "-"
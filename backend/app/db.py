@@ -1,17 +1,58 @@
 from sqlmodel import create_engine, Session
 import os
 import logging
+from contextlib import contextmanager
+from fastapi import Request
 from sqlalchemy import event
 from sqlalchemy.engine import Engine
 import sqlite3
 
+from app.services.replica_routing import SAFE_METHODS, ReadRouter, principal_key
+from app.services.request_deadline import install_statement_cancellation
+from app.services.sqlite_writer import SQLiteWriteQueue, create_sqlite_read_engine
+
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./app.db")
+# Replica opzionale per GET/HEAD/OPTIONS (Postgres hot standby o copia del file SQLite)
+DATABASE_READ_URL = os.getenv("DATABASE_READ_URL", "").strip()
+# Dopo una scrittura l'utente legge dal primary per questi secondi (read-your-writes)
+READ_YOUR_WRITES_SECONDS = float(os.getenv("READ_YOUR_WRITES_SECONDS", "5"))
+# SQLite: scritture serializzate su una connessione con commit di gruppo, letture su un pool query_only
+SQLITE_WRITER_QUEUE = os.getenv("SQLITE_WRITER_QUEUE", "0").strip().lower() in ("1", "true", "yes", "on")
+SQLITE_WRITER_MAX_BATCH = int(os.getenv("SQLITE_WRITER_MAX_BATCH", "64"))
+SQLITE_READ_POOL_SIZE = int(os.getenv("SQLITE_READ_POOL_SIZE", "8"))
+SQLITE_BUSY_TIMEOUT_SECONDS = float(os.getenv("SQLITE_BUSY_TIMEOUT_SECONDS", "30"))
+
+
+def _create_engine(url: str):
+    connect_args = {"check_same_thread": False} if url.startswith("sqlite") else {}
+    created = create_engine(url, echo=False, connect_args=connect_args)
+    # statement_timeout / interrupt legati alla deadline della richiesta
+    install_statement_cancellation(created)
+    return created
+
 
-connect_args = {"check_same_thread": False} if DATABASE_URL.startswith("sqlite") else {}
-engine = create_engine(
-    DATABASE_URL,
-    echo=False,
-    connect_args=connect_args,
+def _sqlite_file_url(url: str) -> bool:
+    return url.startswith("sqlite") and url not in ("sqlite://", "sqlite:///:memory:") and "mode=memory" not in url
+
+
+engine = _create_engine(DATABASE_URL)
+read_engine = _create_engine(DATABASE_READ_URL) if DATABASE_READ_URL else engine
+sqlite_writer = None
+if SQLITE_WRITER_QUEUE and _sqlite_file_url(DATABASE_URL):
+    sqlite_writer = SQLiteWriteQueue(
+        DATABASE_URL, max_batch=SQLITE_WRITER_MAX_BATCH, busy_timeout_seconds=SQLITE_BUSY_TIMEOUT_SECONDS
+    )
+    install_statement_cancellation(sqlite_writer.engine)
+    if not DATABASE_READ_URL:
+        read_engine = create_sqlite_read_engine(
+            DATABASE_URL, pool_size=SQLITE_READ_POOL_SIZE, busy_timeout_seconds=SQLITE_BUSY_TIMEOUT_SECONDS
+        )
+        install_statement_cancellation(read_engine)
+# stesso file: nessun ritardo di replica, read-your-writes non serve
+read_router = ReadRouter(
+    engine,
+    read_engine,
+    pin_seconds=0 if sqlite_writer is not None and not DATABASE_READ_URL else READ_YOUR_WRITES_SECONDS,
 )
 
 logger = logging.getLogger("liner-backend.db")
@@ -26,27 +67,58 @@ def _should_run_migrations_on_startup() -> bool:
 
 
 def init_db():
-    # Optionally run Alembic migrations on startup to keep schema in sync
+    # Optionally run Alembic migrations on startup to keep schema in sync;
+    # one worker migrates under a lock, the others wait for the schema to reach head
     if _should_run_migrations_on_startup():
         try:
-            from alembic.config import Config
-            from alembic import command
-            base_dir = os.path.dirname(os.path.dirname(__file__))  # backend/
-            alembic_ini = os.path.join(base_dir, "alembic.ini")
-            cfg = Config(alembic_ini)
-            cfg.set_main_option("sqlalchemy.url", DATABASE_URL)
-            command.upgrade(cfg, "head")
-            logger.info("Alembic migrations applied at startup")
+            from app.services.startup_migrations import migrate_to_head
+            migrate_to_head(engine, DATABASE_URL)
         except Exception as e:
             logger.warning("Skipping migrations at startup: %s", e)
     else:
         logger.info("Skipping migrations at startup by configuration")
     # If disabled, rely on external alembic upgrade
 
-def get_session():
+def get_session(request: Request = None):
+    if sqlite_writer is not None and request is not None and request.method not in SAFE_METHODS:
+        # letture dal pool query_only; in coda sul writer solo alla prima scrittura, si esce dopo il commit di gruppo
+        reads = read_router.primary if DATABASE_READ_URL else read_router.replica
+        with sqlite_writer.session(read_bind=reads) as session:
+            yield session
+        return
+    # Fuori da una richiesta (script) sempre il primary
+    if request is None:
+        bind, key = engine, None
+    else:
+        key = principal_key(request)
+        bind = read_router.engine_for(request.method, key)
     # Avoid expiring objects on commit to reduce refresh round-trips
-    with Session(engine, expire_on_commit=False) as session:
-        yield session
+    try:
+        with Session(bind, expire_on_commit=False) as session:
+            yield session
+    finally:
+        if read_router.enabled and key is not None and request.method not in SAFE_METHODS:
+            # la finestra read-your-writes parte da quando la scrittura è finita
+            read_router.pin(key)
+
+
+@contextmanager
+def write_session():
+    """Session for writers outside a request (log writer): through the SQLite writer queue when enabled."""
+    if sqlite_writer is not None:
+        with sqlite_writer.session() as session:
+            yield session
+    else:
+        with Session(engine, expire_on_commit=False) as session:
+            yield session
+
+
+def replica_routing_stats() -> dict:
+    return read_router.stats()
+
+
+def sqlite_writer_stats() -> dict:
+    return {"enabled": False} if sqlite_writer is None else {"enabled": True, **sqlite_writer.stats()}
 
 # For SQLite foreign key enforcement
 @event.listens_for(Engine, "connect")
@@ -1,37 +1,25 @@
-import time
-import uuid
-import logging
 import os
 from contextlib import asynccontextmanager
-from datetime import datetime
-from fastapi import FastAPI, Request
+from fastapi import FastAPI
 from fastapi.responses import JSONResponse
-from starlette.middleware.gzip import GZipMiddleware
-from sqlmodel import Session
-from app.model.audit_log import AuditLog
-from app.common.audit import safe_json_snapshot
 
 
-from app.db import init_db, engine
+from app.db import init_db
 from app.deps import apply_cors
-from app.logging_config import (
-    setup_logging,
-    request_id_ctx,
-    client_ctx,
-    path_ctx,
-    user_ctx,
-)
-from app.middleware_limits import RequestSizeLimitMiddleware, RequestTimeoutMiddleware
-from app.middleware_rate_limit import SensitiveRateLimitMiddleware
-from app.model.access_log import AccessLog
-from app.services.request_geo import best_effort_geo_from_headers, request_ip
-from app.alerts import emit_alert
+from app.logging_config import setup_logging
+from app.middleware_audit import AuditBodyCaptureMiddleware
+from app.middleware_compression import CompressionMiddleware
+from app.middleware_limits import RequestTimeoutMiddleware
+from app.middleware_pipeline import RequestPipelineMiddleware
+from app.services.request_deadline import parse_route_timeouts
+from app.services.request_geo import init_geoip_reader
+from app.services.log_writer import request_log_writer
 
 # Routers
 from app.routers import (
     auth_router, user_router, product_router, product_application_router,
     kpi_router, ranking_router, tpp_router, massage_router, speed_router, smt_hood_router,
-    news_router
+    news_router, runs_router, ops_router
 )
 from app.routers.setting_calculator import router as setting_calculator_router
 
@@ -39,14 +27,18 @@ from app.routers.setting_calculator import router as setting_calculator_router
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     init_db()
+    init_geoip_reader()
     yield
+    request_log_writer.flush()
 
 
 logger = setup_logging()
-access_logger = logging.getLogger("liner-backend.access")
-AUDIT_BODY_MAX_BYTES = 50 * 1024
+AUDIT_BODY_MAX_BYTES = int(os.getenv("AUDIT_BODY_MAX_BYTES", str(50 * 1024)))
 MAX_REQUEST_BODY_BYTES = int(os.getenv("MAX_REQUEST_BODY_BYTES", str(2 * 1024 * 1024)))
+COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", "500"))
 REQUEST_TIMEOUT_SECONDS = float(os.getenv("REQUEST_TIMEOUT_SECONDS", "60"))
+# Budget per prefisso di path, es. "/rankings=20,/auth/login=10" (vince il prefisso piu' lungo)
+REQUEST_TIMEOUT_ROUTES = parse_route_timeouts(os.getenv("REQUEST_TIMEOUT_ROUTES", ""))
 ENABLE_SENSITIVE_RATE_LIMITING = os.getenv("ENABLE_SENSITIVE_RATE_LIMITING", "1").strip().lower() not in ("", "0", "false", "no")
 
 app = FastAPI(
@@ -68,7 +60,9 @@ app.include_router(tpp_router.router, prefix="/tpp", tags=["TPP Runs"])
 app.include_router(massage_router.router, prefix="/massage", tags=["Massage Runs"])
 app.include_router(speed_router.router, prefix="/speed", tags=["Speed Runs"])
 app.include_router(smt_hood_router.router, prefix="/smt-hood", tags=["SMT/Hood Runs"])
+app.include_router(runs_router.router, prefix="/runs", tags=["Runs"])
 app.include_router(news_router.router, prefix="/news", tags=["News"])
+app.include_router(ops_router.router, prefix="/ops", tags=["Ops"])
 app.include_router(setting_calculator_router, prefix="/setting-calculator", tags=["Setting Calculator"])
 app.include_router(setting_calculator_router, prefix="/api/v1/setting-calculator", tags=["Setting Calculator v1"])
 
@@ -76,210 +70,22 @@ app.include_router(setting_calculator_router, prefix="/api/v1/setting-calculator
 def root():
     return JSONResponse({"ok": True, "docs": "/docs", "health": "/healthz"})
 
-# Middleware
-if ENABLE_SENSITIVE_RATE_LIMITING:
-    app.add_middleware(SensitiveRateLimitMiddleware)
-app.add_middleware(RequestTimeoutMiddleware, timeout_seconds=REQUEST_TIMEOUT_SECONDS)
-app.add_middleware(RequestSizeLimitMiddleware, max_body_bytes=MAX_REQUEST_BODY_BYTES)
-app.add_middleware(GZipMiddleware, minimum_size=500)
+# Middleware (l'ultimo aggiunto e' il piu' esterno): CORS -> pipeline -> audit -> compression -> timeout
+app.add_middleware(
+    RequestTimeoutMiddleware,
+    timeout_seconds=REQUEST_TIMEOUT_SECONDS,
+    route_timeouts=REQUEST_TIMEOUT_ROUTES,
+)
+app.add_middleware(CompressionMiddleware, minimum_size=COMPRESSION_MIN_SIZE)
+app.add_middleware(AuditBodyCaptureMiddleware, max_bytes=AUDIT_BODY_MAX_BYTES)
+# Request id/context, size limit, rate limit and access logging in a single ASGI layer
+app.add_middleware(
+    RequestPipelineMiddleware,
+    max_body_bytes=MAX_REQUEST_BODY_BYTES,
+    rate_limiting=ENABLE_SENSITIVE_RATE_LIMITING,
+)
 apply_cors(app)
 
-@app.middleware("http")
-async def log_requests(request: Request, call_next):
-    print(f"Request received: {request.method} {request.url.path}", flush=True)
-    # Generate or propagate a request id
-    request_id = request.headers.get("x-request-id") or str(uuid.uuid4())
-    # Track context for logging (reset on exit)
-    rid_token = request_id_ctx.set(request_id)
-    client_ip = request_ip(request)
-    client_token = client_ctx.set(client_ip)
-    path_token = path_ctx.set(request.url.path)
-    user_token = user_ctx.set("-")
-    start = time.perf_counter()
-
-    # Capture request payload for auditing (only for state-changing methods)
-    audit_payload = None
-    if request.method in ("POST", "PUT", "PATCH", "DELETE"):
-        ctype = (request.headers.get("content-type") or "").lower()
-        content_length_header = request.headers.get("content-length")
-        try:
-            content_length = int(content_length_header) if content_length_header else None
-        except ValueError:
-            content_length = None
-
-        body_bytes = b""
-        should_read_body = False
-        if "multipart/form-data" in ctype:
-            audit_payload = {
-                "_skipped_multipart": True,
-                "content_length": content_length,
-            }
-        elif "application/json" in ctype or "application/x-www-form-urlencoded" in ctype:
-            if content_length is None:
-                audit_payload = {
-                    "_skipped_no_content_length": True,
-                    "max_bytes": AUDIT_BODY_MAX_BYTES,
-                }
-            elif content_length > AUDIT_BODY_MAX_BYTES:
-                audit_payload = {
-                    "_truncated": True,
-                    "content_length": content_length,
-                    "max_bytes": AUDIT_BODY_MAX_BYTES,
-                }
-            else:
-                should_read_body = True
-
-        if should_read_body:
-            try:
-                # Starlette caches request.body(); we keep the explicit cache assignment
-                # to avoid consuming the stream for downstream handlers in edge cases.
-                body_bytes = await request.body()
-                try:
-                    request._body = body_bytes  # type: ignore[attr-defined]
-                except Exception:
-                    pass
-            except Exception:
-                body_bytes = b""
-
-        if should_read_body and "application/json" in ctype:
-            try:
-                import json
-                audit_payload = json.loads(body_bytes.decode() or "{}")
-            except Exception:
-                audit_payload = {"_invalid_json": True}
-        elif should_read_body and "application/x-www-form-urlencoded" in ctype:
-            try:
-                from urllib.parse import parse_qs
-                parsed = parse_qs(body_bytes.decode() if body_bytes else "")
-                audit_payload = {k: "***REDACTED***" for k in parsed.keys()}
-            except Exception:
-                audit_payload = {"_form_read_failed": True}
-
-
-    try:
-        response = await call_next(request)
-    except Exception:
-        response = None
-        raise
-    finally:
-        duration_ms = (time.perf_counter() - start) * 1000
-        status_code = getattr(response, "status_code", 500)
-        user_obj = getattr(request.state, "user", None)
-        user_id = getattr(user_obj, "id", None)
-        user_email = getattr(user_obj, "email", None)
-        user_agent = request.headers.get("user-agent", "")
-        country, region, city, _lat, _lon, geo_source = best_effort_geo_from_headers(request)
-
-        # Keep logging context aware of authenticated user
-        if user_email:
-            try:
-                user_ctx.set(user_email)
-            except Exception:
-                pass
-
-        if response is not None:
-            response.headers["X-Request-ID"] = request_id
-
-        access_logger.info(
-            "api_access method=%s path=%s status=%s user_id=%s ip=%s country=%s region=%s city=%s geo_source=%s dur_ms=%.2f ua=%s",
-            request.method,
-            request.url.path,
-            status_code,
-            user_id,
-            client_ip,
-            country,
-            region,
-            city,
-            geo_source,
-            duration_ms,
-            user_agent,
-        )
-
-        try:
-            with Session(engine, expire_on_commit=False) as session:
-                log_row = AccessLog(
-                    request_id=request_id,
-                    user_id=user_id,
-                    method=request.method,
-                    path=request.url.path,
-                    status_code=status_code,
-                    ip=client_ip,
-                    country=country,
-                    region=region,
-                    city=city,
-                    user_agent=user_agent,
-                    duration_ms=int(duration_ms),
-                    created_at=datetime.utcnow(),
-                )
-                session.add(log_row)
-                session.commit()
-        except Exception:
-            # Logging failures should never break the request lifecycle
-            logger.warning("Failed to persist access log", exc_info=True)
-
-        # Persist audit log for state-changing operations (best-effort)
-        if request.method in ("POST", "PUT", "PATCH", "DELETE"):
-            try:
-                with Session(engine, expire_on_commit=False) as session:
-                    session.add(
-                        AuditLog(
-                            request_id=request_id,
-                            user_id=user_id,
-                            method=request.method,
-                            path=request.url.path,
-                            status_code=status_code,
-                            ip=client_ip,
-                            user_agent=user_agent,
-                            request_json=safe_json_snapshot(audit_payload),
-                            duration_ms=int(duration_ms),
-                            created_at=datetime.utcnow(),
-                        )
-                    )
-                    session.commit()
-                logger.info(
-                    "api_audit method=%s path=%s status=%s user_id=%s ip=%s dur_ms=%.2f",
-                    request.method,
-                    request.url.path,
-                    status_code,
-                    user_id,
-                    client_ip,
-                    duration_ms,
-                )
-                print(
-                    f"api_audit method={request.method} path={request.url.path} "
-                    f"status={status_code} user_id={user_id} ip={client_ip} dur_ms={duration_ms:.2f}",
-                    flush=True,
-                )
-            except Exception:
-                logger.warning("Failed to persist audit log", exc_info=True)
-
-
-        # Structured error logging after persistence attempt
-        if status_code >= 500:
-            emit_alert(
-                logger,
-                alert_code="http_5xx",
-                severity="high",
-                message="HTTP request completed with 5xx",
-                status_code=status_code,
-                method=request.method,
-                path=request.url.path,
-                ip=client_ip,
-            )
-        if response is None:
-            logger.exception(
-                "HTTP %s %s failed after %.2f ms",
-                request.method,
-                request.url.path,
-                duration_ms,
-            )
-
-        user_ctx.reset(user_token)
-        path_ctx.reset(path_token)
-        client_ctx.reset(client_token)
-        request_id_ctx.reset(rid_token)
-    return response
-
 @app.get("/healthz")
 def healthz():
     return {"ok": True}
@@ -0,0 +1,119 @@
+import json
+from typing import Any, Optional
+from urllib.parse import parse_qs
+
+from app.common.http_scope import scope_headers
+
+
+AUDITED_METHODS = ("POST", "PUT", "PATCH", "DELETE")
+
+
+class AuditBodyCapture:
+    """Chunks of a request body seen by the app, capped at ``max_bytes``.
+
+    Chunks are kept by reference and only joined/parsed by ``payload()``, which
+    the log writer calls after the response has been sent.
+    """
+
+    def __init__(self, *, content_type: str, content_length: Optional[int], max_bytes: int):
+        self.content_type = content_type
+        self.content_length = content_length
+        self.max_bytes = max_bytes
+        self.chunks: list[bytes] = []
+        self.size = 0
+        self.truncated = content_length is not None and content_length > max_bytes
+        self.complete = False
+
+    def feed(self, chunk: bytes, more_body: bool) -> None:
+        self.size += len(chunk)
+        if not more_body:
+            self.complete = True
+        if self.truncated:
+            return
+        if self.size > self.max_bytes:
+            # A partial JSON/form body cannot be parsed: drop what we kept
+            self.truncated = True
+            self.chunks = []
+            return
+        if chunk:
+            self.chunks.append(chunk)
+
+    def payload(self) -> Any:
+        if "multipart/form-data" in self.content_type:
+            return {
+                "_skipped_multipart": True,
+                "content_length": self.content_length,
+            }
+        is_json = "application/json" in self.content_type
+        is_form = "application/x-www-form-urlencoded" in self.content_type
+        if not is_json and not is_form:
+            return None
+        if self.truncated:
+            return {
+                "_truncated": True,
+                "content_length": self.content_length if self.content_length is not None else self.size,
+                "max_bytes": self.max_bytes,
+            }
+        if not self.complete:
+            # The handler never consumed the body (e.g. rejected before parsing it)
+            return {
+                "_body_not_read": True,
+                "content_length": self.content_length,
+            }
+
+        body = b"".join(self.chunks)
+        if is_json:
+            try:
+                return json.loads(body.decode() or "{}")
+            except Exception:
+                return {"_invalid_json": True}
+        try:
+            parsed = parse_qs(body.decode() if body else "")
+            return {k: "***REDACTED***" for k in parsed.keys()}
+        except Exception:
+            return {"_form_read_failed": True}
+
+
+class AuditBodyCaptureMiddleware:
+    """Tee request body chunks into an ``AuditBodyCapture`` stored on ``request.state``.
+
+    The body is never read ahead of the handler, so it is not buffered twice.
+    """
+
+    def __init__(self, app, *, max_bytes: int):
+        self.app = app
+        self.max_bytes = max_bytes
+
+    async def __call__(self, scope, receive, send):
+        if scope.get("type") != "http" or scope.get("method") not in AUDITED_METHODS:
+            await self.app(scope, receive, send)
+            return
+
+        headers = scope_headers(scope)
+        content_type = headers.get("content-type", "").lower()
+        content_length_header = headers.get("content-length")
+        try:
+            content_length = int(content_length_header) if content_length_header else None
+        except ValueError:
+            content_length = None
+
+        capture = AuditBodyCapture(
+            content_type=content_type,
+            content_length=content_length,
+            max_bytes=self.max_bytes,
+        )
+        scope.setdefault("state", {})["audit_capture"] = capture
+
+        if "multipart/form-data" in content_type or not (
+            "application/json" in content_type or "application/x-www-form-urlencoded" in content_type
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        async def tee_receive():
+            message = await receive()
+            if message["type"] == "http.request" and not capture.complete:
+                capture.feed(message.get("body", b""), message.get("more_body", False))
+            return message
+
+        await self.app(scope, tee_receive, send)
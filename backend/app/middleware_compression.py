@@ -0,0 +1,396 @@
+import hashlib
+import logging
+import os
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from typing import Optional
+
+from app.common.http_scope import scope_headers
+try:
+    import brotli
+except ImportError:  # pragma: no cover - optional dependency at runtime
+    brotli = None
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - optional dependency at runtime
+    zstandard = None
+
+
+logger = logging.getLogger("liner-backend.compression")
+
+COMPRESSION_CACHE_MAX_BYTES = int(os.getenv("COMPRESSION_CACHE_MAX_BYTES", str(16 * 1024 * 1024)))
+COMPRESSION_CACHE_MAX_ENTRIES = int(os.getenv("COMPRESSION_CACHE_MAX_ENTRIES", "1024"))
+
+# Preferenza del server a parità di q: br comprime meglio, zstd costa meno CPU
+ENCODING_PREFERENCE = ("br", "zstd", "gzip")
+
+COMPRESSIBLE_TYPES = (
+    "text/",
+    "application/json",
+    "application/javascript",
+    "application/xml",
+    "application/x-ndjson",
+    "image/svg+xml",
+)
+
+# Livelli: alti per le entry in cache (compresse una volta), bassi per lo streaming
+CACHED_LEVELS = {"br": 9, "zstd": 10, "gzip": 9}
+DYNAMIC_LEVELS = {"br": 4, "zstd": 3, "gzip": 6}
+
+# Sotto questo rapporto compresso/originale non conviene (payload già compressi, random)
+MAX_USEFUL_RATIO = 0.9
+
+
+def available_encodings() -> tuple[str, ...]:
+    return tuple(
+        enc for enc in ENCODING_PREFERENCE
+        if enc == "gzip" or (enc == "br" and brotli is not None) or (enc == "zstd" and zstandard is not None)
+    )
+
+
+def negotiate_encoding(accept_encoding: Optional[str], supported: tuple[str, ...]) -> Optional[str]:
+    """Best supported coding for an ``Accept-Encoding`` header (q-values honoured), else None."""
+    if not accept_encoding:
+        return None
+    weights: dict[str, float] = {}
+    for item in accept_encoding.split(","):
+        name, _, params = item.strip().partition(";")
+        name = name.strip().lower()
+        if not name:
+            continue
+        q = 1.0
+        for param in params.split(";"):
+            key, _, value = param.strip().partition("=")
+            if key.strip().lower() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        weights[name] = q
+    wildcard = weights.get("*", 0.0)
+    best, best_q = None, 0.0
+    for enc in supported:
+        q = weights.get(enc, wildcard)
+        if q > best_q:
+            best, best_q = enc, q
+    return best
+
+
+def compress(encoding: str, data: bytes, level: int) -> bytes:
+    if encoding == "br":
+        return brotli.compress(data, quality=level)
+    if encoding == "zstd":
+        return zstandard.ZstdCompressor(level=level).compress(data)
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)  # wbits=31: container gzip
+    return compressor.compress(data) + compressor.flush()
+
+
+class _StreamCompressor:
+    """Incremental encoder with the same ``compress``/``finish`` API for every coding."""
+
+    def __init__(self, encoding: str, level: int):
+        if encoding == "br":
+            self._obj = brotli.Compressor(quality=level)
+            self._compress, self._finish = self._obj.process, self._obj.finish
+        elif encoding == "zstd":
+            self._obj = zstandard.ZstdCompressor(level=level).compressobj()
+            self._compress, self._finish = self._obj.compress, self._obj.flush
+        else:
+            self._obj = zlib.compressobj(level, zlib.DEFLATED, 31)
+            self._compress, self._finish = self._obj.compress, self._obj.flush
+
+    def compress(self, chunk: bytes) -> bytes:
+        return self._compress(chunk)
+
+    def finish(self) -> bytes:
+        return self._finish()
+
+
+class CompressedResponseCache:
+    """LRU of compressed bodies keyed by (ETag, coding), bounded in bytes.
+
+    ``None`` as body records that the payload does not compress usefully.
+    Each entry keeps the CPU time its compression took, credited on every hit.
+    """
+
+    def __init__(self, *, max_bytes: int, max_entries: int = 1024):
+        self.max_bytes = max(0, max_bytes)
+        self.max_entries = max(1, max_entries)
+        self._entries: OrderedDict[tuple[str, str], tuple[Optional[bytes], float]] = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: tuple[str, str]):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def put(self, key: tuple[str, str], body: Optional[bytes], cost_seconds: float) -> None:
+        size = len(body) if body else 0
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._size -= len(old[0]) if old[0] else 0
+            self._entries[key] = (body, cost_seconds)
+            self._size += size
+            while self._entries and (self._size > self.max_bytes or len(self._entries) > self.max_entries):
+                _, (evicted, _) = self._entries.popitem(last=False)
+                self._size -= len(evicted) if evicted else 0
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"entries": len(self._entries), "bytes": self._size, "max_bytes": self.max_bytes}
+
+
+class CompressionStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        with self._lock:
+            self.counts = {
+                "cache_hits": 0,
+                "cache_misses": 0,
+                "uncached": 0,
+                "streamed": 0,
+                "not_modified": 0,
+                "skipped_small": 0,
+                "skipped_incompressible": 0,
+            }
+            self.by_encoding: dict[str, dict[str, float]] = {}
+            self.cpu_seconds_spent = 0.0
+            self.cpu_seconds_saved = 0.0
+
+    def incr(self, name: str) -> None:
+        with self._lock:
+            self.counts[name] += 1
+
+    def record(self, encoding: str, bytes_in: int, bytes_out: int, *, spent: float = 0.0, saved: float = 0.0) -> None:
+        with self._lock:
+            entry = self.by_encoding.setdefault(encoding, {"responses": 0, "bytes_in": 0, "bytes_out": 0})
+            entry["responses"] += 1
+            entry["bytes_in"] += bytes_in
+            entry["bytes_out"] += bytes_out
+            self.cpu_seconds_spent += spent
+            self.cpu_seconds_saved += saved
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                **self.counts,
+                "by_encoding": {enc: dict(values) for enc, values in self.by_encoding.items()},
+                "cpu_seconds_spent": round(self.cpu_seconds_spent, 6),
+                "cpu_seconds_saved": round(self.cpu_seconds_saved, 6),
+            }
+
+
+compression_stats = CompressionStats()
+compressed_response_cache = CompressedResponseCache(
+    max_bytes=COMPRESSION_CACHE_MAX_BYTES,
+    max_entries=COMPRESSION_CACHE_MAX_ENTRIES,
+)
+
+
+def response_compression_stats() -> dict:
+    return {**compression_stats.stats(), "cache": compressed_response_cache.stats()}
+
+
+def _header(headers: list, name: bytes) -> Optional[str]:
+    for key, value in headers:
+        if key.lower() == name:
+            return value.decode("latin-1")
+    return None
+
+
+def _set_header(headers: list, name: bytes, value: str) -> list:
+    out = [(k, v) for k, v in headers if k.lower() != name]
+    out.append((name, value.encode("latin-1")))
+    return out
+
+
+def _add_vary(headers: list) -> list:
+    vary = _header(headers, b"vary")
+    if vary is None:
+        return headers + [(b"vary", b"Accept-Encoding")]
+    if "accept-encoding" in vary.lower() or vary.strip() == "*":
+        return headers
+    return _set_header(headers, b"vary", f"{vary}, Accept-Encoding")
+
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    # confronto debole (RFC 9110 13.1.2): W/ ignorato
+    wanted = etag[2:] if etag.startswith("W/") else etag
+    return any(
+        (tag.strip()[2:] if tag.strip().startswith("W/") else tag.strip()) == wanted
+        for tag in if_none_match.split(",")
+    )
+
+
+class CompressionMiddleware:
+    """br / zstd / gzip negotiation with a cache of pre-compressed bodies.
+
+    - complete GET 200 responses get an ETag (content hash unless the handler
+      set one), answer ``If-None-Match`` with 304, and their compressed bytes
+      are cached per coding: identical payloads (rankings, meta, KPI defs) are
+      compressed once, not on every request;
+    - other complete responses are compressed inline at a cheaper level;
+    - streaming responses go through an incremental encoder;
+    - small bodies, non-text types and payloads that barely shrink are sent
+      as they are.
+    """
+
+    def __init__(self, app, *, minimum_size: int = 500, cache: Optional[CompressedResponseCache] = None):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.cache = cache if cache is not None else compressed_response_cache
+        self.encodings = available_encodings()
+
+    async def __call__(self, scope, receive, send):
+        if scope.get("type") != "http":
+            await self.app(scope, receive, send)
+            return
+
+        headers = scope_headers(scope)
+        encoding = negotiate_encoding(headers.get("accept-encoding"), self.encodings)
+        cacheable_request = scope.get("method") == "GET"
+        if encoding is None and not cacheable_request:
+            await self.app(scope, receive, send)
+            return
+
+        start_message = None
+        streamer: Optional[_StreamCompressor] = None
+        passthrough = False
+        stream_in = stream_out = 0
+
+        async def compressing_send(message):
+            nonlocal start_message, streamer, passthrough, stream_in, stream_out
+            kind = message["type"]
+            if kind == "http.response.start":
+                start_message = message
+                return
+            if kind != "http.response.body" or passthrough:
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+
+            if streamer is not None:
+                chunk = streamer.compress(body) + (b"" if more_body else streamer.finish())
+                stream_in += len(body)
+                stream_out += len(chunk)
+                if not more_body:
+                    compression_stats.record(encoding, stream_in, stream_out)
+                await send({"type": "http.response.body", "body": chunk, "more_body": more_body})
+                return
+
+            response_headers = list(start_message.get("headers", []))
+            status = start_message["status"]
+            content_type = (_header(response_headers, b"content-type") or "").lower()
+            eligible = (
+                status >= 200 and status not in (204, 304)
+                and _header(response_headers, b"content-encoding") is None
+                and content_type.startswith(COMPRESSIBLE_TYPES)
+            )
+            if not eligible:
+                passthrough = True
+                await send(start_message)
+                await send(message)
+                return
+
+            if more_body:
+                if encoding is None:
+                    passthrough = True
+                    await send(start_message)
+                    await send(message)
+                    return
+                # risposta in streaming: niente cache, compressione incrementale
+                streamer = _StreamCompressor(encoding, DYNAMIC_LEVELS[encoding])
+                compression_stats.incr("streamed")
+                response_headers = _add_vary(_set_header(
+                    [(k, v) for k, v in response_headers if k.lower() != b"content-length"],
+                    b"content-encoding", encoding,
+                ))
+                await send({**start_message, "headers": response_headers})
+                chunk = streamer.compress(body)
+                stream_in, stream_out = len(body), len(chunk)
+                await send({"type": "http.response.body", "body": chunk, "more_body": True})
+                return
+
+            await self._send_complete(scope, send, start_message, response_headers, body, encoding)
+
+        await self.app(scope, receive, compressing_send)
+
+    async def _send_complete(self, scope, send, start_message, response_headers, body, encoding):
+        status = start_message["status"]
+        cache_control = (_header(response_headers, b"cache-control") or "").lower()
+        etag = None
+        if scope.get("method") == "GET" and status == 200 and "no-store" not in cache_control:
+            etag = _header(response_headers, b"etag")
+            if etag is None:
+                etag = f'W/"{hashlib.blake2b(body, digest_size=16).hexdigest()}"'
+                response_headers = response_headers + [(b"etag", etag.encode("latin-1"))]
+            if _etag_matches(scope_headers(scope).get("if-none-match"), etag):
+                compression_stats.incr("not_modified")
+                not_modified = [
+                    (k, v) for k, v in response_headers
+                    if k.lower() not in (b"content-length", b"content-type")
+                ]
+                await send({**start_message, "status": 304, "headers": _add_vary(not_modified)})
+                await send({"type": "http.response.body", "body": b""})
+                return
+
+        compressed = None
+        if encoding is not None and len(body) < self.minimum_size:
+            compression_stats.incr("skipped_small")
+        elif encoding is not None and etag is not None:
+            key = (etag, encoding)
+            cached = self.cache.get(key)
+            if cached is not None:
+                compressed, cost = cached
+                compression_stats.incr("cache_hits")
+                if compressed is not None:
+                    compression_stats.record(encoding, len(body), len(compressed), saved=cost)
+            else:
+                compression_stats.incr("cache_misses")
+                compressed, cost = self._compress(encoding, body, CACHED_LEVELS[encoding])
+                self.cache.put(key, compressed, cost)
+        elif encoding is not None:
+            compression_stats.incr("uncached")
+            compressed, _ = self._compress(encoding, body, DYNAMIC_LEVELS[encoding])
+
+        response_headers = _add_vary(response_headers)
+        if compressed is not None:
+            response_headers = _set_header(response_headers, b"content-encoding", encoding)
+            response_headers = _set_header(response_headers, b"content-length", str(len(compressed)))
+            body = compressed
+        await send({**start_message, "headers": response_headers})
+        await send({"type": "http.response.body", "body": body})
+
+    @staticmethod
+    def _compress(encoding: str, body: bytes, level: int) -> tuple[Optional[bytes], float]:
+        started = time.thread_time()
+        compressed = compress(encoding, body, level)
+        cost = time.thread_time() - started
+        if len(compressed) > len(body) * MAX_USEFUL_RATIO:
+            compression_stats.incr("skipped_incompressible")
+            compression_stats.record("identity", len(body), len(body), spent=cost)
+            return None, cost
+        compression_stats.record(encoding, len(body), len(compressed), spent=cost)
+        return compressed, cost
@@ -1,8 +1,11 @@
 import asyncio
 import logging
+from typing import Optional
 
 from starlette.responses import JSONResponse
 from app.alerts import emit_alert
+from app.common.http_scope import scope_headers
+from app.services.request_deadline import RequestCancelledError, RequestDeadline, request_deadline_ctx, route_timeout
 
 
 logger = logging.getLogger("liner-backend.limits")
@@ -12,34 +15,22 @@ class PayloadTooLargeError(Exception):
     pass
 
 
-class RequestSizeLimitMiddleware:
-    def __init__(self, app, *, max_body_bytes: int):
-        self.app = app
-        self.max_body_bytes = max_body_bytes
+class RequestSizeLimiter:
+    """Body size checks shared by the standalone middleware and the request pipeline."""
 
-    async def __call__(self, scope, receive, send):
-        if scope.get("type") != "http":
-            await self.app(scope, receive, send)
-            return
+    def __init__(self, *, max_body_bytes: int):
+        self.max_body_bytes = max_body_bytes
 
-        headers = {
-            k.decode("latin-1").lower(): v.decode("latin-1")
-            for k, v in scope.get("headers", [])
-        }
-        content_length = headers.get("content-length")
+    def declared_too_large(self, scope) -> bool:
+        content_length = scope_headers(scope).get("content-length")
         if content_length:
             try:
-                if int(content_length) > self.max_body_bytes:
-                    await JSONResponse(
-                        status_code=413,
-                        content={
-                            "detail": f"Request body too large. Max allowed is {self.max_body_bytes} bytes."
-                        },
-                    )(scope, receive, send)
-                    return
+                return int(content_length) > self.max_body_bytes
             except ValueError:
-                pass
+                return False
+        return False
 
+    def limited_receive(self, receive):
         total_bytes = 0
 
         async def limited_receive():
@@ -51,56 +42,153 @@ class RequestSizeLimitMiddleware:
                     raise PayloadTooLargeError()
             return message
 
+        return limited_receive
+
+    def too_large_response(self) -> JSONResponse:
+        return JSONResponse(
+            status_code=413,
+            content={
+                "detail": f"Request body too large. Max allowed is {self.max_body_bytes} bytes."
+            },
+        )
+
+
+class RequestSizeLimitMiddleware(RequestSizeLimiter):
+    def __init__(self, app, *, max_body_bytes: int):
+        super().__init__(max_body_bytes=max_body_bytes)
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope.get("type") != "http":
+            await self.app(scope, receive, send)
+            return
+
+        if self.declared_too_large(scope):
+            await self.too_large_response()(scope, receive, send)
+            return
+
         try:
-            await self.app(scope, limited_receive, send)
+            await self.app(scope, self.limited_receive(receive), send)
         except PayloadTooLargeError:
-            await JSONResponse(
-                status_code=413,
-                content={
-                    "detail": f"Request body too large. Max allowed is {self.max_body_bytes} bytes."
-                },
-            )(scope, receive, send)
+            await self.too_large_response()(scope, receive, send)
+
+
+class _ReceivePump:
+    """Reads ``receive`` ahead of the app so a client disconnect is seen while a
+    sync handler is still busy; the app gets the same messages from a queue."""
+
+    def __init__(self, receive, on_disconnect):
+        self._receive = receive
+        self._on_disconnect = on_disconnect
+        self._queue: asyncio.Queue = asyncio.Queue()
+
+    async def run(self):
+        while True:
+            try:
+                message = await self._receive()
+            except Exception as exc:
+                # es. PayloadTooLargeError: la solleva la receive dell'app
+                await self._queue.put(exc)
+                return
+            await self._queue.put(message)
+            if message["type"] == "http.disconnect":
+                self._on_disconnect()
+                return
+
+    async def receive(self):
+        item = await self._queue.get()
+        if isinstance(item, Exception):
+            raise item
+        if item["type"] == "http.disconnect":
+            # dopo il disconnect ogni receive deve restituirlo di nuovo
+            self._queue.put_nowait(item)
+        return item
 
 
 class RequestTimeoutMiddleware:
-    def __init__(self, app, *, timeout_seconds: float):
+    """Request deadline, enforced in the app and in the database.
+
+    The deadline (global, or per path prefix via ``route_timeouts``) is exposed
+    to the engine hooks in ``app.services.request_deadline``; on timeout or
+    client disconnect the handler task is cancelled and its running statements
+    are interrupted, so threadpool handlers stop holding pool connections.
+    """
+
+    def __init__(self, app, *, timeout_seconds: float, route_timeouts: Optional[dict[str, float]] = None):
         self.app = app
         self.timeout_seconds = timeout_seconds
+        self.route_timeouts = route_timeouts or {}
 
     async def __call__(self, scope, receive, send):
         if scope.get("type") != "http":
             await self.app(scope, receive, send)
             return
 
+        path = scope.get("path", "-")
+        timeout_seconds = route_timeout(path, self.route_timeouts, self.timeout_seconds)
+        deadline = RequestDeadline(timeout_seconds, route=path)
         response_started = False
+        response_complete = False
+        disconnected = asyncio.Event()
 
         async def tracked_send(message):
-            nonlocal response_started
+            nonlocal response_started, response_complete
             if message["type"] == "http.response.start":
                 response_started = True
+            elif message["type"] == "http.response.body" and not message.get("more_body", False):
+                response_complete = True
             await send(message)
 
+        def on_disconnect():
+            if not response_complete:
+                disconnected.set()
+
+        pump = _ReceivePump(receive, on_disconnect)
+        token = request_deadline_ctx.set(deadline)
+        pump_task = asyncio.ensure_future(pump.run())
+        app_task = asyncio.ensure_future(self.app(scope, pump.receive, tracked_send))
+        disconnect_task = asyncio.ensure_future(disconnected.wait())
         try:
-            await asyncio.wait_for(
-                self.app(scope, receive, tracked_send),
-                timeout=self.timeout_seconds,
-            )
-        except TimeoutError:
+            await asyncio.wait({app_task, disconnect_task}, timeout=timeout_seconds, return_when=asyncio.FIRST_COMPLETED)
+            if app_task.done():
+                try:
+                    app_task.result()
+                    return
+                except RequestCancelledError:
+                    # il DB ha applicato la deadline prima del middleware
+                    if response_started:
+                        raise
+
+            app_task.cancel()
+            route = getattr(scope.get("route"), "path", None) or path
+            deadline.route = route
+            if disconnected.is_set():
+                interrupted = deadline.cancel("client_disconnect")
+                logger.info("Client disconnected path=%s interrupted_statements=%s", route, interrupted)
+                return
+
+            interrupted = deadline.cancel("timeout")
             emit_alert(
                 logger,
                 alert_code="request_timeout",
                 severity="medium",
                 message="Request processing timed out",
-                path=scope.get("path", "-"),
-                timeout_seconds=self.timeout_seconds,
+                path=route,
+                timeout_seconds=timeout_seconds,
+                interrupted_statements=interrupted,
             )
             logger.warning(
-                "Request timeout path=%s timeout_seconds=%s",
-                scope.get("path", "-"),
-                self.timeout_seconds,
+                "Request timeout path=%s timeout_seconds=%s interrupted_statements=%s",
+                route,
+                timeout_seconds,
+                interrupted,
             )
             if not response_started:
                 await JSONResponse(
                     status_code=504,
                     content={"detail": "Request processing timed out."},
                 )(scope, receive, send)
+        finally:
+            for task in (pump_task, disconnect_task, app_task):
+                task.cancel()
+            request_deadline_ctx.reset(token)
@@ -0,0 +1,180 @@
+import logging
+import time
+import uuid
+from datetime import datetime
+
+from app.alerts import emit_alert
+from app.common.http_scope import client_ip_from_scope, scope_headers
+from app.logging_config import client_ctx, path_ctx, request_id_ctx, user_ctx
+from app.middleware_audit import AUDITED_METHODS
+from app.middleware_limits import PayloadTooLargeError, RequestSizeLimiter
+from app.middleware_rate_limit import RateLimitRule, SensitiveRateLimiter
+from app.services.log_writer import RequestLogEntry, RequestLogWriter, request_log_writer
+from app.services.request_geo import geo_from_scope
+
+
+logger = logging.getLogger("liner-backend")
+access_logger = logging.getLogger("liner-backend.access")
+
+
+class RequestPipelineMiddleware:
+    """One pure-ASGI layer for request context, size/rate limits and access logging.
+
+    Headers are parsed once into the scope cache (``app.common.http_scope``) and
+    shared with the inner layers and the handlers. The response is passed
+    through untouched apart from the ``X-Request-ID`` header, so streaming
+    responses stay streamed.
+    """
+
+    def __init__(
+        self,
+        app,
+        *,
+        max_body_bytes: int,
+        rate_limiting: bool = True,
+        rate_limit_rules: tuple[RateLimitRule, ...] | None = None,
+        log_writer: RequestLogWriter | None = None,
+    ):
+        self.app = app
+        self.size_limiter = RequestSizeLimiter(max_body_bytes=max_body_bytes)
+        self.rate_limiter = SensitiveRateLimiter(rules=rate_limit_rules) if rate_limiting else None
+        self.log_writer = log_writer or request_log_writer
+
+    async def __call__(self, scope, receive, send):
+        if scope.get("type") != "http":
+            await self.app(scope, receive, send)
+            return
+
+        headers = scope_headers(scope)
+        method = scope.get("method", "")
+        path = scope.get("path", "")
+        state = scope.setdefault("state", {})
+        # Generate or propagate a request id
+        request_id = headers.get("x-request-id") or str(uuid.uuid4())
+        client_ip = client_ip_from_scope(scope)
+        # Track context for logging (reset on exit)
+        rid_token = request_id_ctx.set(request_id)
+        client_token = client_ctx.set(client_ip)
+        path_token = path_ctx.set(path)
+        user_token = user_ctx.set("-")
+        start = time.perf_counter()
+
+        status_code = 500
+        response_started = False
+        request_id_header = (b"x-request-id", request_id.encode("latin-1"))
+
+        async def send_with_request_id(message):
+            nonlocal status_code, response_started
+            if message["type"] == "http.response.start":
+                response_started = True
+                status_code = message["status"]
+                message = {**message, "headers": [*message.get("headers", ()), request_id_header]}
+            await send(message)
+
+        failed = False
+        try:
+            rejection = None
+            if self.size_limiter.declared_too_large(scope):
+                rejection = self.size_limiter.too_large_response()
+            elif self.rate_limiter is not None:
+                rejection = self.rate_limiter.blocked_response(scope)
+
+            if rejection is not None:
+                await rejection(scope, receive, send_with_request_id)
+            else:
+                try:
+                    await self.app(scope, self.size_limiter.limited_receive(receive), send_with_request_id)
+                except PayloadTooLargeError:
+                    if response_started:
+                        raise
+                    await self.size_limiter.too_large_response()(scope, receive, send_with_request_id)
+        except Exception:
+            failed = True
+            raise
+        finally:
+            duration_ms = (time.perf_counter() - start) * 1000
+            self._log(
+                state=state,
+                scope=scope,
+                request_id=request_id,
+                method=method,
+                path=path,
+                status_code=status_code,
+                client_ip=client_ip,
+                user_agent=headers.get("user-agent", ""),
+                duration_ms=duration_ms,
+                failed=failed,
+            )
+            user_ctx.reset(user_token)
+            path_ctx.reset(path_token)
+            client_ctx.reset(client_token)
+            request_id_ctx.reset(rid_token)
+
+    def _log(self, *, state, scope, request_id, method, path, status_code, client_ip, user_agent, duration_ms, failed):
+        user_obj = state.get("user")
+        user_id = getattr(user_obj, "id", None)
+        user_email = getattr(user_obj, "email", None)
+        country, region, city, _lat, _lon, geo_source = geo_from_scope(scope)
+        # impostato dal router di Starlette sullo stesso scope quando una route fa match
+        route = getattr(scope.get("route"), "path", None)
+
+        # Keep logging context aware of authenticated user
+        if user_email:
+            user_ctx.set(user_email)
+
+        access_logger.info(
+            "api_access method=%s path=%s route=%s status=%s user_id=%s ip=%s country=%s region=%s city=%s geo_source=%s dur_ms=%.2f ua=%s",
+            method,
+            path,
+            route,
+            status_code,
+            user_id,
+            client_ip,
+            country,
+            region,
+            city,
+            geo_source,
+            duration_ms,
+            user_agent,
+        )
+
+        # Rows (and the audit body snapshot) are built and committed by the log writer
+        self.log_writer.submit(
+            RequestLogEntry(
+                request_id=request_id,
+                user_id=user_id,
+                method=method,
+                path=path,
+                route=route,
+                status_code=status_code,
+                ip=client_ip,
+                country=country,
+                region=region,
+                city=city,
+                user_agent=user_agent,
+                duration_ms=duration_ms,
+                created_at=datetime.utcnow(),
+                audit=method in AUDITED_METHODS,
+                audit_capture=state.get("audit_capture"),
+            )
+        )
+
+        # Structured error logging after persistence attempt
+        if status_code >= 500:
+            emit_alert(
+                logger,
+                alert_code="http_5xx",
+                severity="high",
+                message="HTTP request completed with 5xx",
+                status_code=status_code,
+                method=method,
+                path=path,
+                ip=client_ip,
+            )
+        if failed:
+            logger.exception(
+                "HTTP %s %s failed after %.2f ms",
+                method,
+                path,
+                duration_ms,
+            )
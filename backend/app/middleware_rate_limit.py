@@ -7,6 +7,7 @@ from threading import Lock
 
 from starlette.responses import JSONResponse
 from app.alerts import emit_alert
+from app.common.http_scope import client_ip_from_scope
 
 
 logger = logging.getLogger("liner-backend.ratelimit")
@@ -26,6 +27,7 @@ DEFAULT_SENSITIVE_RATE_LIMIT_RULES = (
     RateLimitRule("auth_register", "POST", r"^/auth/register$", 5, 3600),
     RateLimitRule("security_events", "GET", r"^/auth/security/(events|summary)$", 30, 300),
     RateLimitRule("setting_compare", "POST", r"^/setting-calculator/compare$", 30, 60),
+    RateLimitRule("setting_solve", "POST", r"^/setting-calculator/solve$", 10, 60),
     RateLimitRule("tpp_compute", "POST", r"^/tpp/runs/\d+/compute$", 20, 60),
     RateLimitRule("speed_compute", "POST", r"^/speed/runs/\d+/compute$", 20, 60),
     RateLimitRule("massage_compute", "POST", r"^/massage/runs/\d+/compute$", 20, 60),
@@ -42,29 +44,10 @@ DEFAULT_SENSITIVE_RATE_LIMIT_RULES = (
 )
 
 
-def _scope_headers(scope) -> dict[str, str]:
-    return {
-        k.decode("latin-1").lower(): v.decode("latin-1")
-        for k, v in scope.get("headers", [])
-    }
+class SensitiveRateLimiter:
+    """Sliding-window limits per (rule, client IP) for sensitive endpoints."""
 
-
-def _request_ip_from_scope(scope) -> str:
-    headers = _scope_headers(scope)
-    forwarded = (
-        headers.get("x-forwarded-for")
-        or headers.get("x-real-ip")
-        or headers.get("fly-client-ip")
-    )
-    if forwarded:
-        return forwarded.split(",")[0].strip()
-    client = scope.get("client")
-    return client[0] if client else "-"
-
-
-class SensitiveRateLimitMiddleware:
-    def __init__(self, app, *, rules: tuple[RateLimitRule, ...] | None = None):
-        self.app = app
+    def __init__(self, *, rules: tuple[RateLimitRule, ...] | None = None):
         self.rules = tuple(rules or DEFAULT_SENSITIVE_RATE_LIMIT_RULES)
         self.compiled_rules = [
             (rule, re.compile(rule.path_regex))
@@ -94,46 +77,59 @@ class SensitiveRateLimitMiddleware:
             hits.append(now)
             return True, 0
 
-    async def __call__(self, scope, receive, send):
-        if scope.get("type") != "http":
-            await self.app(scope, receive, send)
-            return
-
+    def blocked_response(self, scope) -> JSONResponse | None:
+        """Return the 429 response when the request exceeds its rule, else None."""
         path = scope.get("path", "")
         method = scope.get("method", "")
         rule = self._match_rule(method, path)
         if rule is None:
+            return None
+
+        ip = client_ip_from_scope(scope)
+        allowed, retry_after = self._allow(rule, ip)
+        if allowed:
+            return None
+
+        emit_alert(
+            logger,
+            alert_code="rate_limit_block",
+            severity="medium",
+            message="Sensitive endpoint rate limit exceeded",
+            method=method,
+            path=path,
+            ip=ip,
+            retry_after=retry_after,
+        )
+        logger.warning(
+            "RATE_LIMIT_BLOCK rule=%s method=%s path=%s ip=%s retry_after=%s",
+            rule.name,
+            method,
+            path,
+            ip,
+            retry_after,
+        )
+        response = JSONResponse(
+            status_code=429,
+            content={
+                "detail": f"Rate limit exceeded for {rule.name}. Retry in {retry_after} seconds."
+            },
+        )
+        response.headers["Retry-After"] = str(retry_after)
+        return response
+
+
+class SensitiveRateLimitMiddleware(SensitiveRateLimiter):
+    def __init__(self, app, *, rules: tuple[RateLimitRule, ...] | None = None):
+        super().__init__(rules=rules)
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope.get("type") != "http":
             await self.app(scope, receive, send)
             return
 
-        ip = _request_ip_from_scope(scope)
-        allowed, retry_after = self._allow(rule, ip)
-        if not allowed:
-            emit_alert(
-                logger,
-                alert_code="rate_limit_block",
-                severity="medium",
-                message="Sensitive endpoint rate limit exceeded",
-                method=method,
-                path=path,
-                ip=ip,
-                retry_after=retry_after,
-            )
-            logger.warning(
-                "RATE_LIMIT_BLOCK rule=%s method=%s path=%s ip=%s retry_after=%s",
-                rule.name,
-                method,
-                path,
-                ip,
-                retry_after,
-            )
-            response = JSONResponse(
-                status_code=429,
-                content={
-                    "detail": f"Rate limit exceeded for {rule.name}. Retry in {retry_after} seconds."
-                },
-            )
-            response.headers["Retry-After"] = str(retry_after)
+        response = self.blocked_response(scope)
+        if response is not None:
             await response(scope, receive, send)
             return
 
@@ -16,6 +16,8 @@ class AccessLog(SQLModel, table=True):
     user_id: Optional[int] = Field(default=None, index=True, foreign_key="users.id")
     method: str = Field(sa_column=sa.Column(sa.String(length=10), nullable=False))
     path: str = Field(sa_column=sa.Column(sa.Text(), nullable=False))
+    # template della route FastAPI (es. /tpp/runs/{run_id}/compute); NULL se nessuna route ha fatto match
+    route: Optional[str] = Field(default=None, sa_column=sa.Column(sa.String(length=255), nullable=True))
     status_code: int = Field(nullable=False)
     ip: Optional[str] = Field(default=None, index=True, max_length=45)
     country: Optional[str] = Field(default=None, sa_column=sa.Column(sa.String(length=64)))
@@ -28,3 +30,28 @@ class AccessLog(SQLModel, table=True):
     __table_args__ = (
         sa.Index("ix_access_logs_user_path_created_at", "user_id", "path", "created_at"),
     )
+
+
+#latenze aggregate per (route, metodo, ora UTC), calcolate da app.services.latency_rollup
+class RouteLatencyRollup(SQLModel, table=True):
+    __tablename__ = "route_latency_rollups"
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    route: str = Field(sa_column=sa.Column(sa.String(length=255), nullable=False))
+    method: str = Field(sa_column=sa.Column(sa.String(length=10), nullable=False))
+    hour: datetime = Field(nullable=False)  # inizio dell'ora, naive UTC come access_logs.created_at
+    count: int
+    error_count: int  # risposte 5xx
+    duration_sum_ms: float
+    duration_max_ms: float
+    p50_ms: float
+    p95_ms: float
+    p99_ms: float
+    # LatencySketch serializzato: si fonde tra ore/route per i percentili su finestre più ampie
+    sketch: dict = Field(sa_column=sa.Column(sa.JSON(), nullable=False))
+    computed_at: datetime = Field(default_factory=datetime.utcnow, nullable=False)
+
+    __table_args__ = (
+        sa.UniqueConstraint("route", "method", "hour", name="ux_route_latency_rollups_route_method_hour"),
+        sa.Index("ix_route_latency_rollups_hour", "hour"),
+    )
@@ -18,7 +18,7 @@ class KpiDef(SQLModel, table=True):
     name: str
     description: Optional[str] = None
 
-    test_type_code: TestKind = Field(index=True)
+    test_type_code: TestKind  # indice esplicito ix_kpi_def_test_type_code in __table_args__
 
     formula_type: FormulaType
     formula_text: str
@@ -66,6 +66,10 @@ class TestMetric(SQLModel, table=True):
     value_num: float
     unit: Optional[str] = None
     context_json: Optional[str] = None# JSON string (usiamo TEXT per compatibilità)
+    # contesto tipizzato (stesso contenuto di context_json) per lookup indicizzati
+    flow_lpm: Optional[float] = None
+    pressure_kpa: Optional[int] = None
+    agg: Optional[str] = None
     computed_at: datetime = Field(default_factory=utcnow, nullable=False)
 
 #vincoli
@@ -74,6 +78,10 @@ class TestMetric(SQLModel, table=True):
             "run_type", "run_id", "metric_code", "context_json",
             name="ux_test_metrics_unique"
         ),
+        sa.Index("ix_test_metrics_pa_metric_flow", "product_application_id", "metric_code", "flow_lpm"),
+        sa.Index("ix_test_metrics_pa_metric_pressure", "product_application_id", "metric_code", "pressure_kpa"),
+        # ultimo valore di una metrica per applicazione (latest_metric): seek già ordinato
+        sa.Index("ix_test_metrics_pa_metric_computed_at", "product_application_id", "metric_code", "computed_at"),
     )
 
 # --------------- KPI VALUE ----------------------------------
@@ -94,6 +102,9 @@ class KpiValue(SQLModel, table=True):
     score: int
     unit: Optional[str] = None
     context_json: Optional[str] = None
+    flow_lpm: Optional[float] = None
+    pressure_kpa: Optional[int] = None
+    agg: Optional[str] = None
     computed_at: datetime = Field(default_factory=utcnow, nullable=False)
 
 #vincoli
@@ -102,4 +113,64 @@ class KpiValue(SQLModel, table=True):
             "run_type", "run_id", "kpi_code", "context_json",
             name="ux_kpi_values_unique"
         ),
+        # MASSAGE/SMT_HOOD: un solo valore per applicazione (target dell'upsert)
+        sa.Index(
+            "ux_kpi_values_application_kpi",
+            "product_application_id", "kpi_code",
+            unique=True,
+            postgresql_where=sa.text("run_type IN ('MASSAGE', 'SMT_HOOD')"),
+            sqlite_where=sa.text("run_type IN ('MASSAGE', 'SMT_HOOD')"),
+        ),
+        sa.Index("ix_kpi_values_pa_kpi_agg", "product_application_id", "kpi_code", "agg"),
+        # ranking: ultimo valore per (applicazione, KPI) dei soli KPI richiesti
+        sa.Index("ix_kpi_values_kpi_pa_computed_at", "kpi_code", "product_application_id", "computed_at"),
+    )
+
+# --------------- COMPOSITE SCORE ------------------------------
+#profili di pesi salvati dall'utente (in alternativa a KpiDef.weight)
+
+class CompositeWeightProfile(SQLModel, table=True):
+    __tablename__ = "composite_weight_profiles"
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    user_id: int = Field(
+        sa_column=sa.Column(
+            sa.Integer,
+            sa.ForeignKey("users.id", ondelete="CASCADE"),
+            index=True,
+            nullable=False,
+        )
+    )
+    name: str
+    weights: dict = Field(default_factory=dict, sa_column=Column(JSON, nullable=False))  # {kpi_code: peso}
+    created_at: datetime = Field(default_factory=utcnow, nullable=False)
+
+    __table_args__ = (
+        sa.UniqueConstraint("user_id", "name", name="uq_composite_weight_profile_user_name"),
+    )
+
+
+#punteggio composito precalcolato per (profilo, applicazione); profile_id 0 = pesi di KpiDef
+class CompositeScore(SQLModel, table=True):
+    __tablename__ = "composite_scores"
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    profile_id: int = Field(default=0, nullable=False)
+    product_application_id: int = Field(
+        sa_column=sa.Column(
+            sa.Integer,
+            sa.ForeignKey("product_applications.id", ondelete="CASCADE"),
+            nullable=False,
+        )
+    )
+    score: float  # media pesata degli score KPI (1..4)
+    coverage: float  # quota del peso totale del profilo coperta da KPI misurati
+    kpi_count: int
+    computed_at: datetime = Field(default_factory=utcnow, nullable=False)
+
+#vincoli
+    __table_args__ = (
+        sa.UniqueConstraint("profile_id", "product_application_id", name="ux_composite_scores_profile_application"),
+        sa.Index("ix_composite_scores_profile_score", "profile_id", "score"),
+        sa.Index("ix_composite_scores_application", "product_application_id"),
     )
@@ -33,4 +33,7 @@ class LoginEvent(SQLModel, table=True):
             "success",
             "created_at",
         ),
+        # conteggio tentativi falliti recenti (lockout per email / per IP)
+        sa.Index("ix_login_events_email_success_created_at", "email_attempted", "success", "created_at"),
+        sa.Index("ix_login_events_ip_success_created_at", "ip", "success", "created_at"),
     )
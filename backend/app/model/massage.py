@@ -21,6 +21,7 @@ class MassageRun(SQLModel, table=True):
 
     __table_args__ = (
         sa.Index("ix_massage_runs_created_at", "created_at"),
+        sa.Index("ix_massage_runs_application_created_at", "product_application_id", "created_at"),
     )
 
     # Optional relationship for eager loading
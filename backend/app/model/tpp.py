@@ -22,6 +22,7 @@ class TppRun(SQLModel, table=True):
 
     __table_args__ = (
         sa.Index("ix_tpp_runs_created_at", "created_at"),
+        sa.Index("ix_tpp_runs_application_created_at", "product_application_id", "created_at"),
     )
 
     # Optional relationship to use with selectinload
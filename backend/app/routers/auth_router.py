@@ -5,7 +5,7 @@ from typing import Optional
 import json
 import logging
 import os
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 from uuid import uuid4
 
 from fastapi import APIRouter, Depends, HTTPException, status, Request, Form
@@ -13,6 +13,7 @@ from sqlmodel import Session, select
 from app.services.conversion_wrapper import convert_output
 from app.services.request_geo import best_effort_geo_from_headers, request_ip
 from app.services.user_lookup import find_user_by_email, normalize_email
+from app.services.log_archive import ARCHIVE_TABLES, LOG_ARCHIVE_DIR, read_archive
 
 from app.db import get_session
 from app.auth import hash_password, verify_password, create_access_token, get_current_user, require_role
@@ -542,6 +543,37 @@ def security_summary(
     }
 
 
+@router.get("/security/archive")
+def security_archive(
+    table: str = "access_logs",
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    user_id: Optional[int] = None,
+    path: Optional[str] = None,
+    limit: int = 200,
+    _: User = Depends(require_role("admin")),
+):
+    # log oltre la retention: file compressi di LOG_ARCHIVE_DIR, non il database
+    if not LOG_ARCHIVE_DIR:
+        raise HTTPException(status_code=404, detail="Log archive not configured")
+    if table not in ARCHIVE_TABLES:
+        raise HTTPException(status_code=422, detail=f"table must be one of {', '.join(ARCHIVE_TABLES)}")
+    # l'archivio è in UTC naive: "...Z" / "+02:00" dal client vanno convertiti prima del confronto
+    start, end = (
+        v.astimezone(timezone.utc).replace(tzinfo=None) if v is not None and v.tzinfo is not None else v
+        for v in (start, end)
+    )
+    return read_archive(
+        table,
+        archive_dir=LOG_ARCHIVE_DIR,
+        start=start,
+        end=end,
+        user_id=user_id,
+        path=path,
+        limit=max(1, min(limit, 1000)),
+    )
+
+
 @router.get("/me", response_model=UserRead)
 @convert_output
 def me(user: User = Depends(get_current_user)):
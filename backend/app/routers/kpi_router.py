@@ -8,6 +8,7 @@ from app.db import get_session
 from app.auth import require_role, get_current_user
 from app.model.kpi import KpiDef, KpiScale, KpiValue
 from app.schema.kpi import KpiDefIn, KpiDefOut, KpiScaleUpsertIn, KpiValuesBatchIn
+from app.services.composite_score import DEFAULT_PROFILE_ID, refresh_composite_scores
 
 router = APIRouter()
 
@@ -101,15 +102,22 @@ def list_kpis_for_applications_batch(
 def create_or_update_kpi(payload: KpiDefIn, session: Session = Depends(get_session)):
     existing = session.exec(select(KpiDef).where(KpiDef.code == payload.code)).first()
     if existing:
+        weight_changed = existing.weight != payload.weight
         for k, v in payload.dict().items():
             setattr(existing, k, v)
         session.add(existing)
+        if weight_changed:
+            session.flush()
+            refresh_composite_scores(session, profile_ids=[DEFAULT_PROFILE_ID])
         session.commit()
         session.refresh(existing)
         return existing
 
     item = KpiDef(**payload.dict())
     session.add(item)
+    session.flush()
+    #nuovo KPI pesato: cambia il punteggio composito di default
+    refresh_composite_scores(session, profile_ids=[DEFAULT_PROFILE_ID])
     session.commit()
     session.refresh(item)
     return item
@@ -121,6 +129,8 @@ def delete_kpi(kpi_id: int, session: Session = Depends(get_session)):
     if not item:
         raise HTTPException(status_code=404, detail="Not found")
     session.delete(item)
+    session.flush()
+    refresh_composite_scores(session, profile_ids=[DEFAULT_PROFILE_ID])
     session.commit()
 
 #Aggiorna (upsert) le scale di un KPI. Solo admin.
@@ -0,0 +1,65 @@
+from datetime import datetime, timedelta
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException
+from sqlmodel import Session
+
+from app.auth import require_role
+from app.db import get_session, replica_routing_stats, sqlite_writer_stats
+from app.middleware_compression import response_compression_stats
+from app.model.user import User
+from app.services.latency_rollup import latency_report
+from app.services.log_writer import request_log_writer
+from app.services.product_similarity import product_similarity_stats
+from app.services.request_deadline import request_cancellation_stats
+from app.services.request_geo import geoip_cache_stats
+from app.services.setting_calculator.cache import setting_calculator_cache_stats
+
+router = APIRouter()
+
+OPS_LATENCY_MAX_HOURS = 24 * 90
+
+
+@router.get("/latency")
+def route_latency(
+    hours: int = 24,
+    end: Optional[datetime] = None,
+    route: Optional[str] = None,
+    method: Optional[str] = None,
+    granularity: str = "hour",
+    sort: str = "p95",
+    limit: int = 50,
+    session: Session = Depends(get_session),
+    _: User = Depends(require_role("admin")),
+):
+    # solo route_latency_rollups: access_logs non viene letta (vedi app.scripts.rollup_route_latency)
+    window_end = end or datetime.utcnow()
+    window_start = window_end - timedelta(hours=max(1, min(hours, OPS_LATENCY_MAX_HOURS)))
+    try:
+        return latency_report(
+            session.connection(),
+            start=window_start,
+            end=window_end,
+            route=route,
+            method=method,
+            granularity=granularity,
+            sort=sort,
+            limit=max(1, min(limit, 500)),
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+
+@router.get("/stats")
+def runtime_stats(_: User = Depends(require_role("admin"))):
+    # contatori in-process del worker che risponde (non aggregati tra processi)
+    return {
+        "geoip_cache": geoip_cache_stats(),
+        "request_log_writer": request_log_writer.stats(),
+        "setting_calculator_cache": setting_calculator_cache_stats(),
+        "request_cancellation": request_cancellation_stats(),
+        "response_compression": response_compression_stats(),
+        "product_similarity": product_similarity_stats(),
+        "replica_routing": replica_routing_stats(),
+        "sqlite_writer": sqlite_writer_stats(),
+    }
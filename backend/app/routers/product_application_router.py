@@ -2,6 +2,7 @@ from fastapi import APIRouter, Depends, HTTPException, Path
 from sqlmodel import Session, select
 from sqlalchemy.exc import IntegrityError
 from app.services.conversion_wrapper import convert_output
+from app.services.setting_calculator.cache import invalidate_liner_info
 from pydantic import BaseModel
 
 from app.db import get_session
@@ -126,4 +127,5 @@ def delete_product_application(
 
     session.delete(app_obj)
     session.commit()
+    invalidate_liner_info(app_id)
     return None
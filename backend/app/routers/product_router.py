@@ -5,6 +5,8 @@ from sqlmodel import Session, select, func
 from sqlalchemy.exc import IntegrityError
 from typing import List, Optional
 from app.services.conversion_wrapper import convert_output
+from app.services.setting_calculator.cache import invalidate_product_liner_info
+from app.services.product_similarity import parse_feature_weights, product_spec_index
 
 from app.db import get_session
 from app.auth import get_current_user, require_role
@@ -17,6 +19,7 @@ from app.schema.product import (
     ProductMetaOut,
     ProductPreferenceIn,
     ProductPreferenceOut,
+    SimilarProductOut,
 )
 from app.schema.product import SIZE_LABELS
 
@@ -281,6 +284,7 @@ def create_product(payload: ProductIn, session: Session = Depends(get_session)):
             session.bulk_save_objects(apps)
 
             session.commit()
+            product_spec_index.invalidate()
             return obj
 
     except HTTPException:
@@ -300,6 +304,58 @@ def get_product(product_id: int, session: Session = Depends(get_session), user=D
         raise HTTPException(status_code=404, detail="Not found")
     return obj
 
+#SIMILAR: liner più vicini per specifiche tecniche (indice in memoria)
+@router.get("/{product_id}/similar", response_model=List[SimilarProductOut])
+@convert_output
+def similar_products(
+    product_id: int,
+    session: Session = Depends(get_session),
+    user=Depends(get_current_user),
+    k: int = Query(10, ge=1, le=50),
+    weights: Optional[str] = Query(None, description="feature=weight,... (unlisted features weigh 1, 0 ignores)"),
+    compound: Optional[str] = Query(None),
+    robot_liner: Optional[bool] = Query(None),
+):
+    is_admin = getattr(user, "role", "") == "admin"
+    target = session.get(Product, product_id)
+    if not target or (target.only_admin and not is_admin):
+        raise HTTPException(status_code=404, detail="Not found")
+    def lookup():
+        try:
+            found = product_spec_index.nearest(
+                session,
+                product_id,
+                k=k,
+                weights=parse_feature_weights(weights),
+                compound=_norm_compound(compound) if compound else None,
+                robot_liner=robot_liner,
+                include_admin_only=is_admin,
+            )
+        except ValueError as e:
+            raise HTTPException(status_code=422, detail=str(e))
+        ids = [pid for pid, _, _ in found or ()]
+        rows = session.exec(select(Product).where(Product.id.in_(ids))).all() if ids else []
+        return found, {p.id: p for p in rows}
+
+    neighbours, products = lookup()
+    if neighbours is None or len(products) < len(neighbours):
+        # snapshot più vecchio delle scritture di un altro worker (prodotto nuovo o vicino cancellato):
+        # lo ricostruisco una volta invece di aspettare il TTL
+        product_spec_index.invalidate()
+        neighbours, products = lookup()
+    if not neighbours:
+        return []
+
+    return [
+        SimilarProductOut(
+            **ProductOut.model_validate(products[pid]).model_dump(),
+            distance=round(distance, 4),
+            compared_features=compared,
+        )
+        for pid, distance, compared in neighbours
+        if pid in products
+    ]
+
 #UPDATE
 @router.put("/{product_id}", response_model=ProductOut, dependencies=[Depends(require_role("admin"))])
 def update_product(product_id: int, payload: ProductIn, session: Session = Depends(get_session)):
@@ -347,6 +403,8 @@ def update_product(product_id: int, payload: ProductIn, session: Session = Depen
     #Aggiorna i campi derivati che hai già in logica (se name non passato, NON lo tocco)
         session.add(obj)
         session.commit()
+        invalidate_product_liner_info(product_id)
+        product_spec_index.invalidate()
         return obj
 
     except IntegrityError as e:
@@ -369,4 +427,6 @@ def delete_product(product_id: int, session: Session = Depends(get_session)):
         raise HTTPException(status_code=404, detail="Not found")
     session.delete(obj)
     session.commit()
+    invalidate_product_liner_info(product_id)
+    product_spec_index.invalidate()
     return None
@@ -1,9 +1,12 @@
-from fastapi import APIRouter, Depends, Query
-from sqlmodel import Session
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlmodel import Session, select
 
 from app.auth import get_current_user
 from app.db import get_session
-from app.services.ranking import get_overview_rankings
+from app.model.kpi import CompositeWeightProfile
+from app.schema.kpi import CompositeWeightProfileIn, CompositeWeightProfileOut
+from app.services.composite_score import DEFAULT_PROFILE_ID, delete_profile_scores, refresh_composite_scores
+from app.services.ranking import get_composite_rankings, get_overview_rankings
 
 router = APIRouter()
 
@@ -27,3 +30,84 @@ def overview_rankings(
         reference_areas=reference_areas,
         limit=limit,
     )
+
+
+def _own_profile(session: Session, user, profile_id: int) -> CompositeWeightProfile:
+    profile = session.exec(
+        select(CompositeWeightProfile).where(
+            CompositeWeightProfile.id == profile_id,
+            CompositeWeightProfile.user_id == user.id,
+        )
+    ).first()
+    if not profile:
+        raise HTTPException(status_code=404, detail="Weight profile not found")
+    return profile
+
+
+#Classifica per punteggio composito (pesi KpiDef o profilo dell'utente), precalcolato
+@router.get("/composite", response_model=dict)
+def composite_rankings(
+    teat_sizes: str = Query("XS,S,M,L"),
+    reference_areas: str = Query("Global"),
+    limit: int = Query(5, ge=1, le=20),
+    profile_id: int = Query(DEFAULT_PROFILE_ID, ge=0),
+    session: Session = Depends(get_session),
+    user=Depends(get_current_user),
+):
+    if profile_id != DEFAULT_PROFILE_ID:
+        _own_profile(session, user, profile_id)
+    return get_composite_rankings(
+        session=session,
+        user=user,
+        teat_sizes=teat_sizes,
+        reference_areas=reference_areas,
+        limit=limit,
+        profile_id=profile_id,
+    )
+
+
+#PROFILI DI PESI (salvataggio/lettura per utente)
+@router.get("/composite/profiles", response_model=list[CompositeWeightProfileOut])
+def list_weight_profiles(session: Session = Depends(get_session), user=Depends(get_current_user)):
+    return session.exec(
+        select(CompositeWeightProfile)
+        .where(CompositeWeightProfile.user_id == user.id)
+        .order_by(CompositeWeightProfile.created_at.desc())
+    ).all()
+
+
+@router.post("/composite/profiles", response_model=CompositeWeightProfileOut)
+def save_weight_profile(
+    payload: CompositeWeightProfileIn,
+    session: Session = Depends(get_session),
+    user=Depends(get_current_user),
+):
+    profile = session.exec(
+        select(CompositeWeightProfile).where(
+            CompositeWeightProfile.user_id == user.id,
+            CompositeWeightProfile.name == payload.name,
+        )
+    ).first()
+    if profile:
+        profile.weights = payload.weights
+    else:
+        profile = CompositeWeightProfile(user_id=user.id, name=payload.name, weights=payload.weights)
+    session.add(profile)
+    session.flush()
+    # punteggi del profilo ricalcolati nella stessa transazione
+    refresh_composite_scores(session, profile_ids=[profile.id])
+    session.commit()
+    session.refresh(profile)
+    return profile
+
+
+@router.delete("/composite/profiles/{profile_id}", status_code=204)
+def delete_weight_profile(
+    profile_id: int,
+    session: Session = Depends(get_session),
+    user=Depends(get_current_user),
+):
+    profile = _own_profile(session, user, profile_id)
+    delete_profile_scores(session, profile.id)
+    session.delete(profile)
+    session.commit()
@@ -0,0 +1,34 @@
+from fastapi import APIRouter, Depends, HTTPException
+from sqlmodel import Session
+
+from app.auth import get_current_user
+from app.db import get_session
+from app.schema.runs import LatestRunsBatchIn
+from app.services.conversion_manager import apply_conversions
+from app.services.latest_runs import MAX_BATCH_APPLICATION_IDS, get_latest_runs_batch
+
+router = APIRouter()
+
+
+#Ultimo run TPP/speed/massage/smt-hood (con punti) per ogni application: 4 query in totale
+@router.post("/latest/batch", response_model=dict[str, dict])
+def latest_runs_batch(
+    payload: LatestRunsBatchIn,
+    session: Session = Depends(get_session),
+    user=Depends(get_current_user),
+):
+    raw_ids = payload.product_application_ids or []
+    deduped_ids = list(dict.fromkeys(int(x) for x in raw_ids if int(x) > 0))
+    if not deduped_ids:
+        return {}
+    if len(deduped_ids) > MAX_BATCH_APPLICATION_IDS:
+        raise HTTPException(
+            status_code=422,
+            detail=f"Maximum {MAX_BATCH_APPLICATION_IDS} product_application_ids allowed",
+        )
+
+    out = get_latest_runs_batch(session, deduped_ids)
+    unit_system = getattr(user, "unit_system", None)
+    if unit_system:
+        out = {pa_id: apply_conversions(item, unit_system) for pa_id, item in out.items()}
+    return out
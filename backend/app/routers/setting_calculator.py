@@ -1,20 +1,20 @@
 from typing import List
 
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
 from sqlmodel import Session
 from sqlmodel import select
 
 from app.db import get_session
 from app.auth import get_current_user
 
-from app.schema.setting_calculator.request_v1 import CompareRequestV1
-from app.schema.setting_calculator.response_v1 import CompareResponseV1
+from app.schema.setting_calculator.request_v1 import CompareRequestV1, SolveRequestV1
+from app.schema.setting_calculator.response_v1 import CompareResponseV1, SolveResponseV1
 from app.schema.setting_calculator.preferences import (
     SettingComparisonPreferenceIn,
     SettingComparisonPreferenceOut,
 )
 from app.model.setting_comparison_preference import SettingComparisonPreference
-from app.services.setting_calculator import compare_settings_v1
+from app.services.setting_calculator import compare_settings_v1, solve_settings_v1
 
 
 router = APIRouter()
@@ -32,7 +32,27 @@ def compare_settings(
     """
     Compare two liner configurations and return charts + derived metrics.
     """
-    return compare_settings_v1(session, payload)
+    result = compare_settings_v1(session, payload)
+    # I side result sono già validati dal service: serializzazione diretta, senza il
+    # giro dump -> validate -> serialize del response_model (che resta per OpenAPI)
+    return Response(content=result.model_dump_json(), media_type="application/json")
+
+
+@router.post(
+    "/solve",
+    response_model=SolveResponseV1,
+)
+def solve_settings(
+    payload: SolveRequestV1,
+    session: Session = Depends(get_session),
+    user=Depends(get_current_user),
+):
+    """
+    Find the pulsation settings of the candidate liner that hit a target metric
+    (explicit value or taken from a reference liner), within the given ranges.
+    """
+    result = solve_settings_v1(session, payload)
+    return Response(content=result.model_dump_json(), media_type="application/json")
 
 
 @router.get("/preferences", response_model=List[SettingComparisonPreferenceOut])
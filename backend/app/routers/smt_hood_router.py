@@ -1,5 +1,4 @@
 from typing import Optional, List
-import json
 import sqlalchemy as sa
 from fastapi import APIRouter, Depends, HTTPException, Query, Body, Path
 from sqlmodel import Session, select
@@ -8,11 +7,10 @@ from app.services.conversion_wrapper import convert_output
 
 from app.db import get_session
 from app.auth import get_current_user, require_role
-from app.model.kpi import KpiValue, TestMetric
 from app.model.product import ProductApplication
 from app.model.smthood import SmtHoodRun, SmtHoodPoint
 from app.schema.smthood import SmtHoodRunOut, SmtHoodPointIn
-from app.services.kpi_engine import score_or_422
+from app.services.run_compute import RunComputeError, compute_smt_hood_run
 
 router = APIRouter()
 
@@ -190,141 +188,12 @@ def compute_smt_hood_kpis(
     run = session.get(SmtHoodRun, run_id)
     if not run:
         raise HTTPException(status_code=404, detail="Run not found")
-    
-    #punti del run
-    pts = session.exec(select(SmtHoodPoint).where(SmtHoodPoint.run_id == run_id)).all()
-    by = {p.flow_code: p for p in pts}
-    needed = [_flow_code(f) for f in ALLOWED_FLOWS]
-    if not all(k in by for k in needed):
-        raise HTTPException(status_code=400, detail="Run requires 3 points at flows 0.5, 1.9, 3.6 L/min")
-    
-    #pulizia metriche del run (idempotente)
-    session.exec(sa.delete(TestMetric).where(TestMetric.run_type == "SMT_HOOD", TestMetric.run_id == run.id))
-    session.commit()
-
-    results = {}
-    metrics_to_save = []
-    respray_vals, fluydo_vals, slippage_vals, ringing_vals = [], [], [], []
-
-    # ---- per-flow: calcolo, scoring e persistenza metriche derivate ----
-    for fl in ALLOWED_FLOWS:
-        code = _flow_code(fl)
-        p = by[code]
-
-        smt_min, smt_max = float(p.smt_min), float(p.smt_max)
-        hood_min, hood_max = float(p.hood_min), float(p.hood_max)
-
-        # derivati (kPa)
-        respray_val = smt_max - MILK_VAC
-        fluydo_val = (smt_max - smt_min) - (smt_max - MILK_VAC) if smt_max > MILK_VAC else (smt_max - smt_min)
-        slippage_val = (hood_max - hood_min) - (hood_max - MILK_VAC) if hood_max > MILK_VAC else (hood_max - hood_min)
-        ringing_val = hood_max - MILK_VAC
-
-        s_respray  = score_or_422(session, "RESPRAY",       respray_val)
-        s_fluydo   = score_or_422(session, "FLUYDODINAMIC", fluydo_val)
-        s_slippage = score_or_422(session, "SLIPPAGE",      slippage_val)
-        s_ringing  = score_or_422(session, "RINGING_RISK",  ringing_val)
-
-        # Salva metriche derivate
-        # Accumula metriche derivate per batch insert
-        metrics_to_save.extend([
-            TestMetric(
-                run_type="SMT_HOOD", run_id=run.id, product_application_id=run.product_application_id,
-                metric_code="RESPRAY_VAL", value_num=float(respray_val), unit="kPa",
-                context_json=json.dumps({"flow_lpm": fl}),
-            ),
-            TestMetric(
-                run_type="SMT_HOOD", run_id=run.id, product_application_id=run.product_application_id,
-                metric_code="FLUYDODINAMIC_VAL", value_num=float(fluydo_val), unit="kPa",
-                context_json=json.dumps({"flow_lpm": fl}),
-            ),
-            TestMetric(
-                run_type="SMT_HOOD", run_id=run.id, product_application_id=run.product_application_id,
-                metric_code="SLIPPAGE_VAL", value_num=float(slippage_val), unit="kPa",
-                context_json=json.dumps({"flow_lpm": fl}),
-            ),
-            TestMetric(
-                run_type="SMT_HOOD", run_id=run.id, product_application_id=run.product_application_id,
-                metric_code="RINGING_VAL", value_num=float(ringing_val), unit="kPa",
-                context_json=json.dumps({"flow_lpm": fl}),
-            ),
-        ])
-
-        results[fl] = {
-            "respray": {"value": respray_val, "score": s_respray},
-            "fluydodinamic": {"value": fluydo_val, "score": s_fluydo},
-            "slippage": {"value": slippage_val, "score": s_slippage},
-            "ringing_risk": {"value": ringing_val, "score": s_ringing},
-        }
-
-        respray_vals.append(respray_val)
-        fluydo_vals.append(fluydo_val)
-        slippage_vals.append(slippage_val)
-        ringing_vals.append(ringing_val)
 
-    # Persisti metriche derivate in batch
-    if metrics_to_save:
-        session.bulk_save_objects(metrics_to_save)
-
-    # ---- KPI finali (medie 3 flow) + upsert in kpi_values ----
-    def _avg(xs: list[float]) -> float:
-        return (sum(xs) / len(xs)) if xs else 0.0
-
-    avg_respray, avg_fluydo, avg_slip, avg_ringing = (
-        _avg(respray_vals),
-        _avg(fluydo_vals),
-        _avg(slippage_vals),
-        _avg(ringing_vals),
-    )
-
-    def upsert_kpi(code: str, value: float, score: int, unit: str | None = "kPa"):
-        ctx = json.dumps({"flows": ALLOWED_FLOWS, "agg": "final"})
-        kv = session.exec(
-            select(KpiValue).where(
-                KpiValue.product_application_id == run.product_application_id,
-                KpiValue.kpi_code == code,
-            )
-        ).first()
-        if kv:
-            kv.value_num, kv.score, kv.unit = float(value), int(score), unit
-            kv.run_type, kv.run_id, kv.context_json = "SMT_HOOD", run.id, ctx
-            session.add(kv)
-        else:
-            session.add(
-                KpiValue(
-                    product_application_id=run.product_application_id,
-                    kpi_code=code,
-                    value_num=float(value),
-                    score=int(score),
-                    run_type="SMT_HOOD",
-                    run_id=run.id,
-                    unit=unit,
-                    context_json=ctx,
-                )
-            )
-
-    upsert_kpi("RESPRAY",        avg_respray, score_or_422(session, "RESPRAY",       avg_respray))
-    upsert_kpi("FLUYDODINAMIC",  avg_fluydo,  score_or_422(session, "FLUYDODINAMIC", avg_fluydo))
-    upsert_kpi("SLIPPAGE",       avg_slip,    score_or_422(session, "SLIPPAGE",      avg_slip))
-    upsert_kpi("RINGING_RISK",   avg_ringing, score_or_422(session, "RINGING_RISK",  avg_ringing))
-
-
-    session.commit()
-
-    def _r1(x: float) -> float:
-        return float(f"{x:.1f}")
-
-    return {
-        "run_id": run.id,
-        "product_application_id": run.product_application_id,
-        "flows": results,
-        "final": {
-            "RESPRAY": {"value": _r1(avg_respray), "unit": "kPa"},
-            "FLUYDODINAMIC": {"value": _r1(avg_fluydo), "unit": "kPa"},
-            "SLIPPAGE": {"value": _r1(avg_slip), "unit": "kPa"},
-            "RINGING_RISK": {"value": _r1(avg_ringing), "unit": "kPa"},
-        },
-    }
+    #metriche per flow + KPI finali in una transazione (un solo commit)
+    try:
+        return compute_smt_hood_run(session, run)
+    except RunComputeError as exc:
+        raise HTTPException(status_code=exc.status_code, detail=exc.detail)
 
 
 @router.get("/runs", response_model=List[SmtHoodRunOut])
@@ -1,6 +1,4 @@
 from typing import Optional, List
-import json
-import sqlalchemy as sa
 from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlmodel import Session, select
 from sqlalchemy.orm import selectinload
@@ -8,11 +6,11 @@ from app.services.conversion_wrapper import convert_output
 
 from app.db import get_session
 from app.auth import get_current_user, require_role
-from app.model.kpi import KpiValue, TestMetric
+from app.model.kpi import KpiValue
 from app.model.speed import SpeedRun
 from app.schema.speed import SpeedRunIn, SpeedRunOut
 from app.schema.kpi import KpiValueOut
-from app.services.kpi_engine import score_from_scales
+from app.services.run_compute import RunComputeError, compute_speed_run
 
 router = APIRouter()
 
@@ -48,64 +46,14 @@ def compute_speed_kpis(
     run = session.get(SpeedRun, run_id)
     if not run:
         raise HTTPException(status_code=404, detail="Run not found")
-    if run.measure_ml is None:
-        raise HTTPException(status_code=400, detail="Missing measure_ml")
 
-    context = json.dumps({"agg": "final"})
+    #SPEED_ML + KPI SPEED in una transazione
+    try:
+        kpis = compute_speed_run(session, run)
+    except RunComputeError as exc:
+        raise HTTPException(status_code=exc.status_code, detail=exc.detail)
 
-    # 1) Cancella eventuali metriche duplicate e inserisci la metrica derivata
-    session.exec(sa.delete(TestMetric).where(
-        (TestMetric.run_type == "SPEED") &
-        (TestMetric.run_id == run.id) &
-        (TestMetric.metric_code == "SPEED_ML") &
-        (TestMetric.context_json == context)
-    ))
-
-    session.add(TestMetric(
-        run_type="SPEED",
-        run_id=run.id,
-        product_application_id=run.product_application_id,
-        metric_code="SPEED_ML",
-        value_num=run.measure_ml,
-        unit="ml",
-        context_json=context
-    ))
-
-    #Calcola KPI SPEED
-    score = score_from_scales(session, "SPEED", run.measure_ml)
-
-    #Pulisce ed aggiorna KpiValue
-    session.exec(sa.delete(KpiValue).where(
-        (KpiValue.run_type == "SPEED") &
-        (KpiValue.run_id == run.id) &
-        (KpiValue.kpi_code == "SPEED") &
-        (KpiValue.context_json == context)
-    ))
-
-    kv = KpiValue(
-        run_type="SPEED",
-        run_id=run.id,
-        product_application_id=run.product_application_id,
-        kpi_code="SPEED",
-        value_num=run.measure_ml,
-        score=score,
-        unit="ml",
-        context_json=context
-    )
-
-    session.add(kv)
-    session.commit()
-
-    return [
-        KpiValueOut(
-            kpi_code=kv.kpi_code,
-            value_num=kv.value_num,
-            score=kv.score,
-            unit=kv.unit,
-            context_json=kv.context_json,
-            computed_at=kv.computed_at,
-        )
-    ]
+    return [KpiValueOut(**kv) for kv in kpis]
 
 #Restituisce la lista dei run SPEED
 @router.get("/runs", response_model=List[SpeedRunOut])
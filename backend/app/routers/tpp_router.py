@@ -2,18 +2,17 @@ from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlmodel import Session, select
 from sqlalchemy.orm import selectinload
 from typing import Optional
-import sqlalchemy as sa
-import json
 from app.services.conversion_wrapper import convert_output
 
 from app.db import get_session
 from app.auth import get_current_user, require_role
-from app.model.kpi import KpiValue, TestMetric
+from app.model.kpi import KpiValue
 from app.model.tpp import TppRun
 from app.schema.kpi import KpiValueOut
 from app.schema.tpp import TppRunIn, TppRunOut
 
-from app.services.kpi_engine import score_from_scales
+from app.services.run_compute import RunComputeError, compute_tpp_run
+from app.services.setting_calculator.cache import invalidate_liner_info
 
 router = APIRouter()
 
@@ -38,6 +37,8 @@ def create_tpp_run(
     session.add(run)
     session.commit()
     session.refresh(run)
+    # Il calcolatore usa l'ultimo real_tpp dell'application
+    invalidate_liner_info(run.product_application_id)
     return run
 
 
@@ -55,68 +56,14 @@ def compute_tpp_kpis(
     run = session.get(TppRun, run_id)
     if not run:
         raise HTTPException(status_code=404, detail="Run not found")
-    if run.real_tpp is None:
-        raise HTTPException(status_code=400, detail="Missing real_tpp")
-
-    #salva la metrica derivata (REAL_TPP) su test_metrics (upsert semplice: delete->insert)
-
-    context = json.dumps({"agg": "final"})
-
-    #elimina eventuali metriche precedenti per idempotenza
-    session.exec(sa.delete(TestMetric).where(
-        (TestMetric.run_type == "TPP")
-        & (TestMetric.run_id == run.id)
-        & (TestMetric.metric_code == "REAL_TPP")
-        & (TestMetric.context_json == context)
-    ))
-
-    #salva metrica derivata (REAL_TPP)
-    session.add(TestMetric(
-        run_type="TPP",
-        run_id=run.id,
-        product_application_id=run.product_application_id,
-        metric_code="REAL_TPP",
-        value_num=run.real_tpp,
-        unit=None,
-        context_json=context,
-    ))
-
-    #calcola KPI "CLOSURE"
-    score = score_from_scales(session, "CLOSURE", run.real_tpp)
-
-    #rimuovi vecchi valori KPI per questo run
-    session.exec(sa.delete(KpiValue).where(
-        (KpiValue.run_type == "TPP")
-        & (KpiValue.run_id == run.id)
-        & (KpiValue.kpi_code == "CLOSURE")
-        & (KpiValue.context_json == context)
-    ))
-
-    #salva il nuovo valore KPI
-    kv = KpiValue(
-        run_type="TPP",
-        run_id=run.id,
-        product_application_id=run.product_application_id,
-        kpi_code="CLOSURE",
-        value_num=run.real_tpp,
-        score=score,
-        unit=None,
-        context_json=context,
-    )
 
-    session.add(kv)
-    session.commit()
+    #REAL_TPP + KPI CLOSURE in una transazione
+    try:
+        kpis = compute_tpp_run(session, run)
+    except RunComputeError as exc:
+        raise HTTPException(status_code=exc.status_code, detail=exc.detail)
 
-    return [
-        KpiValueOut(
-            kpi_code=kv.kpi_code,
-            value_num=kv.value_num,
-            score=kv.score,
-            unit=kv.unit,
-            context_json=kv.context_json,
-            computed_at=kv.computed_at,
-        )
-    ]
+    return [KpiValueOut(**kv) for kv in kpis]
 
 
 # ---------------------------------------------------------------------------
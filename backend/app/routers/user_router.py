@@ -14,6 +14,7 @@ from app.model.audit_log import AuditLog
 from app.model.access_log import AccessLog
 from app.model.setting_comparison_preference import SettingComparisonPreference
 from app.model.search import SearchPreference
+from app.services.composite_score import delete_user_profile_scores
 from app.schema.user import (
     UserRead,
     UserUpdate,
@@ -173,6 +174,10 @@ def delete_user(
         deleted = session.exec(delete(SearchPreference).where(SearchPreference.user_id == user_id)).rowcount
         logger.debug(f"Deleted {deleted} SearchPreference records")
 
+        # i profili pesi seguono la cascade di users, i loro composite_scores no (niente FK su profile_id)
+        deleted = delete_user_profile_scores(session, user_id)
+        logger.debug(f"Deleted {deleted} CompositeScore records")
+
         logger.info(f"Deleting user with id={user_id}")
         session.delete(user)
         session.commit()
@@ -3,6 +3,23 @@ from pydantic import BaseModel, model_validator
 from typing import Dict, Any
 from app.services.unit_converter import UnitConverter
 
+#imperial_field -> (metric_field, converter), costruita una volta all'import
+#(il validator gira per ogni modello annidato di ogni richiesta)
+_UNIT_RULES = {
+    "size_inch": ("size_mm", UnitConverter.inch_to_mm),
+    "pressure_inhg": ("pressure_kpa", UnitConverter.inhg_to_kpa),
+    "milk_oz": ("milk_ml", UnitConverter.oz_to_ml),
+    "flow_lb_min": ("flow_l_min", UnitConverter.lbmin_to_lmin) if hasattr(UnitConverter, "lbmin_to_lmin") else None,
+    "flow_gpm": ("flow_l_min", UnitConverter.gpm_to_lmin) if hasattr(UnitConverter, "gpm_to_lmin") else None,
+
+     # --- Setting calculator (imperial -> metric) ---
+    "milkingVacuumMaxInHg": ("milkingVacuumMaxKpa", UnitConverter.inhg_to_kpa),
+    "pfVacuumInHg": ("pfVacuumKpa", UnitConverter.inhg_to_kpa),
+    "omVacuumInHg": ("omVacuumKpa", UnitConverter.inhg_to_kpa),
+}
+_UNIT_RULES = {k: v for k, v in _UNIT_RULES.items() if v}
+
+
 #Base model that normalizes imperial inputs into metric fields.
 #Extend this in all input schemas.
 class MetricNormalizedModel(BaseModel):
@@ -12,25 +29,7 @@ class MetricNormalizedModel(BaseModel):
         if not isinstance(data, dict):
             return data
 
-        #imperial_field -> (metric_field, converter)
-        RULES = {
-            "size_inch": ("size_mm", UnitConverter.inch_to_mm),
-            "pressure_inhg": ("pressure_kpa", UnitConverter.inhg_to_kpa),
-            "milk_oz": ("milk_ml", UnitConverter.oz_to_ml),
-            "flow_lb_min": ("flow_l_min", UnitConverter.lbmin_to_lmin) if hasattr(UnitConverter, "lbmin_to_lmin") else None,
-            "flow_gpm": ("flow_l_min", UnitConverter.gpm_to_lmin) if hasattr(UnitConverter, "gpm_to_lmin") else None,
-            
-             # --- Setting calculator (imperial -> metric) ---
-            "milkingVacuumMaxInHg": ("milkingVacuumMaxKpa", UnitConverter.inhg_to_kpa),
-            "pfVacuumInHg": ("pfVacuumKpa", UnitConverter.inhg_to_kpa),
-            "omVacuumInHg": ("omVacuumKpa", UnitConverter.inhg_to_kpa),
-        }
-
-        for imperial_field, item in RULES.items():
-            if not item:
-                continue
-            metric_field, converter = item
-
+        for imperial_field, (metric_field, converter) in _UNIT_RULES.items():
             if imperial_field in data and data.get(imperial_field) is not None:
                 # Converto sempre in metric anche se mancante o None
                 data[metric_field] = converter(data[imperial_field])
@@ -1,6 +1,6 @@
 from datetime import datetime
 from typing import List, Optional, Dict, Any
-from pydantic import ConfigDict
+from pydantic import ConfigDict, Field, field_validator
 from .base import MetricNormalizedModel
 # Use the same enums as the ORM models to avoid mismatch
 from ..model.kpi import FormulaType, TestKind
@@ -55,3 +55,28 @@ class KpiValueOut(MetricNormalizedModel):
 
 class KpiValuesBatchIn(MetricNormalizedModel):
     product_application_ids: List[int]
+
+# --------------- COMPOSITE SCORE -------------------------
+
+class CompositeWeightProfileIn(MetricNormalizedModel):
+    name: str = Field(min_length=1, max_length=100)
+    weights: Dict[str, float]
+
+    @field_validator("weights")
+    @classmethod
+    def validate_weights(cls, value: Dict[str, float]) -> Dict[str, float]:
+        weights = {code.strip().upper(): float(w) for code, w in value.items() if code.strip()}
+        if any(w < 0 for w in weights.values()):
+            raise ValueError("weights must be >= 0")
+        if not any(w > 0 for w in weights.values()):
+            raise ValueError("at least one weight must be > 0")
+        return weights
+
+
+class CompositeWeightProfileOut(MetricNormalizedModel):
+    id: int
+    name: str
+    weights: Dict[str, float]
+    created_at: Optional[datetime] = None
+
+    model_config = ConfigDict(from_attributes=True)
@@ -103,6 +103,12 @@ class ProductOut(ProductBase):
 
         model_config = ConfigDict(from_attributes=True)
 
+
+class SimilarProductOut(ProductOut):
+        # distanza pesata sulle specifiche normalizzate (0 = identico)
+        distance: float
+        compared_features: int
+
 # ------------------ PRODUCT PREFERENCE SCHEMAS ------------------
 #classi per salvataggio filtri 
 
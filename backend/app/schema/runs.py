@@ -0,0 +1,7 @@
+from typing import List
+
+from .base import MetricNormalizedModel
+
+
+class LatestRunsBatchIn(MetricNormalizedModel):
+    product_application_ids: List[int]
@@ -1,5 +1,5 @@
-from .request_v1 import CompareRequestV1
-from .response_v1 import CompareResponseV1
+from .request_v1 import CompareRequestV1, SolveRequestV1
+from .response_v1 import CompareResponseV1, SolveResponseV1
 from .errors import ValidationErrorResponseV1
 
-__all__ = ["CompareRequestV1", "CompareResponseV1", "ValidationErrorResponseV1"]
+__all__ = ["CompareRequestV1", "CompareResponseV1", "SolveRequestV1", "SolveResponseV1", "ValidationErrorResponseV1"]
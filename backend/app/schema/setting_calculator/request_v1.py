@@ -33,3 +33,51 @@ class CompareRequestV1(MetricNormalizedModel):
 
     left: SideRequestV1
     right: SideRequestV1
+
+
+# --- Solver inverso (/setting-calculator/solve) ---
+
+SolveMetricV1 = Literal[
+    "bRealMs",
+    "realOffMs",
+    "appliedVacuum.pf",
+    "appliedVacuum.om",
+    "massageIntensity.pf",
+    "massageIntensity.om",
+]
+
+
+class SolveTargetV1(MetricNormalizedModel):
+    metric: SolveMetricV1
+    # valore esplicito; se manca si calcola dal lato "reference"
+    value: Optional[float] = Field(default=None, ge=0)
+
+
+class SolveRangeV1(MetricNormalizedModel):
+    min: float = Field(..., gt=0)
+    max: float = Field(..., gt=0)
+    # risoluzione del pulsatore (es. 1 bpm, 1 %): il risultato cade su min + k * step
+    step: Optional[float] = Field(default=None, gt=0)
+
+
+class SolveConstraintsV1(MetricNormalizedModel):
+    # parametri senza range restano fissi al valore di candidate.inputs
+    frequencyBpm: Optional[SolveRangeV1] = None
+    ratioPct: Optional[SolveRangeV1] = None
+    phaseAMs: Optional[SolveRangeV1] = None
+    phaseCMs: Optional[SolveRangeV1] = None
+
+
+class SolveRequestV1(MetricNormalizedModel):
+    schemaVersion: Literal["1.0"] = "1.0"
+    requestId: str
+
+    target: SolveTargetV1
+    reference: Optional[SideRequestV1] = None
+    candidate: SideRequestV1
+    constraints: SolveConstraintsV1
+
+    # errore relativo accettato: tra i settaggi entro tolleranza vince il più vicino a candidate.inputs
+    tolerancePct: float = Field(default=0.5, ge=0, le=100)
+    maxIterations: int = Field(default=6, ge=1, le=20)
+    gridSize: int = Field(default=9, ge=3, le=41)
@@ -1,49 +1,50 @@
 from typing import List, Literal
-from pydantic import Field
+from pydantic import BaseModel, Field
 
-from app.schema.base import MetricNormalizedModel
+# Solo output: niente normalizzazione delle unità (MetricNormalizedModel è per gli input),
+# così la validazione di un SideResultV1 non passa da un validator Python per ogni modello annidato
 
 
-class PointV1(MetricNormalizedModel):
+class PointV1(BaseModel):
     xMs: float = Field(..., ge=0)
     yKpa: float = Field(..., ge=0)
 
 
-class CurveV1(MetricNormalizedModel):
+class CurveV1(BaseModel):
     label: str
     points: List[PointV1]
 
 
-class PulsationChartV1(MetricNormalizedModel):
+class PulsationChartV1(BaseModel):
     curve: CurveV1
     threshold: CurveV1
 
 
-class SegmentV1(MetricNormalizedModel):
+class SegmentV1(BaseModel):
     key: str  # "A"|"B"|"C"|"D"
     valueMs: float = Field(..., ge=0)
 
 
-class PulsatorPhasesChartV1(MetricNormalizedModel):
+class PulsatorPhasesChartV1(BaseModel):
     segments: List[SegmentV1]
 
 
-class BarV1(MetricNormalizedModel):
+class BarV1(BaseModel):
     key: str
     valueMs: float = Field(..., ge=0)
 
 
-class RealMilkingMassageChartV1(MetricNormalizedModel):
+class RealMilkingMassageChartV1(BaseModel):
     bars: List[BarV1]
 
 
-class ChartsV1(MetricNormalizedModel):
+class ChartsV1(BaseModel):
     pulsation: PulsationChartV1
     pulsatorPhases: PulsatorPhasesChartV1
     realMilkingMassage: RealMilkingMassageChartV1
 
 
-class LinerInfoV1(MetricNormalizedModel):
+class LinerInfoV1(BaseModel):
     id: int
     model: str
     brand: str
@@ -53,7 +54,7 @@ class LinerInfoV1(MetricNormalizedModel):
     intensityOmKpa: float = Field(..., ge=0)
 
 
-class DerivedV1(MetricNormalizedModel):
+class DerivedV1(BaseModel):
     tMs: float = Field(..., gt=0)
 
     aMs: float = Field(..., ge=0)
@@ -73,7 +74,7 @@ class DerivedV1(MetricNormalizedModel):
     realOffMs: float = Field(..., ge=0)
 
 
-class InputsUsedV1(MetricNormalizedModel):
+class InputsUsedV1(BaseModel):
     milkingVacuumMaxKpa: float
     pfVacuumKpa: float
     omVacuumKpa: float
@@ -84,7 +85,7 @@ class InputsUsedV1(MetricNormalizedModel):
     phaseCMs: float
 
 
-class SideResultV1(MetricNormalizedModel):
+class SideResultV1(BaseModel):
     liner: LinerInfoV1
     inputsUsed: InputsUsedV1
     derived: DerivedV1
@@ -92,17 +93,17 @@ class SideResultV1(MetricNormalizedModel):
     warnings: List[str] = Field(default_factory=list)
 
 
-class DiffPairV1(MetricNormalizedModel):
+class DiffPairV1(BaseModel):
     pf: float
     om: float
 
 
-class DiffPctV1(MetricNormalizedModel):
+class DiffPctV1(BaseModel):
     appliedVacuum: DiffPairV1
     massageIntensity: DiffPairV1
 
 
-class CompareResponseV1(MetricNormalizedModel):
+class CompareResponseV1(BaseModel):
     schemaVersion: Literal["1.0"] = "1.0"
     engineVersion: str
     requestId: str
@@ -112,3 +113,29 @@ class CompareResponseV1(MetricNormalizedModel):
 
     diffPct: DiffPctV1
     warnings: List[str] = Field(default_factory=list)
+
+
+class SolveSettingsV1(BaseModel):
+    frequencyBpm: float
+    ratioPct: float
+    phaseAMs: float
+    phaseCMs: float
+
+
+class SolveResponseV1(BaseModel):
+    schemaVersion: Literal["1.0"] = "1.0"
+    engineVersion: str
+    requestId: str
+
+    metric: str
+    targetValue: float
+    achievedValue: float
+    errorPct: float
+    withinTolerance: bool
+
+    settings: SolveSettingsV1
+    result: SideResultV1
+
+    iterations: int
+    evaluations: int
+    warnings: List[str] = Field(default_factory=list)
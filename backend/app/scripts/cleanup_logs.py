@@ -1,43 +1,74 @@
 import os
 from datetime import datetime, timedelta
 
-from sqlmodel import Session, delete
-
 from app.db import engine
-from app.model.access_log import AccessLog
-from app.model.audit_log import AuditLog
-from app.model.login_event import LoginEvent
-from app.model.security_event import SecurityEvent
+from app.services.latency_rollup import rollup_route_latency
+from app.services.log_archive import ARCHIVE_TABLES, LOG_ARCHIVE_DIR, archive_logs
+from app.services.log_partitions import (
+    LOG_TABLES,
+    PARTITION_INTERVALS,
+    catch_all_partitions,
+    chunked_delete,
+    drop_expired_partitions,
+    ensure_partitions,
+    is_partitioned,
+    period_start,
+)
+
+LOG_PARTITION_INTERVAL = os.getenv("LOG_PARTITION_INTERVAL", "day").strip().lower()
+LOG_PARTITION_PRECREATE = int(os.getenv("LOG_PARTITION_PRECREATE", "7"))
+LOG_CLEANUP_BATCH_SIZE = int(os.getenv("LOG_CLEANUP_BATCH_SIZE", "5000"))
 
 
 def cleanup_logs(retention_days: int) -> None:
     # NB: i vostri created_at usano datetime.utcnow() (naive), quindi usiamo cutoff naive UTC
-    cutoff = datetime.utcnow() - timedelta(days=retention_days)
-
-    with Session(engine) as session:
-        res_access = session.exec(
-            delete(AccessLog).where(AccessLog.created_at < cutoff)
-        )
-        res_audit = session.exec(
-            delete(AuditLog).where(AuditLog.created_at < cutoff)
-        )
-        res_login_events = session.exec(
-            delete(LoginEvent).where(LoginEvent.created_at < cutoff)
-        )
-        res_security_events = session.exec(
-            delete(SecurityEvent).where(SecurityEvent.created_at < cutoff)
-        )
-        session.commit()
-
-    access_deleted = getattr(res_access, "rowcount", None)
-    audit_deleted = getattr(res_audit, "rowcount", None)
-    login_events_deleted = getattr(res_login_events, "rowcount", None)
-    security_events_deleted = getattr(res_security_events, "rowcount", None)
+    now = datetime.utcnow()
+    cutoff = now - timedelta(days=retention_days)
+    interval = LOG_PARTITION_INTERVAL if LOG_PARTITION_INTERVAL in PARTITION_INTERVALS else "day"
+
+    # le ore ancora da aggregare vanno nei rollup prima che le righe grezze spariscano
+    rolled = rollup_route_latency(engine, now=now)
+    summary = [f"latency_rollup_rows={rolled['rows']}"]
+    archived_tables = ARCHIVE_TABLES if LOG_ARCHIVE_DIR else ()
+    if archived_tables:
+        # esporta (e cancella) i giorni interi prima del cutoff; il resto del giorno
+        # del cutoff resta in tabella fino al prossimo giro
+        archived = archive_logs(engine, before=cutoff, archive_dir=LOG_ARCHIVE_DIR, tables=archived_tables)
+        summary += [f"{table}_archived={rows}" for table, rows in archived.items()]
+
+    for table in LOG_TABLES:
+        table_cutoff = period_start(cutoff, "day") if table in archived_tables else cutoff
+        with engine.begin() as conn:
+            partitioned = is_partitioned(conn, table)
+            if partitioned:
+                # Postgres: retention = drop whole partitions, then make sure upcoming ones exist
+                dropped = drop_expired_partitions(conn, table, cutoff=table_cutoff)
+                leftovers = catch_all_partitions(conn, table)
+                created = ensure_partitions(
+                    conn,
+                    table,
+                    interval=interval,
+                    ahead=LOG_PARTITION_PRECREATE,
+                    now=now,
+                )
+        if partitioned:
+            # DEFAULT e legacy (MINVALUE ..) non si droppano: le righe scadute lì si cancellano a blocchi
+            purged = sum(
+                chunked_delete(engine, name, cutoff=table_cutoff, batch_size=LOG_CLEANUP_BATCH_SIZE)
+                for name in leftovers
+            )
+            summary.append(
+                f"{table}_partitions_dropped={len(dropped)} {table}_partitions_created={len(created)} "
+                f"{table}_catch_all_deleted={purged}"
+            )
+        else:
+            # SQLite / non-partitioned tables: short batched DELETEs instead of one big transaction
+            deleted = chunked_delete(engine, table, cutoff=table_cutoff, batch_size=LOG_CLEANUP_BATCH_SIZE)
+            summary.append(f"{table}_deleted={deleted}")
 
     print(
         f"[cleanup_logs] retention_days={retention_days} cutoff={cutoff.isoformat()} "
-        f"access_deleted={access_deleted} audit_deleted={audit_deleted} "
-        f"login_events_deleted={login_events_deleted} security_events_deleted={security_events_deleted}"
+        + " ".join(summary)
     )
 
 
@@ -1,17 +1,14 @@
 import argparse
 import csv
-import json
 import re
 from typing import Dict, List, Optional, Tuple
 
-import sqlalchemy as sa
-from sqlmodel import Session, select, delete
+from sqlmodel import Session, select
 
 from app.db import engine
-from app.model.kpi import KpiValue, TestMetric
 from app.model.product import Product, ProductApplication
 from app.model.massage import MassageRun, MassagePoint
-from app.services.kpi_engine import score_or_422
+from app.services.run_compute import compute_massage_run
 
 
 PRESSURES = [45, 40, 35]
@@ -108,84 +105,6 @@ def _read_rows(path: str, delimiter: str) -> List[Dict[str, str]]:
         return rows
 
 
-def _compute_massage_kpis(session: Session, run: MassageRun) -> None:
-    pts = session.exec(select(MassagePoint).where(MassagePoint.run_id == run.id)).all()
-    by = {p.pressure_kpa: p for p in pts}
-    if not all(k in by for k in PRESSURES):
-        raise ValueError("Run requires 3 points at 45/40/35 kPa")
-
-    I45 = by[45].max_val - by[45].min_val
-    I40 = by[40].max_val - by[40].min_val
-    I35 = by[35].max_val - by[35].min_val
-
-    avg_overmilk = (I45 + I40) / 2.0
-    avg_pf = (I40 + I35) / 2.0
-    diff_from_max = 45.0 - by[45].max_val
-    diff_pct = (diff_from_max / 45.0) if 45.0 != 0 else 0.0
-    drop_45_to_40 = (I40 - I45) / I45 if I45 else 0.0
-    drop_40_to_35 = (I35 - I40) / I40 if I40 else 0.0
-
-    k_cong = score_or_422(session, "CONGESTION_RISK", avg_overmilk)
-    k_hk = score_or_422(session, "HYPERKERATOSIS_RISK", avg_overmilk)
-    k_fit = score_or_422(session, "FITTING", diff_pct)
-
-    session.exec(delete(TestMetric).where(TestMetric.run_type == "MASSAGE", TestMetric.run_id == run.id))
-
-    metrics = [
-        TestMetric(run_type="MASSAGE", run_id=run.id, product_application_id=run.product_application_id,
-                   metric_code="I45", value_num=float(I45), unit=None, context_json=json.dumps({})),
-        TestMetric(run_type="MASSAGE", run_id=run.id, product_application_id=run.product_application_id,
-                   metric_code="I40", value_num=float(I40), unit=None, context_json=json.dumps({})),
-        TestMetric(run_type="MASSAGE", run_id=run.id, product_application_id=run.product_application_id,
-                   metric_code="I35", value_num=float(I35), unit=None, context_json=json.dumps({})),
-        TestMetric(run_type="MASSAGE", run_id=run.id, product_application_id=run.product_application_id,
-                   metric_code="AVG_OVERMILK", value_num=float(avg_overmilk), unit=None, context_json=json.dumps({})),
-        TestMetric(run_type="MASSAGE", run_id=run.id, product_application_id=run.product_application_id,
-                   metric_code="AVG_PF", value_num=float(avg_pf), unit=None, context_json=json.dumps({})),
-        TestMetric(run_type="MASSAGE", run_id=run.id, product_application_id=run.product_application_id,
-                   metric_code="DIFF_FROM_MAX", value_num=float(diff_from_max), unit="kPa", context_json=json.dumps({})),
-        TestMetric(run_type="MASSAGE", run_id=run.id, product_application_id=run.product_application_id,
-                   metric_code="DIFF_PCT", value_num=float(diff_pct), unit="%", context_json=json.dumps({})),
-        TestMetric(run_type="MASSAGE", run_id=run.id, product_application_id=run.product_application_id,
-                   metric_code="DROP_45_40", value_num=float(drop_45_to_40), unit="%", context_json=json.dumps({})),
-        TestMetric(run_type="MASSAGE", run_id=run.id, product_application_id=run.product_application_id,
-                   metric_code="DROP_40_35", value_num=float(drop_40_to_35), unit="%", context_json=json.dumps({})),
-    ]
-    session.bulk_save_objects(metrics)
-
-    def upsert_kpi(code: str, value: float, score: int | None) -> None:
-        ctx = json.dumps({"pressures": [45, 40, 35]})
-        kv = session.exec(
-            select(KpiValue).where(
-                KpiValue.product_application_id == run.product_application_id,
-                KpiValue.kpi_code == code,
-            )
-        ).first()
-        if kv:
-            kv.value_num = float(value)
-            kv.score = int(score) if score is not None else None
-            kv.run_type = "MASSAGE"
-            kv.run_id = run.id
-            kv.context_json = ctx
-            session.add(kv)
-        else:
-            session.add(
-                KpiValue(
-                    product_application_id=run.product_application_id,
-                    kpi_code=code,
-                    value_num=float(value),
-                    score=int(score) if score is not None else None,
-                    run_type="MASSAGE",
-                    run_id=run.id,
-                    context_json=ctx,
-                )
-            )
-
-    upsert_kpi("CONGESTION_RISK", avg_overmilk, k_cong)
-    upsert_kpi("HYPERKERATOSIS_RISK", avg_overmilk, k_hk)
-    upsert_kpi("FITTING", diff_pct, k_fit)
-
-
 def main() -> int:
     parser = argparse.ArgumentParser(description="Import Massage runs from CSV.")
     parser.add_argument("--file", required=True, help="Path to CSV file.")
@@ -280,7 +199,7 @@ def main() -> int:
                     session.bulk_save_objects(pts)
                 session.flush()
 
-                _compute_massage_kpis(session, run)
+                compute_massage_run(session, run, pts, commit=False)
                 session.commit()
                 created += 1
             except Exception as exc:
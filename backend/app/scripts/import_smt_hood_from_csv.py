@@ -1,21 +1,17 @@
 import argparse
 import csv
-import json
 import re
 from typing import Dict, List, Optional, Tuple
 
-import sqlalchemy as sa
 from sqlmodel import Session, select
 
 from app.db import engine
-from app.model.kpi import KpiValue, TestMetric
 from app.model.product import Product, ProductApplication
 from app.model.smthood import SmtHoodRun, SmtHoodPoint
-from app.services.kpi_engine import score_or_422
+from app.services.run_compute import compute_smt_hood_run
 
 
 ALLOWED_FLOWS = [0.5, 1.9, 3.6]
-MILK_VAC = 45.0
 SIZE_LABELS = {"XS": 40, "S": 50, "M": 60, "L": 70}
 
 
@@ -115,106 +111,6 @@ def _read_rows(path: str, delimiter: str) -> List[Dict[str, str]]:
         return rows
 
 
-def _compute_smt_hood_kpis(session: Session, run: SmtHoodRun) -> None:
-    pts = session.exec(select(SmtHoodPoint).where(SmtHoodPoint.run_id == run.id)).all()
-    by_code = {p.flow_code: p for p in pts}
-    needed = [_flow_code(f) for f in ALLOWED_FLOWS]
-    if not all(code in by_code for code in needed):
-        raise ValueError("Run requires 3 points at flows 0.5, 1.9, 3.6 L/min")
-
-    session.exec(sa.delete(TestMetric).where(TestMetric.run_type == "SMT_HOOD", TestMetric.run_id == run.id))
-
-    metrics_to_save = []
-    respray_vals, fluydo_vals, slippage_vals, ringing_vals = [], [], [], []
-
-    for fl in ALLOWED_FLOWS:
-        code = _flow_code(fl)
-        p = by_code[code]
-        smt_min, smt_max = float(p.smt_min), float(p.smt_max)
-        hood_min, hood_max = float(p.hood_min), float(p.hood_max)
-
-        respray_val = smt_max - MILK_VAC
-        fluydo_val = (smt_max - smt_min) - (smt_max - MILK_VAC) if smt_max > MILK_VAC else (smt_max - smt_min)
-        slippage_val = (hood_max - hood_min) - (hood_max - MILK_VAC) if hood_max > MILK_VAC else (hood_max - hood_min)
-        ringing_val = hood_max - MILK_VAC
-
-        score_or_422(session, "RESPRAY", respray_val)
-        score_or_422(session, "FLUYDODINAMIC", fluydo_val)
-        score_or_422(session, "SLIPPAGE", slippage_val)
-        score_or_422(session, "RINGING_RISK", ringing_val)
-
-        metrics_to_save.extend([
-            TestMetric(
-                run_type="SMT_HOOD", run_id=run.id, product_application_id=run.product_application_id,
-                metric_code="RESPRAY_VAL", value_num=float(respray_val), unit="kPa",
-                context_json=json.dumps({"flow_lpm": fl}),
-            ),
-            TestMetric(
-                run_type="SMT_HOOD", run_id=run.id, product_application_id=run.product_application_id,
-                metric_code="FLUYDODINAMIC_VAL", value_num=float(fluydo_val), unit="kPa",
-                context_json=json.dumps({"flow_lpm": fl}),
-            ),
-            TestMetric(
-                run_type="SMT_HOOD", run_id=run.id, product_application_id=run.product_application_id,
-                metric_code="SLIPPAGE_VAL", value_num=float(slippage_val), unit="kPa",
-                context_json=json.dumps({"flow_lpm": fl}),
-            ),
-            TestMetric(
-                run_type="SMT_HOOD", run_id=run.id, product_application_id=run.product_application_id,
-                metric_code="RINGING_VAL", value_num=float(ringing_val), unit="kPa",
-                context_json=json.dumps({"flow_lpm": fl}),
-            ),
-        ])
-
-        respray_vals.append(respray_val)
-        fluydo_vals.append(fluydo_val)
-        slippage_vals.append(slippage_val)
-        ringing_vals.append(ringing_val)
-
-    if metrics_to_save:
-        session.bulk_save_objects(metrics_to_save)
-
-    def _avg(xs: list[float]) -> float:
-        return (sum(xs) / len(xs)) if xs else 0.0
-
-    avg_respray = _avg(respray_vals)
-    avg_fluydo = _avg(fluydo_vals)
-    avg_slip = _avg(slippage_vals)
-    avg_ringing = _avg(ringing_vals)
-
-    def upsert_kpi(code: str, value: float) -> None:
-        ctx = json.dumps({"flows": ALLOWED_FLOWS, "agg": "final"})
-        score = score_or_422(session, code, value)
-        kv = session.exec(
-            select(KpiValue).where(
-                KpiValue.product_application_id == run.product_application_id,
-                KpiValue.kpi_code == code,
-            )
-        ).first()
-        if kv:
-            kv.value_num, kv.score, kv.unit = float(value), int(score), "kPa"
-            kv.run_type, kv.run_id, kv.context_json = "SMT_HOOD", run.id, ctx
-            session.add(kv)
-        else:
-            session.add(
-                KpiValue(
-                    product_application_id=run.product_application_id,
-                    kpi_code=code,
-                    value_num=float(value),
-                    score=int(score),
-                    run_type="SMT_HOOD",
-                    run_id=run.id,
-                    unit="kPa",
-                    context_json=ctx,
-                )
-            )
-
-    upsert_kpi("RESPRAY", avg_respray)
-    upsert_kpi("FLUYDODINAMIC", avg_fluydo)
-    upsert_kpi("SLIPPAGE", avg_slip)
-    upsert_kpi("RINGING_RISK", avg_ringing)
-
-
 def main() -> int:
     parser = argparse.ArgumentParser(description="Import SMT/Hood runs from CSV.")
     parser.add_argument("--file", required=True, help="Path to CSV file.")
@@ -320,7 +216,7 @@ def main() -> int:
                     session.bulk_save_objects(pts)
                 session.flush()
 
-                _compute_smt_hood_kpis(session, run)
+                compute_smt_hood_run(session, run, pts, commit=False)
                 session.commit()
                 created += 1
             except Exception as exc:
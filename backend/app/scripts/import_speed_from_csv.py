@@ -1,17 +1,14 @@
 import argparse
 import csv
-import json
 import re
 from typing import Dict, Optional
 
-import sqlalchemy as sa
 from sqlmodel import Session, select
 
 from app.db import engine
-from app.model.kpi import KpiValue, TestMetric
 from app.model.product import Product, ProductApplication
 from app.model.speed import SpeedRun
-from app.services.kpi_engine import score_from_scales
+from app.services.run_compute import compute_speed_run
 
 
 def _normalize_header(value: str) -> str:
@@ -31,56 +28,6 @@ def _parse_float(value: Optional[str]) -> Optional[float]:
         return None
 
 
-def _compute_speed_kpis(session: Session, run: SpeedRun) -> None:
-    if run.measure_ml is None:
-        return
-
-    context = json.dumps({"agg": "final"})
-
-    session.exec(
-        sa.delete(TestMetric).where(
-            (TestMetric.run_type == "SPEED")
-            & (TestMetric.run_id == run.id)
-            & (TestMetric.metric_code == "SPEED_ML")
-            & (TestMetric.context_json == context)
-        )
-    )
-    session.add(
-        TestMetric(
-            run_type="SPEED",
-            run_id=run.id,
-            product_application_id=run.product_application_id,
-            metric_code="SPEED_ML",
-            value_num=run.measure_ml,
-            unit="ml",
-            context_json=context,
-        )
-    )
-
-    score = score_from_scales(session, "SPEED", run.measure_ml)
-
-    session.exec(
-        sa.delete(KpiValue).where(
-            (KpiValue.run_type == "SPEED")
-            & (KpiValue.run_id == run.id)
-            & (KpiValue.kpi_code == "SPEED")
-            & (KpiValue.context_json == context)
-        )
-    )
-    session.add(
-        KpiValue(
-            run_type="SPEED",
-            run_id=run.id,
-            product_application_id=run.product_application_id,
-            kpi_code="SPEED",
-            value_num=run.measure_ml,
-            score=score,
-            unit="ml",
-            context_json=context,
-        )
-    )
-
-
 def _load_product_map(session: Session) -> Dict[str, Product]:
     products = session.exec(
         select(Product).where(Product.product_type == "liner")
@@ -167,7 +114,7 @@ def main() -> int:
                 run = SpeedRun(product_application_id=app.id, measure_ml=speed_val)
                 session.add(run)
                 session.flush()
-                _compute_speed_kpis(session, run)
+                compute_speed_run(session, run, commit=False)
                 session.commit()
                 created += 1
             except Exception as exc:
@@ -1,17 +1,14 @@
 import argparse
 import csv
-import json
 import re
 from typing import Dict, Optional
 
-import sqlalchemy as sa
 from sqlmodel import Session, select
 
 from app.db import engine
-from app.model.kpi import KpiValue, TestMetric
 from app.model.product import Product, ProductApplication
 from app.model.tpp import TppRun
-from app.services.kpi_engine import score_from_scales
+from app.services.run_compute import compute_tpp_run
 
 
 def _normalize_header(value: str) -> str:
@@ -31,56 +28,6 @@ def _parse_float(value: Optional[str]) -> Optional[float]:
         return None
 
 
-def _compute_tpp_kpis(session: Session, run: TppRun) -> None:
-    if run.real_tpp is None:
-        return
-
-    context = json.dumps({"agg": "final"})
-
-    session.exec(
-        sa.delete(TestMetric).where(
-            (TestMetric.run_type == "TPP")
-            & (TestMetric.run_id == run.id)
-            & (TestMetric.metric_code == "REAL_TPP")
-            & (TestMetric.context_json == context)
-        )
-    )
-    session.add(
-        TestMetric(
-            run_type="TPP",
-            run_id=run.id,
-            product_application_id=run.product_application_id,
-            metric_code="REAL_TPP",
-            value_num=run.real_tpp,
-            unit=None,
-            context_json=context,
-        )
-    )
-
-    score = score_from_scales(session, "CLOSURE", run.real_tpp)
-
-    session.exec(
-        sa.delete(KpiValue).where(
-            (KpiValue.run_type == "TPP")
-            & (KpiValue.run_id == run.id)
-            & (KpiValue.kpi_code == "CLOSURE")
-            & (KpiValue.context_json == context)
-        )
-    )
-    session.add(
-        KpiValue(
-            run_type="TPP",
-            run_id=run.id,
-            product_application_id=run.product_application_id,
-            kpi_code="CLOSURE",
-            value_num=run.real_tpp,
-            score=score,
-            unit=None,
-            context_json=context,
-        )
-    )
-
-
 def _load_product_map(session: Session) -> Dict[str, Product]:
     products = session.exec(
         select(Product).where(Product.product_type == "liner")
@@ -167,7 +114,7 @@ def main() -> int:
                 run = TppRun(product_application_id=app.id, real_tpp=real_tpp)
                 session.add(run)
                 session.flush()
-                _compute_tpp_kpis(session, run)
+                compute_tpp_run(session, run, commit=False)
                 session.commit()
                 created += 1
             except Exception as exc:
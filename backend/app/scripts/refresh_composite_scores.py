@@ -0,0 +1,17 @@
+from sqlmodel import Session
+
+from app.db import engine
+from app.services.composite_score import refresh_composite_scores
+
+
+def refresh_all() -> int:
+    # Ricalcolo completo (tutte le applicazioni, tutti i profili): dopo la migrazione
+    # che crea composite_scores o per riallineare a mano la tabella
+    with Session(engine) as session:
+        written = refresh_composite_scores(session)
+        session.commit()
+    return written
+
+
+if __name__ == "__main__":
+    print(f"[refresh_composite_scores] rows_written={refresh_all()}")
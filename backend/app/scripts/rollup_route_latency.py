@@ -0,0 +1,8 @@
+from app.db import engine
+from app.services.latency_rollup import rollup_route_latency
+
+
+if __name__ == "__main__":
+    # da cron ogni ora (o più spesso): ricalcola dall'ultima ora aggregata a quella corrente
+    summary = rollup_route_latency(engine)
+    print(f"[rollup_route_latency] hours={summary['hours']} rows={summary['rows']}")
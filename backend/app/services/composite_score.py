@@ -0,0 +1,153 @@
+"""Composite liner score: weighted mean of the latest KPI scores of an application.
+
+Weights come from ``KpiDef.weight`` (profile 0) or from a user's
+``CompositeWeightProfile``. Results live in ``composite_scores`` (one row per
+profile and application) so ``/rankings/composite`` never touches
+``kpi_values``; they are refreshed in the same transaction that changes their
+inputs:
+
+- KPI values of an application (``run_compute``): that application, every profile;
+- ``KpiDef`` weights: every application, profile 0;
+- a saved profile: every application, that profile.
+
+``profile_id`` has no FK (0 is the KpiDef profile): rows of deleted profiles
+are removed explicitly (profile/user delete) and by the full refresh.
+"""
+from typing import Iterable, Mapping, Optional
+
+import sqlalchemy as sa
+from sqlmodel import Session, select
+
+from app.model.kpi import CompositeScore, CompositeWeightProfile, KpiDef, KpiValue, utcnow
+from app.services.kpi_persistence import upsert_composite_scores
+
+
+DEFAULT_PROFILE_ID = 0
+
+
+def normalize_weights(weights: Mapping[str, float]) -> dict[str, float]:
+    """Upper-cased KPI codes with a positive weight (0 = KPI ignored)."""
+    return {str(code).strip().upper(): float(w) for code, w in weights.items() if w is not None and float(w) > 0}
+
+
+def load_weight_profiles(session: Session, profile_ids: Optional[Iterable[int]] = None) -> dict[int, dict[str, float]]:
+    """``{profile_id: {kpi_code: weight}}``; all profiles when ``profile_ids`` is None."""
+    wanted = None if profile_ids is None else set(profile_ids)
+    profiles: dict[int, dict[str, float]] = {}
+    if wanted is None or DEFAULT_PROFILE_ID in wanted:
+        rows = session.exec(select(KpiDef.code, KpiDef.weight)).all()
+        profiles[DEFAULT_PROFILE_ID] = normalize_weights({code: weight for code, weight in rows})
+    if wanted is None or wanted - {DEFAULT_PROFILE_ID}:
+        stmt = select(CompositeWeightProfile.id, CompositeWeightProfile.weights)
+        if wanted is not None:
+            stmt = stmt.where(CompositeWeightProfile.id.in_(wanted - {DEFAULT_PROFILE_ID}))
+        for profile_id, weights in session.exec(stmt).all():
+            profiles[profile_id] = normalize_weights(weights or {})
+    return profiles
+
+
+def latest_kpi_scores(
+    session: Session,
+    kpi_codes: Iterable[str],
+    application_ids: Optional[Iterable[int]] = None,
+) -> dict[int, dict[str, int]]:
+    """Latest score per (application, KPI), same window as the overview ranking."""
+    codes = sorted(set(kpi_codes))
+    if not codes:
+        return {}
+    kv = KpiValue.__table__
+    latest = (
+        sa.select(
+            kv.c.product_application_id,
+            kv.c.kpi_code,
+            kv.c.score,
+            sa.func.row_number()
+            .over(partition_by=(kv.c.kpi_code, kv.c.product_application_id), order_by=kv.c.computed_at.desc())
+            .label("rn_latest"),
+        )
+        .where(kv.c.kpi_code.in_(codes))
+    )
+    if application_ids is not None:
+        latest = latest.where(kv.c.product_application_id.in_(list(application_ids)))
+    latest = latest.subquery("latest")
+
+    out: dict[int, dict[str, int]] = {}
+    rows = session.exec(
+        sa.select(latest.c.product_application_id, latest.c.kpi_code, latest.c.score).where(latest.c.rn_latest == 1)
+    ).all()
+    for pa_id, code, score in rows:
+        if score is not None:
+            out.setdefault(pa_id, {})[code] = score
+    return out
+
+
+def composite_score(scores: Mapping[str, int], weights: Mapping[str, float]) -> Optional[dict]:
+    """Weighted mean over the KPIs measured; ``coverage`` = weight share they represent."""
+    present = [(w, scores[code]) for code, w in weights.items() if scores.get(code) is not None]
+    if not present:
+        return None
+    total = sum(weights.values())
+    measured = sum(w for w, _ in present)
+    return {
+        "score": sum(w * s for w, s in present) / measured,
+        "coverage": measured / total,
+        "kpi_count": len(present),
+    }
+
+
+def refresh_composite_scores(
+    session: Session,
+    application_ids: Optional[Iterable[int]] = None,
+    profile_ids: Optional[Iterable[int]] = None,
+) -> int:
+    """Recompute composite scores (None = all applications / all profiles); caller commits.
+
+    Rows of the refreshed scope that no longer have any weighted KPI are removed.
+    """
+    ids = None if application_ids is None else sorted(set(application_ids))
+    if ids == []:
+        return 0
+    profiles = load_weight_profiles(session, profile_ids)
+    if not profiles:
+        return 0
+    codes = {code for weights in profiles.values() for code in weights}
+    scores = latest_kpi_scores(session, codes, ids)
+
+    now = utcnow()
+    rows = []
+    incomplete = set()  # profili con almeno un'applicazione del perimetro senza punteggio
+    for profile_id, weights in profiles.items():
+        for pa_id in (ids if ids is not None else scores):
+            result = composite_score(scores.get(pa_id, {}), weights)
+            if result is None:
+                incomplete.add(profile_id)
+            else:
+                rows.append(dict(profile_id=profile_id, product_application_id=pa_id, computed_at=now, **result))
+    upsert_composite_scores(session, rows)
+
+    if ids is None and profile_ids is None:
+        # refresh completo: profili non più esistenti (anche via cascade da users): nessuno riscrive le loro righe
+        session.exec(sa.delete(CompositeScore).where(CompositeScore.profile_id.not_in(list(profiles))))
+
+    # refresh completo: quello che non è stato riscritto ora è obsoleto;
+    # per applicazione basta ripulire i profili rimasti senza punteggio
+    stale_profiles = list(profiles) if ids is None else sorted(incomplete)
+    if stale_profiles:
+        stale = sa.delete(CompositeScore).where(
+            CompositeScore.profile_id.in_(stale_profiles),
+            CompositeScore.computed_at < now,
+        )
+        if ids is not None:
+            stale = stale.where(CompositeScore.product_application_id.in_(ids))
+        session.exec(stale)
+    return len(rows)
+
+
+def delete_profile_scores(session: Session, profile_id: int) -> None:
+    session.exec(sa.delete(CompositeScore).where(CompositeScore.profile_id == profile_id))
+
+
+def delete_user_profile_scores(session: Session, user_id: int) -> int:
+    """Scores of every weight profile of ``user_id`` (the profiles go with the user's FK cascade)."""
+    profiles = select(CompositeWeightProfile.id).where(CompositeWeightProfile.user_id == user_id)
+    return session.exec(sa.delete(CompositeScore).where(CompositeScore.profile_id.in_(profiles))).rowcount
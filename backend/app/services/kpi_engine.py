@@ -1,7 +1,7 @@
 # app/services/kpi_engine.py
 from sqlmodel import Session, select
 from app.model.kpi import KpiScale
-from typing import Dict, Tuple
+from typing import Dict, Iterable, Tuple
 from fastapi import HTTPException
 
 #Ritorna lo score se trova una banda, altrimenti None (soft)
@@ -26,6 +26,26 @@ def score_or_422(session: Session, kpi_code: str, value: float) -> int:
         )
     return s
 
+#Carica in una sola query le bande di più KPI: {kpi_code: [(band_min, band_max, score), ...]}
+def load_scale_bands(session: Session, kpi_codes: Iterable[str]) -> Dict[str, list[Tuple[float, float, int]]]:
+    codes = sorted(set(kpi_codes))
+    bands: Dict[str, list[Tuple[float, float, int]]] = {code: [] for code in codes}
+    rows = session.exec(
+        select(KpiScale.kpi_code, KpiScale.band_min, KpiScale.band_max, KpiScale.score)
+        .where(KpiScale.kpi_code.in_(codes))
+        .order_by(KpiScale.kpi_code, KpiScale.band_min.asc(), KpiScale.band_max.asc())
+    ).all()
+    for code, band_min, band_max, score in rows:
+        bands[code].append((band_min, band_max, int(score)))
+    return bands
+
+#Come score_from_scales ma sulle bande già caricate (stesso ordine, prima banda che contiene il valore)
+def score_from_bands(bands: Dict[str, list[Tuple[float, float, int]]], kpi_code: str, value: float) -> int | None:
+    for band_min, band_max, score in bands.get(kpi_code, ()):
+        if band_min <= value <= band_max:
+            return score
+    return None
+
 
 def massage_compute_derivatives(points: Dict[int, Tuple[float, float]]):
     """
@@ -0,0 +1,152 @@
+"""Bulk upserts of derived metrics and KPI values.
+
+One ``INSERT ... ON CONFLICT DO UPDATE`` per call (Postgres and SQLite share the
+syntax), so a run's metrics or KPIs land in a single statement with no prior
+SELECT or DELETE.
+
+Conflict keys:
+- ``test_metrics``: ``ux_test_metrics_unique`` (run_type, run_id, metric_code, context_json)
+- ``kpi_values`` of TPP/SPEED runs: ``ux_kpi_values_unique``; one row per run is kept
+  and rankings pick the newest.
+- ``kpi_values`` of MASSAGE/SMT_HOOD runs: ``ux_kpi_values_application_kpi``
+  (product_application_id, kpi_code); the last computed run overwrites the value.
+- ``composite_scores``: ``ux_composite_scores_profile_application``.
+
+Rows may carry ``context`` (a dict) instead of ``context_json``: both are turned
+into ``context_json`` plus the typed ``flow_lpm``/``pressure_kpa``/``agg`` columns.
+"""
+import json
+from datetime import datetime, timezone
+from typing import Iterable, Mapping, Optional, Sequence
+
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlmodel import Session
+
+from app.model.kpi import CompositeScore, KpiValue, TestMetric
+
+
+# KPI con un solo valore per applicazione (l'ultimo run calcolato vince)
+APPLICATION_SCOPED_RUN_TYPES = ("MASSAGE", "SMT_HOOD")
+
+TEST_METRIC_KEY = ("run_type", "run_id", "metric_code", "context_json")
+KPI_VALUE_RUN_KEY = ("run_type", "run_id", "kpi_code", "context_json")
+KPI_VALUE_APPLICATION_KEY = ("product_application_id", "kpi_code")
+COMPOSITE_SCORE_KEY = ("profile_id", "product_application_id")
+# righe per statement: resta sotto il limite di parametri di SQLite nei refresh completi
+COMPOSITE_CHUNK_SIZE = 1000
+CONTEXT_COLUMNS = ("flow_lpm", "pressure_kpa", "agg")
+
+# Stesso predicato (letterale) dell'indice parziale: il planner deve riconoscerlo
+APPLICATION_SCOPED_WHERE = sa.text("run_type IN ('MASSAGE', 'SMT_HOOD')")
+
+_INSERTS = {"postgresql": postgresql.insert, "sqlite": sqlite.insert}
+
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def context_fields(context: Optional[Mapping]) -> dict:
+    """``context_json`` and the typed context columns for a context dict."""
+    ctx = dict(context or {})
+    flow_lpm = ctx.get("flow_lpm")
+    pressure_kpa = ctx.get("pressure_kpa")
+    agg = ctx.get("agg")
+    return {
+        "context_json": json.dumps(ctx),
+        "flow_lpm": float(flow_lpm) if flow_lpm is not None else None,
+        "pressure_kpa": int(pressure_kpa) if pressure_kpa is not None else None,
+        "agg": str(agg) if agg is not None else None,
+    }
+
+
+def _with_context(row: Mapping) -> dict:
+    out = dict(row)
+    if "context" in out:
+        out.update(context_fields(out.pop("context")))
+    elif not all(name in out for name in CONTEXT_COLUMNS):
+        raw = out.get("context_json")
+        typed = context_fields(json.loads(raw) if raw else None)
+        for name in CONTEXT_COLUMNS:
+            out.setdefault(name, typed[name])
+    return out
+
+
+def _dedupe(rows: Iterable[Mapping], key: Sequence[str]) -> list[dict]:
+    # Postgres rifiuta due righe con la stessa chiave nello stesso INSERT: vince l'ultima
+    out: dict[tuple, dict] = {}
+    for row in rows:
+        row = _with_context(row)
+        out[tuple(row.get(name) for name in key)] = row
+    return list(out.values())
+
+
+def _upsert_statement(dialect: str, table: sa.Table, rows: list[dict], key: Sequence[str], index_where=None):
+    insert = _INSERTS.get(dialect)
+    if insert is None:
+        raise NotImplementedError(f"Upsert not supported for dialect {dialect!r}")
+
+    stmt = insert(table).values(rows)
+    updated = {
+        name: stmt.excluded[name]
+        for name in rows[0]
+        if name not in key and name != "id"
+    }
+    return stmt.on_conflict_do_update(
+        index_elements=list(key),
+        index_where=index_where,
+        set_=updated,
+    )
+
+
+def _upsert(
+    session: Session,
+    table: sa.Table,
+    rows: list[dict],
+    key: Sequence[str],
+    index_where=None,
+) -> int:
+    if not rows:
+        return 0
+    now = _utcnow()
+    for row in rows:
+        row.setdefault("computed_at", now)
+
+    dialect = session.get_bind().dialect.name
+    session.exec(_upsert_statement(dialect, table, rows, key, index_where))
+    return len(rows)
+
+
+def upsert_test_metrics(session: Session, rows: Iterable[Mapping]) -> int:
+    """Insert or update ``test_metrics`` rows (dicts of column values); returns the row count."""
+    return _upsert(session, TestMetric.__table__, _dedupe(rows, TEST_METRIC_KEY), TEST_METRIC_KEY)
+
+
+def upsert_kpi_values(session: Session, rows: Iterable[Mapping]) -> int:
+    """Insert or update ``kpi_values`` rows; one statement per conflict key in use.
+
+    MASSAGE/SMT_HOOD rows are keyed per application, every other run type per run.
+    """
+    per_application, per_run = [], []
+    for row in rows:
+        (per_application if row["run_type"] in APPLICATION_SCOPED_RUN_TYPES else per_run).append(row)
+
+    table = KpiValue.__table__
+    return _upsert(
+        session,
+        table,
+        _dedupe(per_application, KPI_VALUE_APPLICATION_KEY),
+        KPI_VALUE_APPLICATION_KEY,
+        index_where=APPLICATION_SCOPED_WHERE,
+    ) + _upsert(session, table, _dedupe(per_run, KPI_VALUE_RUN_KEY), KPI_VALUE_RUN_KEY)
+
+
+def upsert_composite_scores(session: Session, rows: Iterable[Mapping]) -> int:
+    """Insert or update ``composite_scores`` rows, in chunks; returns the row count."""
+    deduped = list({tuple(row[name] for name in COMPOSITE_SCORE_KEY): dict(row) for row in rows}.values())
+    table = CompositeScore.__table__
+    return sum(
+        _upsert(session, table, deduped[i:i + COMPOSITE_CHUNK_SIZE], COMPOSITE_SCORE_KEY)
+        for i in range(0, len(deduped), COMPOSITE_CHUNK_SIZE)
+    )
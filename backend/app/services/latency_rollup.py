@@ -0,0 +1,307 @@
+"""Hourly per-route latency rollups built from ``access_logs``.
+
+``rollup_route_latency`` (cron via ``app.scripts.rollup_route_latency``, and
+run by ``cleanup_logs`` before raw rows are deleted) groups the raw rows by
+route template, method and UTC hour into ``route_latency_rollups``: request
+and 5xx counts, sum/max duration and a ``LatencySketch``. Hours are always
+recomputed whole from the raw rows, starting from the last hour already rolled
+up, so re-runs and late rows from the async log writer are harmless.
+
+``latency_report`` serves ``/ops/latency`` from the rollups only: percentiles
+over several hours (or routes) come from merging the hourly sketches, never
+from averaging hourly percentiles.
+"""
+import logging
+import math
+import os
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Optional
+
+import sqlalchemy as sa
+from sqlalchemy.engine import Engine
+
+from app.model.access_log import AccessLog, RouteLatencyRollup
+
+
+logger = logging.getLogger("liner-backend.access")
+
+# Errore relativo massimo dei percentili (1% -> ~550 bucket tra 1 ms e 60 s)
+LATENCY_SKETCH_ACCURACY = float(os.getenv("LATENCY_SKETCH_ACCURACY", "0.01"))
+# Ore ricalcolate per transazione dal job di rollup
+LATENCY_ROLLUP_CHUNK_HOURS = int(os.getenv("LATENCY_ROLLUP_CHUNK_HOURS", "24"))
+LATENCY_ROLLUP_BATCH_SIZE = int(os.getenv("LATENCY_ROLLUP_BATCH_SIZE", "5000"))
+
+UNMATCHED_ROUTE = "(unmatched)"
+REPORT_SORT_KEYS = ("p50", "p95", "p99", "mean", "count", "errors")
+REPORT_GRANULARITIES = {"hour": timedelta(hours=1), "day": timedelta(days=1)}
+
+
+class LatencySketch:
+    """Log-bucketed histogram (DDSketch): quantiles within ``accuracy`` relative error.
+
+    A value ``v > 0`` falls in bucket ``ceil(log_gamma(v))`` with
+    ``gamma = (1 + accuracy) / (1 - accuracy)``; two sketches with the same
+    accuracy merge exactly by adding their bucket counts.
+    """
+
+    def __init__(self, accuracy: float = LATENCY_SKETCH_ACCURACY):
+        if not 0 < accuracy < 1:
+            raise ValueError("accuracy must be in (0, 1)")
+        self.accuracy = accuracy
+        self.gamma = (1 + accuracy) / (1 - accuracy)
+        self._log_gamma = math.log(self.gamma)
+        self.bins: dict[int, int] = {}
+        self.zero = 0
+        self.count = 0
+
+    def add(self, value: float, n: int = 1) -> None:
+        if value <= 0:
+            self.zero += n
+        else:
+            index = math.ceil(math.log(value) / self._log_gamma)
+            self.bins[index] = self.bins.get(index, 0) + n
+        self.count += n
+
+    def merge(self, other: "LatencySketch") -> "LatencySketch":
+        if other.accuracy != self.accuracy:
+            raise ValueError("cannot merge sketches with different accuracy")
+        for index, n in other.bins.items():
+            self.bins[index] = self.bins.get(index, 0) + n
+        self.zero += other.zero
+        self.count += other.count
+        return self
+
+    def quantile(self, q: float) -> Optional[float]:
+        if self.count == 0:
+            return None
+        rank = min(max(q, 0.0), 1.0) * (self.count - 1)
+        seen = self.zero
+        if seen > rank:
+            return 0.0
+        for index in sorted(self.bins):
+            seen += self.bins[index]
+            if seen > rank:
+                # centro del bucket (gamma^(i-1), gamma^i] in senso relativo
+                return 2 * self.gamma ** index / (self.gamma + 1)
+        return 2 * self.gamma ** max(self.bins) / (self.gamma + 1)
+
+    def to_dict(self) -> dict:
+        return {"accuracy": self.accuracy, "zero": self.zero, "bins": sorted(self.bins.items())}
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "LatencySketch":
+        sketch = cls(data["accuracy"])
+        sketch.zero = int(data.get("zero", 0))
+        sketch.bins = {int(index): int(n) for index, n in data.get("bins", [])}
+        sketch.count = sketch.zero + sum(sketch.bins.values())
+        return sketch
+
+
+def route_key(route: Optional[str], path: Optional[str], status_code: int) -> str:
+    """Rollup key of a row: its route template, else the path with numeric segments as ``{id}``."""
+    if route:
+        return route[:255]
+    if status_code == 404:
+        # nessuna route: scanner e URL sbagliati in un solo gruppo, non uno per path
+        return UNMATCHED_ROUTE
+    segments = (path or "").split("?", 1)[0].split("/")
+    return ("/".join("{id}" if s.isdigit() else s for s in segments) or "/")[:255]
+
+
+def _hour(value: datetime) -> datetime:
+    return value.replace(minute=0, second=0, microsecond=0)
+
+
+def _as_datetime(value) -> Optional[datetime]:
+    if isinstance(value, str):  # SQLite senza tipo nella funzione aggregata
+        return datetime.fromisoformat(value)
+    return value
+
+
+@dataclass
+class _RouteHour:
+    count: int = 0
+    error_count: int = 0
+    duration_sum_ms: float = 0.0
+    duration_max_ms: float = 0.0
+    sketch: LatencySketch = field(default_factory=LatencySketch)
+
+    def add(self, duration_ms: float, status_code: int) -> None:
+        self.count += 1
+        if status_code >= 500:
+            self.error_count += 1
+        self.duration_sum_ms += duration_ms
+        self.duration_max_ms = max(self.duration_max_ms, duration_ms)
+        self.sketch.add(duration_ms)
+
+    def merge(self, other: "_RouteHour") -> None:
+        self.count += other.count
+        self.error_count += other.error_count
+        self.duration_sum_ms += other.duration_sum_ms
+        self.duration_max_ms = max(self.duration_max_ms, other.duration_max_ms)
+        self.sketch.merge(other.sketch)
+
+    def summary(self) -> dict:
+        def ms(q):
+            value = self.sketch.quantile(q)
+            return None if value is None else round(value, 2)
+
+        return {
+            "count": self.count,
+            "error_count": self.error_count,
+            "error_rate": round(self.error_count / self.count, 4) if self.count else 0.0,
+            "mean_ms": round(self.duration_sum_ms / self.count, 2) if self.count else None,
+            "max_ms": round(self.duration_max_ms, 2),
+            "p50_ms": ms(0.5),
+            "p95_ms": ms(0.95),
+            "p99_ms": ms(0.99),
+        }
+
+
+def _aggregate(engine: Engine, start: datetime, end: datetime, batch_size: int) -> dict[tuple, _RouteHour]:
+    logs = AccessLog.__table__
+    stmt = (
+        sa.select(logs.c.route, logs.c.path, logs.c.method, logs.c.status_code, logs.c.duration_ms, logs.c.created_at)
+        .where(logs.c.created_at >= start, logs.c.created_at < end)
+    )
+    groups: dict[tuple, _RouteHour] = {}
+    with engine.connect() as conn:
+        for route, path, method, status_code, duration_ms, created_at in conn.execution_options(
+            yield_per=batch_size
+        ).execute(stmt):
+            key = (route_key(route, path, status_code), method, _hour(created_at))
+            group = groups.get(key)
+            if group is None:
+                group = groups[key] = _RouteHour()
+            group.add(float(duration_ms), status_code)
+    return groups
+
+
+def rollup_route_latency(
+    engine: Engine,
+    *,
+    now: Optional[datetime] = None,
+    since: Optional[datetime] = None,
+    chunk_hours: int = LATENCY_ROLLUP_CHUNK_HOURS,
+    batch_size: int = LATENCY_ROLLUP_BATCH_SIZE,
+) -> dict:
+    """Recompute the rollups from ``since`` (default: last rolled-up hour) up to the current hour."""
+    logs = AccessLog.__table__
+    rollups = RouteLatencyRollup.__table__
+    end = _hour(now or datetime.utcnow()) + timedelta(hours=1)
+    with engine.connect() as conn:
+        oldest_raw = _as_datetime(conn.execute(sa.select(sa.func.min(logs.c.created_at))).scalar())
+        last_rolled = _as_datetime(conn.execute(sa.select(sa.func.max(rollups.c.hour))).scalar())
+    if oldest_raw is None:
+        return {"hours": 0, "rows": 0}
+    start = since or last_rolled or oldest_raw
+    # mai prima dei dati grezzi rimasti: le ore già cancellate dalla retention restano come sono
+    start = _hour(max(start, oldest_raw))
+
+    hours = rows = 0
+    step = timedelta(hours=max(1, chunk_hours))
+    chunk_start = start
+    while chunk_start < end:
+        chunk_end = min(chunk_start + step, end)
+        groups = _aggregate(engine, chunk_start, chunk_end, batch_size)
+        computed_at = datetime.utcnow()
+        values = [
+            {
+                "route": route,
+                "method": method,
+                "hour": hour,
+                "count": group.count,
+                "error_count": group.error_count,
+                "duration_sum_ms": group.duration_sum_ms,
+                "duration_max_ms": group.duration_max_ms,
+                "p50_ms": group.sketch.quantile(0.5),
+                "p95_ms": group.sketch.quantile(0.95),
+                "p99_ms": group.sketch.quantile(0.99),
+                "sketch": group.sketch.to_dict(),
+                "computed_at": computed_at,
+            }
+            for (route, method, hour), group in groups.items()
+        ]
+        with engine.begin() as conn:
+            conn.execute(rollups.delete().where(rollups.c.hour >= chunk_start, rollups.c.hour < chunk_end))
+            if values:
+                conn.execute(rollups.insert(), values)
+        hours += int((chunk_end - chunk_start) / timedelta(hours=1))
+        rows += len(values)
+        chunk_start = chunk_end
+
+    logger.info("route latency rollup from=%s to=%s hours=%d rows=%d", start.isoformat(), end.isoformat(), hours, rows)
+    return {"hours": hours, "rows": rows, "from": start.isoformat(), "to": end.isoformat()}
+
+
+def _bucket(hour: datetime, granularity: str) -> datetime:
+    return hour.replace(hour=0) if granularity == "day" else hour
+
+
+def latency_report(
+    conn,
+    *,
+    start: datetime,
+    end: datetime,
+    route: Optional[str] = None,
+    method: Optional[str] = None,
+    granularity: str = "hour",
+    sort: str = "p95",
+    limit: int = 50,
+) -> dict:
+    """Per-route summary over ``[start, end)`` and, for a single ``route``, its trend per bucket."""
+    if granularity not in REPORT_GRANULARITIES:
+        raise ValueError(f"granularity must be one of {', '.join(REPORT_GRANULARITIES)}")
+    if sort not in REPORT_SORT_KEYS:
+        raise ValueError(f"sort must be one of {', '.join(REPORT_SORT_KEYS)}")
+
+    rollups = RouteLatencyRollup.__table__
+    stmt = (
+        sa.select(
+            rollups.c.route, rollups.c.method, rollups.c.hour, rollups.c.count, rollups.c.error_count,
+            rollups.c.duration_sum_ms, rollups.c.duration_max_ms, rollups.c.sketch,
+        )
+        .where(rollups.c.hour >= _hour(start), rollups.c.hour < end)
+        .order_by(rollups.c.hour)
+    )
+    if route is not None:
+        stmt = stmt.where(rollups.c.route == route)
+    if method is not None:
+        stmt = stmt.where(rollups.c.method == method.upper())
+
+    totals: dict[tuple, _RouteHour] = {}
+    series: dict[datetime, _RouteHour] = {}
+    for row in conn.execute(stmt):
+        part = _RouteHour(
+            count=row.count,
+            error_count=row.error_count,
+            duration_sum_ms=row.duration_sum_ms,
+            duration_max_ms=row.duration_max_ms,
+            sketch=LatencySketch.from_dict(row.sketch),
+        )
+        if route is not None:
+            bucket = _bucket(_as_datetime(row.hour), granularity)
+            if bucket not in series:
+                series[bucket] = _RouteHour(sketch=LatencySketch(part.sketch.accuracy))
+            series[bucket].merge(part)
+        key = (row.route, row.method)
+        if key in totals:
+            totals[key].merge(part)
+        else:
+            totals[key] = part
+
+    sort_field = {"count": "count", "errors": "error_count", "mean": "mean_ms"}.get(sort, f"{sort}_ms")
+    routes = [{"route": r, "method": m, **group.summary()} for (r, m), group in totals.items()]
+    routes.sort(key=lambda item: (item[sort_field] or 0, item["count"]), reverse=True)
+    report = {
+        "start": start.isoformat(),
+        "end": end.isoformat(),
+        "granularity": granularity,
+        "sort": sort,
+        "routes": routes[:limit],
+        "routes_total": len(routes),
+    }
+    if route is not None:
+        report["series"] = [{"bucket": bucket.isoformat(), **group.summary()} for bucket, group in sorted(series.items())]
+    return report
@@ -0,0 +1,134 @@
+import sqlalchemy as sa
+from sqlmodel import Session
+
+from app.model.massage import MassagePoint, MassageRun
+from app.model.smthood import SmtHoodPoint, SmtHoodRun
+from app.model.speed import SpeedRun
+from app.model.tpp import TppRun
+
+
+MAX_BATCH_APPLICATION_IDS = 500
+
+
+def _latest_per_application(session: Session, run_table: sa.Table, application_ids: list[int]):
+    """Subquery with the newest run of each application (ties broken by id).
+
+    Postgres uses DISTINCT ON, other dialects a row_number() window; both walk
+    the (product_application_id, created_at) index.
+    """
+    pa_col = run_table.c.product_application_id
+    order = (run_table.c.created_at.desc(), run_table.c.id.desc())
+    if session.get_bind().dialect.name == "postgresql":
+        return (
+            sa.select(run_table)
+            .where(pa_col.in_(application_ids))
+            .distinct(pa_col)
+            .order_by(pa_col, *order)
+            .subquery("latest")
+        )
+
+    ranked = (
+        sa.select(
+            run_table,
+            sa.func.row_number().over(partition_by=pa_col, order_by=order).label("rn_latest"),
+        )
+        .where(pa_col.in_(application_ids))
+        .subquery("ranked")
+    )
+    return (
+        sa.select(*[ranked.c[c.name] for c in run_table.c])
+        .where(ranked.c.rn_latest == 1)
+        .subquery("latest")
+    )
+
+
+def _run_dict(row, columns: tuple[str, ...]) -> dict:
+    return {name: getattr(row, name) for name in columns}
+
+
+def _latest_simple_runs(session: Session, run_table: sa.Table, application_ids: list[int], columns) -> dict:
+    latest = _latest_per_application(session, run_table, application_ids)
+    rows = session.exec(sa.select(latest)).all()
+    return {row.product_application_id: _run_dict(row, columns) for row in rows}
+
+
+def _latest_runs_with_points(
+    session: Session,
+    run_table: sa.Table,
+    point_table: sa.Table,
+    application_ids: list[int],
+    run_columns: tuple[str, ...],
+    point_columns: tuple[str, ...],
+    point_order,
+) -> dict:
+    """Latest run per application joined with its points: one statement per test type."""
+    latest = _latest_per_application(session, run_table, application_ids)
+    stmt = (
+        sa.select(
+            latest,
+            *[point_table.c[name].label(f"pt_{name}") for name in point_columns],
+            point_table.c.id.label("pt_id"),
+        )
+        .select_from(latest.outerjoin(point_table, point_table.c.run_id == latest.c.id))
+        .order_by(latest.c.product_application_id, point_order(point_table))
+    )
+
+    out: dict[int, dict] = {}
+    for row in session.exec(stmt).all():
+        entry = out.get(row.product_application_id)
+        if entry is None:
+            run = _run_dict(row, run_columns)
+            run["points"] = []
+            entry = out[row.product_application_id] = {"run": run, "points": run["points"]}
+        if row.pt_id is not None:
+            entry["points"].append({name: getattr(row, f"pt_{name}") for name in point_columns})
+    return out
+
+
+def get_latest_runs_batch(session: Session, application_ids: list[int]) -> dict[str, dict]:
+    """Latest TPP/speed/massage/SMT-hood run (with points) for each application.
+
+    Shapes match the single-application endpoints: ``tpp``/``speed`` are the run
+    (or None), ``massage``/``smt_hood`` are ``{"run": ..., "points": [...]}``.
+    """
+    tpp = _latest_simple_runs(
+        session,
+        TppRun.__table__,
+        application_ids,
+        ("id", "product_application_id", "performed_at", "real_tpp", "notes", "created_at"),
+    )
+    speed = _latest_simple_runs(
+        session,
+        SpeedRun.__table__,
+        application_ids,
+        ("id", "product_application_id", "performed_at", "measure_ml", "notes", "created_at"),
+    )
+    run_columns = ("id", "product_application_id", "performed_at", "notes", "created_at")
+    massage = _latest_runs_with_points(
+        session,
+        MassageRun.__table__,
+        MassagePoint.__table__,
+        application_ids,
+        run_columns,
+        ("pressure_kpa", "min_val", "max_val"),
+        lambda t: t.c.pressure_kpa.desc(),
+    )
+    smt_hood = _latest_runs_with_points(
+        session,
+        SmtHoodRun.__table__,
+        SmtHoodPoint.__table__,
+        application_ids,
+        run_columns,
+        ("flow_lpm", "smt_min", "smt_max", "hood_min", "hood_max"),
+        lambda t: t.c.flow_code.asc(),
+    )
+
+    return {
+        str(pa_id): {
+            "tpp": tpp.get(pa_id),
+            "speed": speed.get(pa_id),
+            "massage": massage.get(pa_id) or {"run": None, "points": []},
+            "smt_hood": smt_hood.get(pa_id) or {"run": None, "points": []},
+        }
+        for pa_id in application_ids
+    }
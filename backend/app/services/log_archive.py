@@ -0,0 +1,301 @@
+"""Archive of aged access/audit log rows as compressed JSONL files.
+
+``archive_logs`` (run by ``cleanup_logs`` when ``LOG_ARCHIVE_DIR`` is set)
+exports whole days older than the retention cutoff before they are deleted:
+
+    <LOG_ARCHIVE_DIR>/<table>/<YYYY-MM-DD>.<part>.jsonl.zst   (.jsonl.gz without zstandard)
+
+and records every file in ``index.json`` (id and time range, user ids, first
+path segments), so a query only opens the files that can match. Exported rows
+are deleted by id range right after their file is indexed; a re-run skips ids
+already archived, so an interrupted run neither loses nor duplicates rows.
+
+``read_archive`` serves the admin endpoint: matching files are memory-mapped
+and decompressed as a stream.
+"""
+import gzip
+import io
+import json
+import logging
+import mmap
+import os
+import threading
+from datetime import date, datetime, timedelta
+from typing import Iterator, Optional
+
+import sqlalchemy as sa
+from sqlalchemy.engine import Engine
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - optional dependency at runtime
+    zstandard = None
+
+
+logger = logging.getLogger("liner-backend.db")
+
+# Vuoto = nessun archivio: cleanup_logs cancella e basta
+LOG_ARCHIVE_DIR = os.getenv("LOG_ARCHIVE_DIR", "").strip()
+LOG_ARCHIVE_BATCH_SIZE = int(os.getenv("LOG_ARCHIVE_BATCH_SIZE", "5000"))
+LOG_ARCHIVE_ZSTD_LEVEL = int(os.getenv("LOG_ARCHIVE_ZSTD_LEVEL", "10"))
+
+ARCHIVE_TABLES = ("access_logs", "audit_logs")
+
+INDEX_FILE = "index.json"
+
+
+def _table(name: str) -> sa.Table:
+    from app.model.access_log import AccessLog
+    from app.model.audit_log import AuditLog
+
+    return {"access_logs": AccessLog.__table__, "audit_logs": AuditLog.__table__}[name]
+
+
+def path_prefix(path: Optional[str]) -> str:
+    """First path segment (``/products/12/similar`` -> ``/products``), the unit of the path index."""
+    segment = (path or "").split("?", 1)[0].strip("/").split("/", 1)[0]
+    return "/" + segment
+
+
+def _day_start(value: datetime) -> datetime:
+    return value.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+class ArchiveIndex:
+    """``index.json`` of an archive directory, reloaded when the file changes."""
+
+    def __init__(self, archive_dir: str):
+        self.archive_dir = archive_dir
+        self.path = os.path.join(archive_dir, INDEX_FILE)
+        self._entries: list[dict] = []
+        self._mtime: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def entries(self) -> list[dict]:
+        with self._lock:
+            try:
+                mtime = os.stat(self.path).st_mtime
+            except OSError:
+                return []
+            if mtime != self._mtime:
+                with open(self.path, encoding="utf-8") as fh:
+                    self._entries = json.load(fh).get("files", [])
+                self._mtime = mtime
+            return list(self._entries)
+
+    def add(self, entry: dict) -> None:
+        entries = self.entries() + [entry]
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as fh:
+            json.dump({"files": entries}, fh, indent=1, sort_keys=True)
+            fh.flush()
+            os.fsync(fh.fileno())
+        os.replace(tmp, self.path)
+        with self._lock:
+            # niente rilettura: con mtime a grana grossa due add ravvicinati si perderebbero
+            self._entries = entries
+            self._mtime = os.stat(self.path).st_mtime
+
+    def last_id(self, table: str, day: str) -> int:
+        return max((e["max_id"] for e in self.entries() if e["table"] == table and e["day"] == day), default=0)
+
+    def select(
+        self,
+        table: str,
+        *,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        user_id: Optional[int] = None,
+        path: Optional[str] = None,
+    ) -> list[dict]:
+        prefix = path_prefix(path) if path else None
+        out = []
+        for e in self.entries():
+            if e["table"] != table:
+                continue
+            if start is not None and datetime.fromisoformat(e["max_created_at"]) < start:
+                continue
+            if end is not None and datetime.fromisoformat(e["min_created_at"]) >= end:
+                continue
+            if user_id is not None and user_id not in e["user_ids"]:
+                continue
+            if prefix is not None and prefix not in e["path_prefixes"]:
+                continue
+            out.append(e)
+        return sorted(out, key=lambda e: (e["day"], e["min_id"]))
+
+
+def _open_compressed(fh):
+    if zstandard is not None:
+        return zstandard.ZstdCompressor(level=LOG_ARCHIVE_ZSTD_LEVEL).stream_writer(fh, closefd=False), ".jsonl.zst"
+    return gzip.GzipFile(fileobj=fh, mode="wb", compresslevel=6), ".jsonl.gz"
+
+
+def _json_value(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return value
+
+
+def archive_day(engine: Engine, table_name: str, day: datetime, *, archive_dir: str, index: ArchiveIndex,
+                batch_size: int = LOG_ARCHIVE_BATCH_SIZE) -> int:
+    """Export the not yet archived rows of ``day`` to a new part file, then delete them."""
+    table = _table(table_name)
+    day_key = day.date().isoformat()
+    next_day = day + timedelta(days=1)
+    last_id = index.last_id(table_name, day_key)
+    table_dir = os.path.join(archive_dir, table_name)
+    os.makedirs(table_dir, exist_ok=True)
+    part = sum(1 for e in index.entries() if e["table"] == table_name and e["day"] == day_key)
+    tmp_path = os.path.join(table_dir, f".{day_key}.{part}.tmp")
+
+    rows = 0
+    min_id = max_id = None
+    min_created = max_created = None
+    user_ids: set[int] = set()
+    prefixes: set[str] = set()
+    stmt = (
+        sa.select(table)
+        .where(table.c.created_at >= day, table.c.created_at < next_day, table.c.id > last_id)
+        .order_by(table.c.id)
+    )
+    with open(tmp_path, "wb") as fh:
+        writer, suffix = _open_compressed(fh)
+        with engine.connect() as conn:
+            result = conn.execution_options(yield_per=batch_size).execute(stmt)
+            for row in result.mappings():
+                record = {key: _json_value(value) for key, value in row.items()}
+                writer.write(json.dumps(record, separators=(",", ":"), default=str).encode("utf-8") + b"\n")
+                rows += 1
+                min_id = row["id"] if min_id is None else min_id
+                max_id = row["id"]
+                created = row["created_at"]
+                min_created = created if min_created is None else min(min_created, created)
+                max_created = created if max_created is None else max(max_created, created)
+                if row["user_id"] is not None:
+                    user_ids.add(row["user_id"])
+                prefixes.add(path_prefix(row["path"]))
+        # chiude il frame compresso, non il file sottostante
+        writer.close()
+        fh.flush()
+        os.fsync(fh.fileno())
+
+    if rows == 0:
+        os.remove(tmp_path)
+        return 0
+    file_name = f"{day_key}.{part}{suffix}"
+    os.replace(tmp_path, os.path.join(table_dir, file_name))
+    index.add({
+        "table": table_name,
+        "day": day_key,
+        "file": f"{table_name}/{file_name}",
+        "rows": rows,
+        "min_id": min_id,
+        "max_id": max_id,
+        "min_created_at": min_created.isoformat(),
+        "max_created_at": max_created.isoformat(),
+        "user_ids": sorted(user_ids),
+        "path_prefixes": sorted(prefixes),
+        "bytes": os.path.getsize(os.path.join(table_dir, file_name)),
+    })
+
+    # solo righe già nel file indicizzato, in transazioni brevi
+    delete = sa.text(
+        f"DELETE FROM {table_name} WHERE id IN (SELECT id FROM {table_name} "
+        "WHERE id >= :lo AND id <= :hi AND created_at >= :day AND created_at < :next_day ORDER BY id LIMIT :batch)"
+    )
+    params = {"lo": min_id, "hi": max_id, "day": day, "next_day": next_day, "batch": batch_size}
+    while True:
+        with engine.begin() as conn:
+            deleted = conn.execute(delete, params).rowcount or 0
+        if deleted < batch_size:
+            break
+    return rows
+
+
+def archive_logs(engine: Engine, *, before: datetime, archive_dir: str = LOG_ARCHIVE_DIR,
+                 tables=ARCHIVE_TABLES, batch_size: int = LOG_ARCHIVE_BATCH_SIZE) -> dict[str, int]:
+    """Archive and delete every whole day older than ``before``; returns rows per table."""
+    cutoff = _day_start(before)
+    index = ArchiveIndex(archive_dir)
+    os.makedirs(archive_dir, exist_ok=True)
+    summary = {}
+    for table_name in tables:
+        table = _table(table_name)
+        total = 0
+        lower = None
+        while True:
+            # salta direttamente al prossimo giorno con righe
+            stmt = sa.select(sa.func.min(table.c.created_at)).where(table.c.created_at < cutoff)
+            if lower is not None:
+                stmt = stmt.where(table.c.created_at >= lower)
+            with engine.connect() as conn:
+                oldest = conn.execute(stmt).scalar()
+            if oldest is None:
+                break
+            if isinstance(oldest, str):  # SQLite senza tipo nella funzione aggregata
+                oldest = datetime.fromisoformat(oldest)
+            day = _day_start(oldest)
+            total += archive_day(engine, table_name, day, archive_dir=archive_dir, index=index, batch_size=batch_size)
+            lower = day + timedelta(days=1)
+        summary[table_name] = total
+    return summary
+
+
+def _iter_file(path: str) -> Iterator[dict]:
+    with open(path, "rb") as fh:
+        if os.fstat(fh.fileno()).st_size == 0:
+            return
+        with mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            if path.endswith(".zst"):
+                if zstandard is None:
+                    raise RuntimeError(f"zstandard is required to read {path}")
+                stream = io.BufferedReader(zstandard.ZstdDecompressor().stream_reader(mm))
+            else:
+                stream = gzip.GzipFile(fileobj=mm, mode="rb")
+            with stream:
+                for line in stream:
+                    if line.strip():
+                        yield json.loads(line)
+
+
+_indexes: dict[str, ArchiveIndex] = {}
+
+
+def read_archive(
+    table: str,
+    *,
+    archive_dir: str = LOG_ARCHIVE_DIR,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    user_id: Optional[int] = None,
+    path: Optional[str] = None,
+    limit: int = 200,
+) -> dict:
+    """Archived rows of ``table`` in ``[start, end)``, oldest first; ``path`` is a prefix."""
+    index = _indexes.get(archive_dir)
+    if index is None:
+        index = _indexes.setdefault(archive_dir, ArchiveIndex(archive_dir))
+    files = index.select(table, start=start, end=end, user_id=user_id, path=path)
+    rows: list[dict] = []
+    scanned = 0
+    truncated = False
+    for entry in files:
+        scanned += 1
+        for row in _iter_file(os.path.join(archive_dir, entry["file"])):
+            created = datetime.fromisoformat(row["created_at"])
+            if start is not None and created < start:
+                continue
+            if end is not None and created >= end:
+                continue
+            if user_id is not None and row.get("user_id") != user_id:
+                continue
+            if path is not None and not (row.get("path") or "").startswith(path):
+                continue
+            if len(rows) >= limit:
+                truncated = True
+                break
+            rows.append(row)
+        if truncated:
+            break
+    return {"table": table, "files_indexed": len(files), "files_scanned": scanned, "truncated": truncated, "rows": rows}
@@ -0,0 +1,178 @@
+import logging
+import re
+from datetime import datetime, timedelta
+from typing import Optional
+
+import sqlalchemy as sa
+from sqlalchemy.engine import Connection, Engine
+
+
+logger = logging.getLogger("liner-backend.db")
+
+# Append-only log tables, all range-partitionable on created_at
+LOG_TABLES = ("access_logs", "audit_logs", "login_events", "security_events")
+
+PARTITION_INTERVALS = ("day", "week")
+
+_BOUND_RE = re.compile(r"FROM \((.+?)\) TO \((.+?)\)")
+
+
+def period_start(value: datetime, interval: str) -> datetime:
+    day = value.replace(hour=0, minute=0, second=0, microsecond=0)
+    if interval == "week":
+        # ISO weeks: partitions start on Monday
+        return day - timedelta(days=day.weekday())
+    return day
+
+
+def period_step(interval: str) -> timedelta:
+    return timedelta(days=7) if interval == "week" else timedelta(days=1)
+
+
+def partition_name(table: str, start: datetime) -> str:
+    return f"{table}_p{start:%Y%m%d}"
+
+
+def _parse_bound(raw: str) -> Optional[datetime]:
+    raw = raw.strip()
+    if raw.upper() in ("MINVALUE", "MAXVALUE"):
+        return None
+    return datetime.fromisoformat(raw.strip("'"))
+
+
+def is_partitioned(conn: Connection, table: str) -> bool:
+    if conn.dialect.name != "postgresql":
+        return False
+    row = conn.execute(
+        sa.text("SELECT c.relkind FROM pg_class c WHERE c.oid = to_regclass(:t)"),
+        {"t": table},
+    ).first()
+    return bool(row and row[0] == "p")
+
+
+def list_partitions(conn: Connection, table: str) -> list[tuple[str, Optional[datetime], Optional[datetime]]]:
+    """Return (name, lower, upper) for each range partition; None means MINVALUE/MAXVALUE.
+
+    The DEFAULT partition is not returned.
+    """
+    rows = conn.execute(
+        sa.text(
+            """
+            SELECT child.relname, pg_get_expr(child.relpartbound, child.oid)
+            FROM pg_inherits i
+            JOIN pg_class child ON child.oid = i.inhrelid
+            WHERE i.inhparent = to_regclass(:t)
+            """
+        ),
+        {"t": table},
+    ).all()
+    out = []
+    for name, bound in rows:
+        match = _BOUND_RE.search(bound or "")
+        if not match:
+            continue
+        out.append((name, _parse_bound(match.group(1)), _parse_bound(match.group(2))))
+    return sorted(out, key=lambda p: p[2] or datetime.max)
+
+
+def default_partition(conn: Connection, table: str) -> Optional[str]:
+    row = conn.execute(
+        sa.text(
+            """
+            SELECT child.relname
+            FROM pg_inherits i
+            JOIN pg_class child ON child.oid = i.inhrelid
+            WHERE i.inhparent = to_regclass(:t)
+              AND pg_get_expr(child.relpartbound, child.oid) = 'DEFAULT'
+            """
+        ),
+        {"t": table},
+    ).first()
+    return row[0] if row else None
+
+
+def catch_all_partitions(conn: Connection, table: str) -> list[str]:
+    """Partitions retention cannot drop whole: the DEFAULT one and the legacy MINVALUE one still in range.
+
+    Call after ``drop_expired_partitions``; expired rows in these are purged
+    with ``chunked_delete``.
+    """
+    names = [name for name, lower, _upper in list_partitions(conn, table) if lower is None]
+    default = default_partition(conn, table)
+    if default is not None:
+        names.append(default)
+    return names
+
+
+def _move_default_rows(conn: Connection, table: str, default: str, name: str, bounds: str,
+                       start: datetime, end: datetime) -> int:
+    # con righe del range nel DEFAULT il CREATE ... PARTITION OF fallisce: si stacca il DEFAULT,
+    # si crea la partizione, si spostano le righe e lo si riattacca (tutto nella stessa transazione)
+    params = {"start": start, "end": end}
+    where = "created_at >= :start AND created_at < :end"
+    conn.execute(sa.text(f'ALTER TABLE "{table}" DETACH PARTITION "{default}"'))
+    conn.execute(sa.text(f'CREATE TABLE IF NOT EXISTS "{name}" PARTITION OF "{table}" {bounds}'))
+    moved = conn.execute(
+        sa.text(f'INSERT INTO "{table}" SELECT * FROM "{default}" WHERE {where}'), params
+    ).rowcount or 0
+    conn.execute(sa.text(f'DELETE FROM "{default}" WHERE {where}'), params)
+    conn.execute(sa.text(f'ALTER TABLE "{table}" ATTACH PARTITION "{default}" DEFAULT'))
+    return moved
+
+
+def ensure_partitions(conn: Connection, table: str, *, interval: str, ahead: int, now: datetime) -> list[str]:
+    """Pre-create partitions for the current period and the next ``ahead`` periods.
+
+    Rows of a new period that already landed in the DEFAULT partition are
+    moved into the new partition.
+    """
+    existing = list_partitions(conn, table)
+    covered_until = max((upper for _, _, upper in existing if upper is not None), default=None)
+    default = default_partition(conn, table)
+    step = period_step(interval)
+    start = period_start(now, interval)
+    created = []
+    for _ in range(ahead + 1):
+        end = start + step
+        if covered_until is None or start >= covered_until:
+            name = partition_name(table, start)
+            bounds = f"FOR VALUES FROM ('{start.isoformat(sep=' ')}') TO ('{end.isoformat(sep=' ')}')"
+            stray = default is not None and conn.execute(
+                sa.text(f'SELECT 1 FROM "{default}" WHERE created_at >= :start AND created_at < :end LIMIT 1'),
+                {"start": start, "end": end},
+            ).first()
+            if stray:
+                moved = _move_default_rows(conn, table, default, name, bounds, start, end)
+                logger.info("Moved %d rows from %s into new partition %s", moved, default, name)
+            else:
+                conn.execute(sa.text(f'CREATE TABLE IF NOT EXISTS "{name}" PARTITION OF "{table}" {bounds}'))
+            created.append(name)
+        start = end
+    return created
+
+
+def drop_expired_partitions(conn: Connection, table: str, *, cutoff: datetime) -> list[str]:
+    """Detach and drop partitions whose upper bound is at or before ``cutoff``."""
+    dropped = []
+    for name, _lower, upper in list_partitions(conn, table):
+        if upper is None or upper > cutoff:
+            continue
+        conn.execute(sa.text(f'ALTER TABLE "{table}" DETACH PARTITION "{name}"'))
+        conn.execute(sa.text(f'DROP TABLE "{name}"'))
+        dropped.append(name)
+    return dropped
+
+
+def chunked_delete(engine: Engine, table: str, *, cutoff: datetime, batch_size: int) -> int:
+    """Delete rows older than ``cutoff`` in short transactions of ``batch_size`` rows."""
+    stmt = sa.text(
+        f"DELETE FROM {table} WHERE id IN "
+        f"(SELECT id FROM {table} WHERE created_at < :cutoff ORDER BY id LIMIT :batch)"
+    )
+    total = 0
+    while True:
+        with engine.begin() as conn:
+            deleted = conn.execute(stmt, {"cutoff": cutoff, "batch": batch_size}).rowcount or 0
+        total += deleted
+        if deleted < batch_size:
+            return total
@@ -0,0 +1,201 @@
+import logging
+import os
+import queue
+import threading
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Optional
+
+from sqlmodel import Session
+
+from app.common.audit import safe_json_snapshot
+from app.model.access_log import AccessLog
+from app.model.audit_log import AuditLog
+
+
+logger = logging.getLogger("liner-backend.access")
+
+ASYNC_LOG_WRITER = os.getenv("ASYNC_LOG_WRITER", "1").strip().lower() not in ("", "0", "false", "no")
+LOG_WRITER_QUEUE_SIZE = int(os.getenv("LOG_WRITER_QUEUE_SIZE", "10000"))
+LOG_WRITER_BATCH_SIZE = int(os.getenv("LOG_WRITER_BATCH_SIZE", "200"))
+
+
+@dataclass
+class RequestLogEntry:
+    request_id: str
+    user_id: Optional[int]
+    method: str
+    path: str
+    status_code: int
+    ip: str
+    country: Optional[str]
+    region: Optional[str]
+    city: Optional[str]
+    user_agent: str
+    duration_ms: float
+    created_at: datetime
+    # Template della route che ha gestito la richiesta (None se nessun match)
+    route: Optional[str] = None
+    # Set for state-changing requests only; parsed lazily by the writer
+    audit: bool = False
+    audit_capture: Any = None
+
+
+def _audit_payload(entry: RequestLogEntry) -> Optional[dict]:
+    if entry.audit_capture is None:
+        return None
+    try:
+        payload = entry.audit_capture.payload()
+    except Exception:
+        payload = {"_capture_failed": True}
+    return safe_json_snapshot(payload)
+
+
+def write_entries(session: Session, entries: list[RequestLogEntry]) -> None:
+    for entry in entries:
+        session.add(
+            AccessLog(
+                request_id=entry.request_id,
+                user_id=entry.user_id,
+                method=entry.method,
+                path=entry.path,
+                route=entry.route,
+                status_code=entry.status_code,
+                ip=entry.ip,
+                country=entry.country,
+                region=entry.region,
+                city=entry.city,
+                user_agent=entry.user_agent,
+                duration_ms=int(entry.duration_ms),
+                created_at=entry.created_at,
+            )
+        )
+        if entry.audit:
+            session.add(
+                AuditLog(
+                    request_id=entry.request_id,
+                    user_id=entry.user_id,
+                    method=entry.method,
+                    path=entry.path,
+                    status_code=entry.status_code,
+                    ip=entry.ip,
+                    user_agent=entry.user_agent,
+                    request_json=_audit_payload(entry),
+                    duration_ms=int(entry.duration_ms),
+                    created_at=entry.created_at,
+                )
+            )
+    session.commit()
+
+    for entry in entries:
+        if entry.audit:
+            logger.info(
+                "api_audit method=%s path=%s status=%s user_id=%s ip=%s dur_ms=%.2f",
+                entry.method,
+                entry.path,
+                entry.status_code,
+                entry.user_id,
+                entry.ip,
+                entry.duration_ms,
+            )
+            print(
+                f"api_audit method={entry.method} path={entry.path} "
+                f"status={entry.status_code} user_id={entry.user_id} ip={entry.ip} dur_ms={entry.duration_ms:.2f}",
+                flush=True,
+            )
+
+
+class RequestLogWriter:
+    """Persists access/audit rows off the request path.
+
+    Entries are queued by the request middleware and committed in batches by a
+    daemon thread. With ``async_mode=False`` they are written inline instead.
+    """
+
+    def __init__(self, *, engine=None, async_mode: bool = True, max_queue_size: int = 10000, batch_size: int = 200):
+        self._engine = engine
+        self.async_mode = async_mode
+        self.batch_size = max(1, batch_size)
+        self._queue: queue.Queue[RequestLogEntry] = queue.Queue(maxsize=max_queue_size)
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+        self.dropped = 0
+
+    @property
+    def engine(self):
+        if self._engine is None:
+            from app.db import engine
+            self._engine = engine
+        return self._engine
+
+    def _session(self):
+        if self._engine is None:
+            # engine dell'app: su SQLite passa dalla coda del writer se attiva
+            from app.db import write_session
+            return write_session()
+        return Session(self._engine, expire_on_commit=False)
+
+    def _write(self, entries: list[RequestLogEntry]) -> None:
+        try:
+            with self._session() as session:
+                write_entries(session, entries)
+            return
+        except Exception:
+            if len(entries) == 1:
+                # Logging failures should never break the request lifecycle
+                logger.warning("Failed to persist access/audit log", exc_info=True)
+                return
+        # One bad row must not drop the whole batch: retry entries one by one
+        for entry in entries:
+            self._write([entry])
+
+    def _ensure_started(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._start_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="request-log-writer", daemon=True)
+                self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            entries = [self._queue.get()]
+            while len(entries) < self.batch_size:
+                try:
+                    entries.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                self._write(entries)
+            finally:
+                for _ in entries:
+                    self._queue.task_done()
+
+    def submit(self, entry: RequestLogEntry) -> None:
+        if not self.async_mode:
+            self._write([entry])
+            return
+        self._ensure_started()
+        try:
+            self._queue.put_nowait(entry)
+        except queue.Full:
+            self.dropped += 1
+            logger.warning("Request log queue full, dropping entry path=%s", entry.path)
+
+    def flush(self) -> None:
+        if self.async_mode and self._thread is not None:
+            self._queue.join()
+
+    def stats(self) -> dict:
+        return {
+            "queue_depth": self._queue.qsize(),
+            "dropped": self.dropped,
+            "async_mode": self.async_mode,
+        }
+
+
+request_log_writer = RequestLogWriter(
+    async_mode=ASYNC_LOG_WRITER,
+    max_queue_size=LOG_WRITER_QUEUE_SIZE,
+    batch_size=LOG_WRITER_BATCH_SIZE,
+)
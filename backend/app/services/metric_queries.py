@@ -0,0 +1,44 @@
+"""Lookups on test_metrics by typed context.
+
+Filters use the ``flow_lpm`` / ``pressure_kpa`` / ``agg`` columns, so they are
+seeks on ``ix_test_metrics_pa_metric_flow`` / ``ix_test_metrics_pa_metric_pressure``
+instead of scans parsing ``context_json``.
+"""
+from typing import Optional
+
+from sqlmodel import Session, select
+
+from app.model.kpi import TestMetric
+
+
+def context_filters(model, *, flow_lpm: Optional[float] = None, pressure_kpa: Optional[int] = None, agg: Optional[str] = None) -> list:
+    """WHERE clauses on the typed context columns of ``TestMetric``/``KpiValue`` (None = any)."""
+    clauses = []
+    if flow_lpm is not None:
+        clauses.append(model.flow_lpm == float(flow_lpm))
+    if pressure_kpa is not None:
+        clauses.append(model.pressure_kpa == int(pressure_kpa))
+    if agg is not None:
+        clauses.append(model.agg == agg)
+    return clauses
+
+
+def latest_metric(
+    session: Session,
+    product_application_id: int,
+    metric_code: str,
+    *,
+    run_type: Optional[str] = None,
+    flow_lpm: Optional[float] = None,
+    pressure_kpa: Optional[int] = None,
+    agg: Optional[str] = None,
+) -> Optional[TestMetric]:
+    """Most recently computed metric of an application matching the given context."""
+    stmt = select(TestMetric).where(
+        TestMetric.product_application_id == product_application_id,
+        TestMetric.metric_code == metric_code,
+        *context_filters(TestMetric, flow_lpm=flow_lpm, pressure_kpa=pressure_kpa, agg=agg),
+    )
+    if run_type is not None:
+        stmt = stmt.where(TestMetric.run_type == run_type)
+    return session.exec(stmt.order_by(TestMetric.computed_at.desc(), TestMetric.id.desc())).first()
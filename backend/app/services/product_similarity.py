@@ -0,0 +1,212 @@
+"""Nearest liners by technical specification.
+
+``product_spec_index`` keeps the numeric specs of every product in a NumPy
+matrix, z-scored per feature so that millimetres, degrees and Shore hardness
+weigh the same. A k-NN query is a weighted Euclidean distance over the features
+both liners have (missing specs are skipped and the distance is averaged over
+the weight actually compared), computed for the whole catalog in one pass.
+
+The matrix is rebuilt lazily: product writes call ``invalidate()`` and the next
+query reloads it (one SELECT of the spec columns); the TTL bounds staleness for
+writes made by other processes (CSV importer, other workers). NumPy is imported
+on the first query, so workers that never serve one do not pay for it.
+"""
+import logging
+import math
+import os
+import threading
+import time
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Mapping, Optional
+
+from sqlmodel import Session, select
+
+from app.model.product import Product
+
+if TYPE_CHECKING:  # pragma: no cover
+    import numpy as np
+
+
+logger = logging.getLogger("liner-backend.similarity")
+
+PRODUCT_SIMILARITY_TTL_SECONDS = float(os.getenv("PRODUCT_SIMILARITY_TTL_SECONDS", "300"))
+
+SPEC_FIELDS = (
+    "liner_length",
+    "shell_orifice",
+    "shell_length",
+    "shell_external_diameter",
+    "barrel_diameter",
+    "mp_depth_mm",
+    "orifice_diameter",
+    "hoodcup_diameter",
+    "return_to_lockring",
+    "lockring_diameter",
+    "overall_length",
+    "milk_tube_id",
+    "barrell_wall_thickness",
+    "barrell_conicity",
+    "hardness",
+)
+
+
+def parse_feature_weights(raw: Optional[str]) -> dict[str, float]:
+    """``"barrel_diameter=2,hardness=0"`` -> ``{feature: weight}``; unlisted features weigh 1."""
+    weights: dict[str, float] = {}
+    for item in (raw or "").split(","):
+        if not item.strip():
+            continue
+        name, sep, value = item.strip().partition("=")
+        name = name.strip()
+        if name not in SPEC_FIELDS:
+            raise ValueError(f"Unknown spec feature {name!r}")
+        try:
+            weight = float(value) if sep else 1.0
+        except ValueError:
+            raise ValueError(f"Invalid weight for {name!r}: {value!r}")
+        if not math.isfinite(weight) or weight < 0:
+            raise ValueError(f"Weight for {name!r} must be a non-negative number")
+        weights[name] = weight
+    return weights
+
+
+@dataclass(frozen=True)
+class _Snapshot:
+    generation: int
+    built_at: float
+    ids: "np.ndarray"          # (n,) int64
+    matrix: "np.ndarray"       # (n, f) float64 z-score, NaN = spec mancante
+    compound: "np.ndarray"     # (n,) object
+    robot_liner: "np.ndarray"  # (n,) bool
+    only_admin: "np.ndarray"   # (n,) bool
+    row_of: dict
+
+
+def _zscore(raw: "np.ndarray") -> "np.ndarray":
+    import numpy as np
+
+    present = ~np.isnan(raw)
+    count = present.sum(axis=0)
+    safe_count = np.maximum(count, 1)
+    mean = np.where(present, raw, 0.0).sum(axis=0) / safe_count
+    centered = np.where(present, raw - mean, 0.0)
+    std = np.sqrt((centered ** 2).sum(axis=0) / safe_count)
+    # feature costante o assente: nessuna scala, contribuisce solo con 0
+    std[std == 0] = 1.0
+    return (raw - mean) / std
+
+
+class ProductSpecIndex:
+    def __init__(self, *, ttl_seconds: float):
+        self.ttl_seconds = ttl_seconds
+        self._snapshot: Optional[_Snapshot] = None
+        self._generation = 0
+        self._lock = threading.Lock()
+        self.rebuilds = 0
+        self.queries = 0
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._generation += 1
+
+    def _build(self, session: Session, generation: int) -> _Snapshot:
+        import numpy as np
+
+        columns = [getattr(Product, name) for name in SPEC_FIELDS]
+        rows = session.exec(
+            select(Product.id, Product.compound, Product.robot_liner, Product.only_admin, *columns).order_by(Product.id)
+        ).all()
+        n = len(rows)
+        ids = np.fromiter((r[0] for r in rows), dtype=np.int64, count=n)
+        raw = np.array(
+            [[np.nan if v is None else float(v) for v in r[4:]] for r in rows],
+            dtype=np.float64,
+        ).reshape(n, len(SPEC_FIELDS))
+        return _Snapshot(
+            generation=generation,
+            built_at=time.monotonic(),
+            ids=ids,
+            matrix=_zscore(raw),
+            compound=np.array([(r[1] or "").upper() for r in rows], dtype=object),
+            robot_liner=np.array([bool(r[2]) for r in rows], dtype=bool),
+            only_admin=np.array([bool(r[3]) for r in rows], dtype=bool),
+            row_of={int(pid): i for i, pid in enumerate(ids)},
+        )
+
+    def snapshot(self, session: Session) -> _Snapshot:
+        with self._lock:
+            snap = self._snapshot
+            generation = self._generation
+            if snap is not None and snap.generation == generation and time.monotonic() - snap.built_at < self.ttl_seconds:
+                return snap
+            # rebuild sotto lock: richieste concorrenti aspettano lo stesso snapshot
+            snap = self._build(session, generation)
+            self._snapshot = snap
+            self.rebuilds += 1
+            logger.info("Product spec index rebuilt products=%d", len(snap.ids))
+            return snap
+
+    def nearest(
+        self,
+        session: Session,
+        product_id: int,
+        *,
+        k: int = 10,
+        weights: Optional[Mapping[str, float]] = None,
+        compound: Optional[str] = None,
+        robot_liner: Optional[bool] = None,
+        include_admin_only: bool = False,
+    ) -> Optional[list[tuple[int, float, int]]]:
+        """``[(product_id, distance, compared_features)]`` closest first; None if the product is unknown."""
+        import numpy as np
+
+        snap = self.snapshot(session)
+        with self._lock:
+            self.queries += 1
+        row = snap.row_of.get(product_id)
+        if row is None:
+            return None
+
+        w = np.array([float((weights or {}).get(name, 1.0)) for name in SPEC_FIELDS])
+        if not (w > 0).any():
+            raise ValueError("At least one spec feature must have a positive weight")
+
+        diff = snap.matrix - snap.matrix[row]
+        compared = ~np.isnan(diff) & (w > 0)
+        weight_compared = compared @ w
+        sq = np.where(compared, diff, 0.0) ** 2
+        with np.errstate(invalid="ignore", divide="ignore"):
+            distance = np.sqrt((sq @ w) / weight_compared)
+
+        keep = weight_compared > 0
+        keep[row] = False
+        if not include_admin_only:
+            keep &= ~snap.only_admin
+        if compound:
+            keep &= snap.compound == compound.strip().upper()
+        if robot_liner is not None:
+            keep &= snap.robot_liner == robot_liner
+
+        candidates = np.flatnonzero(keep)
+        # a parità di distanza vince l'id più basso: risultato stabile tra rebuild
+        candidates = candidates[np.lexsort((snap.ids[candidates], distance[candidates]))][:k]
+        counts = compared.sum(axis=1)
+        return [(int(snap.ids[i]), float(distance[i]), int(counts[i])) for i in candidates]
+
+    def stats(self) -> dict:
+        with self._lock:
+            snap = self._snapshot
+            return {
+                "products": 0 if snap is None else len(snap.ids),
+                "features": len(SPEC_FIELDS),
+                "rebuilds": self.rebuilds,
+                "queries": self.queries,
+                "stale": snap is None or snap.generation != self._generation,
+            }
+
+
+product_spec_index = ProductSpecIndex(ttl_seconds=PRODUCT_SIMILARITY_TTL_SECONDS)
+
+
+def product_similarity_stats() -> dict:
+    return product_spec_index.stats()
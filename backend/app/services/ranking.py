@@ -2,7 +2,7 @@ import sqlalchemy as sa
 from fastapi import HTTPException
 from sqlmodel import Session
 
-from app.model.kpi import KpiValue
+from app.model.kpi import CompositeScore, KpiValue
 from app.model.product import Product, ProductApplication
 
 
@@ -32,6 +32,45 @@ def _size_label(mm: int) -> str:
     return rev.get(mm, str(mm))
 
 
+def _parse_size_and_area_filters(teat_sizes: str, reference_areas: str) -> tuple[list[str], list[int], list[str]]:
+    size_keys = [s.strip().upper() for s in teat_sizes.split(",") if s.strip()]
+    size_mms = [TEAT_SIZE_MAP[s] for s in size_keys if s in TEAT_SIZE_MAP]
+    area_tokens = [s.strip().lower() for s in reference_areas.split(",") if s.strip()]
+    area_values = [REFERENCE_AREAS[s] for s in area_tokens if s in REFERENCE_AREAS]
+
+    if not size_mms:
+        raise HTTPException(status_code=422, detail="teat_sizes cannot be empty")
+    if not area_values:
+        raise HTTPException(status_code=422, detail="reference_areas cannot be empty")
+    return size_keys, size_mms, area_values
+
+
+def _apply_visibility(query, prod, user, area_values: list[str]):
+    role_value = getattr(getattr(user, "role", None), "value", getattr(user, "role", None))
+    if role_value != "admin":
+        query = query.where(prod.c.only_admin.is_(False))
+    if "Global" not in area_values:
+        # I prodotti taggati "Global" sono universali: vanno inclusi anche
+        # quando si filtra per una regione specifica.
+        targets = area_values + ["Global"]
+        area_matchers = [
+            sa.func.lower(sa.cast(prod.c.reference_areas, sa.String)).like(f'%"{area.lower()}"%')
+            for area in targets
+        ]
+        query = query.where(sa.or_(*area_matchers))
+    return query
+
+
+def _mi_first(prod):
+    return sa.case(
+        (
+            sa.func.upper(sa.func.coalesce(prod.c.brand, "")) == "MI",
+            0,
+        ),
+        else_=1,
+    ).asc()
+
+
 def get_overview_rankings(
     session: Session,
     user,
@@ -41,17 +80,9 @@ def get_overview_rankings(
     limit: int,
 ) -> dict:
     kpi_codes = [c.strip().upper() for c in kpis.split(",") if c.strip()]
-    size_keys = [s.strip().upper() for s in teat_sizes.split(",") if s.strip()]
-    size_mms = [TEAT_SIZE_MAP[s] for s in size_keys if s in TEAT_SIZE_MAP]
-    area_tokens = [s.strip().lower() for s in reference_areas.split(",") if s.strip()]
-    area_values = [REFERENCE_AREAS[s] for s in area_tokens if s in REFERENCE_AREAS]
-
     if not kpi_codes:
         raise HTTPException(status_code=422, detail="kpis cannot be empty")
-    if not size_mms:
-        raise HTTPException(status_code=422, detail="teat_sizes cannot be empty")
-    if not area_values:
-        raise HTTPException(status_code=422, detail="reference_areas cannot be empty")
+    size_keys, size_mms, area_values = _parse_size_and_area_filters(teat_sizes, reference_areas)
 
     kv = KpiValue.__table__
     pa = ProductApplication.__table__
@@ -66,7 +97,8 @@ def get_overview_rankings(
             kv.c.computed_at.label("computed_at"),
             sa.func.row_number()
             .over(
-                partition_by=(kv.c.product_application_id, kv.c.kpi_code),
+                # stesso ordine di ix_kpi_values_kpi_pa_computed_at: seek per kpi_code, niente sort
+                partition_by=(kv.c.kpi_code, kv.c.product_application_id),
                 order_by=kv.c.computed_at.desc(),
             )
             .label("rn_latest"),
@@ -94,13 +126,7 @@ def get_overview_rankings(
                         (latest.c.kpi_code.in_(HIGHER_IS_BETTER_KPIS), sa.func.coalesce(latest.c.value_num, -1e12)),
                         else_=-sa.func.coalesce(latest.c.value_num, 1e12),
                     ).desc(),
-                    sa.case(
-                        (
-                            sa.func.upper(sa.func.coalesce(prod.c.brand, "")) == "MI",
-                            0,
-                        ),
-                        else_=1,
-                    ).asc(),
+                    _mi_first(prod),
                     latest.c.computed_at.desc(),
                     prod.c.model.asc(),
                 ),
@@ -117,18 +143,7 @@ def get_overview_rankings(
         )
     )
 
-    role_value = getattr(getattr(user, "role", None), "value", getattr(user, "role", None))
-    if role_value != "admin":
-        ranking = ranking.where(prod.c.only_admin.is_(False))
-    if "Global" not in area_values:
-        # I prodotti taggati "Global" sono universali: vanno inclusi anche
-        # quando si filtra per una regione specifica.
-        targets = area_values + ["Global"]
-        area_matchers = [
-            sa.func.lower(sa.cast(prod.c.reference_areas, sa.String)).like(f'%"{area.lower()}"%')
-            for area in targets
-        ]
-        ranking = ranking.where(sa.or_(*area_matchers))
+    ranking = _apply_visibility(ranking, prod, user, area_values)
 
     ranked = ranking.subquery("ranked")
     query = (
@@ -181,3 +196,88 @@ def get_overview_rankings(
         },
         "items": items,
     }
+
+
+def get_composite_rankings(
+    session: Session,
+    user,
+    teat_sizes: str,
+    reference_areas: str,
+    limit: int,
+    profile_id: int = 0,
+) -> dict:
+    """Top-N applications per teat size by precomputed composite score.
+
+    Same visibility and reference-area rules as ``get_overview_rankings``;
+    reads ``composite_scores`` only (see ``app.services.composite_score``).
+    """
+    size_keys, size_mms, area_values = _parse_size_and_area_filters(teat_sizes, reference_areas)
+
+    cs = CompositeScore.__table__
+    pa = ProductApplication.__table__
+    prod = Product.__table__
+
+    ranking = (
+        sa.select(
+            pa.c.size_mm.label("size_mm"),
+            prod.c.brand.label("brand"),
+            prod.c.model.label("model"),
+            prod.c.barrel_shape.label("barrel_shape"),
+            cs.c.score.label("score"),
+            cs.c.coverage.label("coverage"),
+            cs.c.kpi_count.label("kpi_count"),
+            sa.func.row_number()
+            .over(
+                partition_by=pa.c.size_mm,
+                order_by=(cs.c.score.desc(), cs.c.coverage.desc(), _mi_first(prod), prod.c.model.asc()),
+            )
+            .label("rank_pos"),
+        )
+        .select_from(cs)
+        .join(pa, pa.c.id == cs.c.product_application_id)
+        .join(prod, prod.c.id == pa.c.product_id)
+        .where(
+            cs.c.profile_id == profile_id,
+            pa.c.size_mm.in_(size_mms),
+            prod.c.product_type == "liner",
+        )
+    )
+    ranking = _apply_visibility(ranking, prod, user, area_values)
+
+    ranked = ranking.subquery("ranked")
+    rows = session.exec(
+        sa.select(ranked)
+        .where(ranked.c.rank_pos <= limit)
+        .order_by(ranked.c.size_mm.asc(), ranked.c.rank_pos.asc())
+    ).all()
+
+    grouped = {}
+    for r in rows:
+        grouped.setdefault(int(r.size_mm), []).append(
+            {
+                "rank": int(r.rank_pos),
+                "brand": r.brand or "",
+                "model": r.model or "",
+                "barrel_shape": r.barrel_shape or "",
+                "score": round(float(r.score), 3),
+                "coverage": round(float(r.coverage), 3),
+                "kpi_count": int(r.kpi_count),
+            }
+        )
+
+    return {
+        "meta": {
+            "limit": limit,
+            "profile_id": profile_id,
+            "teat_sizes": size_keys,
+            "reference_areas": area_values,
+        },
+        "items": [
+            {
+                "teat_size": _size_label(size_mm),
+                "size_mm": size_mm,
+                "top": grouped.get(size_mm, []),
+            }
+            for size_mm in sorted(size_mms)
+        ],
+    }
@@ -0,0 +1,226 @@
+"""Request deadlines propagated to the database.
+
+``RequestTimeoutMiddleware`` stores a ``RequestDeadline`` in a ContextVar; the
+context is copied into the threadpool that runs sync handlers, so the engine
+hooks installed by ``install_statement_cancellation`` see it on every
+connection checked out for that request:
+
+- Postgres: ``statement_timeout`` set to the remaining budget at the start of
+  every transaction (``set_config(..., true)``: it holds after a ``commit`` on
+  the same checkout, and nothing leaks back into the pool);
+- SQLite: a progress handler aborting the statement once the deadline passes.
+
+When the deadline passes or the client disconnects, ``cancel`` interrupts the
+statements still running on those connections (``cancel()`` / ``interrupt()``)
+and any later statement of the abandoned handler fails fast with
+``RequestCancelledError`` instead of taking a pool slot.
+"""
+import logging
+import threading
+import time
+from contextvars import ContextVar
+from typing import Optional
+
+import sqlalchemy as sa
+
+
+logger = logging.getLogger("liner-backend.limits")
+
+# Ogni quante istruzioni della VM SQLite si controlla la deadline
+SQLITE_PROGRESS_STEPS = 10000
+
+
+class RequestCancelledError(Exception):
+    """The request owning this statement timed out or its client went away."""
+
+
+class RequestDeadline:
+    def __init__(self, timeout_seconds: float, *, route: str = "-"):
+        self.timeout_seconds = timeout_seconds
+        self.expires_at = time.monotonic() + timeout_seconds
+        self.route = route
+        self.reason: Optional[str] = None
+        self._connections: set = set()
+        self._lock = threading.Lock()
+
+    def remaining(self) -> float:
+        return self.expires_at - time.monotonic()
+
+    @property
+    def cancelled(self) -> bool:
+        return self.reason is not None
+
+    def expired(self) -> bool:
+        return self.cancelled or self.remaining() <= 0
+
+    def check(self) -> None:
+        if self.expired():
+            raise RequestCancelledError(f"Request {self.reason or 'timeout'}: statement not executed")
+
+    def attach(self, dbapi_connection) -> None:
+        with self._lock:
+            self._connections.add(dbapi_connection)
+
+    def detach(self, dbapi_connection) -> None:
+        with self._lock:
+            self._connections.discard(dbapi_connection)
+
+    def cancel(self, reason: str) -> int:
+        """Mark the request as abandoned and interrupt its running statements."""
+        with self._lock:
+            if self.reason is not None:
+                return 0
+            self.reason = reason
+            connections = list(self._connections)
+        interrupted = 0
+        for conn in connections:
+            interrupt = getattr(conn, "cancel", None) or getattr(conn, "interrupt", None)
+            if interrupt is None:
+                continue
+            try:
+                interrupt()
+                interrupted += 1
+            except Exception:
+                logger.warning("Failed to interrupt statement route=%s", self.route, exc_info=True)
+        cancellation_stats.record(reason, self.route, interrupted)
+        return interrupted
+
+
+request_deadline_ctx: ContextVar[Optional[RequestDeadline]] = ContextVar("request_deadline", default=None)
+
+
+class CancellationStats:
+    """Counters on abandoned requests and the database work they cut short."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        with self._lock:
+            self.requests = {"timeout": 0, "client_disconnect": 0}
+            self.by_route: dict[str, int] = {}
+            self.connections_interrupted = 0
+            self.statements_rejected = 0
+            self.statements_aborted = 0
+
+    def record(self, reason: str, route: str, interrupted: int) -> None:
+        with self._lock:
+            self.requests[reason] = self.requests.get(reason, 0) + 1
+            self.by_route[route] = self.by_route.get(route, 0) + 1
+            self.connections_interrupted += interrupted
+
+    def statement_rejected(self) -> None:
+        with self._lock:
+            self.statements_rejected += 1
+
+    def statement_aborted(self) -> None:
+        with self._lock:
+            self.statements_aborted += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "requests": dict(self.requests),
+                "by_route": dict(self.by_route),
+                "connections_interrupted": self.connections_interrupted,
+                "statements_rejected": self.statements_rejected,
+                "statements_aborted": self.statements_aborted,
+            }
+
+
+cancellation_stats = CancellationStats()
+
+
+def request_cancellation_stats() -> dict:
+    return cancellation_stats.stats()
+
+
+def parse_route_timeouts(raw: str) -> dict[str, float]:
+    """``"/rankings=20,/products/export=120"`` -> ``{path_prefix: seconds}``."""
+    budgets: dict[str, float] = {}
+    for item in (raw or "").split(","):
+        prefix, sep, seconds = item.strip().partition("=")
+        if not sep or not prefix.startswith("/"):
+            continue
+        try:
+            budgets[prefix.rstrip("/") or "/"] = float(seconds)
+        except ValueError:
+            logger.warning("Ignoring invalid route timeout %r", item)
+    return budgets
+
+
+def route_timeout(path: str, budgets: dict[str, float], default: float) -> float:
+    """Budget of the longest prefix matching ``path`` (segment-wise), else ``default``."""
+    best, best_len = default, -1
+    for prefix, seconds in budgets.items():
+        if (path == prefix or path.startswith(prefix.rstrip("/") + "/")) and len(prefix) > best_len:
+            best, best_len = seconds, len(prefix)
+    return best
+
+
+def _postgres_statement_timeout(dbapi_connection, deadline: RequestDeadline) -> None:
+    cursor = dbapi_connection.cursor()
+    try:
+        # locale alla transazione: al rientro nel pool vale di nuovo il default
+        cursor.execute(
+            "SELECT set_config('statement_timeout', %s, true)",
+            (str(max(1, int(deadline.remaining() * 1000))),),
+        )
+    finally:
+        cursor.close()
+
+
+# Per dialetto: eseguito a ogni BEGIN di una connessione agganciata a una richiesta
+TRANSACTION_DEADLINE_HOOKS = {"postgresql": _postgres_statement_timeout}
+
+
+def install_statement_cancellation(engine) -> None:
+    """Attach request deadlines to the connections ``engine`` hands out."""
+    dialect = engine.dialect.name
+
+    def on_checkout(dbapi_connection, connection_record, connection_proxy):
+        deadline = request_deadline_ctx.get()
+        if deadline is None or deadline.expired():
+            # niente statement qui: before_cursor_execute rifiuta quelli successivi
+            return
+        connection_record.info["request_deadline"] = deadline
+        deadline.attach(dbapi_connection)
+        if dialect == "sqlite":
+            dbapi_connection.set_progress_handler(lambda: 1 if deadline.expired() else 0, SQLITE_PROGRESS_STEPS)
+
+    def on_checkin(dbapi_connection, connection_record):
+        deadline = connection_record.info.pop("request_deadline", None)
+        if deadline is None:
+            return
+        deadline.detach(dbapi_connection)
+        if dialect == "sqlite" and dbapi_connection is not None:
+            dbapi_connection.set_progress_handler(None, 0)
+
+    def on_begin(conn):
+        # a ogni transazione, non solo al checkout: dopo un commit l'handler può continuare a leggere
+        hook = TRANSACTION_DEADLINE_HOOKS.get(dialect)
+        deadline = conn.info.get("request_deadline")
+        if hook is None or deadline is None or deadline.expired():
+            return
+        hook(conn.connection.dbapi_connection, deadline)
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        deadline = request_deadline_ctx.get()
+        if deadline is not None and deadline.expired():
+            cancellation_stats.statement_rejected()
+            raise RequestCancelledError(f"Request {deadline.reason or 'timeout'}: statement not executed")
+
+    def handle_error(context):
+        deadline = request_deadline_ctx.get()
+        if deadline is None or not deadline.expired() or isinstance(context.original_exception, RequestCancelledError):
+            return None
+        # statement interrotto (timeout/interrupt): l'handler vede RequestCancelledError -> 504, non un 500
+        cancellation_stats.statement_aborted()
+        return RequestCancelledError(f"Request {deadline.reason or 'timeout'}: statement interrupted")
+
+    sa.event.listen(engine, "checkout", on_checkout)
+    sa.event.listen(engine, "checkin", on_checkin)
+    sa.event.listen(engine, "begin", on_begin)
+    sa.event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    sa.event.listen(engine, "handle_error", handle_error)
@@ -1,39 +1,49 @@
 import ipaddress
+import logging
 import os
-from functools import lru_cache
+import time
+from threading import Lock
 from typing import Optional
 
 from fastapi import Request
 
-try:
-    import geoip2.database
-except ImportError:  # pragma: no cover - optional dependency at runtime
-    geoip2 = None
-else:  # pragma: no cover - keeps attribute access simple below
-    geoip2 = geoip2.database
+from app.common.http_scope import client_ip_from_scope, first_scope_header, scope_headers
+from app.common.lru_cache import LruCache
+
+
+logger = logging.getLogger("liner-backend.geo")
+
+_UNLOADED = object()
+_geoip2_database = _UNLOADED
+
+
+def _geoip2():
+    """``geoip2.database``, imported on first use: without a configured .mmdb it never loads."""
+    global _geoip2_database
+    if _geoip2_database is _UNLOADED:
+        try:
+            import geoip2.database
+        except ImportError:  # pragma: no cover - optional dependency at runtime
+            _geoip2_database = None
+        else:
+            _geoip2_database = geoip2.database
+    return _geoip2_database
 
 
 def first_header(request: Request, *names: str) -> Optional[str]:
-    for name in names:
-        value = request.headers.get(name)
-        if value:
-            return value.strip()
-    return None
+    return first_scope_header(request.scope, *names)
 
 
 def request_ip(request: Request) -> str:
-    forwarded = first_header(request, "x-forwarded-for", "x-real-ip", "fly-client-ip")
-    if forwarded:
-        return forwarded.split(",")[0].strip()
-    return request.client.host if request.client else "-"
+    return client_ip_from_scope(request.scope)
 
 
-def _header_geo_source(request: Request) -> Optional[str]:
-    if request.headers.get("x-vercel-ip-country") or request.headers.get("x-vercel-ip-country-region"):
+def _header_geo_source(headers: dict[str, str]) -> Optional[str]:
+    if headers.get("x-vercel-ip-country") or headers.get("x-vercel-ip-country-region"):
         return "vercel"
-    if request.headers.get("cf-ipcountry"):
+    if headers.get("cf-ipcountry"):
         return "cloudflare"
-    if request.headers.get("cloudfront-viewer-country"):
+    if headers.get("cloudfront-viewer-country"):
         return "cloudfront"
     return "generic-proxy"
 
@@ -46,29 +56,99 @@ def _is_public_ip(ip: str) -> bool:
     return addr.is_global
 
 
-@lru_cache(maxsize=1)
-def _geoip_reader(db_path: str):
-    if not db_path or not os.path.exists(db_path) or geoip2 is None:
-        return None
-    try:
-        return geoip2.Reader(db_path)
-    except Exception:
-        return None
-
-
-def _geoip_lookup(ip: str) -> tuple[Optional[str], Optional[str], Optional[str], Optional[float], Optional[float], Optional[str]]:
-    db_path = (os.getenv("GEOIP2_CITY_DB_PATH") or "").strip()
-    if not db_path or not _is_public_ip(ip):
-        return None, None, None, None, None, None
-
-    reader = _geoip_reader(db_path)
-    if reader is None:
-        return None, None, None, None, None, None
-
+GeoTuple = tuple[Optional[str], Optional[str], Optional[str], Optional[float], Optional[float], Optional[str]]
+_EMPTY_GEO: GeoTuple = (None, None, None, None, None, None)
+
+GEOIP2_CITY_DB_PATH = (os.getenv("GEOIP2_CITY_DB_PATH") or "").strip()
+GEOIP_CACHE_MAX_ENTRIES = int(os.getenv("GEOIP_CACHE_MAX_ENTRIES", "10000"))
+GEOIP_CACHE_TTL_SECONDS = float(os.getenv("GEOIP_CACHE_TTL_SECONDS", "3600"))
+# How often (at most) we stat() the .mmdb file to detect a replaced database
+GEOIP_RELOAD_CHECK_SECONDS = float(os.getenv("GEOIP_RELOAD_CHECK_SECONDS", "60"))
+
+
+class GeoIpCache(LruCache[str, GeoTuple]):
+    """Bounded LRU of resolved geo tuples per IP, with a per-entry TTL."""
+
+
+class _GeoIpReaderHolder:
+    """Keeps one memory-mapped reader open and reopens it when the .mmdb file changes."""
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self._reader = None
+        self._mtime: Optional[float] = None
+        self._next_check = 0.0
+        self._lock = Lock()
+
+    def _open(self) -> None:
+        # Called with the lock held
+        try:
+            mtime = os.stat(self.db_path).st_mtime
+        except OSError:
+            self._close()
+            return
+        if self._reader is not None and mtime == self._mtime:
+            return
+        geoip2 = _geoip2()
+        try:
+            reader = geoip2.Reader(self.db_path, mode=geoip2.MODE_MMAP)
+        except Exception:
+            logger.warning("Failed to open GeoIP database path=%s", self.db_path, exc_info=True)
+            return
+        old_reader = self._reader
+        self._reader = reader
+        self._mtime = mtime
+        if old_reader is not None:
+            # Cached answers came from the previous database
+            geoip_cache.clear()
+            try:
+                old_reader.close()
+            except Exception:
+                pass
+            logger.info("GeoIP database reloaded path=%s", self.db_path)
+
+    def _close(self) -> None:
+        if self._reader is not None:
+            try:
+                self._reader.close()
+            except Exception:
+                pass
+        self._reader = None
+        self._mtime = None
+
+    def get(self):
+        if not self.db_path or _geoip2() is None:
+            return None
+        now = time.monotonic()
+        if now >= self._next_check:
+            with self._lock:
+                if now >= self._next_check:
+                    self._open()
+                    self._next_check = now + GEOIP_RELOAD_CHECK_SECONDS
+        return self._reader
+
+
+geoip_cache = GeoIpCache(
+    max_entries=GEOIP_CACHE_MAX_ENTRIES,
+    ttl_seconds=GEOIP_CACHE_TTL_SECONDS,
+)
+_reader_holder = _GeoIpReaderHolder(GEOIP2_CITY_DB_PATH)
+
+
+def init_geoip_reader() -> None:
+    # Open the reader eagerly at startup so the first request does not pay for it
+    _reader_holder.get()
+
+
+def geoip_cache_stats() -> dict:
+    return geoip_cache.stats()
+
+
+def _geoip_lookup_uncached(reader, ip: str) -> GeoTuple:
     try:
         result = reader.city(ip)
     except Exception:
-        return None, None, None, None, None, None
+        return _EMPTY_GEO
 
     subdivision = result.subdivisions.most_specific if result.subdivisions else None
     region = subdivision.iso_code or subdivision.name if subdivision else None
@@ -82,38 +162,53 @@ def _geoip_lookup(ip: str) -> tuple[Optional[str], Optional[str], Optional[str],
     )
 
 
-def best_effort_geo_from_headers(
-    request: Request,
-) -> tuple[Optional[str], Optional[str], Optional[str], Optional[float], Optional[float], Optional[str]]:
-    country = first_header(
-        request,
+def _geoip_lookup(ip: str) -> GeoTuple:
+    if not _is_public_ip(ip):
+        return _EMPTY_GEO
+
+    reader = _reader_holder.get()
+    if reader is None:
+        return _EMPTY_GEO
+
+    cached = geoip_cache.get(ip)
+    if cached is not None:
+        return cached
+
+    geo = _geoip_lookup_uncached(reader, ip)
+    geoip_cache.put(ip, geo)
+    return geo
+
+
+def geo_from_scope(scope) -> GeoTuple:
+    country = first_scope_header(
+        scope,
         "x-vercel-ip-country",
         "cf-ipcountry",
         "cloudfront-viewer-country",
         "x-country-code",
         "x-country",
     )
-    region = first_header(
-        request,
+    region = first_scope_header(
+        scope,
         "x-vercel-ip-country-region",
         "cloudfront-viewer-country-region",
         "x-region",
         "x-country-region",
     )
-    city = first_header(
-        request,
+    city = first_scope_header(
+        scope,
         "x-vercel-ip-city",
         "cloudfront-viewer-city",
         "x-city",
     )
-    lat_raw = first_header(
-        request,
+    lat_raw = first_scope_header(
+        scope,
         "x-vercel-ip-latitude",
         "cloudfront-viewer-latitude",
         "x-latitude",
     )
-    lon_raw = first_header(
-        request,
+    lon_raw = first_scope_header(
+        scope,
         "x-vercel-ip-longitude",
         "cloudfront-viewer-longitude",
         "x-longitude",
@@ -130,6 +225,10 @@ def best_effort_geo_from_headers(
         lon = None
 
     if country or region or city or lat is not None or lon is not None:
-        return country, region, city, lat, lon, _header_geo_source(request)
+        return country, region, city, lat, lon, _header_geo_source(scope_headers(scope))
+
+    return _geoip_lookup(client_ip_from_scope(scope))
+
 
-    return _geoip_lookup(request_ip(request))
+def best_effort_geo_from_headers(request: Request) -> GeoTuple:
+    return geo_from_scope(request.scope)
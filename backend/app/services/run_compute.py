@@ -0,0 +1,268 @@
+"""KPI compute pipeline for TPP, SPEED, MASSAGE and SMT_HOOD runs.
+
+Shared by the ``/runs/{id}/compute`` endpoints and the CSV importers. Each
+``compute_*_run`` loads its inputs once (points and all the scale bands it
+needs), computes derivatives and scores in memory, then writes metrics and KPI
+values with one upsert per table (contexts go through ``context_fields`` so the
+typed context columns are filled too) and refreshes the application's composite
+scores. With ``commit=True`` (HTTP) that is the only commit; the importers pass
+``commit=False`` so the run, its points and its KPIs land in their own single
+transaction.
+"""
+from typing import Optional, Sequence
+
+from sqlmodel import Session, select
+
+from app.model.kpi import utcnow
+from app.model.massage import MassagePoint, MassageRun
+from app.model.smthood import SmtHoodPoint, SmtHoodRun
+from app.model.speed import SpeedRun
+from app.model.tpp import TppRun
+from app.services.composite_score import refresh_composite_scores
+from app.services.kpi_engine import load_scale_bands, score_from_bands
+from app.services.kpi_persistence import context_fields, upsert_kpi_values, upsert_test_metrics
+from app.services.setting_calculator.cache import invalidate_liner_info
+
+
+MASSAGE_PRESSURES = [45, 40, 35]
+MASSAGE_KPIS = ("CONGESTION_RISK", "HYPERKERATOSIS_RISK", "FITTING")
+
+SMT_HOOD_FLOWS = [0.5, 1.9, 3.6]
+SMT_HOOD_KPIS = ("RESPRAY", "FLUYDODINAMIC", "SLIPPAGE", "RINGING_RISK")
+MILK_VAC = 45.0
+
+_FINAL_CONTEXT = context_fields({"agg": "final"})
+
+
+class RunComputeError(ValueError):
+    """Run inputs cannot be computed; ``status_code`` is what the HTTP layer returns."""
+
+    def __init__(self, detail: str, status_code: int = 400):
+        super().__init__(detail)
+        self.detail = detail
+        self.status_code = status_code
+
+
+def _flow_code(lpm: float) -> int:
+    return int(round(lpm * 10))
+
+
+def _required_score(bands: dict, kpi_code: str, value: float) -> int:
+    score = score_from_bands(bands, kpi_code, value)
+    if score is None:
+        raise RunComputeError(f"No scale band for KPI {kpi_code} covering value {value}", status_code=422)
+    return score
+
+
+def _metric(run, run_type: str, code: str, value: float, unit: Optional[str], context: dict) -> dict:
+    return dict(
+        run_type=run_type,
+        run_id=run.id,
+        product_application_id=run.product_application_id,
+        metric_code=code,
+        value_num=float(value),
+        unit=unit,
+        **context,
+    )
+
+
+def _kpi(run, run_type: str, code: str, value: float, score: int, unit: Optional[str], context: dict) -> dict:
+    return dict(
+        run_type=run_type,
+        run_id=run.id,
+        product_application_id=run.product_application_id,
+        kpi_code=code,
+        value_num=float(value),
+        score=int(score),
+        unit=unit,
+        **context,
+        computed_at=utcnow(),
+    )
+
+
+def _persist(session: Session, metrics: list[dict], kpis: list[dict], *, commit: bool) -> None:
+    upsert_test_metrics(session, metrics)
+    upsert_kpi_values(session, kpis)
+    # punteggi compositi aggiornati nella stessa transazione dei KPI
+    refresh_composite_scores(session, {kpi["product_application_id"] for kpi in kpis})
+    if commit:
+        session.commit()
+
+
+def _compute_single_measure(session: Session, run, *, run_type, value, metric_code, kpi_code, unit, commit) -> list[dict]:
+    bands = load_scale_bands(session, [kpi_code])
+    kpi = _kpi(run, run_type, kpi_code, value, _required_score(bands, kpi_code, value), unit, _FINAL_CONTEXT)
+    _persist(session, [_metric(run, run_type, metric_code, value, unit, _FINAL_CONTEXT)], [kpi], commit=commit)
+    return [kpi]
+
+
+def compute_tpp_run(session: Session, run: TppRun, *, commit: bool = True) -> list[dict]:
+    """REAL_TPP metric and CLOSURE KPI; returns the KPI rows written."""
+    if run.real_tpp is None:
+        raise RunComputeError("Missing real_tpp")
+    kpis = _compute_single_measure(
+        session, run,
+        run_type="TPP", value=run.real_tpp, metric_code="REAL_TPP", kpi_code="CLOSURE", unit=None, commit=commit,
+    )
+    if commit:
+        invalidate_liner_info(run.product_application_id)
+    return kpis
+
+
+def compute_speed_run(session: Session, run: SpeedRun, *, commit: bool = True) -> list[dict]:
+    """SPEED_ML metric and SPEED KPI; returns the KPI rows written."""
+    if run.measure_ml is None:
+        raise RunComputeError("Missing measure_ml")
+    return _compute_single_measure(
+        session, run,
+        run_type="SPEED", value=run.measure_ml, metric_code="SPEED_ML", kpi_code="SPEED", unit="ml", commit=commit,
+    )
+
+
+def compute_massage_run(
+    session: Session,
+    run: MassageRun,
+    points: Optional[Sequence[MassagePoint]] = None,
+    *,
+    commit: bool = True,
+) -> dict:
+    """Intensities/derived metrics and CONGESTION_RISK, HYPERKERATOSIS_RISK, FITTING.
+
+    ``points`` can be passed by callers that already hold them (importers).
+    """
+    if points is None:
+        points = session.exec(select(MassagePoint).where(MassagePoint.run_id == run.id)).all()
+    by = {p.pressure_kpa: p for p in points}
+    if not all(k in by for k in MASSAGE_PRESSURES):
+        raise RunComputeError("Run requires 3 points at 45/40/35 kPa")
+
+    #intensità per pressione
+    I45 = by[45].max_val - by[45].min_val
+    I40 = by[40].max_val - by[40].min_val
+    I35 = by[35].max_val - by[35].min_val
+
+    #derivati
+    avg_overmilk = (I45 + I40) / 2.0
+    avg_pf = (I40 + I35) / 2.0
+    diff_from_max = 45.0 - by[45].max_val
+    diff_pct = (diff_from_max / 45.0) if 45.0 != 0 else 0.0
+    drop_45_to_40 = (I40 - I45) / I45 if I45 else 0.0
+    drop_40_to_35 = (I35 - I40) / I40 if I40 else 0.0
+
+    #KPI score (bande caricate una volta)
+    bands = load_scale_bands(session, MASSAGE_KPIS)
+    kpi_inputs = {
+        "CONGESTION_RISK": avg_overmilk,
+        "HYPERKERATOSIS_RISK": avg_overmilk,
+        "FITTING": diff_pct,
+    }
+    scores = {code: _required_score(bands, code, value) for code, value in kpi_inputs.items()}
+
+    no_ctx = context_fields({})
+    metrics = [
+        _metric(run, "MASSAGE", code, value, unit, no_ctx)
+        for code, value, unit in (
+            ("I45", I45, None),
+            ("I40", I40, None),
+            ("I35", I35, None),
+            ("AVG_OVERMILK", avg_overmilk, None),
+            ("AVG_PF", avg_pf, None),
+            ("DIFF_FROM_MAX", diff_from_max, "kPa"),
+            ("DIFF_PCT", diff_pct, "%"),
+            ("DROP_45_40", drop_45_to_40, "%"),
+            ("DROP_40_35", drop_40_to_35, "%"),
+        )
+    ]
+    ctx = context_fields({"pressures": MASSAGE_PRESSURES})
+    kpis = [_kpi(run, "MASSAGE", code, value, scores[code], None, ctx) for code, value in kpi_inputs.items()]
+    _persist(session, metrics, kpis, commit=commit)
+    if commit:
+        # AVG_PF / AVG_OVERMILK alimentano il calcolatore
+        invalidate_liner_info(run.product_application_id)
+
+    return {
+        "run_id": run.id,
+        "product_application_id": run.product_application_id,
+        "metrics": {
+            "I45": I45, "I40": I40, "I35": I35,
+            "avg_overmilk": avg_overmilk,
+            "avg_pf": avg_pf,
+            "diff_from_max": diff_from_max,
+            "diff_pct": diff_pct,
+            "drop_45_to_40": drop_45_to_40,
+            "drop_40_to_35": drop_40_to_35,
+        },
+        "kpis": scores,
+    }
+
+
+def compute_smt_hood_run(
+    session: Session,
+    run: SmtHoodRun,
+    points: Optional[Sequence[SmtHoodPoint]] = None,
+    *,
+    commit: bool = True,
+) -> dict:
+    """Per-flow RESPRAY/FLUYDODINAMIC/SLIPPAGE/RINGING values and their 3-flow averages as KPIs."""
+    if points is None:
+        points = session.exec(select(SmtHoodPoint).where(SmtHoodPoint.run_id == run.id)).all()
+    by = {p.flow_code: p for p in points}
+    if not all(_flow_code(f) in by for f in SMT_HOOD_FLOWS):
+        raise RunComputeError("Run requires 3 points at flows 0.5, 1.9, 3.6 L/min")
+
+    bands = load_scale_bands(session, SMT_HOOD_KPIS)
+    results = {}
+    metrics = []
+    values: dict[str, list[float]] = {code: [] for code in SMT_HOOD_KPIS}
+
+    # ---- per-flow: calcolo, scoring e metriche derivate ----
+    for fl in SMT_HOOD_FLOWS:
+        p = by[_flow_code(fl)]
+        smt_min, smt_max = float(p.smt_min), float(p.smt_max)
+        hood_min, hood_max = float(p.hood_min), float(p.hood_max)
+
+        # derivati (kPa)
+        derived = {
+            "RESPRAY": smt_max - MILK_VAC,
+            "FLUYDODINAMIC": (smt_max - smt_min) - (smt_max - MILK_VAC) if smt_max > MILK_VAC else (smt_max - smt_min),
+            "SLIPPAGE": (hood_max - hood_min) - (hood_max - MILK_VAC) if hood_max > MILK_VAC else (hood_max - hood_min),
+            "RINGING_RISK": hood_max - MILK_VAC,
+        }
+        flow_ctx = context_fields({"flow_lpm": fl})
+        for code, metric_code in (
+            ("RESPRAY", "RESPRAY_VAL"),
+            ("FLUYDODINAMIC", "FLUYDODINAMIC_VAL"),
+            ("SLIPPAGE", "SLIPPAGE_VAL"),
+            ("RINGING_RISK", "RINGING_VAL"),
+        ):
+            metrics.append(_metric(run, "SMT_HOOD", metric_code, derived[code], "kPa", flow_ctx))
+            values[code].append(derived[code])
+
+        results[fl] = {
+            key: {"value": derived[code], "score": _required_score(bands, code, derived[code])}
+            for key, code in (
+                ("respray", "RESPRAY"),
+                ("fluydodinamic", "FLUYDODINAMIC"),
+                ("slippage", "SLIPPAGE"),
+                ("ringing_risk", "RINGING_RISK"),
+            )
+        }
+
+    # ---- KPI finali (medie 3 flow): un valore per applicazione ----
+    averages = {code: sum(xs) / len(xs) for code, xs in values.items()}
+    ctx = context_fields({"flows": SMT_HOOD_FLOWS, "agg": "final"})
+    kpis = [
+        _kpi(run, "SMT_HOOD", code, value, _required_score(bands, code, value), "kPa", ctx)
+        for code, value in averages.items()
+    ]
+    _persist(session, metrics, kpis, commit=commit)
+
+    return {
+        "run_id": run.id,
+        "product_application_id": run.product_application_id,
+        "flows": results,
+        "final": {
+            code: {"value": float(f"{value:.1f}"), "unit": "kPa"}
+            for code, value in averages.items()
+        },
+    }
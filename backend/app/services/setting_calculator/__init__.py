@@ -1,3 +1,3 @@
-from .service import compare_settings_v1
+from .service import compare_settings_v1, solve_settings_v1
 
-__all__ = ["compare_settings_v1"]
+__all__ = ["compare_settings_v1", "solve_settings_v1"]
@@ -0,0 +1,107 @@
+"""In-process caches for the setting calculator.
+
+- ``liner_info_cache``: productApplicationId -> (version, LinerInfoV1). Entries are
+  dropped when a TPP/massage run of the application is computed or its product
+  changes; the TTL bounds staleness for writes made by other processes
+  (CSV importers, other workers).
+- ``side_result_cache``: LRU of (SideComputation, SideResultV1) keyed by (liner
+  info version, SideInputs). A rebuilt LinerInfo gets a new version, so stale
+  side results are never hit and simply age out.
+"""
+import itertools
+import os
+from threading import Lock
+from typing import Optional
+
+from app.common.lru_cache import LruCache
+from app.schema.setting_calculator.response_v1 import LinerInfoV1
+
+
+SETTING_CALC_LINER_CACHE_MAX_ENTRIES = int(os.getenv("SETTING_CALC_LINER_CACHE_MAX_ENTRIES", "2048"))
+SETTING_CALC_LINER_CACHE_TTL_SECONDS = float(os.getenv("SETTING_CALC_LINER_CACHE_TTL_SECONDS", "300"))
+SETTING_CALC_SIDE_CACHE_MAX_ENTRIES = int(os.getenv("SETTING_CALC_SIDE_CACHE_MAX_ENTRIES", "4096"))
+
+_versions = itertools.count(1)
+
+
+class LinerInfoCache:
+    """productApplicationId -> (version, LinerInfoV1), LRU with TTL.
+
+    ``generation`` is read before the DB lookup and passed back to ``put``: an
+    invalidation in between (a compute committed while the request was reading
+    the old rows) makes ``put`` skip the store, as in ``ProductSpecIndex``.
+    """
+
+    def __init__(self, *, max_entries: int, ttl_seconds: float):
+        self._entries: LruCache[int, tuple[int, LinerInfoV1]] = LruCache(
+            max_entries=max_entries, ttl_seconds=ttl_seconds
+        )
+        self._generations: dict[int, int] = {}
+        # invalidate_product non conosce gli id delle application in costruzione
+        self._product_generation = 0
+        self._lock = Lock()
+
+    def generation(self, product_application_id: int) -> tuple[int, int]:
+        with self._lock:
+            return self._product_generation, self._generations.get(product_application_id, 0)
+
+    def get(self, product_application_id: int) -> Optional[tuple[int, LinerInfoV1]]:
+        return self._entries.get(product_application_id)
+
+    def put(
+        self,
+        product_application_id: int,
+        liner: LinerInfoV1,
+        generation: Optional[tuple[int, int]] = None,
+    ) -> int:
+        version = next(_versions)
+        with self._lock:
+            current = (self._product_generation, self._generations.get(product_application_id, 0))
+            if generation is None or generation == current:
+                self._entries.put(product_application_id, (version, liner))
+        return version
+
+    def invalidate(self, product_application_id: int) -> None:
+        with self._lock:
+            self._generations[product_application_id] = self._generations.get(product_application_id, 0) + 1
+            self._entries.pop(product_application_id)
+
+    def invalidate_product(self, product_id: int) -> None:
+        # LinerInfoV1.id is the product id (brand/model come from the product row)
+        with self._lock:
+            self._product_generation += 1
+            self._entries.pop_where(lambda _, entry: entry[1].id == product_id)
+
+    def clear(self) -> None:
+        self._entries.clear(reset_stats=True)
+
+    def stats(self) -> dict:
+        return self._entries.stats()
+
+
+class SideResultCache(LruCache[tuple, tuple]):
+    """(liner version, SideInputs) -> (SideComputation, SideResultV1); no TTL, versions never go stale."""
+
+
+liner_info_cache = LinerInfoCache(
+    max_entries=SETTING_CALC_LINER_CACHE_MAX_ENTRIES,
+    ttl_seconds=SETTING_CALC_LINER_CACHE_TTL_SECONDS,
+)
+side_result_cache = SideResultCache(max_entries=SETTING_CALC_SIDE_CACHE_MAX_ENTRIES)
+
+
+def invalidate_liner_info(product_application_id: int) -> None:
+    liner_info_cache.invalidate(int(product_application_id))
+
+
+def invalidate_product_liner_info(product_id: int) -> None:
+    liner_info_cache.invalidate_product(int(product_id))
+
+
+def clear_setting_calculator_caches() -> None:
+    liner_info_cache.clear()
+    side_result_cache.clear(reset_stats=True)
+
+
+def setting_calculator_cache_stats() -> dict:
+    return {"liner_info": liner_info_cache.stats(), "side_results": side_result_cache.stats()}
@@ -1,54 +1,44 @@
 from __future__ import annotations
 
-from typing import List
+from dataclasses import dataclass
 
 from app.schema.setting_calculator.request_v1 import UserInputsV1
-from app.schema.setting_calculator.response_v1 import (
-    SideResultV1,
-    LinerInfoV1,
-    DerivedV1,
-    ChartsV1,
-    PulsationChartV1,
-    CurveV1,
-    PointV1,
-    PulsatorPhasesChartV1,
-    SegmentV1,
-    RealMilkingMassageChartV1,
-    BarV1,
-    InputsUsedV1,
-)
+from app.schema.setting_calculator.response_v1 import LinerInfoV1, SideResultV1
+from app.services.setting_calculator.validation_v1 import SideInputs, derive_side_inputs
 
 
 def _clamp(x: float, lo: float, hi: float) -> float:
     return max(lo, min(x, hi))
 
 
-def compute_side_result_v1(
-    liner: LinerInfoV1,
-    inputs: UserInputsV1,
-) -> SideResultV1:
+@dataclass(slots=True)
+class SideComputation:
+    """Risultato del motore per un lato: solo numeri, il modello di risposta si costruisce dopo."""
+    liner: LinerInfoV1
+    inputs: SideInputs
+    delta_kpa: float
+    t_start_ms: float
+    t_end_ms: float
+    b_real_ms: float
+    real_off_ms: float
+    warnings: tuple[str, ...]
+
 
-    warnings: List[str] = []
+def compute_side(liner: LinerInfoV1, inputs: SideInputs) -> SideComputation:
+    """Real milking window of one side; ``inputs`` come from ``derive_side_inputs`` (already valid)."""
+    warnings: tuple[str, ...] = ()
 
     # -------------------------
-    # 1) DERIVED DURATIONS
+    # 1) DERIVED DURATIONS (già calcolate dalla validazione)
     # -------------------------
-    max_kpa = float(inputs.milkingVacuumMaxKpa)
-    pf_kpa = float(inputs.pfVacuumKpa)
-    om_kpa = float(inputs.omVacuumKpa)
-
-    frequency = float(inputs.frequencyBpm)
-    ratio = float(inputs.ratioPct)
+    max_kpa = inputs.max_kpa
+    t_ms = inputs.t_ms
+    a_ms = inputs.a_ms
+    b_ms = inputs.b_ms
+    c_ms = inputs.c_ms
 
-    a_ms = float(inputs.phaseAMs)
-    c_ms = float(inputs.phaseCMs)
-
-    t_ms = 60000.0 / frequency
-    on_ms = t_ms * (ratio / 100.0)
-    off_ms = t_ms - on_ms
-
-    b_ms = on_ms - a_ms
-    d_ms = off_ms - c_ms
+    if max_kpa <= 0:
+        raise ValueError("milkingVacuumMaxKpa must be > 0")
 
     # -------------------------
     # 2) DELTA + REAL WINDOW
@@ -56,18 +46,14 @@ def compute_side_result_v1(
     delta_raw = max_kpa - liner.tppKpa
     delta_effective = _clamp(delta_raw, 0.0, max_kpa)
 
-
-    if max_kpa <= 0:
-        raise ValueError("milkingVacuumMaxKpa must be > 0")
-
     if delta_effective <= 0:
         b_real_ms = t_ms
-        warnings.append("delta<=0: real window covers full cycle")
+        warnings = ("delta<=0: real window covers full cycle",)
         t_start_ms = 0.0
         t_end_ms = t_ms
     elif delta_effective >= max_kpa:
         b_real_ms = 0.0
-        warnings.append("delta>=max: real window empty")
+        warnings = ("delta>=max: real window empty",)
         t_start_ms = 0.0
         t_end_ms = 0.0
     else:
@@ -81,121 +67,138 @@ def compute_side_result_v1(
         b_real_ms = t_end_ms - t_start_ms
 
     b_real_ms = _clamp(b_real_ms, 0.0, t_ms)
-    real_milking_ms = b_real_ms
-    real_off_ms = t_ms - b_real_ms
 
-    # -------------------------
-    # 3) BUILD CHARTS
-    # -------------------------
-
-    # Pulsation grafico
-    pulsation_curve = CurveV1(
-        label=liner.model,
-        points=[
-            PointV1(xMs=0.0, yKpa=0.0),
-            PointV1(xMs=a_ms, yKpa=max_kpa),
-            PointV1(xMs=a_ms + b_ms, yKpa=max_kpa),
-            PointV1(xMs=a_ms + b_ms + c_ms, yKpa=0.0),
-            PointV1(xMs=t_ms, yKpa=0.0),
-        ],
-    )
-
-    delta_for_chart = delta_effective
-
-    threshold_curve = CurveV1(
-        label="Real B threshold",
-        points=[
-            PointV1(xMs=0.0, yKpa=delta_for_chart),
-            PointV1(xMs=t_ms, yKpa=delta_for_chart),
-        ],
+    return SideComputation(
+        liner=liner,
+        inputs=inputs,
+        delta_kpa=delta_effective,
+        t_start_ms=t_start_ms,
+        t_end_ms=t_end_ms,
+        b_real_ms=b_real_ms,
+        real_off_ms=t_ms - b_real_ms,
+        warnings=warnings,
     )
 
-    pulsation_chart = PulsationChartV1(
-        curve=pulsation_curve,
-        threshold=threshold_curve,
-    )
 
-    phases_chart = PulsatorPhasesChartV1(
-        segments=[
-            SegmentV1(key="A", valueMs=a_ms),
-            SegmentV1(key="B", valueMs=b_ms),
-            SegmentV1(key="C", valueMs=c_ms),
-            SegmentV1(key="D", valueMs=d_ms),
-        ]
-    )
+def side_result_payload(result: SideComputation) -> dict:
+    """Plain-dict SideResultV1 of a computed side (charts, derived values, inputs used)."""
+    inputs = result.inputs
+    t_ms, a_ms, b_ms, c_ms, d_ms = inputs.t_ms, inputs.a_ms, inputs.b_ms, inputs.c_ms, inputs.d_ms
+    max_kpa = inputs.max_kpa
+    delta_kpa = result.delta_kpa
 
-    real_chart = RealMilkingMassageChartV1(
-        bars=[
-            BarV1(key="Real Milking", valueMs=real_milking_ms),
-            BarV1(key="Real OFF", valueMs=real_off_ms),
-        ]
-    )
+    # -------------------------
+    # 3) BUILD CHARTS
+    # -------------------------
 
-    charts = ChartsV1(
-        pulsation=pulsation_chart,
-        pulsatorPhases=phases_chart,
-        realMilkingMassage=real_chart,
-    )
+    charts = {
+        # Pulsation grafico
+        "pulsation": {
+            "curve": {
+                "label": result.liner.model,
+                "points": [
+                    {"xMs": 0.0, "yKpa": 0.0},
+                    {"xMs": a_ms, "yKpa": max_kpa},
+                    {"xMs": a_ms + b_ms, "yKpa": max_kpa},
+                    {"xMs": a_ms + b_ms + c_ms, "yKpa": 0.0},
+                    {"xMs": t_ms, "yKpa": 0.0},
+                ],
+            },
+            "threshold": {
+                "label": "Real B threshold",
+                "points": [
+                    {"xMs": 0.0, "yKpa": delta_kpa},
+                    {"xMs": t_ms, "yKpa": delta_kpa},
+                ],
+            },
+        },
+        "pulsatorPhases": {
+            "segments": [
+                {"key": "A", "valueMs": a_ms},
+                {"key": "B", "valueMs": b_ms},
+                {"key": "C", "valueMs": c_ms},
+                {"key": "D", "valueMs": d_ms},
+            ]
+        },
+        "realMilkingMassage": {
+            "bars": [
+                {"key": "Real Milking", "valueMs": result.b_real_ms},
+                {"key": "Real OFF", "valueMs": result.real_off_ms},
+            ]
+        },
+    }
 
     # -------------------------
     # 4) DERIVED OBJECT
     # -------------------------
 
-    derived = DerivedV1(
-        tMs=t_ms,
-        aMs=a_ms,
-        bMs=b_ms,
-        cMs=c_ms,
-        dMs=d_ms,
-        onMs=on_ms,
-        offMs=off_ms,
-        deltaKpa=delta_effective,
-        tStartMs=t_start_ms,
-        tEndMs=t_end_ms,
-        bRealMs=b_real_ms,
-        realMilkingMs=real_milking_ms,
-        realOffMs=real_off_ms,
-    )
+    derived = {
+        "tMs": t_ms,
+        "aMs": a_ms,
+        "bMs": b_ms,
+        "cMs": c_ms,
+        "dMs": d_ms,
+        "onMs": inputs.on_ms,
+        "offMs": inputs.off_ms,
+        "deltaKpa": delta_kpa,
+        "tStartMs": result.t_start_ms,
+        "tEndMs": result.t_end_ms,
+        "bRealMs": result.b_real_ms,
+        "realMilkingMs": result.b_real_ms,
+        "realOffMs": result.real_off_ms,
+    }
+
+    inputs_used = {
+        "milkingVacuumMaxKpa": max_kpa,
+        "pfVacuumKpa": inputs.pf_kpa,
+        "omVacuumKpa": inputs.om_kpa,
+        "omDurationSec": inputs.om_duration_sec,
+        "frequencyBpm": inputs.frequency_bpm,
+        "ratioPct": inputs.ratio_pct,
+        "phaseAMs": a_ms,
+        "phaseCMs": c_ms,
+    }
+
+    return {
+        "liner": result.liner,
+        "inputsUsed": inputs_used,
+        "derived": derived,
+        "charts": charts,
+        "warnings": list(result.warnings),
+    }
+
+
+def side_result_v1(result: SideComputation) -> SideResultV1:
+    """SideResultV1 of a computed side: one validation pass over the whole tree."""
+    return SideResultV1.model_validate(side_result_payload(result))
 
-    inputs_used = InputsUsedV1(
-        milkingVacuumMaxKpa=max_kpa,
-        pfVacuumKpa=pf_kpa,
-        omVacuumKpa=om_kpa,
-        omDurationSec=float(inputs.omDurationSec),
-        frequencyBpm=frequency,
-        ratioPct=ratio,
-        phaseAMs=a_ms,
-        phaseCMs=c_ms,
-    )
 
-    return SideResultV1(
-        liner=liner,
-        inputsUsed=inputs_used,
-        derived=derived,
-        charts=charts,
-        warnings=warnings,
-    )
-
-def applied_vacuum_abs(inputs: UserInputsV1, derived: DerivedV1) -> tuple[float, float]:
-    
-    freq = float(inputs.frequencyBpm)
-    b_real_ms = float(derived.bRealMs)
-    om_duration_sec = float(inputs.omDurationSec)
+def compute_side_result_v1(
+    liner: LinerInfoV1,
+    inputs: UserInputsV1,
+) -> SideResultV1:
+    """Validate, compute and build the response model of one side in one call."""
+    side_inputs, errs = derive_side_inputs("side", inputs)
+    if errs:
+        raise ValueError("; ".join(f"{e.path}: {e.reason}" for e in errs))
+    return side_result_v1(compute_side(liner, side_inputs))
 
-    pf = float(inputs.pfVacuumKpa) * freq * (b_real_ms / 60000.0)
-    om = float(inputs.omVacuumKpa) * freq * (b_real_ms / 60000.0) * om_duration_sec
-    return pf, om
 
+def applied_vacuum_abs(result: SideComputation) -> tuple[float, float]:
+    inputs = result.inputs
+    freq = inputs.frequency_bpm
+    b_real_ms = result.b_real_ms
 
-def applied_massage_abs(inputs: UserInputsV1, derived: DerivedV1, liner: LinerInfoV1) -> tuple[float, float]:
+    pf = inputs.pf_kpa * freq * (b_real_ms / 60000.0)
+    om = inputs.om_kpa * freq * (b_real_ms / 60000.0) * inputs.om_duration_sec
+    return pf, om
 
-    freq = float(inputs.frequencyBpm)
-    real_off_ms = float(derived.realOffMs)
-    om_duration_sec = float(inputs.omDurationSec)
 
-    pf_db = liner.intensityPfKpa
-    om_db = liner.intensityOmKpa
+def applied_massage_abs(result: SideComputation) -> tuple[float, float]:
+    inputs = result.inputs
+    freq = inputs.frequency_bpm
+    real_off_ms = result.real_off_ms
 
-    pf = pf_db * freq * (real_off_ms / 60000.0)
-    om = om_db * freq * (real_off_ms / 60000.0) * om_duration_sec
-    return pf, om
\ No newline at end of file
+    pf = result.liner.intensityPfKpa * freq * (real_off_ms / 60000.0)
+    om = result.liner.intensityOmKpa * freq * (real_off_ms / 60000.0) * inputs.om_duration_sec
+    return pf, om
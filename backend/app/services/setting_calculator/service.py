@@ -5,11 +5,12 @@ from fastapi import HTTPException
 
 from app.model.product import Product, ProductApplication
 from app.model.tpp import TppRun
-from app.model.kpi import TestMetric
 
-from app.schema.setting_calculator.request_v1 import CompareRequestV1
+from app.schema.setting_calculator.request_v1 import CompareRequestV1, SolveRequestV1
 from app.schema.setting_calculator.response_v1 import (
     CompareResponseV1,
+    SolveResponseV1,
+    SolveSettingsV1,
     SideResultV1,
     LinerInfoV1,
     DiffPctV1,
@@ -21,12 +22,20 @@ from app.schema.setting_calculator.errors import (
     FieldErrorV1,
 )
 
-from app.services.setting_calculator.validation_v1 import validate_compare_request
+from app.services.metric_queries import latest_metric
+from app.services.setting_calculator.validation_v1 import FieldError, SideInputs, derive_side_inputs
+from app.services.setting_calculator.cache import (
+    liner_info_cache,
+    side_result_cache,
+)
 from app.services.setting_calculator.engine_v1 import (
-    compute_side_result_v1, 
-    applied_vacuum_abs, 
+    SideComputation,
+    compute_side,
+    side_result_v1,
+    applied_vacuum_abs,
     applied_massage_abs
 )
+from app.services.setting_calculator.solver_v1 import PARAMS, metric_value, search_settings
 
 
 ENGINE_VERSION = "setting-calculator-engine@1.0.0"
@@ -74,15 +83,7 @@ def _get_latest_tpp_kpa(session: Session, product_application_id: int) -> float:
 
 
 def _get_latest_metric_value(session: Session, product_application_id: int, metric_code: str) -> float:
-    row = session.exec(
-        select(TestMetric)
-        .where(
-            (TestMetric.run_type == "MASSAGE")
-            & (TestMetric.product_application_id == product_application_id)
-            & (TestMetric.metric_code == metric_code)
-        )
-        .order_by(TestMetric.computed_at.desc())
-    ).first()
+    row = latest_metric(session, product_application_id, metric_code, run_type="MASSAGE")
 
     if not row:
         raise HTTPException(
@@ -125,6 +126,27 @@ def _build_liner_info(
         intensityOmKpa=intensity_om_kpa,
     )
 
+def _get_liner_info(session: Session, product_application_id: int) -> tuple[int, LinerInfoV1]:
+    """(version, LinerInfoV1) from the cache, rebuilding it from the DB on a miss."""
+    cached = liner_info_cache.get(product_application_id)
+    if cached is not None:
+        return cached
+    # letta prima della query: se un compute invalida nel frattempo, il LinerInfo non va in cache
+    generation = liner_info_cache.generation(product_application_id)
+    liner = _build_liner_info(session, product_application_id)
+    return liner_info_cache.put(product_application_id, liner, generation), liner
+
+
+def _get_side_result(liner_version: int, liner: LinerInfoV1, inputs: SideInputs) -> tuple[SideComputation, SideResultV1]:
+    key = (liner_version, inputs)
+    cached = side_result_cache.get(key)
+    if cached is None:
+        computed = compute_side(liner, inputs)
+        # il modello di risposta si costruisce una volta sola e si riusa dalla LRU
+        cached = (computed, side_result_v1(computed))
+        side_result_cache.put(key, cached)
+    return cached
+
 #Calcolo perrcentuale per gli ultimi grafici
 def _pct(left: float, right: float) -> float:
     if left == 0:
@@ -133,46 +155,126 @@ def _pct(left: float, right: float) -> float:
 
 
 def compare_settings_v1(session: Session, req: CompareRequestV1) -> CompareResponseV1:
-    # 1) Validate multi-field rules
-    errs = validate_compare_request(req.left.inputs, req.right.inputs)
-    if errs:
-        _raise_422(req.requestId, errs)
+    # 1) Validate multi-field rules (e derivate delle fasi nello stesso passaggio)
+    left_inputs, left_errs = derive_side_inputs("left", req.left.inputs)
+    right_inputs, right_errs = derive_side_inputs("right", req.right.inputs)
+    if left_errs or right_errs:
+        _raise_422(req.requestId, left_errs + right_errs)
 
-    # 2) Fetch liner data (db)
-    left_liner = _build_liner_info(session, req.left.productApplicationId)
-    right_liner = _build_liner_info(session, req.right.productApplicationId)
+    # 2) Fetch liner data (cache, then db)
+    left_version, left_liner = _get_liner_info(session, req.left.productApplicationId)
+    right_version, right_liner = _get_liner_info(session, req.right.productApplicationId)
 
-    # 3) Compute sides (engine)
-    left_res: SideResultV1 = compute_side_result_v1(left_liner, req.left.inputs)
-    right_res: SideResultV1 = compute_side_result_v1(right_liner, req.right.inputs)
+    # 3) Compute sides (engine, memoized per liner version + inputs)
+    left_res, left_out = _get_side_result(left_version, left_liner, left_inputs)
+    right_res, right_out = _get_side_result(right_version, right_liner, right_inputs)
 
     # 4) DiffPct
 
     # 4.1 Vacuum
-    left_pf_abs, left_om_abs = applied_vacuum_abs(req.left.inputs, left_res.derived)
-    right_pf_abs, right_om_abs = applied_vacuum_abs(req.right.inputs, right_res.derived)
+    left_pf_abs, left_om_abs = applied_vacuum_abs(left_res)
+    right_pf_abs, right_om_abs = applied_vacuum_abs(right_res)
 
     # 4.2 Massage intensity
-    left_pf_massage, left_om_massage = applied_massage_abs(req.left.inputs, left_res.derived, left_liner)
-    right_pf_massage, right_om_massage = applied_massage_abs(req.right.inputs, right_res.derived, right_liner)
+    left_pf_massage, left_om_massage = applied_massage_abs(left_res)
+    right_pf_massage, right_om_massage = applied_massage_abs(right_res)
 
-    diff = DiffPctV1(
-        appliedVacuum=DiffPairV1(
+    diff = DiffPctV1.model_construct(
+        appliedVacuum=DiffPairV1.model_construct(
             pf=_pct(left_pf_abs, right_pf_abs),
             om=_pct(left_om_abs, right_om_abs),
         ),
-        massageIntensity=DiffPairV1(
+        massageIntensity=DiffPairV1.model_construct(
             pf=_pct(left_pf_massage, right_pf_massage),
             om=_pct(left_om_massage, right_om_massage),
         ),
     )
 
-    # 5) Response
-    return CompareResponseV1(
+    # 5) Response: i side result sono già validati (una volta, alla costruzione), il resto sono float
+    return CompareResponseV1.model_construct(
         engineVersion=ENGINE_VERSION,
         requestId=req.requestId,
-        left=left_res,
-        right=right_res,
+        left=left_out,
+        right=right_out,
         diffPct=diff,
         warnings=[],
     )
+
+
+def solve_settings_v1(session: Session, req: SolveRequestV1) -> SolveResponseV1:
+    # 1) Validate: candidate come su /compare, poi range e target
+    candidate_inputs, errs = derive_side_inputs("candidate", req.candidate.inputs)
+    ranges = {}
+    for name in PARAMS:
+        rng = getattr(req.constraints, name)
+        if rng is None:
+            continue
+        if rng.min > rng.max:
+            errs.append(FieldError(f"constraints.{name}", "min must be <= max"))
+        elif name == "ratioPct" and rng.max >= 100:
+            errs.append(FieldError(f"constraints.{name}", "max must be < 100"))
+        else:
+            ranges[name] = (rng.min, rng.max, rng.step)
+    if not any(getattr(req.constraints, name) is not None for name in PARAMS):
+        errs.append(FieldError("constraints", "at least one of frequencyBpm, ratioPct, phaseAMs, phaseCMs needs a range"))
+
+    reference_inputs = None
+    if (req.target.value is None) == (req.reference is None):
+        errs.append(FieldError("target.value", "provide either target.value or reference"))
+    elif req.reference is not None:
+        reference_inputs, ref_errs = derive_side_inputs("reference", req.reference.inputs)
+        errs.extend(ref_errs)
+    if errs:
+        _raise_422(req.requestId, errs)
+
+    metric = req.target.metric
+    target = req.target.value
+    if target is None:
+        ref_version, ref_liner = _get_liner_info(session, req.reference.productApplicationId)
+        ref_res, _ = _get_side_result(ref_version, ref_liner, reference_inputs)
+        target = metric_value(metric, ref_res)
+
+    # 2) Search (griglia vettorizzata, zoom per un numero limitato di iterazioni)
+    version, liner = _get_liner_info(session, req.candidate.productApplicationId)
+    tolerance = req.tolerancePct / 100.0
+    start = {name: getattr(req.candidate.inputs, name) for name in PARAMS}
+    outcome = search_settings(
+        metric,
+        target,
+        liner,
+        candidate_inputs,
+        start,
+        ranges,
+        tolerance=tolerance,
+        max_iterations=req.maxIterations,
+        grid_size=req.gridSize,
+    )
+    if outcome is None:
+        _raise_422(req.requestId, [FieldError("constraints", "no feasible setting within the given ranges")])
+
+    # 3) Verify: il punto scelto ripassa dal motore scalare (stessi numeri di /compare)
+    best_inputs, best_errs = derive_side_inputs("candidate", req.candidate.inputs.model_copy(update=outcome.settings))
+    if best_errs:
+        _raise_422(req.requestId, best_errs)
+    result, result_out = _get_side_result(version, liner, best_inputs)
+    achieved = metric_value(metric, result)
+    error = abs(achieved - target) / (abs(target) or 1.0)
+
+    warnings = []
+    if error > tolerance:
+        warnings.append("target not reachable within constraints: closest setting returned")
+
+    return SolveResponseV1.model_construct(
+        engineVersion=ENGINE_VERSION,
+        requestId=req.requestId,
+        metric=metric,
+        targetValue=target,
+        achievedValue=achieved,
+        errorPct=error * 100.0,
+        withinTolerance=error <= tolerance,
+        settings=SolveSettingsV1.model_construct(**outcome.settings),
+        result=result_out,
+        iterations=outcome.iterations,
+        evaluations=outcome.evaluations,
+        warnings=warnings,
+    )
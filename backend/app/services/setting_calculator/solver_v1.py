@@ -0,0 +1,190 @@
+"""Inverse setting solver: pulsation settings of a liner that hit a target value.
+
+``search_settings`` evaluates the engine formulas (``engine_v1``) on a whole
+grid of (frequency, ratio, phase A, phase C) at once with NumPy, then zooms
+the grid around the best point for a bounded number of iterations. Settings
+within the tolerance count as equally good; among them the one closest to
+the starting settings wins, so the answer changes as little as possible.
+
+The service recomputes the chosen settings with the scalar engine, so the
+values returned are exactly the ones ``/compare`` shows for them.
+"""
+from __future__ import annotations
+
+import os
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Optional
+
+from app.schema.setting_calculator.response_v1 import LinerInfoV1
+from app.services.setting_calculator.engine_v1 import SideComputation, applied_massage_abs, applied_vacuum_abs
+from app.services.setting_calculator.validation_v1 import SideInputs
+
+if TYPE_CHECKING:  # pragma: no cover
+    import numpy as np
+
+
+# Punti valutati per iterazione al massimo (la griglia si riduce con più parametri liberi)
+SETTING_SOLVE_MAX_GRID_POINTS = int(os.getenv("SETTING_SOLVE_MAX_GRID_POINTS", "20000"))
+
+PARAMS = ("frequencyBpm", "ratioPct", "phaseAMs", "phaseCMs")
+
+
+def metric_value(metric: str, result: SideComputation) -> float:
+    """Value of a solve target for one computed side (same numbers as /compare)."""
+    if metric == "bRealMs":
+        return result.b_real_ms
+    if metric == "realOffMs":
+        return result.real_off_ms
+    if metric.startswith("appliedVacuum."):
+        pf, om = applied_vacuum_abs(result)
+    else:
+        pf, om = applied_massage_abs(result)
+    return pf if metric.endswith(".pf") else om
+
+
+def evaluate_grid(
+    metric: str,
+    liner: LinerInfoV1,
+    base: SideInputs,
+    freq: "np.ndarray",
+    ratio: "np.ndarray",
+    a_ms: "np.ndarray",
+    c_ms: "np.ndarray",
+) -> tuple["np.ndarray", "np.ndarray"]:
+    """(metric values, feasible mask) for every setting of the grid, vectorized ``compute_side``."""
+    import numpy as np
+
+    t_ms = 60000.0 / freq
+    on_ms = t_ms * (ratio / 100.0)
+    off_ms = t_ms - on_ms
+    b_ms = on_ms - a_ms
+    d_ms = off_ms - c_ms
+    # stessi vincoli di derive_side_inputs
+    feasible = (on_ms > 0) & (off_ms > 0) & (b_ms >= 0) & (d_ms >= 0)
+
+    max_kpa = base.max_kpa
+    delta = max(0.0, min(max_kpa - liner.tppKpa, max_kpa))
+    if delta <= 0:
+        b_real_ms = t_ms
+    elif delta >= max_kpa:
+        b_real_ms = np.zeros_like(t_ms)
+    else:
+        t_start_ms = a_ms * (delta / max_kpa)
+        t_end_ms = (a_ms + b_ms) + c_ms * (1.0 - delta / max_kpa)
+        b_real_ms = t_end_ms - t_start_ms
+    b_real_ms = np.clip(b_real_ms, 0.0, t_ms)
+
+    if metric == "bRealMs":
+        values = b_real_ms
+    elif metric == "realOffMs":
+        values = t_ms - b_real_ms
+    else:
+        pf = metric.endswith(".pf")
+        if metric.startswith("appliedVacuum."):
+            level = base.pf_kpa if pf else base.om_kpa
+            window_ms = b_real_ms
+        else:
+            level = liner.intensityPfKpa if pf else liner.intensityOmKpa
+            window_ms = t_ms - b_real_ms
+        values = level * freq * (window_ms / 60000.0)
+        if not pf:
+            values = values * base.om_duration_sec
+    return values, feasible
+
+
+@dataclass(slots=True)
+class SearchOutcome:
+    settings: dict[str, float]
+    error: float  # relativo al target
+    iterations: int
+    evaluations: int
+
+
+def _axis(lo: float, hi: float, n: int, bounds: tuple[float, float, Optional[float]]) -> "np.ndarray":
+    import numpy as np
+
+    bound_lo, bound_hi, step = bounds
+    values = np.linspace(lo, hi, n)
+    if step:
+        # solo valori impostabili sul pulsatore: bound_lo + k * step dentro il range
+        k_max = np.floor((bound_hi - bound_lo) / step + 1e-9)
+        values = bound_lo + np.clip(np.round((values - bound_lo) / step), 0, k_max) * step
+    return np.unique(values)
+
+
+def search_settings(
+    metric: str,
+    target: float,
+    liner: LinerInfoV1,
+    base: SideInputs,
+    start: dict[str, float],
+    ranges: dict[str, tuple[float, float, Optional[float]]],
+    *,
+    tolerance: float,
+    max_iterations: int,
+    grid_size: int,
+    max_points: int = SETTING_SOLVE_MAX_GRID_POINTS,
+) -> Optional[SearchOutcome]:
+    """Best settings for ``target`` with the ``ranges`` parameters free; None if none is feasible."""
+    import numpy as np
+
+    free = [name for name in PARAMS if name in ranges]
+    n = max(2, min(grid_size, int(max_points ** (1.0 / max(1, len(free))))))
+    window = {name: (ranges[name][0], ranges[name][1]) for name in free}
+    span = {name: (ranges[name][1] - ranges[name][0]) or 1.0 for name in free}
+    scale = abs(target) or 1.0
+
+    best_key: Optional[tuple[float, float]] = None
+    best: Optional[SearchOutcome] = None
+    evaluations = 0
+    for iteration in range(1, max_iterations + 1):
+        axes = [
+            _axis(*window[name], n, ranges[name]) if name in window else np.array([start[name]])
+            for name in PARAMS
+        ]
+        grid = [m.ravel() for m in np.meshgrid(*axes, indexing="ij")]
+        values, feasible = evaluate_grid(metric, liner, base, *grid)
+        evaluations += values.size
+
+        if feasible.any():
+            # dentro la tolleranza gli errori valgono uguale: decide la distanza dal punto di partenza
+            error = np.where(feasible, np.abs(values - target) / scale, np.inf)
+            capped = np.maximum(error, tolerance)
+            distance = np.zeros(values.size)
+            for name, column in zip(PARAMS, grid):
+                if name in window:
+                    distance += ((column - start[name]) / span[name]) ** 2
+            distance = np.where(capped <= capped.min(), distance, np.inf)
+            i = int(np.argmin(distance))
+            key = (float(capped[i]), float(distance[i]))
+            if best_key is None or key < best_key:
+                best_key = key
+                best = SearchOutcome(
+                    settings={name: float(column[i]) for name, column in zip(PARAMS, grid)},
+                    error=float(error[i]),
+                    iterations=iteration,
+                    evaluations=0,
+                )
+
+        if best is None or not free:
+            if not free:
+                break
+            continue
+        # zoom: una cella della griglia precedente attorno al migliore
+        collapsed = True
+        for name in free:
+            lo, hi = window[name]
+            bound_lo, bound_hi, step = ranges[name]
+            cell = max((hi - lo) / (n - 1), step or 0.0)
+            centre = best.settings[name]
+            new_window = (max(bound_lo, centre - cell), min(bound_hi, centre + cell))
+            if new_window[1] - new_window[0] > max(step or 0.0, 1e-9 * span[name]):
+                collapsed = False
+            window[name] = new_window
+        if collapsed:
+            break
+
+    if best is not None:
+        best.iterations = iteration
+        best.evaluations = evaluations
+    return best
@@ -1,7 +1,7 @@
 from __future__ import annotations
 
 from dataclasses import dataclass
-from typing import List, Optional
+from typing import List, NamedTuple, Optional
 
 from app.schema.setting_calculator.request_v1 import UserInputsV1
 
@@ -11,49 +11,86 @@ class FieldError:
     path: str
     reason: str
 
+
+class SideInputs(NamedTuple):
+    """Inputs di un lato già validati, con le durate di fase derivate una volta sola.
+
+    Tupla (immutabile, hashable): fa da chiave della LRU dei side result insieme
+    alla versione del liner.
+    """
+    max_kpa: float
+    pf_kpa: float
+    om_kpa: float
+    om_duration_sec: float
+    frequency_bpm: float
+    ratio_pct: float
+    a_ms: float
+    c_ms: float
+    # derivate: T = 60000 / f, ON = T * ratio, OFF = T - ON, B = ON - A, D = OFF - C
+    t_ms: float
+    on_ms: float
+    off_ms: float
+    b_ms: float
+    d_ms: float
+
+
+_REQUIRED = (
+    "milkingVacuumMaxKpa", "pfVacuumKpa", "omVacuumKpa",
+    "frequencyBpm", "ratioPct", "phaseAMs", "phaseCMs", "omDurationSec",
+)
+
+
 def _require(side: str, field: str, value) -> Optional[FieldError]:
     if value is None:
         return FieldError(f"{side}.inputs.{field}", "is required (provide Kpa or InHg)")
     return None
 
 
-def validate_user_inputs(side: str, inputs: UserInputsV1) -> List[FieldError]:
+def derive_side_inputs(side: str, inputs: UserInputsV1) -> tuple[Optional[SideInputs], List[FieldError]]:
     """
-    Multi-field business validation (range minimi già coperti dai Pydantic Field()).
+    Validazione multi-campo e derivazione delle fasi in un solo passaggio
+    (range minimi già coperti dai Pydantic Field()).
     side: "left" | "right"
+    Ritorna (SideInputs, []) se valido, altrimenti (None, errori).
     """
     errs: List[FieldError] = []
     p = f"{side}.inputs"
 
-    for f in [
-      "milkingVacuumMaxKpa","pfVacuumKpa","omVacuumKpa",
-      "frequencyBpm","ratioPct","phaseAMs","phaseCMs","omDurationSec"
-    ]:
+    for f in _REQUIRED:
         err = _require(side, f, getattr(inputs, f))
         if err:
             errs.append(err)
     if errs:
-        return errs
+        return None, errs
+
+    # già float: li ha validati Pydantic
+    max_kpa = inputs.milkingVacuumMaxKpa
+    pf_kpa = inputs.pfVacuumKpa
+    om_kpa = inputs.omVacuumKpa
+    frequency = inputs.frequencyBpm
+    ratio = inputs.ratioPct
+    a_ms = inputs.phaseAMs
+    c_ms = inputs.phaseCMs
 
     # Vincoli Milking Vacuum
-    if inputs.pfVacuumKpa > inputs.milkingVacuumMaxKpa:
+    if pf_kpa > max_kpa:
         errs.append(FieldError(f"{p}.pfVacuumKpa", "must be <= milkingVacuumMaxKpa"))
 
-    if inputs.omVacuumKpa > inputs.milkingVacuumMaxKpa:
+    if om_kpa > max_kpa:
         errs.append(FieldError(f"{p}.omVacuumKpa", "must be <= milkingVacuumMaxKpa"))
 
-    if inputs.milkingVacuumMaxKpa <= 0: 
+    if max_kpa <= 0:
         errs.append(FieldError(f"{p}.milkingVacuumMaxKpa", "must be > 0"))
 
     # Vincoli percentuale tra 0 e 100 (non inclusi)
-    if inputs.ratioPct <= 0 or inputs.ratioPct >= 100: 
+    if ratio <= 0 or ratio >= 100:
         errs.append(FieldError(f"{p}.ratioPct", "must be between 0 and 100"))
 
 
     # Derivate fasi
     # tMs = 60000 / f
-    t_ms = 60000.0 / inputs.frequencyBpm
-    on_ms = t_ms * (inputs.ratioPct / 100.0)
+    t_ms = 60000.0 / frequency
+    on_ms = t_ms * (ratio / 100.0)
     off_ms = t_ms - on_ms
 
     # Consistenza ratio (ridondante perché ratioPct è ma teniamolo per sicurezza)
@@ -63,8 +100,8 @@ def validate_user_inputs(side: str, inputs: UserInputsV1) -> List[FieldError]:
         errs.append(FieldError(f"{p}.ratioPct", "ratioPct results in OFF_ms <= 0"))
 
     # B = ON - A ; D = OFF - C
-    b_ms = on_ms - inputs.phaseAMs
-    d_ms = off_ms - inputs.phaseCMs
+    b_ms = on_ms - a_ms
+    d_ms = off_ms - c_ms
 
     if b_ms < 0:
         errs.append(
@@ -82,7 +119,27 @@ def validate_user_inputs(side: str, inputs: UserInputsV1) -> List[FieldError]:
             )
         )
 
-    return errs
+    if errs:
+        return None, errs
+    return SideInputs(
+        max_kpa=max_kpa,
+        pf_kpa=pf_kpa,
+        om_kpa=om_kpa,
+        om_duration_sec=inputs.omDurationSec,
+        frequency_bpm=frequency,
+        ratio_pct=ratio,
+        a_ms=a_ms,
+        c_ms=c_ms,
+        t_ms=t_ms,
+        on_ms=on_ms,
+        off_ms=off_ms,
+        b_ms=b_ms,
+        d_ms=d_ms,
+    ), errs
+
+
+def validate_user_inputs(side: str, inputs: UserInputsV1) -> List[FieldError]:
+    return derive_side_inputs(side, inputs)[1]
 
 
 def validate_compare_request(left_inputs: UserInputsV1, right_inputs: UserInputsV1) -> List[FieldError]:
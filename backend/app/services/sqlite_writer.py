@@ -0,0 +1,250 @@
+"""Single-writer queue for SQLite deployments (``SQLITE_WRITER_QUEUE=1``).
+
+SQLite takes one writer at a time; with several threads writing through the
+pool, the losers wait on the file lock and eventually fail with "database is
+locked". Here every write session in the process goes through one connection,
+handed out in FIFO order:
+
+- the first writer opens ``BEGIN IMMEDIATE`` (the file lock is taken up front);
+- each write session runs inside a SAVEPOINT of that transaction, so its own
+  ``commit()``/``rollback()`` behave as usual (release / roll back to the
+  savepoint) without ending the transaction;
+- when a session ends and nobody is waiting, or ``max_batch`` sessions share
+  the transaction, one COMMIT makes the whole group durable (group commit).
+  Every member waits for that COMMIT before returning and fails if it fails.
+
+Reads use a separate pool of ``query_only`` connections: in WAL mode they run
+in parallel with the writer and never see a group before it commits. A
+session opened with ``read_bind`` (request sessions) reads from that pool and
+queues for the writer only at its first write (flush or DML statement), so
+requests that never write never wait for the writer.
+"""
+import logging
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional
+
+import sqlalchemy as sa
+from sqlalchemy.sql.dml import UpdateBase
+from sqlmodel import Session
+
+
+logger = logging.getLogger("liner-backend.db")
+
+# Sessione che nel contesto corrente (richiesta / job) tiene già il writer.
+# Non il thread: i worker del threadpool passano da una richiesta all'altra.
+_active_session: ContextVar[Optional["_QueuedSession"]] = ContextVar("sqlite_writer_session", default=None)
+
+
+class WriteGroupError(Exception):
+    """The group commit that should have made this session's writes durable failed."""
+
+
+class _Group:
+    def __init__(self):
+        self.members = 0
+        self.done = threading.Event()
+        self.error: Optional[BaseException] = None
+
+
+class _QueuedSession(Session):
+    """Session that reads from ``read_bind`` until its first write, then moves to the writer connection."""
+
+    def __init__(self, queue: "SQLiteWriteQueue", read_bind=None):
+        super().__init__(bind=read_bind, expire_on_commit=False, join_transaction_mode="create_savepoint")
+        self._queue = queue
+        self.write_conn: Optional[sa.Connection] = None
+        self.write_group: Optional[_Group] = None
+
+    def take_writer(self) -> sa.Connection:
+        if self.write_conn is None:
+            self.write_conn, self.write_group = self._queue._acquire()
+            _active_session.set(self)
+        return self.write_conn
+
+    def holds_writer(self, queue: "SQLiteWriteQueue") -> bool:
+        return self._queue is queue and self.write_conn is not None
+
+    def get_bind(self, mapper=None, *, clause=None, **kw):
+        if self.write_conn is None and (self._flushing or isinstance(clause, UpdateBase)):
+            self.take_writer()
+        if self.write_conn is not None:
+            # da qui anche le letture: vedono le scritture della sessione
+            return self.write_conn
+        return super().get_bind(mapper, clause=clause, **kw)
+
+
+def _sqlite_connect_args(busy_timeout_seconds: float) -> dict:
+    return {"check_same_thread": False, "timeout": busy_timeout_seconds}
+
+
+def create_sqlite_read_engine(url: str, *, pool_size: int, busy_timeout_seconds: float = 30.0):
+    """Pool of connections that refuse writes (``PRAGMA query_only``)."""
+    read_engine = sa.create_engine(
+        url,
+        connect_args=_sqlite_connect_args(busy_timeout_seconds),
+        pool_size=pool_size,
+        max_overflow=0,
+    )
+
+    @sa.event.listens_for(read_engine, "connect")
+    def _query_only(dbapi_connection, _):
+        dbapi_connection.execute("PRAGMA query_only=ON")
+
+    return read_engine
+
+
+class SQLiteWriteQueue:
+    def __init__(self, url: str, *, max_batch: int = 64, busy_timeout_seconds: float = 30.0):
+        self.max_batch = max(1, max_batch)
+        self.engine = sa.create_engine(
+            url,
+            connect_args=_sqlite_connect_args(busy_timeout_seconds),
+            pool_size=1,
+            max_overflow=0,
+        )
+        # transazioni gestite da SQLAlchemy (pysqlite altrimenti rompe i SAVEPOINT)
+        sa.event.listen(self.engine, "connect", self._driver_autocommit)
+        sa.event.listen(self.engine, "begin", self._begin_immediate)
+
+        self._cond = threading.Condition()
+        self._waiting: deque = deque()
+        self._busy = False
+        self._conn: Optional[sa.Connection] = None
+        self._group: Optional[_Group] = None
+        self.reset_stats()
+
+    @staticmethod
+    def _driver_autocommit(dbapi_connection, _):
+        dbapi_connection.isolation_level = None
+
+    @staticmethod
+    def _begin_immediate(conn):
+        conn.exec_driver_sql("BEGIN IMMEDIATE")
+
+    def reset_stats(self) -> None:
+        self.sessions = 0
+        self.commits = 0
+        self.failed_commits = 0
+        self.last_batch_size = 0
+        self.max_batch_size = 0
+        self.max_queue_depth = 0
+        self.wait_seconds_total = 0.0
+
+    def _acquire(self) -> tuple[sa.Connection, _Group]:
+        started = time.perf_counter()
+        with self._cond:
+            ticket = object()
+            self._waiting.append(ticket)
+            self.max_queue_depth = max(self.max_queue_depth, len(self._waiting))
+            while self._busy or self._waiting[0] is not ticket:
+                self._cond.wait()
+            self._waiting.popleft()
+            self._busy = True
+            self.wait_seconds_total += time.perf_counter() - started
+            try:
+                if self._conn is None:
+                    self._conn = self.engine.connect()
+                if self._group is None:
+                    self._conn.begin()
+                    self._group = _Group()
+            except BaseException:
+                self._busy = False
+                self._cond.notify_all()
+                raise
+            self._group.members += 1
+            self.sessions += 1
+            return self._conn, self._group
+
+    def _release(self, group: _Group) -> None:
+        with self._cond:
+            commit_now = not self._waiting or group.members >= self.max_batch
+            if not commit_now:
+                # il prossimo in coda continua nella stessa transazione
+                self._busy = False
+                self._cond.notify_all()
+        if commit_now:
+            self._commit(group)
+        group.done.wait()
+        if group.error is not None:
+            raise WriteGroupError("Group commit failed") from group.error
+
+    def _commit(self, group: _Group) -> None:
+        error = None
+        try:
+            self._conn.commit()
+        except Exception as e:
+            error = e
+            logger.exception("SQLite group commit failed members=%d", group.members)
+            try:
+                self._conn.rollback()
+            except Exception:
+                # connessione inutilizzabile: la prossima acquire ne apre una nuova
+                self._conn.invalidate()
+                self._conn = None
+        with self._cond:
+            self._group = None
+            self._busy = False
+            if error is None:
+                self.commits += 1
+                self.last_batch_size = group.members
+                self.max_batch_size = max(self.max_batch_size, group.members)
+            else:
+                self.failed_commits += 1
+            group.error = error
+            group.done.set()
+            self._cond.notify_all()
+
+    @contextmanager
+    def session(self, read_bind=None):
+        """Write session in the shared transaction; returns once its group is committed.
+
+        With ``read_bind`` the writer is taken lazily, at the first write; a
+        session that only reads never queues. Nested in another write session
+        of the same context it gets its own SAVEPOINT on the connection
+        already held, without queueing again.
+        """
+        holder = _active_session.get()
+        if holder is not None and holder.holds_writer(self):
+            with Session(bind=holder.write_conn, expire_on_commit=False, join_transaction_mode="create_savepoint") as nested:
+                yield nested
+            return
+        session = _QueuedSession(self, read_bind)
+        try:
+            if read_bind is None:
+                session.take_writer()
+            # quello che non è stato committato torna al savepoint alla chiusura
+            with session:
+                yield session
+        finally:
+            group = session.write_group
+            session.write_conn = None
+            # set() e non reset(token): FastAPI può chiudere la dependency in un altro contesto
+            _active_session.set(holder)
+            if group is not None:
+                self._release(group)
+
+    def close(self) -> None:
+        with self._cond:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+            self.engine.dispose()
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {
+                "queue_depth": len(self._waiting),
+                "max_queue_depth": self.max_queue_depth,
+                "busy": self._busy,
+                "sessions": self.sessions,
+                "commits": self.commits,
+                "failed_commits": self.failed_commits,
+                "last_batch_size": self.last_batch_size,
+                "max_batch_size": self.max_batch_size,
+                "avg_batch_size": round(self.sessions / self.commits, 2) if self.commits else 0.0,
+                "wait_seconds_total": round(self.wait_seconds_total, 3),
+            }
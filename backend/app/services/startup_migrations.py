@@ -0,0 +1,202 @@
+"""Alembic upgrade at startup, once per deployment instead of once per worker.
+
+Every worker compares ``alembic_version`` with the script heads (parsed from
+the revision headers, without importing Alembic or executing the migration
+modules): when they match, which is the common case, startup goes on. Otherwise
+workers compete for a lock (``pg_advisory_lock`` on Postgres, ``flock`` on a
+file next to the SQLite database) and only the holder runs ``upgrade head``;
+the others keep polling the cheap revision check until the schema is at head.
+Each phase is timed and logged.
+"""
+import ast
+import functools
+import logging
+import os
+import tempfile
+import time
+import zlib
+from typing import Callable, Optional
+
+import sqlalchemy as sa
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - optional dependency at runtime (Windows)
+    fcntl = None
+
+
+logger = logging.getLogger("liner-backend.db")
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(__file__)))  # backend/
+ALEMBIC_INI = os.path.join(BASE_DIR, "alembic.ini")
+VERSIONS_DIR = os.path.join(BASE_DIR, "migrations", "versions")
+
+MIGRATION_LOCK_TIMEOUT_SECONDS = float(os.getenv("MIGRATION_LOCK_TIMEOUT_SECONDS", "300"))
+MIGRATION_LOCK_POLL_SECONDS = float(os.getenv("MIGRATION_LOCK_POLL_SECONDS", "0.5"))
+
+# chiave fissa dell'advisory lock condivisa da tutti i worker
+_ADVISORY_LOCK_KEY = zlib.crc32(b"liner-backend:alembic-upgrade")
+
+
+def _header_values(path: str) -> dict:
+    with open(path, encoding="utf-8") as fh:
+        tree = ast.parse(fh.read(), path)
+    values = {}
+    for node in tree.body:
+        if isinstance(node, ast.Assign) and len(node.targets) == 1:
+            target, value = node.targets[0], node.value
+        elif isinstance(node, ast.AnnAssign) and node.value is not None:
+            target, value = node.target, node.value
+        else:
+            continue
+        if isinstance(target, ast.Name) and target.id in ("revision", "down_revision"):
+            values[target.id] = ast.literal_eval(value)
+    return values
+
+
+@functools.lru_cache(maxsize=None)
+def script_heads(versions_dir: str = VERSIONS_DIR) -> frozenset:
+    """Revisions no other script points to, i.e. what ``alembic heads`` prints."""
+    revisions, parents = set(), set()
+    for name in os.listdir(versions_dir):
+        if not name.endswith(".py"):
+            continue
+        values = _header_values(os.path.join(versions_dir, name))
+        if not values.get("revision"):
+            continue
+        revisions.add(values["revision"])
+        down = values.get("down_revision")
+        if isinstance(down, str):
+            parents.add(down)
+        elif down:
+            parents.update(down)
+    return frozenset(revisions - parents)
+
+
+def current_revisions(engine) -> frozenset:
+    try:
+        with engine.connect() as conn:
+            return frozenset(conn.execute(sa.text("SELECT version_num FROM alembic_version")).scalars())
+    except sa.exc.DBAPIError:
+        # database vuoto: alembic_version non esiste ancora
+        return frozenset()
+
+
+class MigrationLock:
+    """Cross-process lock: Postgres advisory lock, else ``flock`` on a lock file."""
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.held = False
+        self._conn = None
+        self._fh = None
+
+    def lock_path(self) -> str:
+        database = self.engine.url.database
+        if self.engine.dialect.name == "sqlite" and database and database != ":memory:":
+            return os.path.abspath(database) + ".migrate.lock"
+        return os.path.join(tempfile.gettempdir(), "liner-backend-migrate.lock")
+
+    def try_acquire(self) -> bool:
+        if self.engine.dialect.name == "postgresql":
+            if self._conn is None:
+                self._conn = self.engine.connect().execution_options(isolation_level="AUTOCOMMIT")
+            self.held = bool(
+                self._conn.execute(sa.text("SELECT pg_try_advisory_lock(:key)"), {"key": _ADVISORY_LOCK_KEY}).scalar()
+            )
+            return self.held
+        if fcntl is None:  # pragma: no cover - nessun lock disponibile: migra e basta
+            self.held = True
+            return True
+        if self._fh is None:
+            self._fh = open(self.lock_path(), "a+")
+        try:
+            fcntl.flock(self._fh.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            return False
+        self.held = True
+        return True
+
+    def release(self) -> None:
+        try:
+            if self._conn is not None:
+                if self.held:
+                    self._conn.execute(sa.text("SELECT pg_advisory_unlock(:key)"), {"key": _ADVISORY_LOCK_KEY})
+                self._conn.close()
+            if self._fh is not None:
+                if self.held and fcntl is not None:
+                    fcntl.flock(self._fh.fileno(), fcntl.LOCK_UN)
+                self._fh.close()
+        finally:
+            self.held = False
+            self._conn = None
+            self._fh = None
+
+
+def alembic_upgrade(database_url: str, alembic_ini: str = ALEMBIC_INI) -> None:
+    from alembic import command
+    from alembic.config import Config
+
+    cfg = Config(alembic_ini)
+    cfg.set_main_option("sqlalchemy.url", database_url)
+    command.upgrade(cfg, "head")
+
+
+def migrate_to_head(
+    engine,
+    database_url: str,
+    *,
+    versions_dir: str = VERSIONS_DIR,
+    timeout_seconds: float = MIGRATION_LOCK_TIMEOUT_SECONDS,
+    poll_seconds: float = MIGRATION_LOCK_POLL_SECONDS,
+    upgrade: Optional[Callable[[str], None]] = None,
+) -> dict:
+    """Bring the schema to head; returns ``{"outcome", "timings_ms"}``.
+
+    ``outcome`` is ``at_head`` (nothing to do), ``upgraded`` (this process ran
+    the migrations) or ``upgraded_by_peer`` (another process did meanwhile).
+    """
+    timings: dict[str, float] = {}
+    started = phase = time.perf_counter()
+
+    def lap(name: str) -> None:
+        nonlocal phase
+        now = time.perf_counter()
+        timings[name] = round((now - phase) * 1000, 1)
+        phase = now
+
+    heads = script_heads(versions_dir)
+    lap("script_heads")
+    at_head = current_revisions(engine) == heads
+    lap("revision_check")
+
+    outcome = "at_head"
+    if not at_head:
+        lock = MigrationLock(engine)
+        try:
+            deadline = time.monotonic() + timeout_seconds
+            while not lock.try_acquire():
+                if current_revisions(engine) == heads:
+                    break
+                if time.monotonic() >= deadline:
+                    raise TimeoutError(f"Migration lock not acquired within {timeout_seconds:.0f}s")
+                time.sleep(poll_seconds)
+            lap("lock_wait")
+            # chi ha preso il lock per secondo trova già tutto migrato
+            if not lock.held or current_revisions(engine) == heads:
+                outcome = "upgraded_by_peer"
+            else:
+                (upgrade or alembic_upgrade)(database_url)
+                outcome = "upgraded"
+                lap("upgrade")
+        finally:
+            lock.release()
+
+    timings["total"] = round((time.perf_counter() - started) * 1000, 1)
+    logger.info(
+        "Startup migrations %s heads=%s %s",
+        outcome,
+        ",".join(sorted(heads)),
+        " ".join(f"{name}={ms}ms" for name, ms in timings.items()),
+    )
+    return {"outcome": outcome, "timings_ms": timings}
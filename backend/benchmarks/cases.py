@@ -0,0 +1,206 @@
+"""Registry of pure-compute hot paths to benchmark.
+
+Each case is a factory returning a zero-argument callable: setup work stays in
+the factory, only the returned callable is timed.
+"""
+from typing import Callable
+
+from benchmarks import fixtures
+
+BenchFactory = Callable[[], Callable[[], object]]
+
+CASES: dict[str, BenchFactory] = {}
+
+
+def bench(name: str):
+    def register(factory: BenchFactory) -> BenchFactory:
+        CASES[name] = factory
+        return factory
+    return register
+
+
+@bench("setting_calculator.compute_side_result_v1")
+def _compute_side_result():
+    from app.services.setting_calculator.engine_v1 import compute_side_result_v1
+
+    liner = fixtures.liner_info()
+    inputs = fixtures.user_inputs()
+    return lambda: compute_side_result_v1(liner, inputs)
+
+
+@bench("setting_calculator.compute_side")
+def _compute_side():
+    # solo il core del motore (dataclass con __slots__), input già validati e derivati
+    from app.services.setting_calculator.engine_v1 import compute_side
+    from app.services.setting_calculator.validation_v1 import derive_side_inputs
+
+    liner = fixtures.liner_info()
+    inputs, _ = derive_side_inputs("left", fixtures.user_inputs())
+    return lambda: compute_side(liner, inputs)
+
+
+@bench("setting_calculator.compare_response_v1.serialize")
+def _serialize_compare_response():
+    # confine del router: un CompareResponseV1 già costruito -> corpo JSON
+    from app.schema.setting_calculator.response_v1 import CompareResponseV1
+    from app.services.setting_calculator.engine_v1 import compute_side_result_v1
+
+    side = compute_side_result_v1(fixtures.liner_info(), fixtures.user_inputs())
+    pair = {"pf": 12.5, "om": -3.25}
+    response = CompareResponseV1.model_validate({
+        "engineVersion": "bench",
+        "requestId": "bench",
+        "left": side,
+        "right": side,
+        "diffPct": {"appliedVacuum": pair, "massageIntensity": pair},
+    })
+    return lambda: response.model_dump_json()
+
+
+@bench("setting_calculator.search_settings")
+def _search_settings():
+    # solver inverso: frequenza e ratio liberi, griglia 9x9 con zoom, senza verifica scalare
+    from app.services.setting_calculator.solver_v1 import search_settings
+    from app.services.setting_calculator.validation_v1 import derive_side_inputs
+
+    liner = fixtures.liner_info()
+    inputs = fixtures.user_inputs()
+    base, _ = derive_side_inputs("candidate", inputs)
+    start = {name: getattr(inputs, name) for name in ("frequencyBpm", "ratioPct", "phaseAMs", "phaseCMs")}
+    ranges = {"frequencyBpm": (45.0, 70.0, 1.0), "ratioPct": (50.0, 70.0, 1.0)}
+    return lambda: search_settings(
+        "bRealMs", 500.0, liner, base, start, ranges,
+        tolerance=0.005, max_iterations=6, grid_size=9,
+    )
+
+
+@bench("setting_calculator.validate_compare_request")
+def _validate_compare_request():
+    from app.services.setting_calculator.validation_v1 import validate_compare_request
+
+    req = fixtures.compare_request()
+    return lambda: validate_compare_request(req.left.inputs, req.right.inputs)
+
+
+@bench("kpi_engine.massage_compute_derivatives")
+def _massage_compute_derivatives():
+    from app.services.kpi_engine import massage_compute_derivatives
+
+    points = fixtures.massage_points()
+    return lambda: massage_compute_derivatives(points)
+
+
+@bench("conversion_manager.apply_conversions.imperial")
+def _apply_conversions():
+    from app.services.conversion_manager import apply_conversions
+
+    rows = fixtures.kpi_rows()
+    return lambda: [apply_conversions(row, "imperial") for row in rows]
+
+
+@bench("conversion_wrapper.convert_output.imperial")
+def _convert_output():
+    from app.model.user import User
+    from app.services.conversion_wrapper import convert_output
+
+    rows = fixtures.kpi_rows()
+    user = User(email="bench@milkrite-interpuls.com", hashed_password="-", unit_system="imperial")
+
+    @convert_output
+    def endpoint(user=None):
+        return rows
+
+    return lambda: endpoint(user=user)
+
+
+@bench("schema.MetricNormalizedModel.normalize_units")
+def _normalize_units():
+    from app.schema.setting_calculator.request_v1 import UserInputsV1
+
+    payload = fixtures.imperial_inputs_payload()
+    return lambda: UserInputsV1.model_validate(dict(payload))
+
+
+@bench("audit.safe_json_snapshot")
+def _safe_json_snapshot():
+    from app.common.audit import safe_json_snapshot
+
+    payload = fixtures.audit_payload()
+    return lambda: safe_json_snapshot(payload)
+
+
+@bench("rate_limit._allow")
+def _rate_limit_allow():
+    from app.middleware_rate_limit import SensitiveRateLimitMiddleware
+
+    rule = fixtures.rate_limit_rule()
+    middleware = SensitiveRateLimitMiddleware(None, rules=(rule,))
+    ips = fixtures.client_ips()
+    state = {"i": 0}
+
+    def call():
+        i = state["i"] = (state["i"] + 1) % len(ips)
+        return middleware._allow(rule, ips[i])
+
+    return call
+
+
+def _asgi_request_case(method: str, path: str, body: bytes = b""):
+    """Drive one request through the full app (all middleware) on a private loop.
+
+    The log writer is bypassed and access logging silenced, so the number is the
+    per-request framework + middleware overhead around a trivial handler.
+    """
+    import asyncio
+    import contextlib
+    import io
+    import logging
+
+    from app.main import app
+    from app.services.log_writer import request_log_writer
+
+    loop = asyncio.new_event_loop()
+    scope = fixtures.http_scope(method, path, body=body)
+    sink = io.StringIO()
+
+    async def request():
+        sent = []
+        chunks = [{"type": "http.request", "body": body, "more_body": False}]
+
+        async def receive():
+            if chunks:
+                return chunks.pop()
+            return {"type": "http.disconnect"}
+
+        async def send(message):
+            sent.append(message)
+
+        await app(dict(scope), receive, send)
+        return sent
+
+    def call():
+        request_log_writer.submit = lambda entry: None
+        logging.disable(logging.CRITICAL)
+        try:
+            with contextlib.redirect_stdout(sink):
+                sent = loop.run_until_complete(request())
+        finally:
+            logging.disable(logging.NOTSET)
+            del request_log_writer.submit
+            sink.seek(0)
+            sink.truncate()
+        return sent
+
+    return call
+
+
+@bench("middleware.stack.get_healthz")
+def _middleware_get():
+    return _asgi_request_case("GET", "/healthz")
+
+
+@bench("middleware.stack.post_json")
+def _middleware_post():
+    # /healthz only allows GET: the 405 keeps the handler trivial while every
+    # body-aware layer (size limit, audit tee, rate-limit matching) still runs
+    return _asgi_request_case("POST", "/healthz", body=b'{"productApplicationId": 12, "note": "bench"}')
@@ -0,0 +1,140 @@
+"""Cold-start profile of the API: import cost per module and time to first request.
+
+Each measurement runs in a fresh interpreter (what a new container pays):
+``import app.main``, the lifespan startup and a first ``GET /healthz``, plus
+the list of heavy optional dependencies that got loaded along the way (they
+are meant to load on first use). ``--imports`` adds ``-X importtime`` and
+prints the most expensive modules; timings are then inflated by the tracing.
+
+Usage (from backend/):
+    python -m benchmarks.cold_start                    # time to first request vs budget
+    python -m benchmarks.cold_start --imports --top 30 # per-module import cost
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Budget di cold start (import + lifespan + prima richiesta), misurato su un worker
+# di sviluppo con margine; sovrascrivibile per runner CI lenti
+COLD_START_BUDGET_MS = float(os.getenv("COLD_START_BUDGET_MS", "3000"))
+
+# Dipendenze pesanti usate di rado: non devono essere importate per servire /healthz
+LAZY_MODULES = ("alembic", "geoip2", "maxminddb", "numpy")
+
+_MARKER = "COLD_START_PROFILE "
+
+_PROBE = f"""
+import json, sys, time
+started = time.perf_counter()
+import app.main
+imported = time.perf_counter()
+from fastapi.testclient import TestClient
+client_ready = time.perf_counter()
+with TestClient(app.main.app) as client:
+    started_up = time.perf_counter()
+    status = client.get("/healthz").status_code
+    first_request = time.perf_counter()
+print({_MARKER!r} + json.dumps({{
+    "import_ms": (imported - started) * 1000,
+    # TestClient non fa parte del cold start reale
+    "lifespan_ms": (started_up - client_ready) * 1000,
+    "first_request_ms": (first_request - started_up) * 1000,
+    "status": status,
+    "lazy_loaded": sorted(m for m in {LAZY_MODULES!r} if m in sys.modules),
+}}))
+"""
+
+
+def parse_importtime(stderr: str) -> list[dict]:
+    """``-X importtime`` lines -> ``[{module, self_ms, cumulative_ms}]``."""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        try:
+            self_us, cumulative_us, module = line[len("import time:"):].split("|")
+            rows.append({
+                "module": module.strip(),
+                "self_ms": int(self_us) / 1000,
+                "cumulative_ms": int(cumulative_us) / 1000,
+            })
+        except ValueError:
+            continue
+    return rows
+
+
+def profile_cold_start(*, imports: bool = False, env: dict | None = None) -> dict:
+    """Run the probe in a fresh interpreter and return its timings."""
+    with tempfile.TemporaryDirectory() as workdir:
+        probe_env = {
+            **os.environ,
+            # database usa e getta: il cold start non deve dipendere dai dati locali
+            "DATABASE_URL": f"sqlite:///{os.path.join(workdir, 'cold_start.db')}",
+            "RUN_MIGRATIONS_ON_STARTUP": "0",
+            **(env or {}),
+        }
+        cmd = [sys.executable] + (["-X", "importtime"] if imports else []) + ["-c", _PROBE]
+        started = time.perf_counter()
+        proc = subprocess.run(cmd, cwd=BACKEND_DIR, env=probe_env, capture_output=True, text=True)
+        wall_ms = (time.perf_counter() - started) * 1000
+
+    lines = [line for line in proc.stdout.splitlines() if line.startswith(_MARKER)]
+    if proc.returncode != 0 or not lines:
+        raise RuntimeError(f"cold start probe failed ({proc.returncode}):\n{proc.stderr[-4000:]}")
+    result = json.loads(lines[-1][len(_MARKER):])
+    result["process_ms"] = wall_ms
+    result["cold_start_ms"] = result["import_ms"] + result["lifespan_ms"] + result["first_request_ms"]
+    if imports:
+        result["modules"] = parse_importtime(proc.stderr)
+    return result
+
+
+def _top(modules: list[dict], key: str, n: int) -> list[dict]:
+    return sorted(modules, key=lambda m: m[key], reverse=True)[:n]
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Cold-start profile: import cost and time to first request.")
+    parser.add_argument("--imports", action="store_true", help="Trace imports (-X importtime) and list the costliest")
+    parser.add_argument("--top", type=int, default=20, help="Modules to list with --imports")
+    parser.add_argument("--budget-ms", type=float, default=COLD_START_BUDGET_MS)
+    parser.add_argument("--warm", action="store_true", help="Run once before measuring (page cache, .pyc)")
+    args = parser.parse_args(argv)
+
+    if args.warm:
+        profile_cold_start()
+    res = profile_cold_start(imports=args.imports)
+
+    print(f"import app.main   {res['import_ms']:8.1f} ms")
+    print(f"lifespan startup  {res['lifespan_ms']:8.1f} ms")
+    print(f"first request     {res['first_request_ms']:8.1f} ms  (status {res['status']})")
+    print(f"cold start        {res['cold_start_ms']:8.1f} ms  (budget {args.budget_ms:.0f} ms)")
+    print(f"process wall      {res['process_ms']:8.1f} ms")
+    if args.imports:
+        print(f"\ntop {args.top} modules by cumulative import time")
+        for m in _top(res["modules"], "cumulative_ms", args.top):
+            print(f"  {m['cumulative_ms']:8.1f} ms  {m['module']}")
+        print(f"\ntop {args.top} modules by self import time")
+        for m in _top(res["modules"], "self_ms", args.top):
+            print(f"  {m['self_ms']:8.1f} ms  {m['module']}")
+
+    failures = []
+    if res["lazy_loaded"]:
+        failures.append(f"lazy dependencies imported at startup: {', '.join(res['lazy_loaded'])}")
+    # con -X importtime i tempi sono gonfiati: il budget vale solo senza tracing
+    if not args.imports and res["cold_start_ms"] > args.budget_ms:
+        failures.append(f"cold start {res['cold_start_ms']:.0f} ms over budget {args.budget_ms:.0f} ms")
+    for failure in failures:
+        print(f"FAIL {failure}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,429 @@
+"""Synthetic catalog generator for DB-scale benchmarks.
+
+Builds N products x 4 ProductApplication sizes x M runs per test type (with
+points), the derived TestMetric/KpiValue rows shaped like the compute routers
+write them, users and log-table history. Rows are inserted with Core
+executemany in chunks, so it works the same on SQLite and Postgres.
+
+Usage (from backend/):
+    python -m benchmarks.dataset --database-url sqlite:///./bench.db --products 2000 --runs 3 --create-schema
+"""
+import argparse
+import json
+import random
+import sys
+from dataclasses import asdict, dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Iterable, Iterator, Optional
+
+import sqlalchemy as sa
+from sqlalchemy.engine import Connection, Engine
+from sqlmodel import create_engine
+
+from app.model.access_log import AccessLog
+from app.model.audit_log import AuditLog
+from app.model.kpi import KpiValue, TestMetric
+from app.model.login_event import LoginEvent
+from app.model.massage import MassagePoint, MassageRun
+from app.model.product import Product, ProductApplication
+from app.model.security_event import SecurityEvent
+from app.model.smthood import SmtHoodPoint, SmtHoodRun
+from app.model.speed import SpeedRun
+from app.model.tpp import TppRun
+from app.model.user import User
+from app.services.kpi_persistence import context_fields
+from app.services.ranking import REFERENCE_AREAS, TEAT_SIZE_MAP
+
+
+# Insert order respects the foreign keys
+TABLES = (
+    User.__table__,
+    Product.__table__,
+    ProductApplication.__table__,
+    TppRun.__table__,
+    SpeedRun.__table__,
+    MassageRun.__table__,
+    MassagePoint.__table__,
+    SmtHoodRun.__table__,
+    SmtHoodPoint.__table__,
+    TestMetric.__table__,
+    KpiValue.__table__,
+    AccessLog.__table__,
+    AuditLog.__table__,
+    LoginEvent.__table__,
+    SecurityEvent.__table__,
+)
+
+BRANDS = ("MI", "Milkrite", "DeLaval", "GEA", "Lely", "Boumatic", "Dairymaster", "Westfalia")
+COMPOUNDS = ("STD", "SIL", "NBR", "HSR")
+BARREL_SHAPES = ("round", "triangular", "squared")
+MASSAGE_PRESSURES = (45, 40, 35)
+SMT_FLOWS = (0.5, 1.9, 3.6)
+MASSAGE_METRICS = (
+    "I45", "I40", "I35", "AVG_OVERMILK", "AVG_PF", "DIFF_FROM_MAX", "DIFF_PCT", "DROP_45_40", "DROP_40_35",
+)
+MASSAGE_KPIS = ("CONGESTION_RISK", "HYPERKERATOSIS_RISK", "FITTING")
+SMT_METRICS = ("RESPRAY_VAL", "FLUYDODINAMIC_VAL", "SLIPPAGE_VAL", "RINGING_VAL")
+SMT_KPIS = ("RESPRAY", "FLUYDODINAMIC", "SLIPPAGE", "RINGING_RISK")
+API_PATHS = (
+    "/products/", "/products/meta", "/rankings/overview", "/kpis/values/batch",
+    "/setting-calculator/compare", "/tpp/runs", "/massage/runs",
+)
+
+SYNTHETIC_PASSWORD_HASH = "synthetic-not-a-bcrypt-hash"
+
+
+@dataclass
+class DatasetSpec:
+    products: int = 20
+    runs_per_type: int = 2
+    users: int = 50
+    access_logs: int = 500
+    seed: int = 42
+    chunk_size: int = 2000
+
+    def scaled(self, factor: int) -> "DatasetSpec":
+        """Scale catalog, users and logs by ``factor``; run history depth stays M."""
+        return DatasetSpec(
+            products=self.products * factor,
+            runs_per_type=self.runs_per_type,
+            users=self.users * factor,
+            access_logs=self.access_logs * factor,
+            seed=self.seed,
+            chunk_size=self.chunk_size,
+        )
+
+
+def create_schema(engine: Engine) -> None:
+    """Create only the tables the generator fills (kpi_def/kpi_scales are not needed)."""
+    with engine.begin() as conn:
+        for table in TABLES:
+            table.create(conn, checkfirst=True)
+
+
+def _chunks(rows: Iterable[dict], size: int) -> Iterator[list[dict]]:
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _next_id(conn: Connection, table: sa.Table) -> int:
+    return int(conn.execute(sa.select(sa.func.coalesce(sa.func.max(table.c.id), 0))).scalar_one()) + 1
+
+
+def _insert(conn: Connection, table: sa.Table, rows: Iterable[dict], chunk_size: int) -> int:
+    total = 0
+    for chunk in _chunks(rows, chunk_size):
+        conn.execute(table.insert(), chunk)
+        total += len(chunk)
+    return total
+
+
+def _sync_sequences(conn: Connection) -> None:
+    # Ids are assigned client-side: move the Postgres sequences past them
+    if conn.dialect.name != "postgresql":
+        return
+    for table in TABLES:
+        conn.execute(
+            sa.text(
+                f"SELECT setval(pg_get_serial_sequence('{table.name}', 'id'), "
+                f"COALESCE((SELECT MAX(id) FROM {table.name}), 0) + 1, false)"
+            )
+        )
+
+
+class _Ids:
+    def __init__(self, conn: Connection):
+        self._next = {table.name: _next_id(conn, table) for table in TABLES}
+
+    def peek(self, table: sa.Table) -> int:
+        return self._next[table.name]
+
+    def take(self, table: sa.Table) -> int:
+        value = self._next[table.name]
+        self._next[table.name] = value + 1
+        return value
+
+
+def _score(rng: random.Random) -> int:
+    return rng.choice((1, 2, 2, 3, 3, 3, 4, 4))
+
+
+def generate(engine: Engine, spec: DatasetSpec, *, now: Optional[datetime] = None) -> dict:
+    """Fill the database described by ``engine`` and return per-table row counts."""
+    rng = random.Random(spec.seed)
+    now = now or datetime.now(timezone.utc).replace(tzinfo=None)
+    counts: dict[str, int] = {}
+    area_values = list(REFERENCE_AREAS.values())
+
+    with engine.begin() as conn:
+        ids = _Ids(conn)
+        user_offset = ids.peek(User.__table__)
+        offset = ids.peek(Product.__table__)
+
+        user_rows = []
+        for i in range(spec.users):
+            user_rows.append(
+                {
+                    "id": ids.take(User.__table__),
+                    # Mixed case on purpose: exercises the lower(email) lookup
+                    "email": f"Synthetic.User{user_offset + i:07d}@Example.COM",
+                    "hashed_password": SYNTHETIC_PASSWORD_HASH,
+                    "role": "admin" if i % 25 == 0 else "user",
+                    "is_active": True,
+                    "is_first_login": False,
+                    "unit_system": "imperial" if i % 5 == 0 else "metric",
+                    "created_at": now - timedelta(days=rng.randint(0, 720)),
+                }
+            )
+        counts["users"] = _insert(conn, User.__table__, user_rows, spec.chunk_size)
+        user_ids = [row["id"] for row in user_rows] or [None]
+
+        product_rows, application_rows = [], []
+        for i in range(spec.products):
+            product_id = ids.take(Product.__table__)
+            n = offset + i
+            product_rows.append(
+                {
+                    "id": product_id,
+                    "code": f"SYN-{n:07d}",
+                    "name": f"Synthetic liner {n}",
+                    "product_type": "liner" if rng.random() < 0.95 else "accessory",
+                    "brand": BRANDS[n % len(BRANDS)],
+                    "model": f"SYN-{n:07d}",
+                    "compound": rng.choice(COMPOUNDS),
+                    "only_admin": rng.random() < 0.1,
+                    "robot_liner": rng.random() < 0.2,
+                    "barrel_shape": rng.choice(BARREL_SHAPES),
+                    "reference_areas": rng.sample(area_values, rng.randint(1, 3)),
+                    "liner_length": round(rng.uniform(140, 190), 1),
+                    "shell_length": round(rng.uniform(120, 170), 1),
+                    "barrel_diameter": round(rng.uniform(20, 28), 2),
+                    "orifice_diameter": round(rng.uniform(19, 26), 2),
+                    "hardness": round(rng.uniform(45, 70), 1),
+                    "created_at": now - timedelta(days=rng.randint(0, 720)),
+                }
+            )
+            for size_mm in TEAT_SIZE_MAP.values():
+                application_rows.append(
+                    {
+                        "id": ids.take(ProductApplication.__table__),
+                        "product_id": product_id,
+                        "size_mm": size_mm,
+                        "label": f"{size_mm} mm",
+                        "created_at": now - timedelta(days=rng.randint(0, 720)),
+                    }
+                )
+        counts["products"] = _insert(conn, Product.__table__, product_rows, spec.chunk_size)
+        counts["product_applications"] = _insert(
+            conn, ProductApplication.__table__, application_rows, spec.chunk_size
+        )
+
+        runs = {t.name: [] for t in (TppRun.__table__, SpeedRun.__table__, MassageRun.__table__, SmtHoodRun.__table__)}
+        massage_points, smt_points, metrics, kpis = [], [], [], []
+        final_ctx = context_fields({"agg": "final"})
+        massage_ctx = context_fields({"pressures": list(MASSAGE_PRESSURES)})
+        smt_ctx = context_fields({"flows": list(SMT_FLOWS), "agg": "final"})
+        empty_ctx = context_fields({})
+        flow_ctx = {flow: context_fields({"flow_lpm": flow}) for flow in SMT_FLOWS}
+
+        def metric(run_type, run_id, pa_id, code, value, computed_at, ctx, unit=None):
+            metrics.append(
+                {
+                    "id": ids.take(TestMetric.__table__),
+                    "run_type": run_type,
+                    "run_id": run_id,
+                    "product_application_id": pa_id,
+                    "metric_code": code,
+                    "value_num": value,
+                    "unit": unit,
+                    **ctx,
+                    "computed_at": computed_at,
+                }
+            )
+
+        def kpi(run_type, run_id, pa_id, code, value, computed_at, ctx, unit=None):
+            kpis.append(
+                {
+                    "id": ids.take(KpiValue.__table__),
+                    "run_type": run_type,
+                    "run_id": run_id,
+                    "product_application_id": pa_id,
+                    "kpi_code": code,
+                    "value_num": value,
+                    "score": _score(rng),
+                    "unit": unit,
+                    **ctx,
+                    "computed_at": computed_at,
+                }
+            )
+
+        for app_row in application_rows:
+            pa_id = app_row["id"]
+            for m in range(spec.runs_per_type):
+                at = now - timedelta(days=(spec.runs_per_type - m) * 30, minutes=rng.randint(0, 1440))
+                last = m == spec.runs_per_type - 1
+
+                run_id = ids.take(TppRun.__table__)
+                real_tpp = round(rng.uniform(20, 60), 2)
+                runs["tpp_runs"].append(
+                    {"id": run_id, "product_application_id": pa_id, "performed_at": at,
+                     "real_tpp": real_tpp, "created_at": at}
+                )
+                metric("TPP", run_id, pa_id, "REAL_TPP", real_tpp, at, final_ctx, "kPa")
+                kpi("TPP", run_id, pa_id, "CLOSURE", real_tpp, at, final_ctx, "kPa")
+
+                run_id = ids.take(SpeedRun.__table__)
+                measure = round(rng.uniform(250, 650), 1)
+                runs["speed_runs"].append(
+                    {"id": run_id, "product_application_id": pa_id, "performed_at": at,
+                     "measure_ml": measure, "created_at": at}
+                )
+                metric("SPEED", run_id, pa_id, "SPEED_ML", measure, at, final_ctx, "ml")
+                kpi("SPEED", run_id, pa_id, "SPEED", measure, at, final_ctx, "ml")
+
+                run_id = ids.take(MassageRun.__table__)
+                runs["massage_runs"].append(
+                    {"id": run_id, "product_application_id": pa_id, "performed_at": at, "created_at": at}
+                )
+                for pressure in MASSAGE_PRESSURES:
+                    low = rng.uniform(10, 25)
+                    massage_points.append(
+                        {"id": ids.take(MassagePoint.__table__), "run_id": run_id, "pressure_kpa": pressure,
+                         "min_val": round(low, 2), "max_val": round(low + rng.uniform(5, 20), 2), "created_at": at}
+                    )
+                for code in MASSAGE_METRICS:
+                    metric("MASSAGE", run_id, pa_id, code, round(rng.uniform(0, 40), 3), at, empty_ctx)
+                # Massage and SMT/Hood KPIs are upserted per application: only the last run survives
+                if last:
+                    for code in MASSAGE_KPIS:
+                        kpi("MASSAGE", run_id, pa_id, code, round(rng.uniform(0, 40), 3), at, massage_ctx)
+
+                run_id = ids.take(SmtHoodRun.__table__)
+                runs["smt_hood_runs"].append(
+                    {"id": run_id, "product_application_id": pa_id, "performed_at": at, "created_at": at}
+                )
+                for flow in SMT_FLOWS:
+                    smt_min = rng.uniform(30, 45)
+                    hood_min = rng.uniform(30, 45)
+                    smt_points.append(
+                        {"id": ids.take(SmtHoodPoint.__table__), "run_id": run_id, "flow_code": int(round(flow * 10)),
+                         "flow_lpm": flow, "smt_min": round(smt_min, 2), "smt_max": round(smt_min + rng.uniform(1, 8), 2),
+                         "hood_min": round(hood_min, 2), "hood_max": round(hood_min + rng.uniform(1, 8), 2),
+                         "created_at": at}
+                    )
+                    for code in SMT_METRICS:
+                        metric("SMT_HOOD", run_id, pa_id, code, round(rng.uniform(0, 15), 3), at,
+                               flow_ctx[flow], "kPa")
+                if last:
+                    for code in SMT_KPIS:
+                        kpi("SMT_HOOD", run_id, pa_id, code, round(rng.uniform(0, 15), 3), at, smt_ctx, "kPa")
+
+        for table in (TppRun.__table__, SpeedRun.__table__, MassageRun.__table__, SmtHoodRun.__table__):
+            counts[table.name] = _insert(conn, table, runs[table.name], spec.chunk_size)
+        counts["massage_points"] = _insert(conn, MassagePoint.__table__, massage_points, spec.chunk_size)
+        counts["smt_hood_points"] = _insert(conn, SmtHoodPoint.__table__, smt_points, spec.chunk_size)
+        counts["test_metrics"] = _insert(conn, TestMetric.__table__, metrics, spec.chunk_size)
+        counts["kpi_values"] = _insert(conn, KpiValue.__table__, kpis, spec.chunk_size)
+
+        def access_rows():
+            for _ in range(spec.access_logs):
+                yield {
+                    "id": ids.take(AccessLog.__table__),
+                    "request_id": f"{rng.getrandbits(64):016x}",
+                    "user_id": rng.choice(user_ids),
+                    "method": "GET",
+                    "path": rng.choice(API_PATHS),
+                    "status_code": rng.choice((200, 200, 200, 200, 304, 401, 404, 500)),
+                    "ip": f"10.{rng.randint(0, 255)}.{rng.randint(0, 255)}.{rng.randint(1, 254)}",
+                    "user_agent": "synthetic-benchmark",
+                    "duration_ms": rng.randint(2, 400),
+                    "created_at": now - timedelta(seconds=rng.randint(0, 90 * 86400)),
+                }
+
+        def audit_rows():
+            for _ in range(spec.access_logs // 5):
+                yield {
+                    "id": ids.take(AuditLog.__table__),
+                    "request_id": f"{rng.getrandbits(64):016x}",
+                    "user_id": rng.choice(user_ids),
+                    "method": rng.choice(("POST", "PUT", "DELETE")),
+                    "path": rng.choice(API_PATHS),
+                    "status_code": rng.choice((200, 201, 204, 422)),
+                    "ip": f"10.{rng.randint(0, 255)}.{rng.randint(0, 255)}.{rng.randint(1, 254)}",
+                    "user_agent": "synthetic-benchmark",
+                    "request_json": {"product_application_id": rng.randint(1, 1000)},
+                    "duration_ms": rng.randint(5, 800),
+                    "created_at": now - timedelta(seconds=rng.randint(0, 90 * 86400)),
+                }
+
+        def login_rows():
+            for _ in range(spec.access_logs // 10):
+                success = rng.random() < 0.8
+                yield {
+                    "id": ids.take(LoginEvent.__table__),
+                    "user_id": rng.choice(user_ids) if success else None,
+                    "email_attempted": f"synthetic.user{rng.randint(0, max(spec.users, 1)):07d}@example.com",
+                    "success": success,
+                    "ip": f"10.{rng.randint(0, 255)}.{rng.randint(0, 255)}.{rng.randint(1, 254)}",
+                    "user_agent": "synthetic-benchmark",
+                    "created_at": now - timedelta(seconds=rng.randint(0, 90 * 86400)),
+                }
+
+        def security_rows():
+            for _ in range(spec.access_logs // 50):
+                yield {
+                    "id": ids.take(SecurityEvent.__table__),
+                    "ip": f"10.{rng.randint(0, 255)}.{rng.randint(0, 255)}.{rng.randint(1, 254)}",
+                    "rule_code": rng.choice(("LOGIN_BRUTE_FORCE", "RATE_LIMIT")),
+                    "severity": "medium",
+                    "details_json": {"synthetic": True},
+                    "created_at": now - timedelta(seconds=rng.randint(0, 90 * 86400)),
+                }
+
+        counts["access_logs"] = _insert(conn, AccessLog.__table__, access_rows(), spec.chunk_size)
+        counts["audit_logs"] = _insert(conn, AuditLog.__table__, audit_rows(), spec.chunk_size)
+        counts["login_events"] = _insert(conn, LoginEvent.__table__, login_rows(), spec.chunk_size)
+        counts["security_events"] = _insert(conn, SecurityEvent.__table__, security_rows(), spec.chunk_size)
+
+        _sync_sequences(conn)
+
+    if engine.dialect.name == "postgresql":
+        with engine.connect() as conn:
+            conn.execution_options(isolation_level="AUTOCOMMIT").execute(sa.text("ANALYZE"))
+    return counts
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Generate a synthetic liner catalog for DB-scale benchmarks.")
+    parser.add_argument("--database-url", required=True)
+    parser.add_argument("--create-schema", action="store_true", help="Create the generated tables if missing")
+    parser.add_argument("--products", type=int, default=DatasetSpec.products)
+    parser.add_argument("--runs", type=int, default=DatasetSpec.runs_per_type, help="Runs per test type per application")
+    parser.add_argument("--users", type=int, default=DatasetSpec.users)
+    parser.add_argument("--access-logs", type=int, default=DatasetSpec.access_logs)
+    parser.add_argument("--seed", type=int, default=DatasetSpec.seed)
+    args = parser.parse_args(argv)
+
+    spec = DatasetSpec(
+        products=args.products,
+        runs_per_type=args.runs,
+        users=args.users,
+        access_logs=args.access_logs,
+        seed=args.seed,
+    )
+    engine = create_engine(args.database_url)
+    if args.create_schema:
+        create_schema(engine)
+    counts = generate(engine, spec)
+    print(json.dumps({"spec": asdict(spec), "rows": counts}, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,132 @@
+"""Deterministic inputs for the micro-benchmarks.
+
+Everything is built from a fixed seed so two runs (or two machines) time the
+exact same work.
+"""
+import random
+
+from app.middleware_rate_limit import RateLimitRule
+from app.schema.setting_calculator.request_v1 import CompareRequestV1, UserInputsV1
+from app.schema.setting_calculator.response_v1 import LinerInfoV1
+
+SEED = 20240601
+
+
+def liner_info() -> LinerInfoV1:
+    return LinerInfoV1(
+        id=1,
+        model="BenchLiner",
+        brand="BenchBrand",
+        tppKpa=12.5,
+        intensityPfKpa=21.0,
+        intensityOmKpa=17.5,
+    )
+
+
+def user_inputs_payload() -> dict:
+    return {
+        "milkingVacuumMaxKpa": 42.0,
+        "pfVacuumKpa": 38.0,
+        "omVacuumKpa": 30.0,
+        "omDurationSec": 60.0,
+        "frequencyBpm": 60.0,
+        "ratioPct": 60.0,
+        "phaseAMs": 150.0,
+        "phaseCMs": 150.0,
+    }
+
+
+def imperial_inputs_payload() -> dict:
+    payload = user_inputs_payload()
+    for field in ("milkingVacuumMaxKpa", "pfVacuumKpa", "omVacuumKpa"):
+        payload.pop(field)
+    payload.update(milkingVacuumMaxInHg=12.4, pfVacuumInHg=11.2, omVacuumInHg=8.9)
+    return payload
+
+
+def user_inputs() -> UserInputsV1:
+    return UserInputsV1(**user_inputs_payload())
+
+
+def compare_request() -> CompareRequestV1:
+    side = {"productApplicationId": 1, "inputs": user_inputs_payload()}
+    return CompareRequestV1(requestId="bench", left=side, right=dict(side))
+
+
+def massage_points() -> dict[int, tuple[float, float]]:
+    return {45: (12.1, 41.3), 40: (10.4, 36.8), 35: (8.7, 31.9)}
+
+
+def kpi_rows(n: int = 200) -> list[dict]:
+    """Rows shaped like the /kpis/values/batch items, with nested context."""
+    rng = random.Random(SEED)
+    rows = []
+    for i in range(n):
+        rows.append(
+            {
+                "product_application_id": 1 + i // 20,
+                "kpi_code": f"KPI_{i % 9}",
+                "value_num": rng.uniform(0, 50),
+                "score": rng.randint(1, 4),
+                "run_type": "TPP",
+                "run_id": i,
+                "unit": "kPa",
+                "vacuum_kpa": rng.uniform(30, 45),
+                "flow_l_min": rng.uniform(0.5, 3.0),
+                "context": {"flow_lpm": rng.choice([0.5, 1.9, 3.0]), "smt_min": rng.uniform(0, 10)},
+                "computed_at": "2024-06-01T00:00:00",
+            }
+        )
+    return rows
+
+
+def audit_payload() -> dict:
+    return {
+        "email": "someone@milkrite-interpuls.com",
+        "password": "secret",
+        "profile": {"name": "Bench", "tokens": ["a", "b"], "api_key": "xyz"},
+        "items": [{"code": f"P{i}", "qty": i, "refresh_token": "t"} for i in range(30)],
+    }
+
+
+def rate_limit_rule() -> RateLimitRule:
+    return RateLimitRule("setting_compare", "POST", r"^/setting-calculator/compare$", 30, 60)
+
+
+def client_ips(n: int = 1000) -> list[str]:
+    rng = random.Random(SEED)
+    return [f"203.0.{rng.randint(0, 255)}.{rng.randint(1, 254)}" for _ in range(n)]
+
+
+def http_scope(method: str, path: str, *, body: bytes = b"") -> dict:
+    """ASGI scope with the header set a browser behind a proxy sends."""
+    headers = [
+        (b"host", b"api.liner.example"),
+        (b"user-agent", b"Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 Chrome/126.0 Safari/537.36"),
+        (b"accept", b"application/json, text/plain, */*"),
+        (b"accept-encoding", b"gzip, deflate, br, zstd"),
+        (b"accept-language", b"it-IT,it;q=0.9,en-US;q=0.8"),
+        (b"authorization", b"Bearer eyJhbGciOiJIUzI1NiJ9.e30.bench"),
+        (b"origin", b"https://liner.example"),
+        (b"referer", b"https://liner.example/products/3"),
+        (b"x-forwarded-for", b"93.184.216.34, 10.0.0.2"),
+        (b"x-forwarded-proto", b"https"),
+        (b"x-vercel-ip-country", b"IT"),
+        (b"x-request-id", b"bench-request-id"),
+    ]
+    if body:
+        headers += [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())]
+    return {
+        "type": "http",
+        "asgi": {"version": "3.0", "spec_version": "2.3"},
+        "http_version": "1.1",
+        "method": method,
+        "scheme": "https",
+        "path": path,
+        "raw_path": path.encode(),
+        "root_path": "",
+        "query_string": b"",
+        "headers": headers,
+        "client": ("10.0.0.2", 51234),
+        "server": ("10.0.0.1", 8080),
+    }
@@ -0,0 +1,345 @@
+"""Query-plan regression checks for the hot SQL statements.
+
+Every registered case calls the real application code on a synthetic dataset
+(see benchmarks.dataset) while the SELECTs it issues are captured; each one is
+then EXPLAINed on the same connection:
+
+- SQLite: ``EXPLAIN QUERY PLAN`` (no costs), normalized to an indented tree.
+- Postgres: ``EXPLAIN (FORMAT JSON)`` with ``enable_seqscan = off``, so a Seq
+  Scan that survives means no usable index exists; the root total cost is kept.
+
+A plan fails when it full-scans one of ``BIG_TABLES``. Plans and costs are
+stored as golden files in ``benchmarks/plans/<dialect>.json`` and every change
+(plan shape, cost beyond the tolerance, new or missing statement) is reported.
+
+Usage (from backend/):
+    python -m benchmarks.query_plans                         # SQLite temp file
+    python -m benchmarks.query_plans --update                # rewrite the golden file
+    python -m benchmarks.query_plans --database-url postgresql://... --reset
+"""
+import argparse
+import json
+import os
+import re
+import sqlite3
+import sys
+import tempfile
+from contextlib import contextmanager
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Optional
+
+import sqlalchemy as sa
+from sqlmodel import Session, create_engine
+
+from app.common.enums import UserRole
+from app.model.user import User
+from app.routers.auth_router import _count_recent_failed_attempts_for_email, _count_recent_failed_attempts_for_ip
+from app.routers.kpi_router import list_kpis_for_applications_batch
+from app.routers.massage_router import list_massage_runs
+from app.routers.smt_hood_router import list_smt_hood_runs
+from app.routers.speed_router import list_speed_runs
+from app.routers.tpp_router import list_tpp_runs
+from app.schema.kpi import KpiValuesBatchIn
+from app.services.metric_queries import latest_metric
+from app.services.ranking import get_overview_rankings
+from app.services.setting_calculator.service import _get_latest_tpp_kpa
+from benchmarks.dataset import DatasetSpec, create_schema, generate
+from benchmarks.scale import BATCH_APPLICATION_IDS, _reset
+
+PLANS_DIR = os.path.join(os.path.dirname(__file__), "plans")
+
+# Tabelle che crescono con storico/log: mai in full scan
+BIG_TABLES = frozenset({
+    "kpi_values", "test_metrics",
+    "tpp_runs", "speed_runs", "massage_runs", "smt_hood_runs",
+    "massage_points", "smt_hood_points",
+    "access_logs", "audit_logs", "login_events", "security_events",
+})
+
+# Dataset e istante fissi: i piani (e i costi) devono essere riproducibili
+PLAN_DATASET = DatasetSpec(products=200, runs_per_type=3, users=500, access_logs=20000, seed=7)
+PLAN_NOW = datetime(2026, 1, 1, tzinfo=timezone.utc)
+COST_TOLERANCE_PCT = 25.0
+
+
+@dataclass
+class Sample:
+    """Ids and keys picked from the generated data, passed to every case."""
+    application_id: int
+    batch_ids: list[int]
+    email: str
+    ip: str
+    viewer: User
+
+
+HOT_STATEMENTS: dict[str, Callable[[Session, Sample], object]] = {}
+
+
+def hot_statement(name: str):
+    def register(fn: Callable[[Session, Sample], object]):
+        HOT_STATEMENTS[name] = fn
+        return fn
+    return register
+
+
+@hot_statement("ranking.latest_kpi_window")
+def _ranking(s: Session, sample: Sample):
+    return get_overview_rankings(
+        s, sample.viewer, kpis="CLOSURE,SPEED,FITTING,RESPRAY", teat_sizes="XS,S,M,L",
+        reference_areas="global", limit=10,
+    )
+
+
+@hot_statement("setting_calculator.latest_tpp")
+def _latest_tpp(s: Session, sample: Sample):
+    return _get_latest_tpp_kpa(s, sample.application_id)
+
+
+@hot_statement("setting_calculator.latest_metric")
+def _latest_metric(s: Session, sample: Sample):
+    return latest_metric(s, sample.application_id, "AVG_PF", run_type="MASSAGE")
+
+
+@hot_statement("kpis.values_batch")
+def _kpi_batch(s: Session, sample: Sample):
+    return list_kpis_for_applications_batch(
+        KpiValuesBatchIn(product_application_ids=sample.batch_ids), session=s, user=sample.viewer
+    )
+
+
+@hot_statement("runs.list_tpp")
+def _list_tpp(s: Session, sample: Sample):
+    return list_tpp_runs(product_application_id=sample.application_id, limit=50, offset=0, session=s, user=sample.viewer)
+
+
+@hot_statement("runs.list_speed")
+def _list_speed(s: Session, sample: Sample):
+    return list_speed_runs(product_application_id=sample.application_id, limit=50, offset=0, session=s, user=sample.viewer)
+
+
+@hot_statement("runs.list_massage")
+def _list_massage(s: Session, sample: Sample):
+    return list_massage_runs(product_application_id=sample.application_id, limit=50, offset=0, session=s, user=sample.viewer)
+
+
+@hot_statement("runs.list_smt_hood")
+def _list_smt_hood(s: Session, sample: Sample):
+    return list_smt_hood_runs(product_application_id=sample.application_id, limit=50, offset=0, session=s, user=sample.viewer)
+
+
+@hot_statement("auth.failed_logins_by_email")
+def _failed_by_email(s: Session, sample: Sample):
+    return _count_recent_failed_attempts_for_email(s, sample.email, PLAN_NOW.replace(tzinfo=None))
+
+
+@hot_statement("auth.failed_logins_by_ip")
+def _failed_by_ip(s: Session, sample: Sample):
+    return _count_recent_failed_attempts_for_ip(s, sample.ip, PLAN_NOW.replace(tzinfo=None))
+
+
+def pick_sample(engine) -> Sample:
+    with engine.connect() as conn:
+        app_ids = [r[0] for r in conn.execute(sa.text("SELECT id FROM product_applications ORDER BY id"))]
+        login = conn.execute(sa.text("SELECT email_attempted, ip FROM login_events ORDER BY id LIMIT 1")).first()
+    middle = len(app_ids) // 2
+    return Sample(
+        application_id=app_ids[middle],
+        batch_ids=app_ids[middle:middle + BATCH_APPLICATION_IDS],
+        email=login[0] if login else "nobody@example.com",
+        ip=login[1] if login else "10.0.0.1",
+        viewer=User(id=0, email="plans@example.com", hashed_password="", role=UserRole.ADMIN),
+    )
+
+
+@contextmanager
+def capture_selects(engine):
+    captured: list[tuple[str, object]] = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith(("SELECT", "WITH")):
+            captured.append((statement, parameters))
+
+    sa.event.listen(engine, "before_cursor_execute", record)
+    try:
+        yield captured
+    finally:
+        sa.event.remove(engine, "before_cursor_execute", record)
+
+
+def _sqlite_plan(conn, statement: str, parameters) -> dict:
+    rows = conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters).all()
+    depth: dict[int, int] = {0: -1}
+    lines = []
+    for node_id, parent, _unused, detail in rows:
+        depth[node_id] = depth.get(parent, -1) + 1
+        detail = re.sub(r"^(SCAN|SEARCH) TABLE ", r"\1 ", detail)  # formato SQLite < 3.36
+        lines.append("  " * depth[node_id] + detail)
+    scans = sorted({
+        m.group(1) for line in lines
+        if (m := re.match(r"\s*SCAN (\w+)", line)) and m.group(1) in BIG_TABLES
+    })
+    return {"plan": lines, "cost": None, "seq_scans": scans}
+
+
+def _postgres_plan(conn, statement: str, parameters) -> dict:
+    conn.exec_driver_sql("SET LOCAL enable_seqscan = off")
+    raw = conn.exec_driver_sql(f"EXPLAIN (FORMAT JSON) {statement}", parameters).scalar()
+    root = (json.loads(raw) if isinstance(raw, str) else raw)[0]["Plan"]
+    lines, scans = [], set()
+
+    def walk(node, level):
+        relation = node.get("Relation Name")
+        index = node.get("Index Name")
+        label = node["Node Type"] + (f" on {relation}" if relation else "") + (f" using {index}" if index else "")
+        lines.append("  " * level + label)
+        if node["Node Type"] in ("Seq Scan", "Parallel Seq Scan") and relation in BIG_TABLES:
+            scans.add(relation)
+        for child in node.get("Plans", ()):
+            walk(child, level + 1)
+
+    walk(root, 0)
+    return {"plan": lines, "cost": round(float(root["Total Cost"]), 2), "seq_scans": sorted(scans)}
+
+
+def explain_hot_statements(engine, only: Optional[list[str]] = None) -> dict[str, dict]:
+    """``{case#n: {"plan", "cost", "seq_scans"}}`` for every SELECT of every case."""
+    sample = pick_sample(engine)
+    explain = _postgres_plan if engine.dialect.name == "postgresql" else _sqlite_plan
+    plans: dict[str, dict] = {}
+    for name, fn in HOT_STATEMENTS.items():
+        if only and not any(o in name for o in only):
+            continue
+        with capture_selects(engine) as captured, Session(engine) as session:
+            fn(session, sample)
+        for i, (statement, parameters) in enumerate(captured):
+            with engine.begin() as conn:
+                plans[f"{name}#{i}"] = explain(conn, statement, parameters)
+    return plans
+
+
+def compare_plans(current: dict[str, dict], golden: dict[str, dict], cost_tolerance_pct: float = COST_TOLERANCE_PCT) -> list[str]:
+    changes = []
+    for name in sorted(set(current) | set(golden)):
+        if name not in golden:
+            changes.append(f"{name}: new statement (not in golden file)")
+            continue
+        if name not in current:
+            changes.append(f"{name}: statement no longer issued")
+            continue
+        now, before = current[name], golden[name]
+        if now["plan"] != before["plan"]:
+            diff = "\n".join(
+                [f"    - {line}" for line in before["plan"]] + [f"    + {line}" for line in now["plan"]]
+            )
+            changes.append(f"{name}: plan changed\n{diff}")
+        if now.get("cost") and before.get("cost"):
+            delta = (now["cost"] - before["cost"]) / before["cost"] * 100
+            if abs(delta) > cost_tolerance_pct:
+                changes.append(f"{name}: estimated cost {before['cost']} -> {now['cost']} ({delta:+.0f}%)")
+    return changes
+
+
+def seq_scan_violations(plans: dict[str, dict]) -> list[str]:
+    return [f"{name}: sequential scan on {', '.join(p['seq_scans'])}" for name, p in plans.items() if p["seq_scans"]]
+
+
+def golden_path(dialect: str) -> str:
+    return os.path.join(PLANS_DIR, f"{dialect}.json")
+
+
+def load_golden(dialect: str) -> Optional[dict]:
+    path = golden_path(dialect)
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding="utf-8") as fh:
+        return json.load(fh)
+
+
+def write_golden(dialect: str, plans: dict[str, dict], engine_version: str) -> str:
+    os.makedirs(PLANS_DIR, exist_ok=True)
+    path = golden_path(dialect)
+    document = {"engine_version": engine_version, "dataset": vars(PLAN_DATASET), "plans": plans}
+    with open(path, "w", encoding="utf-8") as fh:
+        json.dump(document, fh, indent=2, sort_keys=True)
+        fh.write("\n")
+    return path
+
+
+def build_plan_database(database_url: Optional[str] = None, *, reset: bool = False, workdir: Optional[str] = None):
+    if database_url:
+        engine = create_engine(database_url)
+        create_schema(engine)
+        if reset:
+            _reset(engine)
+    else:
+        path = os.path.join(workdir or tempfile.gettempdir(), "liner-query-plans.db")
+        if os.path.exists(path):
+            os.remove(path)
+        engine = create_engine(f"sqlite:///{path}")
+        create_schema(engine)
+    generate(engine, PLAN_DATASET, now=PLAN_NOW - timedelta(days=1))
+    if engine.dialect.name == "sqlite":
+        with engine.begin() as conn:
+            conn.exec_driver_sql("ANALYZE")
+    return engine
+
+
+def engine_version(engine) -> str:
+    if engine.dialect.name == "sqlite":
+        return sqlite3.sqlite_version
+    with engine.connect() as conn:
+        return str(conn.exec_driver_sql("SHOW server_version").scalar())
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="EXPLAIN the hot SQL statements and diff them against golden plans.")
+    parser.add_argument("--database-url", help="Target database (default: SQLite temp file)")
+    parser.add_argument("--reset", action="store_true", help="Empty the generated tables first")
+    parser.add_argument("--only", action="append", help="Explain only cases containing this substring")
+    parser.add_argument("--update", action="store_true", help="Rewrite the golden file with the current plans")
+    args = parser.parse_args(argv)
+
+    if args.database_url and not args.reset:
+        parser.error("--database-url needs --reset: plans are taken on the fixed synthetic dataset")
+
+    engine = build_plan_database(args.database_url, reset=args.reset)
+    dialect = engine.dialect.name
+    plans = explain_hot_statements(engine, only=args.only)
+    version = engine_version(engine)
+    engine.dispose()
+
+    for name, p in plans.items():
+        cost = f"  cost={p['cost']}" if p["cost"] is not None else ""
+        print(f"{name}{cost}")
+        for line in p["plan"]:
+            print(f"    {line}")
+
+    violations = seq_scan_violations(plans)
+    if args.update:
+        if args.only:
+            # aggiornamento parziale: gli altri statement restano quelli del golden
+            plans = {**((load_golden(dialect) or {}).get("plans") or {}), **plans}
+        print(f"golden plans written to {write_golden(dialect, plans, version)}")
+    else:
+        golden = load_golden(dialect)
+        if golden is None:
+            print(f"no golden file for {dialect}; run with --update to create it")
+        else:
+            reference = golden["plans"]
+            if args.only:
+                reference = {k: v for k, v in reference.items() if any(o in k for o in args.only)}
+            changes = compare_plans(plans, reference)
+            if golden.get("engine_version") != version:
+                print(f"note: golden taken on {dialect} {golden.get('engine_version')}, running {version}")
+            for change in changes:
+                print(f"CHANGED {change}")
+            violations += [] if not changes else ["plans differ from the golden file"]
+
+    for violation in violations:
+        print(f"FAIL {violation}")
+    return 1 if violations else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
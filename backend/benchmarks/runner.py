@@ -0,0 +1,145 @@
+"""Run the micro-benchmarks, compare with a JSON baseline, fail on regressions.
+
+Usage (from backend/):
+    python -m benchmarks.runner                       # run and print
+    python -m benchmarks.runner --save-baseline       # write benchmarks/baseline.json
+    python -m benchmarks.runner --baseline benchmarks/baseline.json --threshold-pct 20
+"""
+import argparse
+import gc
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+from benchmarks.cases import CASES
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(__file__), "baseline.json")
+
+
+def _calibrate(fn, min_time: float) -> int:
+    """Smallest power-of-two loop count whose run takes at least ``min_time`` seconds."""
+    loops = 1
+    while True:
+        started = time.perf_counter()
+        for _ in range(loops):
+            fn()
+        if time.perf_counter() - started >= min_time or loops >= 1 << 22:
+            return loops
+        loops *= 2
+
+
+def _allocations(fn, calls: int) -> tuple[float, float]:
+    """Return (bytes allocated per call, allocated blocks per call) measured with tracemalloc."""
+    gc.collect()
+    tracemalloc.start()
+    try:
+        before = tracemalloc.take_snapshot()
+        kept = [fn() for _ in range(calls)]  # keep results alive so their memory is counted
+        after = tracemalloc.take_snapshot()
+    finally:
+        tracemalloc.stop()
+    del kept
+    stats = after.compare_to(before, "filename")
+    size = sum(s.size_diff for s in stats if s.size_diff > 0)
+    blocks = sum(s.count_diff for s in stats if s.count_diff > 0)
+    return size / calls, blocks / calls
+
+
+def run_case(name: str, *, rounds: int, min_time: float, alloc_calls: int) -> dict:
+    fn = CASES[name]()
+    fn()  # warm-up (imports, caches)
+    loops = _calibrate(fn, min_time)
+    ops_per_sec = []
+    for _ in range(rounds):
+        gc.collect()
+        started = time.perf_counter()
+        for _ in range(loops):
+            fn()
+        elapsed = time.perf_counter() - started
+        ops_per_sec.append(loops / elapsed)
+    bytes_per_call, blocks_per_call = _allocations(fn, alloc_calls)
+    return {
+        "ops_per_sec": round(max(ops_per_sec), 1),
+        "ops_per_sec_median": round(statistics.median(ops_per_sec), 1),
+        "us_per_op": round(1e6 / max(ops_per_sec), 3),
+        "bytes_per_call": round(bytes_per_call, 1),
+        "blocks_per_call": round(blocks_per_call, 2),
+        "loops": loops,
+        "rounds": rounds,
+    }
+
+
+def compare(results: dict, baseline: dict, threshold_pct: float) -> list[str]:
+    regressions = []
+    for name, current in results.items():
+        base = baseline.get("results", {}).get(name)
+        if not base:
+            continue
+        slowdown = (base["ops_per_sec"] - current["ops_per_sec"]) / base["ops_per_sec"] * 100
+        if slowdown > threshold_pct:
+            regressions.append(
+                f"{name}: ops/sec {base['ops_per_sec']:.0f} -> {current['ops_per_sec']:.0f} (-{slowdown:.1f}%)"
+            )
+        base_bytes = base.get("bytes_per_call") or 0
+        if base_bytes and current["bytes_per_call"] > base_bytes * (1 + threshold_pct / 100):
+            regressions.append(
+                f"{name}: bytes/call {base_bytes:.0f} -> {current['bytes_per_call']:.0f}"
+            )
+    return regressions
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Micro-benchmarks for backend hot paths.")
+    parser.add_argument("--only", action="append", help="Run only cases containing this substring")
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--min-time", type=float, default=0.2, help="Seconds per timed round")
+    parser.add_argument("--alloc-calls", type=int, default=200)
+    parser.add_argument("--baseline", help="Baseline JSON to compare against")
+    parser.add_argument("--save-baseline", nargs="?", const=DEFAULT_BASELINE, help="Write results as baseline")
+    parser.add_argument("--output", help="Write results JSON to this file")
+    parser.add_argument("--threshold-pct", type=float, default=20.0)
+    args = parser.parse_args(argv)
+
+    names = [n for n in CASES if not args.only or any(o in n for o in args.only)]
+    results = {}
+    print(f"{'case':<52} {'ops/sec':>12} {'us/op':>10} {'B/call':>10} {'blocks':>8}")
+    for name in names:
+        res = run_case(name, rounds=args.rounds, min_time=args.min_time, alloc_calls=args.alloc_calls)
+        results[name] = res
+        print(
+            f"{name:<52} {res['ops_per_sec']:>12.0f} {res['us_per_op']:>10.2f} "
+            f"{res['bytes_per_call']:>10.0f} {res['blocks_per_call']:>8.1f}"
+        )
+
+    document = {
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "results": results,
+    }
+    for path in (args.output, args.save_baseline):
+        if path:
+            with open(path, "w", encoding="utf-8") as fh:
+                json.dump(document, fh, indent=2, sort_keys=True)
+            print(f"results written to {path}")
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as fh:
+            baseline = json.load(fh)
+        regressions = compare(results, baseline, args.threshold_pct)
+        if regressions:
+            print(f"\nREGRESSIONS (threshold {args.threshold_pct:.0f}%):")
+            for line in regressions:
+                print(f"  {line}")
+            return 1
+        print(f"\nno regressions beyond {args.threshold_pct:.0f}% vs {args.baseline}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,224 @@
+"""Time DB-bound hot paths on synthetic catalogs at growing scale factors.
+
+For each factor a fresh synthetic dataset is generated (see benchmarks.dataset)
+and every endpoint is called ``--repeat`` times with a new Session, like a
+request would. The output is a scaling curve per endpoint: latency per factor
+plus the log-log slope of p50 vs dataset size (~0 constant, ~1 linear).
+
+Usage (from backend/):
+    python -m benchmarks.scale                                   # SQLite temp files, 1x/10x/100x
+    python -m benchmarks.scale --factors 1,10 --output scale.json
+    python -m benchmarks.scale --database-url postgresql://... --reset   # DESTROYS the generated tables' rows
+"""
+import argparse
+import json
+import math
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from typing import Callable, Optional
+
+import sqlalchemy as sa
+from sqlmodel import Session, create_engine
+
+from app.common.enums import UserRole
+from app.model.user import User
+from app.routers.kpi_router import list_kpis_for_applications_batch
+from app.routers.product_router import list_products
+from app.schema.kpi import KpiValuesBatchIn
+from app.services.ranking import get_overview_rankings
+from app.services.user_lookup import find_user_by_email
+from benchmarks.dataset import TABLES, DatasetSpec, create_schema, generate
+
+# The frontend asks KPIs for ~10 products (4 sizes each) at a time
+BATCH_APPLICATION_IDS = 40
+
+
+def _endpoints(engine) -> dict[str, Callable[[Session], object]]:
+    """Build the timed calls; ids and emails are picked from the generated data."""
+    with Session(engine) as session:
+        app_ids = list(
+            session.exec(
+                sa.select(sa.text("id")).select_from(sa.text("product_applications")).order_by(sa.text("id"))
+            ).scalars()
+        )
+        emails = list(
+            session.exec(sa.select(sa.text("email")).select_from(sa.text("users")).order_by(sa.text("id"))).scalars()
+        )
+    middle = len(app_ids) // 2
+    batch_ids = app_ids[middle:middle + BATCH_APPLICATION_IDS]
+    lookup_email = emails[len(emails) // 2].lower() if emails else "nobody@example.com"
+    viewer = User(id=0, email="bench@example.com", hashed_password="", role=UserRole.USER)
+
+    return {
+        "rankings.overview": lambda s: get_overview_rankings(
+            s,
+            viewer,
+            kpis="CLOSURE,SPEED,CONGESTION_RISK,FITTING,RESPRAY",
+            teat_sizes="XS,S,M,L",
+            reference_areas="europe",
+            limit=10,
+        ),
+        "kpis.values_batch": lambda s: list_kpis_for_applications_batch(
+            KpiValuesBatchIn(product_application_ids=batch_ids), session=s, user=viewer
+        ),
+        "products.list": lambda s: list_products(
+            session=s, user=viewer, product_type="liner", brand=None, model=None,
+            compound=None, q=None, limit=20, offset=0,
+        ),
+        "products.list_search": lambda s: list_products(
+            session=s, user=viewer, product_type=None, brand=None, model=None,
+            compound=None, q="liner 12", limit=20, offset=0,
+        ),
+        "users.lookup_email": lambda s: find_user_by_email(s, lookup_email),
+    }
+
+
+def time_endpoint(engine, fn: Callable[[Session], object], *, repeat: int) -> dict:
+    with Session(engine) as session:
+        fn(session)  # warm-up: statement cache, page cache
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        with Session(engine) as session:
+            fn(session)
+        samples.append((time.perf_counter() - started) * 1000)
+    samples.sort()
+    return {
+        "p50_ms": round(statistics.median(samples), 3),
+        "p95_ms": round(samples[min(len(samples) - 1, int(len(samples) * 0.95))], 3),
+        "min_ms": round(samples[0], 3),
+        "repeat": repeat,
+    }
+
+
+def _reset(engine) -> None:
+    with engine.begin() as conn:
+        if conn.dialect.name == "postgresql":
+            names = ", ".join(t.name for t in TABLES)
+            conn.execute(sa.text(f"TRUNCATE {names} RESTART IDENTITY CASCADE"))
+        else:
+            for table in reversed(TABLES):
+                conn.execute(table.delete())
+
+
+def scaling_slope(points: list[dict], size_key: str = "kpi_values") -> Optional[float]:
+    """Log-log slope of p50 between the smallest and the largest dataset."""
+    usable = [p for p in points if p["rows"].get(size_key) and p["p50_ms"] > 0]
+    if len(usable) < 2:
+        return None
+    first, last = usable[0], usable[-1]
+    size_ratio = last["rows"][size_key] / first["rows"][size_key]
+    if size_ratio <= 1:
+        return None
+    return round(math.log(last["p50_ms"] / first["p50_ms"]) / math.log(size_ratio), 3)
+
+
+def run_scale(
+    *,
+    factors: list[int],
+    base: DatasetSpec,
+    repeat: int,
+    database_url: Optional[str] = None,
+    reset: bool = False,
+    workdir: Optional[str] = None,
+    only: Optional[list[str]] = None,
+) -> dict:
+    curves: dict[str, list[dict]] = {}
+    datasets = []
+    for factor in factors:
+        spec = base.scaled(factor)
+        if database_url:
+            engine = create_engine(database_url)
+            create_schema(engine)
+            if reset:
+                _reset(engine)
+        else:
+            path = os.path.join(workdir or tempfile.gettempdir(), f"liner-scale-{factor}x.db")
+            if os.path.exists(path):
+                os.remove(path)
+            engine = create_engine(f"sqlite:///{path}")
+            create_schema(engine)
+
+        started = time.perf_counter()
+        rows = generate(engine, spec)
+        datasets.append(
+            {"factor": factor, "rows": rows, "generate_seconds": round(time.perf_counter() - started, 2)}
+        )
+        print(f"[{factor}x] generated {rows['products']} products, {rows['kpi_values']} kpi_values, "
+              f"{rows['test_metrics']} test_metrics in {datasets[-1]['generate_seconds']}s")
+
+        for name, fn in _endpoints(engine).items():
+            if only and not any(o in name for o in only):
+                continue
+            res = time_endpoint(engine, fn, repeat=repeat)
+            curves.setdefault(name, []).append({"factor": factor, "rows": rows, **res})
+            print(f"  {name:<24} p50 {res['p50_ms']:>10.2f} ms   p95 {res['p95_ms']:>10.2f} ms")
+        engine.dispose()
+
+    return {
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "dialect": "postgresql" if database_url and database_url.startswith("postgres") else "sqlite",
+        "base": vars(base),
+        "datasets": datasets,
+        "endpoints": {
+            name: {"points": points, "slope": scaling_slope(points)}
+            for name, points in curves.items()
+        },
+    }
+
+
+def _print_curves(document: dict) -> None:
+    factors = [d["factor"] for d in document["datasets"]]
+    header = "".join(f"{f'{f}x p50':>14}" for f in factors)
+    print(f"\n{'endpoint':<24}{header}{'slope':>9}")
+    for name, curve in document["endpoints"].items():
+        cells = "".join(f"{p['p50_ms']:>11.2f} ms" for p in curve["points"])
+        slope = curve["slope"]
+        print(f"{name:<24}{cells}{slope if slope is not None else '-':>9}")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="DB-scale benchmark of ranking, KPI, product and user lookups.")
+    parser.add_argument("--factors", default="1,10,100", help="Comma separated scale factors")
+    parser.add_argument("--products", type=int, default=DatasetSpec.products, help="Products at 1x")
+    parser.add_argument("--runs", type=int, default=DatasetSpec.runs_per_type, help="Runs per test type (not scaled)")
+    parser.add_argument("--users", type=int, default=DatasetSpec.users, help="Users at 1x")
+    parser.add_argument("--access-logs", type=int, default=DatasetSpec.access_logs, help="Access log rows at 1x")
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--only", action="append", help="Time only endpoints containing this substring")
+    parser.add_argument("--database-url", help="Target database (default: SQLite temp file per factor)")
+    parser.add_argument("--reset", action="store_true", help="Empty the generated tables before each factor")
+    parser.add_argument("--workdir", help="Directory for the SQLite files")
+    parser.add_argument("--output", help="Write the scaling curves as JSON")
+    args = parser.parse_args(argv)
+
+    if args.database_url and not args.reset:
+        parser.error("--database-url needs --reset: each factor must start from empty tables")
+
+    base = DatasetSpec(products=args.products, runs_per_type=args.runs, users=args.users, access_logs=args.access_logs)
+    factors = [int(f) for f in args.factors.split(",") if f.strip()]
+    document = run_scale(
+        factors=factors,
+        base=base,
+        repeat=args.repeat,
+        database_url=args.database_url,
+        reset=args.reset,
+        workdir=args.workdir,
+        only=args.only,
+    )
+    _print_curves(document)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as fh:
+            json.dump(document, fh, indent=2, sort_keys=True, default=str)
+        print(f"results written to {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,66 @@
+"""add composite_weight_profiles and composite_scores
+
+Revision ID: a8b9c0d1e2f3
+Revises: f6a7b8c9d0e1
+Create Date: 2026-10-19 20:00:00.000000
+
+Precomputed composite liner scores (weighted mean of the latest KPI scores) per
+weight profile and application; profile 0 uses KpiDef.weight. Fill the table
+once after upgrading with ``python -m app.scripts.refresh_composite_scores``;
+from then on it is refreshed together with KPI values and weights.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "a8b9c0d1e2f3"
+down_revision: Union[str, Sequence[str], None] = "f6a7b8c9d0e1"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "composite_weight_profiles",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("user_id", sa.Integer(), nullable=False),
+        sa.Column("name", sa.String(), nullable=False),
+        sa.Column("weights", sa.JSON(), nullable=False),
+        sa.Column("created_at", sa.DateTime(timezone=True), nullable=False),
+        sa.ForeignKeyConstraint(["user_id"], ["users.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("user_id", "name", name="uq_composite_weight_profile_user_name"),
+    )
+    op.create_index(
+        op.f("ix_composite_weight_profiles_user_id"),
+        "composite_weight_profiles",
+        ["user_id"],
+        unique=False,
+    )
+
+    op.create_table(
+        "composite_scores",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("profile_id", sa.Integer(), nullable=False),
+        sa.Column("product_application_id", sa.Integer(), nullable=False),
+        sa.Column("score", sa.Float(), nullable=False),
+        sa.Column("coverage", sa.Float(), nullable=False),
+        sa.Column("kpi_count", sa.Integer(), nullable=False),
+        sa.Column("computed_at", sa.DateTime(timezone=True), nullable=False),
+        sa.ForeignKeyConstraint(["product_application_id"], ["product_applications.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("profile_id", "product_application_id", name="ux_composite_scores_profile_application"),
+    )
+    op.create_index("ix_composite_scores_profile_score", "composite_scores", ["profile_id", "score"], unique=False)
+    op.create_index("ix_composite_scores_application", "composite_scores", ["product_application_id"], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index("ix_composite_scores_application", table_name="composite_scores")
+    op.drop_index("ix_composite_scores_profile_score", table_name="composite_scores")
+    op.drop_table("composite_scores")
+    op.drop_index(op.f("ix_composite_weight_profiles_user_id"), table_name="composite_weight_profiles")
+    op.drop_table("composite_weight_profiles")
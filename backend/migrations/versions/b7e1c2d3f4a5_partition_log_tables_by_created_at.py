@@ -0,0 +1,149 @@
+"""range-partition log tables by created_at (Postgres only)
+
+Revision ID: b7e1c2d3f4a5
+Revises: d1e2f3a4b5c6
+Create Date: 2026-10-19 09:00:00.000000
+
+On Postgres each log table is rebuilt as a table partitioned by RANGE (created_at).
+The existing table is attached as-is as the "<table>_p_legacy" partition
+(MINVALUE .. start of the next period), so no rows are copied. A DEFAULT
+partition catches rows outside the pre-created ranges. The retention job
+(app.scripts.cleanup_logs) then drops whole partitions and pre-creates new ones.
+
+Partition size follows LOG_PARTITION_INTERVAL ("day" or "week", default "day").
+SQLite is left untouched: retention there uses batched DELETEs.
+"""
+import os
+from datetime import datetime, timedelta
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "b7e1c2d3f4a5"
+down_revision: Union[str, Sequence[str], None] = "d1e2f3a4b5c6"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+LOG_TABLES = ("access_logs", "audit_logs", "login_events", "security_events")
+PRECREATE_PERIODS = 7
+
+
+def _interval() -> str:
+    value = os.getenv("LOG_PARTITION_INTERVAL", "day").strip().lower()
+    return value if value in ("day", "week") else "day"
+
+
+def _period_start(value: datetime, interval: str) -> datetime:
+    day = value.replace(hour=0, minute=0, second=0, microsecond=0)
+    if interval == "week":
+        return day - timedelta(days=day.weekday())
+    return day
+
+
+def _relkind(bind, table: str):
+    row = bind.execute(
+        sa.text("SELECT relkind FROM pg_class WHERE oid = to_regclass(:t)"), {"t": table}
+    ).first()
+    return row[0] if row else None
+
+
+def _partition_table(bind, table: str, interval: str) -> None:
+    legacy = f"{table}_p_legacy"
+    step = timedelta(days=7 if interval == "week" else 1)
+    boundary = _period_start(datetime.utcnow(), interval) + step
+
+    # Free the index/constraint names for the new parent table
+    for (index_name,) in bind.execute(
+        sa.text("SELECT indexname FROM pg_indexes WHERE tablename = :t"), {"t": table}
+    ).all():
+        op.execute(f'ALTER INDEX "{index_name}" RENAME TO "{index_name}_legacy"')
+    op.execute(f'ALTER TABLE "{table}" RENAME TO "{legacy}"')
+
+    op.execute(
+        f'CREATE TABLE "{table}" (LIKE "{legacy}" INCLUDING DEFAULTS INCLUDING CONSTRAINTS) '
+        f"PARTITION BY RANGE (created_at)"
+    )
+    # The id sequence must survive dropping the legacy partition
+    op.execute(f"ALTER SEQUENCE IF EXISTS {table}_id_seq OWNED BY \"{table}\".id")
+    # Partitioned primary keys must include the partition key
+    op.execute(f'ALTER TABLE "{table}" ADD CONSTRAINT "{table}_pkey" PRIMARY KEY (id, created_at)')
+    op.execute(
+        f'ALTER TABLE "{table}" ADD CONSTRAINT "{table}_user_id_fkey" '
+        f"FOREIGN KEY (user_id) REFERENCES users (id)"
+    )
+
+    # Recreate the secondary indexes on the parent (propagated to every partition)
+    for (index_def,) in bind.execute(
+        sa.text(
+            "SELECT indexdef FROM pg_indexes WHERE tablename = :t AND indexname NOT LIKE '%pkey%'"
+        ),
+        {"t": legacy},
+    ).all():
+        parent_def = (
+            index_def.replace("_legacy ON ", " ON ", 1)
+            .replace(f" ON public.{legacy} ", f" ON public.{table} ", 1)
+            .replace(f" ON {legacy} ", f" ON {table} ", 1)
+        )
+        op.execute(parent_def)
+
+    op.execute(
+        f'ALTER TABLE "{table}" ATTACH PARTITION "{legacy}" '
+        f"FOR VALUES FROM (MINVALUE) TO ('{boundary.isoformat(sep=' ')}')"
+    )
+    start = boundary
+    for _ in range(PRECREATE_PERIODS):
+        end = start + step
+        op.execute(
+            f'CREATE TABLE "{table}_p{start:%Y%m%d}" PARTITION OF "{table}" '
+            f"FOR VALUES FROM ('{start.isoformat(sep=' ')}') TO ('{end.isoformat(sep=' ')}')"
+        )
+        start = end
+    op.execute(f'CREATE TABLE "{table}_p_default" PARTITION OF "{table}" DEFAULT')
+
+
+def _unpartition_table(bind, table: str) -> None:
+    tmp = f"{table}_unpartitioned"
+    op.execute(f'CREATE TABLE "{tmp}" (LIKE "{table}" INCLUDING DEFAULTS INCLUDING CONSTRAINTS)')
+    op.execute(f'INSERT INTO "{tmp}" SELECT * FROM "{table}"')
+    op.execute(f"ALTER SEQUENCE IF EXISTS {table}_id_seq OWNED BY \"{tmp}\".id")
+    index_defs = [
+        row[0]
+        for row in bind.execute(
+            sa.text(
+                "SELECT indexdef FROM pg_indexes WHERE tablename = :t AND indexname NOT LIKE '%pkey%'"
+            ),
+            {"t": table},
+        ).all()
+    ]
+    op.execute(f'DROP TABLE "{table}" CASCADE')
+    op.execute(f'ALTER TABLE "{tmp}" RENAME TO "{table}"')
+    op.execute(f'ALTER TABLE "{table}" ADD CONSTRAINT "{table}_pkey" PRIMARY KEY (id)')
+    op.execute(
+        f'ALTER TABLE "{table}" ADD CONSTRAINT "{table}_user_id_fkey" '
+        f"FOREIGN KEY (user_id) REFERENCES users (id)"
+    )
+    for index_def in index_defs:
+        op.execute(index_def)
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    if bind.dialect.name != "postgresql":
+        return
+    interval = _interval()
+    for table in LOG_TABLES:
+        if _relkind(bind, table) == "r":
+            _partition_table(bind, table, interval)
+
+
+def downgrade() -> None:
+    bind = op.get_bind()
+    if bind.dialect.name != "postgresql":
+        return
+    for table in LOG_TABLES:
+        if _relkind(bind, table) == "p":
+            _unpartition_table(bind, table)
@@ -0,0 +1,52 @@
+"""add access_logs.route and route_latency_rollups
+
+Revision ID: b9c0d1e2f3a4
+Revises: a8b9c0d1e2f3
+Create Date: 2026-10-19 22:00:00.000000
+
+access_logs.route stores the matched route template of each request. The
+hourly per-route rollups are filled by ``python -m app.scripts.rollup_route_latency``
+(also run by cleanup_logs before raw rows are deleted); older rows without a
+template are grouped by their path with numeric segments replaced by ``{id}``.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "b9c0d1e2f3a4"
+down_revision: Union[str, Sequence[str], None] = "a8b9c0d1e2f3"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column("access_logs", sa.Column("route", sa.String(length=255), nullable=True))
+
+    op.create_table(
+        "route_latency_rollups",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("route", sa.String(length=255), nullable=False),
+        sa.Column("method", sa.String(length=10), nullable=False),
+        sa.Column("hour", sa.DateTime(), nullable=False),
+        sa.Column("count", sa.Integer(), nullable=False),
+        sa.Column("error_count", sa.Integer(), nullable=False),
+        sa.Column("duration_sum_ms", sa.Float(), nullable=False),
+        sa.Column("duration_max_ms", sa.Float(), nullable=False),
+        sa.Column("p50_ms", sa.Float(), nullable=False),
+        sa.Column("p95_ms", sa.Float(), nullable=False),
+        sa.Column("p99_ms", sa.Float(), nullable=False),
+        sa.Column("sketch", sa.JSON(), nullable=False),
+        sa.Column("computed_at", sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("route", "method", "hour", name="ux_route_latency_rollups_route_method_hour"),
+    )
+    op.create_index("ix_route_latency_rollups_hour", "route_latency_rollups", ["hour"], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index("ix_route_latency_rollups_hour", table_name="route_latency_rollups")
+    op.drop_table("route_latency_rollups")
+    op.drop_column("access_logs", "route")
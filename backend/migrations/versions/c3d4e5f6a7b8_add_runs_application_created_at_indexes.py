@@ -0,0 +1,52 @@
+"""add (product_application_id, created_at) indexes on run tables
+
+Revision ID: c3d4e5f6a7b8
+Revises: b7e1c2d3f4a5
+Create Date: 2026-10-19 12:00:00.000000
+
+Serve "latest run per application" lookups (single and batch) from one index
+scan instead of filtering by application and sorting by created_at.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "c3d4e5f6a7b8"
+down_revision: Union[str, Sequence[str], None] = "b7e1c2d3f4a5"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+RUN_TABLES = ("tpp_runs", "speed_runs", "massage_runs", "smt_hood_runs")
+
+
+def _index_name(table: str) -> str:
+    return f"ix_{table}_application_created_at"
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    dialect = bind.dialect.name
+    insp = sa.inspect(bind)
+
+    for table in RUN_TABLES:
+        name = _index_name(table)
+        if dialect == "sqlite":
+            op.execute(f"CREATE INDEX IF NOT EXISTS \"{name}\" ON {table}(product_application_id, created_at)")
+        elif not any(ix.get("name") == name for ix in insp.get_indexes(table)):
+            op.create_index(name, table, ["product_application_id", "created_at"], unique=False)
+
+
+def downgrade() -> None:
+    bind = op.get_bind()
+    dialect = bind.dialect.name
+
+    for table in reversed(RUN_TABLES):
+        name = _index_name(table)
+        if dialect == "sqlite":
+            op.execute(f"DROP INDEX IF EXISTS \"{name}\"")
+        else:
+            op.drop_index(name, table_name=table)
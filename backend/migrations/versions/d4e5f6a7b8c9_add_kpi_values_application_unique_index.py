@@ -0,0 +1,65 @@
+"""add per-application unique index on kpi_values for massage/smt_hood
+
+Revision ID: d4e5f6a7b8c9
+Revises: c3d4e5f6a7b8
+Create Date: 2026-10-19 14:00:00.000000
+
+MASSAGE and SMT_HOOD KPIs keep a single value per (application, kpi_code).
+The partial unique index is the ON CONFLICT target of the bulk upsert in
+app.services.kpi_persistence; duplicates left by the old SELECT-then-INSERT
+path are removed first, keeping the most recent row.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "d4e5f6a7b8c9"
+down_revision: Union[str, Sequence[str], None] = "c3d4e5f6a7b8"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+INDEX_NAME = "ux_kpi_values_application_kpi"
+SCOPED_WHERE = "run_type IN ('MASSAGE', 'SMT_HOOD')"
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    dialect = bind.dialect.name
+
+    op.execute(
+        f"""
+        DELETE FROM kpi_values
+        WHERE {SCOPED_WHERE}
+          AND id NOT IN (
+            SELECT MAX(id) FROM kpi_values
+            WHERE {SCOPED_WHERE}
+            GROUP BY product_application_id, kpi_code
+          )
+        """
+    )
+
+    if dialect == "sqlite":
+        op.execute(
+            f"CREATE UNIQUE INDEX IF NOT EXISTS \"{INDEX_NAME}\" "
+            f"ON kpi_values(product_application_id, kpi_code) WHERE {SCOPED_WHERE}"
+        )
+    elif not any(ix.get("name") == INDEX_NAME for ix in sa.inspect(bind).get_indexes("kpi_values")):
+        op.create_index(
+            INDEX_NAME,
+            "kpi_values",
+            ["product_application_id", "kpi_code"],
+            unique=True,
+            postgresql_where=sa.text(SCOPED_WHERE),
+        )
+
+
+def downgrade() -> None:
+    bind = op.get_bind()
+    if bind.dialect.name == "sqlite":
+        op.execute(f"DROP INDEX IF EXISTS \"{INDEX_NAME}\"")
+    else:
+        op.drop_index(INDEX_NAME, table_name="kpi_values")
@@ -0,0 +1,95 @@
+"""add typed context columns (flow_lpm, pressure_kpa, agg) to test_metrics/kpi_values
+
+Revision ID: e5f6a7b8c9d0
+Revises: d4e5f6a7b8c9
+Create Date: 2026-10-19 16:00:00.000000
+
+context_json stays (API output and unique keys); the typed copies are
+backfilled from it and indexed so per-flow / per-pressure lookups are index
+seeks instead of scans with string parsing.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "e5f6a7b8c9d0"
+down_revision: Union[str, Sequence[str], None] = "d4e5f6a7b8c9"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+TABLES = ("test_metrics", "kpi_values")
+INDEXES = (
+    ("test_metrics", "ix_test_metrics_pa_metric_flow", ["product_application_id", "metric_code", "flow_lpm"]),
+    ("test_metrics", "ix_test_metrics_pa_metric_pressure", ["product_application_id", "metric_code", "pressure_kpa"]),
+    ("kpi_values", "ix_kpi_values_pa_kpi_agg", ["product_application_id", "kpi_code", "agg"]),
+)
+
+
+def _columns() -> list[sa.Column]:
+    return [
+        sa.Column("flow_lpm", sa.Float(), nullable=True),
+        sa.Column("pressure_kpa", sa.Integer(), nullable=True),
+        sa.Column("agg", sa.String(), nullable=True),
+    ]
+
+
+def _backfill(table: str, dialect: str) -> None:
+    if dialect == "postgresql":
+        op.execute(
+            f"""
+            UPDATE {table} SET
+                flow_lpm = (context_json::jsonb ->> 'flow_lpm')::double precision,
+                pressure_kpa = (context_json::jsonb ->> 'pressure_kpa')::numeric::integer,
+                agg = context_json::jsonb ->> 'agg'
+            WHERE context_json LIKE '{{%'
+            """
+        )
+    else:
+        op.execute(
+            f"""
+            UPDATE {table} SET
+                flow_lpm = json_extract(context_json, '$.flow_lpm'),
+                pressure_kpa = json_extract(context_json, '$.pressure_kpa'),
+                agg = json_extract(context_json, '$.agg')
+            WHERE context_json IS NOT NULL AND json_valid(context_json)
+            """
+        )
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    dialect = bind.dialect.name
+    insp = sa.inspect(bind)
+
+    for table in TABLES:
+        existing = {c["name"] for c in insp.get_columns(table)}
+        for column in _columns():
+            if column.name not in existing:
+                op.add_column(table, column)
+        _backfill(table, dialect)
+
+    for table, name, cols in INDEXES:
+        if dialect == "sqlite":
+            op.execute(f"CREATE INDEX IF NOT EXISTS \"{name}\" ON {table}({', '.join(cols)})")
+        elif not any(ix.get("name") == name for ix in insp.get_indexes(table)):
+            op.create_index(name, table, cols, unique=False)
+
+
+def downgrade() -> None:
+    bind = op.get_bind()
+    dialect = bind.dialect.name
+
+    for table, name, _cols in reversed(INDEXES):
+        if dialect == "sqlite":
+            op.execute(f"DROP INDEX IF EXISTS \"{name}\"")
+        else:
+            op.drop_index(name, table_name=table)
+
+    for table in reversed(TABLES):
+        with op.batch_alter_table(table) as batch:
+            for column in ("agg", "pressure_kpa", "flow_lpm"):
+                batch.drop_column(column)
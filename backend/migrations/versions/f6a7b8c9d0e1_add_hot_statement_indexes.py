@@ -0,0 +1,57 @@
+"""add indexes for the ranking window, latest metric and failed-login counts
+
+Revision ID: f6a7b8c9d0e1
+Revises: e5f6a7b8c9d0
+Create Date: 2026-10-19 18:00:00.000000
+
+Flagged by benchmarks.query_plans:
+- the overview ranking takes the latest value per (KPI, application) for a few
+  KPI codes: with kpi_code leading it is a range seek per code, already in
+  window order, instead of a full pass over kpi_values;
+- the latest metric of an application (setting calculator) reads the first
+  row of (application, metric) in computed_at order instead of sorting;
+- the failed-login counts filter on (email | ip, success, created_at): the old
+  composite has ip between email and success, so only its first column was
+  usable and the planner picked between equivalent single-column indexes.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "f6a7b8c9d0e1"
+down_revision: Union[str, Sequence[str], None] = "e5f6a7b8c9d0"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+INDEXES = (
+    ("ix_kpi_values_kpi_pa_computed_at", "kpi_values", ["kpi_code", "product_application_id", "computed_at"]),
+    ("ix_test_metrics_pa_metric_computed_at", "test_metrics", ["product_application_id", "metric_code", "computed_at"]),
+    ("ix_login_events_email_success_created_at", "login_events", ["email_attempted", "success", "created_at"]),
+    ("ix_login_events_ip_success_created_at", "login_events", ["ip", "success", "created_at"]),
+)
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    dialect = bind.dialect.name
+    insp = sa.inspect(bind)
+
+    for name, table, columns in INDEXES:
+        if dialect == "sqlite":
+            op.execute(f"CREATE INDEX IF NOT EXISTS \"{name}\" ON {table}({', '.join(columns)})")
+        elif not any(ix.get("name") == name for ix in insp.get_indexes(table)):
+            op.create_index(name, table, columns, unique=False)
+
+
+def downgrade() -> None:
+    dialect = op.get_bind().dialect.name
+
+    for name, table, _columns in reversed(INDEXES):
+        if dialect == "sqlite":
+            op.execute(f"DROP INDEX IF EXISTS \"{name}\"")
+        else:
+            op.drop_index(name, table_name=table)
@@ -7,6 +7,7 @@ from sqlalchemy.pool import StaticPool
 from app.main import app 
 from app.db import get_session
 from app.auth import get_current_user  
+from app.services.setting_calculator.cache import clear_setting_calculator_caches
 
 
 from app.model.product import Product, ProductApplication
@@ -41,6 +42,7 @@ def session(engine):
         s.exec(text("DELETE FROM product_applications"))
         s.exec(text("DELETE FROM products"))
         s.commit()
+        clear_setting_calculator_caches()
 
         yield s
 
@@ -58,7 +60,7 @@ def client(session: Session):
 
     app.user_middleware = [
         m for m in app.user_middleware
-        if m.cls.__name__ != "GZipMiddleware"
+        if m.cls.__name__ != "CompressionMiddleware"
     ]
     app.middleware_stack = app.build_middleware_stack()
 
@@ -166,3 +168,44 @@ def test_api_compare_422_validation(client, session):
 
     r = client.post("/setting-calculator/compare", json=payload)
     assert r.status_code == 422
+
+
+def build_solve_payload(app_id: int):
+    payload = build_payload(app_id)
+    candidate = payload["right"]
+    candidate["inputs"]["frequencyBpm"] = 55.0
+    return {
+        "schemaVersion": "1.0",
+        "requestId": "test-solve",
+        "target": {"metric": "bRealMs"},
+        "reference": payload["left"],
+        "candidate": candidate,
+        "constraints": {"frequencyBpm": {"min": 45.0, "max": 70.0, "step": 1.0}},
+    }
+
+
+def test_api_solve_matches_reference(client, session):
+    app_id = seed_app(session)
+
+    r = client.post("/setting-calculator/solve", json=build_solve_payload(app_id))
+    assert r.status_code == 200
+
+    data = r.json()
+    assert data["withinTolerance"] is True
+    assert data["settings"]["frequencyBpm"] == pytest.approx(60.0)
+    # il risultato è quello del motore scalare per i settaggi trovati
+    assert data["result"]["derived"]["bRealMs"] == pytest.approx(data["achievedValue"])
+    assert data["result"]["inputsUsed"]["frequencyBpm"] == pytest.approx(60.0)
+
+
+def test_api_solve_422_target_and_ranges(client, session):
+    app_id = seed_app(session)
+    payload = build_solve_payload(app_id)
+    payload["target"]["value"] = 500.0
+    payload["constraints"]["frequencyBpm"] = {"min": 70.0, "max": 45.0}
+
+    r = client.post("/setting-calculator/solve", json=payload)
+    assert r.status_code == 422
+
+    paths = {f["path"] for f in r.json()["detail"]["error"]["fields"]}
+    assert paths == {"target.value", "constraints.frequencyBpm"}
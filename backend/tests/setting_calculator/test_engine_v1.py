@@ -93,3 +93,21 @@ def test_clamp_behavior():
 
     # bRealMs non deve mai superare tMs
     assert 0.0 <= result.derived.bRealMs <= result.derived.tMs
+
+
+def test_engine_core_is_slotted_and_response_is_built_once():
+    from app.services.setting_calculator.engine_v1 import compute_side, side_result_payload
+    from app.services.setting_calculator.validation_v1 import derive_side_inputs
+
+    inputs, _ = derive_side_inputs("left", make_inputs())
+    core = compute_side(make_liner(), inputs)
+
+    assert not hasattr(core, "__dict__")
+    payload = side_result_payload(core)
+    assert payload["derived"]["bRealMs"] == core.b_real_ms
+    assert [s["key"] for s in payload["charts"]["pulsatorPhases"]["segments"]] == ["A", "B", "C", "D"]
+
+
+def test_invalid_inputs_are_rejected_before_computing():
+    with pytest.raises(ValueError, match="phaseAMs"):
+        compute_side_result_v1(make_liner(), make_inputs(a=700.0))
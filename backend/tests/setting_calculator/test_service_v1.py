@@ -1,6 +1,15 @@
 import pytest
 from sqlmodel import SQLModel, Session, create_engine
 
+from app.services.setting_calculator import service as service_module
+from app.services.setting_calculator.cache import (
+    LinerInfoCache,
+    SideResultCache,
+    clear_setting_calculator_caches,
+    invalidate_liner_info,
+    invalidate_product_liner_info,
+    liner_info_cache,
+)
 from app.services.setting_calculator.service import compare_settings_v1
 from app.schema.setting_calculator.request_v1 import CompareRequestV1, SideRequestV1, UserInputsV1
 
@@ -21,8 +30,11 @@ def session():
             DbTestMetric.__table__,
         ],
     )
+    # Ogni test riparte da id 1: la cache in-process non deve sopravvivere
+    clear_setting_calculator_caches()
     with Session(engine) as session:
         yield session
+    clear_setting_calculator_caches()
 
 def seed_data(session):
     product = Product(code="T1", name="Test", model="ModelX", brand="BrandX")
@@ -92,3 +104,103 @@ def test_service_full_flow(session):
     assert response.left.liner.model == "ModelX"
     assert response.left.derived.deltaKpa == pytest.approx(32.0)
     assert response.diffPct.massageIntensity.pf == pytest.approx(0.0)
+
+
+def test_liner_info_is_cached_until_invalidated(session, monkeypatch):
+    app_id = seed_data(session)
+    builds = []
+    original = service_module._build_liner_info
+
+    def counting_build(s, pa_id):
+        builds.append(pa_id)
+        return original(s, pa_id)
+
+    monkeypatch.setattr(service_module, "_build_liner_info", counting_build)
+
+    first = compare_settings_v1(session, make_request(app_id))
+    second = compare_settings_v1(session, make_request(app_id))
+
+    assert builds == [app_id]
+    # Stesso liner + stessi input: il side result arriva dalla LRU
+    assert second.left is first.left
+
+    tpp = session.get(TppRun, 1)
+    tpp.real_tpp = 14.0
+    session.add(tpp)
+    session.commit()
+    invalidate_liner_info(app_id)
+
+    third = compare_settings_v1(session, make_request(app_id))
+
+    assert builds == [app_id, app_id]
+    assert third.left.liner.tppKpa == pytest.approx(14.0)
+    assert third.left is not first.left
+
+
+def test_product_invalidation_drops_its_applications(session):
+    app_id = seed_data(session)
+    compare_settings_v1(session, make_request(app_id))
+    assert liner_info_cache.get(app_id) is not None
+
+    invalidate_product_liner_info(session.get(ProductApplication, app_id).product_id)
+
+    assert liner_info_cache.get(app_id) is None
+
+
+def test_invalidation_during_build_skips_the_store(session, monkeypatch):
+    app_id = seed_data(session)
+    build = service_module._build_liner_info
+
+    def build_then_invalidate(s, pa_id):
+        # il compute committa mentre la richiesta legge ancora le righe vecchie
+        liner = build(s, pa_id)
+        invalidate_liner_info(pa_id)
+        return liner
+
+    monkeypatch.setattr(service_module, "_build_liner_info", build_then_invalidate)
+    compare_settings_v1(session, make_request(app_id))
+    assert liner_info_cache.get(app_id) is None
+
+    monkeypatch.setattr(service_module, "_build_liner_info", build)
+    compare_settings_v1(session, make_request(app_id))
+    assert liner_info_cache.get(app_id) is not None
+
+
+def test_missing_data_errors_are_not_cached(session):
+    from fastapi import HTTPException
+
+    with pytest.raises(HTTPException):
+        compare_settings_v1(session, make_request(999))
+
+    assert liner_info_cache.get(999) is None
+
+
+def test_liner_cache_ttl_and_bounds(monkeypatch):
+    from app.schema.setting_calculator.response_v1 import LinerInfoV1
+
+    liner = LinerInfoV1(id=1, model="M", brand="B", tppKpa=10.0, intensityPfKpa=20.0, intensityOmKpa=15.0)
+    cache = LinerInfoCache(max_entries=2, ttl_seconds=30)
+    v1 = cache.put(1, liner)
+    cache.put(2, liner)
+    cache.put(3, liner)
+
+    assert cache.get(1) is None
+    assert cache.get(3)[0] > v1
+
+    clock = {"now": 0.0}
+    monkeypatch.setattr("app.common.lru_cache.time.monotonic", lambda: clock["now"])
+    cache.put(4, liner)
+    clock["now"] = 31.0
+    assert cache.get(4) is None
+
+
+def test_side_result_cache_is_a_bounded_lru():
+    cache = SideResultCache(max_entries=2)
+    cache.put(("a",), "A")
+    cache.put(("b",), "B")
+    cache.get(("a",))
+    cache.put(("c",), "C")
+
+    assert cache.get(("b",)) is None
+    assert cache.get(("a",)) == "A"
+    assert cache.stats()["size"] == 2
@@ -0,0 +1,127 @@
+import numpy as np
+import pytest
+
+from app.schema.setting_calculator.request_v1 import UserInputsV1
+from app.schema.setting_calculator.response_v1 import LinerInfoV1
+from app.services.setting_calculator.engine_v1 import compute_side
+from app.services.setting_calculator.solver_v1 import (
+    PARAMS,
+    evaluate_grid,
+    metric_value,
+    search_settings,
+)
+from app.services.setting_calculator.validation_v1 import derive_side_inputs
+
+
+METRICS = [
+    "bRealMs",
+    "realOffMs",
+    "appliedVacuum.pf",
+    "appliedVacuum.om",
+    "massageIntensity.pf",
+    "massageIntensity.om",
+]
+
+
+def make_liner(tpp=10.0):
+    return LinerInfoV1(id=1, model="TestLiner", brand="TestBrand", tppKpa=tpp, intensityPfKpa=20.0, intensityOmKpa=15.0)
+
+
+def make_inputs(freq=60.0, ratio=60.0, a=150.0, c=150.0, max_kpa=42.0):
+    return UserInputsV1(
+        milkingVacuumMaxKpa=max_kpa,
+        pfVacuumKpa=38.0,
+        omVacuumKpa=30.0,
+        omDurationSec=60.0,
+        frequencyBpm=freq,
+        ratioPct=ratio,
+        phaseAMs=a,
+        phaseCMs=c,
+    )
+
+
+def side(inputs):
+    side_inputs, errs = derive_side_inputs("candidate", inputs)
+    assert errs == []
+    return side_inputs
+
+
+@pytest.mark.parametrize("metric", METRICS)
+@pytest.mark.parametrize("tpp", [10.0, 50.0, 0.0])
+def test_evaluate_grid_matches_scalar_engine(metric, tpp):
+    liner = make_liner(tpp=tpp)
+    base = side(make_inputs())
+    settings = [(55.0, 60.0, 150.0, 150.0), (62.0, 65.0, 120.0, 200.0), (48.0, 55.0, 90.0, 100.0)]
+    freq, ratio, a_ms, c_ms = (np.array(col) for col in zip(*settings))
+
+    values, feasible = evaluate_grid(metric, liner, base, freq, ratio, a_ms, c_ms)
+
+    assert feasible.all()
+    for value, (f, r, a, c) in zip(values, settings):
+        expected = metric_value(metric, compute_side(liner, side(make_inputs(f, r, a, c))))
+        assert value == pytest.approx(expected)
+
+
+def test_evaluate_grid_flags_infeasible_phases():
+    base = side(make_inputs())
+    # f=60, ratio=60: ON=600 ms, OFF=400 ms -> A=700 e C=500 sforano
+    values, feasible = evaluate_grid(
+        "bRealMs", make_liner(), base,
+        np.array([60.0, 60.0, 60.0]), np.array([60.0, 60.0, 60.0]),
+        np.array([150.0, 700.0, 150.0]), np.array([150.0, 150.0, 500.0]),
+    )
+    assert feasible.tolist() == [True, False, False]
+
+
+def test_search_reaches_target_within_ranges_and_step():
+    liner = make_liner()
+    target = metric_value("bRealMs", compute_side(liner, side(make_inputs(freq=58.0, ratio=63.0))))
+    base = side(make_inputs())
+    start = {"frequencyBpm": 60.0, "ratioPct": 60.0, "phaseAMs": 150.0, "phaseCMs": 150.0}
+    ranges = {"frequencyBpm": (50.0, 70.0, 1.0), "ratioPct": (55.0, 70.0, 1.0)}
+
+    outcome = search_settings(
+        "bRealMs", target, liner, base, start, ranges,
+        tolerance=0.005, max_iterations=6, grid_size=9,
+    )
+
+    assert outcome is not None
+    assert outcome.error <= 0.005
+    assert 50.0 <= outcome.settings["frequencyBpm"] <= 70.0
+    assert 55.0 <= outcome.settings["ratioPct"] <= 70.0
+    assert outcome.settings["frequencyBpm"] == pytest.approx(round(outcome.settings["frequencyBpm"]))
+    assert outcome.settings["ratioPct"] == pytest.approx(round(outcome.settings["ratioPct"]))
+    # i parametri senza range restano fissi
+    assert outcome.settings["phaseAMs"] == 150.0
+    assert outcome.settings["phaseCMs"] == 150.0
+    assert 1 <= outcome.iterations <= 6
+    assert outcome.evaluations > 0
+
+
+def test_search_prefers_setting_closest_to_start():
+    liner = make_liner()
+    base = side(make_inputs())
+    start = {"frequencyBpm": 60.0, "ratioPct": 60.0, "phaseAMs": 150.0, "phaseCMs": 150.0}
+    target = metric_value("bRealMs", compute_side(liner, base))
+
+    outcome = search_settings(
+        "bRealMs", target, liner, base, start, {name: (10.0, 90.0, 1.0) for name in PARAMS[:2]},
+        tolerance=0.005, max_iterations=6, grid_size=9,
+    )
+
+    # il punto di partenza centra già il target: non deve spostarsi
+    assert outcome.settings == start
+    assert outcome.error == pytest.approx(0.0)
+
+
+def test_search_returns_none_when_nothing_is_feasible():
+    base = side(make_inputs())
+    start = {"frequencyBpm": 60.0, "ratioPct": 60.0, "phaseAMs": 150.0, "phaseCMs": 150.0}
+
+    # A tra 800 e 900 ms non sta mai nell'ON di 600 ms
+    outcome = search_settings(
+        "bRealMs", 500.0, make_liner(), base, start, {"phaseAMs": (800.0, 900.0, None)},
+        tolerance=0.005, max_iterations=3, grid_size=5,
+    )
+
+    assert outcome is None
@@ -57,3 +57,19 @@ def test_phaseA_exceeds_on():
     errors = validate_compare_request(left, right)
 
     assert any("phaseAMs" in e.path for e in errors)
+
+
+def test_derive_side_inputs_returns_derived_phases_in_the_same_pass():
+    from app.services.setting_calculator.validation_v1 import derive_side_inputs
+
+    inputs, errors = derive_side_inputs("left", make_inputs())
+
+    assert errors == []
+    assert (inputs.t_ms, inputs.on_ms, inputs.off_ms) == pytest.approx((1000.0, 600.0, 400.0))
+    assert (inputs.b_ms, inputs.d_ms) == pytest.approx((450.0, 250.0))
+    # chiave della LRU dei side result
+    assert hash(inputs) == hash(derive_side_inputs("right", make_inputs())[0])
+
+    invalid, errors = derive_side_inputs("left", make_inputs(c=500.0))
+    assert invalid is None
+    assert [e.path for e in errors] == ["left.inputs.phaseCMs"]
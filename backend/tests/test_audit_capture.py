@@ -0,0 +1,112 @@
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+from sqlalchemy.pool import StaticPool
+from sqlmodel import Session, SQLModel, create_engine, select
+from datetime import datetime
+
+from app.middleware_audit import AuditBodyCapture, AuditBodyCaptureMiddleware
+from app.model.access_log import AccessLog
+from app.model.audit_log import AuditLog
+from app.model.user import User
+from app.services.log_writer import RequestLogEntry, RequestLogWriter
+
+
+def build_app(*, max_bytes=64):
+    app = FastAPI()
+    app.add_middleware(AuditBodyCaptureMiddleware, max_bytes=max_bytes)
+    captured = {}
+
+    @app.post("/echo")
+    async def echo(request: Request):
+        body = await request.json()
+        captured["capture"] = request.state.audit_capture
+        return {"keys": sorted(body.keys())}
+
+    @app.post("/ignore")
+    async def ignore(request: Request):
+        captured["capture"] = request.state.audit_capture
+        return {"ok": True}
+
+    return app, captured
+
+
+def test_capture_tees_body_without_consuming_it():
+    app, captured = build_app()
+    client = TestClient(app)
+
+    response = client.post("/echo", json={"email": "a@b.c", "password": "secret"})
+
+    assert response.status_code == 200
+    assert response.json() == {"keys": ["email", "password"]}
+    assert captured["capture"].payload() == {"email": "a@b.c", "password": "secret"}
+
+
+def test_capture_marks_large_body_as_truncated():
+    app, captured = build_app(max_bytes=8)
+    client = TestClient(app)
+
+    response = client.post("/echo", json={"email": "someone@example.com"})
+
+    assert response.status_code == 200
+    payload = captured["capture"].payload()
+    assert payload["_truncated"] is True
+    assert payload["max_bytes"] == 8
+    assert captured["capture"].chunks == []
+
+
+def test_capture_reports_body_never_read_by_handler():
+    app, captured = build_app()
+    client = TestClient(app)
+
+    client.post("/ignore", json={"a": 1})
+
+    assert captured["capture"].payload()["_body_not_read"] is True
+
+
+def test_capture_redacts_form_values():
+    capture = AuditBodyCapture(
+        content_type="application/x-www-form-urlencoded",
+        content_length=None,
+        max_bytes=64,
+    )
+    capture.feed(b"username=a%40b.c&", True)
+    capture.feed(b"password=secret", False)
+
+    assert capture.payload() == {"username": "***REDACTED***", "password": "***REDACTED***"}
+
+
+def test_log_writer_persists_access_and_redacted_audit_rows():
+    engine = create_engine(
+        "sqlite://",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    SQLModel.metadata.create_all(engine, tables=[User.__table__, AccessLog.__table__, AuditLog.__table__])
+    capture = AuditBodyCapture(content_type="application/json", content_length=None, max_bytes=1024)
+    capture.feed(b'{"email": "a@b.c", "password": "secret"}', False)
+
+    writer = RequestLogWriter(engine=engine, async_mode=True)
+    writer.submit(
+        RequestLogEntry(
+            request_id="req-1",
+            user_id=None,
+            method="POST",
+            path="/auth/login",
+            status_code=200,
+            ip="203.0.113.10",
+            country=None,
+            region=None,
+            city=None,
+            user_agent="pytest",
+            duration_ms=12.5,
+            created_at=datetime(2024, 1, 1),
+            audit=True,
+            audit_capture=capture,
+        )
+    )
+    writer.flush()
+
+    with Session(engine) as session:
+        assert len(session.exec(select(AccessLog)).all()) == 1
+        audit = session.exec(select(AuditLog)).one()
+        assert audit.request_json == {"email": "a@b.c", "password": "***REDACTED***"}
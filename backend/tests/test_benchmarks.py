@@ -0,0 +1,70 @@
+import pytest
+
+from benchmarks.cases import CASES
+from benchmarks.runner import compare, run_case
+
+
+@pytest.mark.parametrize("name", sorted(CASES))
+def test_benchmark_case_runs(name):
+    fn = CASES[name]()
+    fn()
+
+
+def test_run_case_reports_throughput_and_allocations():
+    res = run_case("kpi_engine.massage_compute_derivatives", rounds=1, min_time=0.001, alloc_calls=5)
+
+    assert res["ops_per_sec"] > 0
+    assert res["bytes_per_call"] >= 0
+
+
+def test_compare_flags_slowdown_and_allocation_growth():
+    baseline = {"results": {"case": {"ops_per_sec": 1000.0, "bytes_per_call": 100.0}}}
+
+    assert compare({"case": {"ops_per_sec": 950.0, "bytes_per_call": 100.0}}, baseline, 20) == []
+    regressions = compare({"case": {"ops_per_sec": 500.0, "bytes_per_call": 200.0}}, baseline, 20)
+    assert len(regressions) == 2
+
+
+def test_synthetic_dataset_counts_follow_the_spec(tmp_path):
+    from sqlmodel import create_engine
+
+    from benchmarks.dataset import DatasetSpec, create_schema, generate
+
+    engine = create_engine(f"sqlite:///{tmp_path / 'synthetic.db'}")
+    create_schema(engine)
+    rows = generate(engine, DatasetSpec(products=3, runs_per_type=2, users=4, access_logs=20))
+
+    assert rows["products"] == 3
+    assert rows["product_applications"] == 12
+    assert rows["tpp_runs"] == rows["massage_runs"] == 24
+    assert rows["massage_points"] == 72
+    # TPP/SPEED keep a KPI per run, MASSAGE/SMT_HOOD only for the latest run
+    assert rows["kpi_values"] == 12 * (2 * 2 + 3 + 4)
+    assert rows["access_logs"] == 20
+
+    # A second pass appends without id or unique-key collisions
+    more = generate(engine, DatasetSpec(products=2, runs_per_type=1, users=2, access_logs=0, seed=7))
+    assert more["products"] == 2
+
+
+def test_scale_run_reports_a_curve_per_endpoint(tmp_path):
+    from benchmarks.dataset import DatasetSpec
+    from benchmarks.scale import run_scale
+
+    document = run_scale(
+        factors=[1, 2],
+        base=DatasetSpec(products=2, runs_per_type=1, users=3, access_logs=10),
+        repeat=2,
+        workdir=str(tmp_path),
+    )
+
+    assert set(document["endpoints"]) == {
+        "rankings.overview",
+        "kpis.values_batch",
+        "products.list",
+        "products.list_search",
+        "users.lookup_email",
+    }
+    curve = document["endpoints"]["rankings.overview"]
+    assert [p["factor"] for p in curve["points"]] == [1, 2]
+    assert curve["points"][1]["rows"]["products"] == 4
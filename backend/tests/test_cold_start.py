@@ -0,0 +1,31 @@
+import sys
+
+from benchmarks.cold_start import COLD_START_BUDGET_MS, parse_importtime, profile_cold_start
+from app.services import request_geo
+
+
+def test_parse_importtime():
+    stderr = "\n".join([
+        "import time: self [us] | cumulative | imported package",
+        "import time:       310 |        310 |     _csv",
+        "import time:      1200 |       5000 | app.main",
+        "unrelated line",
+    ])
+
+    assert parse_importtime(stderr) == [
+        {"module": "_csv", "self_ms": 0.31, "cumulative_ms": 0.31},
+        {"module": "app.main", "self_ms": 1.2, "cumulative_ms": 5.0},
+    ]
+
+
+def test_cold_start_stays_within_budget_without_heavy_imports():
+    res = profile_cold_start()
+
+    assert res["status"] == 200
+    assert res["lazy_loaded"] == []
+    assert res["cold_start_ms"] < COLD_START_BUDGET_MS, res
+
+
+def test_geoip2_loads_on_first_use():
+    # None se geoip2 non è installato; altrimenti il modulo, importato ora
+    assert request_geo._geoip2() is sys.modules.get("geoip2.database")
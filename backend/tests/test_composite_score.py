@@ -0,0 +1,171 @@
+import pytest
+import sqlalchemy as sa
+from fastapi.testclient import TestClient
+from sqlalchemy.pool import StaticPool
+from sqlmodel import Session, SQLModel, create_engine, select
+
+from app.auth import get_current_user
+from app.common.enums import FormulaType, TestKind, UserRole
+from app.db import get_session
+from app.main import app
+from app.model.kpi import CompositeScore, CompositeWeightProfile, KpiDef, KpiValue
+from app.model.product import Product, ProductApplication
+from app.model.user import User
+from app.services.composite_score import composite_score, delete_user_profile_scores, refresh_composite_scores
+
+
+ADMIN = User(id=1, email="admin@example.com", hashed_password="-", role=UserRole.ADMIN)
+VIEWER = User(id=2, email="viewer@example.com", hashed_password="-", role=UserRole.USER)
+
+# (brand, model, only_admin, reference_areas, {kpi_code: score})
+LINERS = [
+    ("MI", "Alpha", False, ["Global"], {"CLOSURE": 4, "SPEED": 2}),
+    ("XX", "Beta", False, ["Europe"], {"CLOSURE": 3, "SPEED": 4}),
+    ("YY", "Gamma", True, ["Global"], {"CLOSURE": 4, "SPEED": 4}),
+    ("ZZ", "Delta", False, ["China"], {"CLOSURE": 1}),
+]
+
+
+@pytest.fixture
+def engine():
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    SQLModel.metadata.create_all(
+        engine,
+        tables=[
+            User.__table__,
+            Product.__table__,
+            ProductApplication.__table__,
+            KpiDef.__table__,
+            KpiValue.__table__,
+            CompositeWeightProfile.__table__,
+            CompositeScore.__table__,
+        ],
+    )
+    with Session(engine) as s:
+        s.add_all([
+            User(id=1, email=ADMIN.email, hashed_password="-", role=UserRole.ADMIN),
+            User(id=2, email=VIEWER.email, hashed_password="-", role=UserRole.USER),
+        ])
+        for code, weight in (("CLOSURE", 3.0), ("SPEED", 1.0)):
+            s.add(KpiDef(code=code, name=code, test_type_code=TestKind.TPP, formula_type=FormulaType.PY,
+                         formula_text="-", weight=weight))
+        for i, (brand, model, only_admin, areas, scores) in enumerate(LINERS, start=1):
+            s.add(Product(id=i, code=f"P{i}", name=model, brand=brand, model=model,
+                          only_admin=only_admin, reference_areas=areas))
+            s.add(ProductApplication(id=i, product_id=i, size_mm=60))
+            s.flush()
+            for code, score in scores.items():
+                s.add(KpiValue(run_type="TPP", run_id=i, product_application_id=i, kpi_code=code,
+                               value_num=float(score), score=score, context_json=code))
+        s.commit()
+    return engine
+
+
+@pytest.fixture
+def client(engine):
+    def override_get_session():
+        with Session(engine) as session:
+            yield session
+
+    app.dependency_overrides[get_session] = override_get_session
+    app.dependency_overrides[get_current_user] = lambda: VIEWER
+    yield TestClient(app)
+    app.dependency_overrides.clear()
+
+
+def top(response, size="M"):
+    item = next(i for i in response.json()["items"] if i["teat_size"] == size)
+    return [(row["model"], row["score"], row["coverage"]) for row in item["top"]]
+
+
+def test_composite_score_is_a_weighted_mean_with_coverage():
+    assert composite_score({"A": 4, "B": 2}, {"A": 3.0, "B": 1.0}) == {"score": 3.5, "coverage": 1.0, "kpi_count": 2}
+    assert composite_score({"A": 2}, {"A": 1.0, "B": 3.0}) == {"score": 2.0, "coverage": 0.25, "kpi_count": 1}
+    assert composite_score({"C": 4}, {"A": 1.0}) is None
+
+
+def test_composite_ranking_reads_precomputed_scores_only(engine, client):
+    with Session(engine) as s:
+        assert refresh_composite_scores(s) == 4
+        s.commit()
+
+    statements = []
+
+    def record(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    sa.event.listen(engine, "before_cursor_execute", record)
+    try:
+        response = client.get("/rankings/composite", params={"teat_sizes": "M", "reference_areas": "Europe"})
+    finally:
+        sa.event.remove(engine, "before_cursor_execute", record)
+
+    assert response.status_code == 200
+    # only_admin nascosto agli utenti, Delta (solo China) escluso dal filtro Europe
+    assert top(response) == [("Alpha", 3.5, 1.0), ("Beta", 3.25, 1.0)]
+    assert not any("kpi_values" in statement for statement in statements)
+
+    app.dependency_overrides[get_current_user] = lambda: ADMIN
+    admin = client.get("/rankings/composite", params={"teat_sizes": "M"})
+    assert [model for model, _, _ in top(admin)] == ["Gamma", "Alpha", "Beta", "Delta"]
+
+
+def test_weight_changes_and_profiles_refresh_scores(engine, client):
+    with Session(engine) as s:
+        refresh_composite_scores(s)
+        s.commit()
+
+    saved = client.post("/rankings/composite/profiles", json={"name": "speed first", "weights": {"speed": 1, "closure": 0}})
+    assert saved.status_code == 200
+    profile_id = saved.json()["id"]
+    by_speed = client.get("/rankings/composite", params={"teat_sizes": "M", "profile_id": profile_id})
+    assert top(by_speed) == [("Beta", 4.0, 1.0), ("Alpha", 2.0, 1.0)]
+
+    app.dependency_overrides[get_current_user] = lambda: ADMIN
+    assert client.get("/rankings/composite", params={"profile_id": profile_id}).status_code == 404
+    kpi = {"code": "SPEED", "name": "SPEED", "test_type_code": "TPP", "formula_type": "PY", "formula_text": "-", "weight": 0}
+    assert client.post("/kpis/", json=kpi).status_code == 200
+    only_closure = client.get("/rankings/composite", params={"teat_sizes": "M"})
+    # a parità di punteggio e copertura MI viene prima
+    assert [(model, score) for model, score, _ in top(only_closure)] == [
+        ("Alpha", 4.0), ("Gamma", 4.0), ("Beta", 3.0), ("Delta", 1.0),
+    ]
+
+    app.dependency_overrides[get_current_user] = lambda: VIEWER
+    assert client.delete(f"/rankings/composite/profiles/{profile_id}").status_code == 204
+    with Session(engine) as s:
+        assert s.exec(select(CompositeScore).where(CompositeScore.profile_id == profile_id)).all() == []
+
+
+def test_per_application_refresh_drops_scores_without_weighted_kpis(engine):
+    with Session(engine) as s:
+        refresh_composite_scores(s)
+        s.commit()
+        s.exec(sa.delete(KpiValue).where(KpiValue.product_application_id == 4))
+        refresh_composite_scores(s, [4])
+        s.commit()
+
+        assert sorted(s.exec(select(CompositeScore.product_application_id)).all()) == [1, 2, 3]
+
+
+def test_scores_of_deleted_user_profiles_are_removed(engine):
+    with Session(engine) as s:
+        s.add_all([
+            CompositeWeightProfile(id=10, user_id=2, name="speed", weights={"SPEED": 1}),
+            CompositeWeightProfile(id=11, user_id=1, name="closure", weights={"CLOSURE": 1}),
+        ])
+        s.commit()
+        refresh_composite_scores(s)
+        s.commit()
+        assert delete_user_profile_scores(s, 2) == 3
+        s.exec(sa.delete(User).where(User.id == 2))  # i profili seguono la cascade
+        s.commit()
+        assert set(s.exec(select(CompositeScore.profile_id)).all()) == {0, 11}
+
+        # profilo sparito senza passare dal delete dell'utente: lo ripulisce il refresh completo
+        s.exec(sa.delete(CompositeWeightProfile).where(CompositeWeightProfile.id == 11))
+        s.commit()
+        assert set(s.exec(select(CompositeScore.profile_id)).all()) == {0, 11}
+        refresh_composite_scores(s)
+        s.commit()
+        assert set(s.exec(select(CompositeScore.profile_id)).all()) == {0}
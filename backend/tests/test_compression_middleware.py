@@ -0,0 +1,119 @@
+import gzip
+import os
+
+import pytest
+from fastapi import FastAPI, Response
+from fastapi.responses import StreamingResponse
+from fastapi.testclient import TestClient
+
+from app.middleware_compression import (
+    CompressedResponseCache,
+    CompressionMiddleware,
+    compression_stats,
+    negotiate_encoding,
+)
+
+
+ROWS = [{"kpi_code": "CLOSURE", "size_mm": 20 + i % 4, "score": i % 5} for i in range(200)]
+
+
+@pytest.fixture
+def client():
+    app = FastAPI()
+    app.add_middleware(CompressionMiddleware, minimum_size=500, cache=CompressedResponseCache(max_bytes=1 << 20))
+    compression_stats.reset()
+
+    @app.get("/rankings")
+    def rankings():
+        return ROWS
+
+    @app.get("/tiny")
+    def tiny():
+        return {"ok": True}
+
+    @app.get("/noise")
+    def noise():
+        return Response(content=os.urandom(8192), media_type="text/plain")
+
+    @app.get("/private")
+    def private(response: Response):
+        response.headers["Cache-Control"] = "no-store"
+        return ROWS
+
+    @app.get("/export")
+    def export():
+        return StreamingResponse((f"{r['kpi_code']},{r['score']}\n" for r in ROWS), media_type="text/csv")
+
+    return TestClient(app)
+
+
+def test_negotiation_honours_q_values_and_server_preference():
+    supported = ("br", "zstd", "gzip")
+
+    assert negotiate_encoding("gzip, deflate, br, zstd", supported) == "br"
+    assert negotiate_encoding("br;q=0.5, gzip", supported) == "gzip"
+    assert negotiate_encoding("*;q=0.1, br;q=0", supported) == "zstd"
+    assert negotiate_encoding("identity", supported) is None
+    assert negotiate_encoding(None, supported) is None
+
+
+def test_cacheable_response_is_compressed_once_and_revalidated(client):
+    first = client.get("/rankings", headers={"Accept-Encoding": "gzip"})
+    second = client.get("/rankings", headers={"Accept-Encoding": "gzip"})
+
+    assert first.headers["content-encoding"] == "gzip"
+    assert first.json() == ROWS and second.json() == ROWS
+    assert first.headers["vary"] == "Accept-Encoding"
+    assert first.headers["etag"] == second.headers["etag"]
+    stats = compression_stats.stats()
+    assert stats["cache_misses"] == 1 and stats["cache_hits"] == 1
+    assert stats["by_encoding"]["gzip"]["bytes_out"] < stats["by_encoding"]["gzip"]["bytes_in"]
+
+    revalidated = client.get("/rankings", headers={"Accept-Encoding": "gzip", "If-None-Match": first.headers["etag"]})
+    assert revalidated.status_code == 304
+    assert revalidated.content == b""
+    assert compression_stats.stats()["not_modified"] == 1
+
+
+def test_small_incompressible_and_private_payloads(client):
+    tiny = client.get("/tiny", headers={"Accept-Encoding": "gzip"})
+    noise = client.get("/noise", headers={"Accept-Encoding": "gzip"})
+    private = client.get("/private", headers={"Accept-Encoding": "gzip"})
+
+    assert "content-encoding" not in tiny.headers
+    assert "content-encoding" not in noise.headers and len(noise.content) == 8192
+    assert private.headers["content-encoding"] == "gzip" and "etag" not in private.headers
+    stats = compression_stats.stats()
+    assert stats["skipped_small"] == 1
+    assert stats["skipped_incompressible"] == 1
+    assert stats["uncached"] == 1
+
+
+def test_streaming_response_is_compressed_incrementally(client):
+    with client.stream("GET", "/export", headers={"Accept-Encoding": "gzip"}) as response:
+        raw = b"".join(response.iter_raw())
+
+    assert response.headers["content-encoding"] == "gzip"
+    assert "content-length" not in response.headers
+    assert gzip.decompress(raw).decode().splitlines()[:2] == ["CLOSURE,0", "CLOSURE,1"]
+    assert compression_stats.stats()["streamed"] == 1
+
+
+def test_without_accept_encoding_bodies_are_sent_as_is(client):
+    response = client.get("/rankings", headers={"Accept-Encoding": "identity"})
+
+    assert "content-encoding" not in response.headers
+    assert response.json() == ROWS
+    assert response.headers["etag"].startswith('W/"')
+
+
+def test_cache_is_bounded_in_bytes():
+    cache = CompressedResponseCache(max_bytes=10)
+    cache.put(("a", "gzip"), b"12345", 0.1)
+    cache.put(("b", "gzip"), b"123456", 0.1)
+    cache.put(("c", "gzip"), None, 0.1)
+
+    assert cache.get(("a", "gzip")) is None
+    assert cache.get(("b", "gzip")) == (b"123456", 0.1)
+    assert cache.get(("c", "gzip")) == (None, 0.1)
+    assert cache.stats()["bytes"] == 6
@@ -0,0 +1,132 @@
+import json
+
+import pytest
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.pool import StaticPool
+from sqlmodel import Session, SQLModel, create_engine, select
+
+from app.model.kpi import KpiValue, TestMetric
+from app.model.product import Product, ProductApplication
+from app.services import kpi_persistence
+from app.services.kpi_persistence import upsert_kpi_values, upsert_test_metrics
+
+
+@pytest.fixture
+def engine():
+    engine = create_engine(
+        "sqlite://",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    SQLModel.metadata.create_all(
+        engine,
+        tables=[
+            Product.__table__,
+            ProductApplication.__table__,
+            TestMetric.__table__,
+            KpiValue.__table__,
+        ],
+    )
+    with Session(engine) as s:
+        product = Product(code="P1", name="Liner", brand="MI", model="M1")
+        s.add(product)
+        s.commit()
+        s.add(ProductApplication(id=1, product_id=product.id, size_mm=50))
+        s.commit()
+    return engine
+
+
+def kpi(run_type, run_id, code, value, score=2, ctx=None):
+    return dict(
+        run_type=run_type,
+        run_id=run_id,
+        product_application_id=1,
+        kpi_code=code,
+        value_num=value,
+        score=score,
+        unit=None,
+        context_json=json.dumps(ctx or {"agg": "final"}),
+    )
+
+
+def count_inserts(engine, fn):
+    statements = []
+
+    def record(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    sa.event.listen(engine, "before_cursor_execute", record)
+    try:
+        fn()
+    finally:
+        sa.event.remove(engine, "before_cursor_execute", record)
+    return [s for s in statements if s.lstrip().upper().startswith("INSERT")]
+
+
+def test_test_metrics_upsert_is_idempotent_in_one_statement(engine):
+    def metrics(value):
+        return [
+            dict(run_type="SMT_HOOD", run_id=7, product_application_id=1, metric_code="RESPRAY_VAL",
+                 value_num=value + fl, unit="kPa", context_json=json.dumps({"flow_lpm": fl}))
+            for fl in (0.5, 1.9, 3.6)
+        ]
+
+    with Session(engine) as s:
+        inserts = count_inserts(engine, lambda: upsert_test_metrics(s, metrics(1.0)))
+        upsert_test_metrics(s, metrics(10.0))
+        s.commit()
+        rows = s.exec(select(TestMetric).order_by(TestMetric.id)).all()
+
+    assert len(inserts) == 1 and "ON CONFLICT" in inserts[0]
+    assert [r.value_num for r in rows] == [10.5, 11.9, 13.6]
+
+
+def test_kpi_values_keep_one_row_per_tpp_run(engine):
+    with Session(engine) as s:
+        upsert_kpi_values(s, [kpi("TPP", 1, "CLOSURE", 10.0)])
+        upsert_kpi_values(s, [kpi("TPP", 1, "CLOSURE", 11.0, score=3)])
+        upsert_kpi_values(s, [kpi("TPP", 2, "CLOSURE", 12.0)])
+        s.commit()
+        rows = s.exec(select(KpiValue).order_by(KpiValue.run_id)).all()
+
+    assert [(r.run_id, r.value_num, r.score) for r in rows] == [(1, 11.0, 3), (2, 12.0, 2)]
+
+
+def test_massage_kpis_are_kept_per_application(engine):
+    ctx = {"pressures": [45, 40, 35]}
+    with Session(engine) as s:
+        first = [kpi("MASSAGE", 1, code, 1.0, ctx=ctx) for code in ("CONGESTION_RISK", "FITTING")]
+        inserts = count_inserts(engine, lambda: upsert_kpi_values(s, first))
+        # Un run successivo sovrascrive il valore dell'applicazione
+        upsert_kpi_values(s, [kpi("MASSAGE", 2, "FITTING", 0.2, score=4, ctx=ctx), kpi("TPP", 5, "CLOSURE", 9.0)])
+        s.commit()
+        rows = {r.kpi_code: r for r in s.exec(select(KpiValue)).all()}
+
+    assert len(inserts) == 1
+    assert set(rows) == {"CONGESTION_RISK", "FITTING", "CLOSURE"}
+    assert (rows["FITTING"].run_id, rows["FITTING"].value_num, rows["FITTING"].score) == (2, 0.2, 4)
+    assert rows["CONGESTION_RISK"].run_id == 1
+
+
+def test_duplicate_keys_in_one_batch_keep_the_last_row(engine):
+    with Session(engine) as s:
+        assert upsert_kpi_values(s, [kpi("SPEED", 3, "SPEED", 400.0), kpi("SPEED", 3, "SPEED", 410.0)]) == 1
+        assert upsert_kpi_values(s, []) == 0
+        s.commit()
+        assert [r.value_num for r in s.exec(select(KpiValue)).all()] == [410.0]
+
+
+def test_postgres_targets_the_partial_application_index():
+    stmt = kpi_persistence._upsert_statement(
+        "postgresql",
+        KpiValue.__table__,
+        [kpi("MASSAGE", 1, "FITTING", 1.0)],
+        kpi_persistence.KPI_VALUE_APPLICATION_KEY,
+        kpi_persistence.APPLICATION_SCOPED_WHERE,
+    )
+    sql = str(stmt.compile(dialect=postgresql.dialect(), compile_kwargs={"render_postcompile": True}))
+
+    assert "ON CONFLICT (product_application_id, kpi_code) WHERE run_type IN ('MASSAGE', 'SMT_HOOD')" in sql
+    assert "run_id = excluded.run_id" in sql
+    assert "kpi_code = excluded" not in sql
@@ -0,0 +1,154 @@
+import random
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy.pool import StaticPool
+from sqlmodel import Session, SQLModel, create_engine, select
+
+from app.auth import get_current_user
+from app.common.enums import UserRole
+from app.db import get_session
+from app.main import app
+from app.model.access_log import AccessLog, RouteLatencyRollup
+from app.model.user import User
+from app.services.latency_rollup import (
+    UNMATCHED_ROUTE,
+    LatencySketch,
+    latency_report,
+    rollup_route_latency,
+    route_key,
+)
+
+
+HOUR = datetime(2026, 10, 1, 10)
+
+
+@pytest.fixture
+def engine():
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    SQLModel.metadata.create_all(
+        engine, tables=[User.__table__, AccessLog.__table__, RouteLatencyRollup.__table__]
+    )
+    return engine
+
+
+def add_logs(engine, rows):
+    with Session(engine) as s:
+        for route, path, status_code, duration_ms, created_at in rows:
+            s.add(AccessLog(method="POST" if path.endswith("compute") else "GET", path=path, route=route,
+                            status_code=status_code, duration_ms=duration_ms, created_at=created_at))
+        s.commit()
+
+
+def rollups(engine):
+    with Session(engine) as s:
+        return {(r.route, r.method, r.hour): r for r in s.exec(select(RouteLatencyRollup)).all()}
+
+
+def test_sketch_quantiles_are_within_relative_accuracy_and_merge_exactly():
+    rng = random.Random(7)
+    values = [rng.lognormvariate(4, 1) for _ in range(5000)] + [0] * 50
+    whole = LatencySketch(0.01)
+    left, right = LatencySketch(0.01), LatencySketch(0.01)
+    for i, value in enumerate(values):
+        whole.add(value)
+        (left if i % 2 else right).add(value)
+
+    merged = LatencySketch.from_dict(left.to_dict()).merge(LatencySketch.from_dict(right.to_dict()))
+    ordered = sorted(values)
+    for q in (0.5, 0.95, 0.99):
+        exact = ordered[int(q * (len(ordered) - 1))]
+        assert merged.quantile(q) == whole.quantile(q)
+        assert abs(whole.quantile(q) - exact) <= 0.01 * exact + 1e-9
+    assert whole.quantile(0.001) == 0.0
+    assert LatencySketch().quantile(0.5) is None
+    with pytest.raises(ValueError):
+        whole.merge(LatencySketch(0.02))
+
+
+def test_route_key_falls_back_to_normalized_path():
+    assert route_key("/tpp/runs/{run_id}/compute", "/tpp/runs/5/compute", 200) == "/tpp/runs/{run_id}/compute"
+    assert route_key(None, "/tpp/runs/123/compute?x=1", 200) == "/tpp/runs/{id}/compute"
+    assert route_key(None, "/wp-admin/123", 404) == UNMATCHED_ROUTE
+
+
+def test_rollup_groups_by_route_method_hour_and_recomputes_the_last_hour(engine):
+    compute = "/tpp/runs/{run_id}/compute"
+    add_logs(engine, [
+        (compute, f"/tpp/runs/{i}/compute", 500 if i == 0 else 200, 100 + i, HOUR + timedelta(minutes=i))
+        for i in range(10)
+    ] + [
+        (None, "/tpp/runs/99/compute", 200, 300, HOUR + timedelta(hours=1, minutes=5)),
+        ("/products/", "/products/", 200, 20, HOUR + timedelta(hours=1, minutes=10)),
+    ])
+
+    summary = rollup_route_latency(engine, now=HOUR + timedelta(hours=1, minutes=30))
+    assert summary["hours"] == 2 and summary["rows"] == 3
+    rows = rollups(engine)
+    first = rows[(compute, "POST", HOUR)]
+    assert (first.count, first.error_count, first.duration_max_ms) == (10, 1, 109)
+    assert first.p50_ms == pytest.approx(104, rel=0.01)
+    assert rows[("/tpp/runs/{id}/compute", "POST", HOUR + timedelta(hours=1))].count == 1
+
+    # riga arrivata in ritardo nell'ultima ora: il giro successivo la include, senza duplicati
+    add_logs(engine, [("/products/", "/products/", 200, 40, HOUR + timedelta(hours=1, minutes=50))])
+    rollup_route_latency(engine, now=HOUR + timedelta(hours=2, minutes=1))
+    rows = rollups(engine)
+    assert len(rows) == 3
+    assert rows[("/products/", "GET", HOUR + timedelta(hours=1))].count == 2
+
+
+def test_report_merges_sketches_across_hours(engine):
+    compute = "/tpp/runs/{run_id}/compute"
+    add_logs(engine, [
+        (compute, "/tpp/runs/1/compute", 200, 10, HOUR + timedelta(minutes=m)) for m in range(50)
+    ] + [
+        (compute, "/tpp/runs/1/compute", 200, 1000, HOUR + timedelta(hours=1, minutes=m)) for m in range(50)
+    ] + [
+        ("/products/", "/products/", 200, 5, HOUR + timedelta(minutes=m)) for m in range(5)
+    ])
+    rollup_route_latency(engine, now=HOUR + timedelta(hours=2))
+
+    with engine.connect() as conn:
+        report = latency_report(conn, start=HOUR, end=HOUR + timedelta(hours=2), route=compute, granularity="hour")
+        day = latency_report(conn, start=HOUR, end=HOUR + timedelta(hours=2), route=compute, granularity="day")
+        overview = latency_report(conn, start=HOUR, end=HOUR + timedelta(hours=2), sort="count")
+        with pytest.raises(ValueError):
+            latency_report(conn, start=HOUR, end=HOUR, sort="median")
+
+    (total,) = report["routes"]
+    assert total["count"] == 100
+    # p95 sull'insieme delle due ore, non la media dei p95 orari
+    assert total["p95_ms"] == pytest.approx(1000, rel=0.01)
+    assert total["p50_ms"] == pytest.approx(10, rel=0.01)
+    assert [p["count"] for p in report["series"]] == [50, 50]
+    assert [p["count"] for p in day["series"]] == [100]
+    assert [r["route"] for r in overview["routes"]] == [compute, "/products/"]
+
+
+def test_ops_latency_endpoint_is_admin_only(engine):
+    add_logs(engine, [("/products/", "/products/", 200, 12, datetime.utcnow() - timedelta(minutes=5))])
+    rollup_route_latency(engine)
+
+    def override_get_session():
+        with Session(engine) as session:
+            yield session
+
+    app.dependency_overrides[get_session] = override_get_session
+    try:
+        client = TestClient(app)
+        app.dependency_overrides[get_current_user] = lambda: User(
+            id=1, email="admin@example.com", hashed_password="-", role=UserRole.ADMIN
+        )
+        res = client.get("/ops/latency", params={"hours": 2})
+        assert res.status_code == 200, res.text
+        assert [(r["route"], r["count"]) for r in res.json()["routes"]] == [("/products/", 1)]
+        assert client.get("/ops/latency", params={"granularity": "week"}).status_code == 422
+
+        app.dependency_overrides[get_current_user] = lambda: User(
+            id=2, email="user@example.com", hashed_password="-", role=UserRole.USER
+        )
+        assert client.get("/ops/latency").status_code == 403
+    finally:
+        app.dependency_overrides.clear()
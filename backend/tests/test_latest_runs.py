@@ -0,0 +1,144 @@
+from datetime import datetime, timedelta
+
+import pytest
+import sqlalchemy as sa
+from fastapi.testclient import TestClient
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.pool import StaticPool
+from sqlmodel import Session, SQLModel, create_engine
+
+from app.auth import get_current_user
+from app.db import get_session
+from app.main import app
+from app.model.massage import MassagePoint, MassageRun
+from app.model.product import Product, ProductApplication
+from app.model.smthood import SmtHoodPoint, SmtHoodRun
+from app.model.speed import SpeedRun
+from app.model.tpp import TppRun
+from app.model.user import User
+from app.services import latest_runs
+
+
+@pytest.fixture
+def engine():
+    engine = create_engine(
+        "sqlite://",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    SQLModel.metadata.create_all(
+        engine,
+        tables=[
+            Product.__table__,
+            ProductApplication.__table__,
+            TppRun.__table__,
+            SpeedRun.__table__,
+            MassageRun.__table__,
+            MassagePoint.__table__,
+            SmtHoodRun.__table__,
+            SmtHoodPoint.__table__,
+        ],
+    )
+    return engine
+
+
+@pytest.fixture
+def client(engine):
+    def override_get_session():
+        with Session(engine) as session:
+            yield session
+
+    app.dependency_overrides[get_session] = override_get_session
+    app.dependency_overrides[get_current_user] = lambda: User(
+        id=1, email="natlog@milkrite-interpuls.com", hashed_password="-", unit_system="imperial"
+    )
+    yield TestClient(app)
+    app.dependency_overrides.clear()
+
+
+def seed(engine) -> tuple[int, int, int]:
+    t0 = datetime(2026, 1, 1)
+    with Session(engine) as s:
+        product = Product(code="P1", name="Liner", brand="MI", model="M1")
+        s.add(product)
+        s.commit()
+        apps = [ProductApplication(product_id=product.id, size_mm=size) for size in (40, 50, 60)]
+        s.add_all(apps)
+        s.commit()
+        a1, a2, a3 = (a.id for a in apps)
+
+        s.add(TppRun(product_application_id=a1, real_tpp=10.0, created_at=t0))
+        s.add(TppRun(product_application_id=a1, real_tpp=12.5, created_at=t0 + timedelta(days=1)))
+        s.add(SpeedRun(product_application_id=a1, measure_ml=410.0, created_at=t0))
+
+        old = MassageRun(product_application_id=a1, created_at=t0)
+        new = MassageRun(product_application_id=a1, created_at=t0 + timedelta(days=2))
+        smt = SmtHoodRun(product_application_id=a2, created_at=t0)
+        s.add_all([old, new, smt])
+        s.commit()
+        s.add(MassagePoint(run_id=old.id, pressure_kpa=45, min_val=1.0, max_val=2.0))
+        for kpa in (35, 45, 40):
+            s.add(MassagePoint(run_id=new.id, pressure_kpa=kpa, min_val=10.0, max_val=20.0 + kpa))
+        for code, lpm in ((36, 3.6), (5, 0.5), (19, 1.9)):
+            s.add(SmtHoodPoint(run_id=smt.id, flow_code=code, flow_lpm=lpm, smt_min=30, smt_max=40, hood_min=31, hood_max=41))
+        s.commit()
+    return a1, a2, a3
+
+
+def test_latest_runs_batch_returns_latest_run_and_points_per_type(engine, client):
+    a1, a2, a3 = seed(engine)
+
+    statements = []
+
+    def record(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    sa.event.listen(engine, "before_cursor_execute", record)
+    try:
+        response = client.post("/runs/latest/batch", json={"product_application_ids": [a1, a2, a3, a1]})
+    finally:
+        sa.event.remove(engine, "before_cursor_execute", record)
+    body = response.json()
+
+    assert response.status_code == 200
+    assert list(body) == [str(a1), str(a2), str(a3)]
+    # One statement per test type, whatever the number of applications
+    assert len([s for s in statements if s.lstrip().upper().startswith("SELECT")]) == 4
+
+    first = body[str(a1)]
+    assert first["tpp"]["real_tpp"] == 12.5
+    assert first["speed"]["measure_ml"] == 410.0
+    assert [p["pressure_kpa"] for p in first["massage"]["points"]] == [45, 40, 35]
+    assert first["massage"]["run"]["points"] == first["massage"]["points"]
+    assert first["smt_hood"]["run"] is None and first["smt_hood"]["points"] == []
+
+    second = body[str(a2)]
+    assert second["tpp"] is None
+    assert [p["flow_lpm"] for p in second["smt_hood"]["points"]] == [0.5, 1.9, 3.6]
+    # Stessa conversione imperial degli endpoint singoli
+    assert "smt_max_inhg" in second["smt_hood"]["points"][0]
+
+    assert body[str(a3)]["massage"]["run"] is None
+
+
+def test_latest_runs_batch_limits_ids(client):
+    assert client.post("/runs/latest/batch", json={"product_application_ids": []}).json() == {}
+
+    too_many = list(range(1, latest_runs.MAX_BATCH_APPLICATION_IDS + 2))
+    response = client.post("/runs/latest/batch", json={"product_application_ids": too_many})
+    assert response.status_code == 422
+
+
+def test_postgres_uses_distinct_on():
+    class FakeBind:
+        dialect = postgresql.dialect()
+
+    class FakeSession:
+        def get_bind(self):
+            return FakeBind()
+
+    subquery = latest_runs._latest_per_application(FakeSession(), TppRun.__table__, [1, 2])
+    sql = str(sa.select(subquery).compile(dialect=postgresql.dialect()))
+
+    assert "DISTINCT ON (tpp_runs.product_application_id)" in sql
+    assert "row_number" not in sql
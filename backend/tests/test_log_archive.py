@@ -0,0 +1,174 @@
+import os
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy.pool import StaticPool
+from sqlmodel import Session, SQLModel, create_engine, func, select
+
+from app.auth import get_current_user
+from app.common.enums import UserRole
+from app.db import get_session
+from app.main import app
+from app.model.access_log import AccessLog, RouteLatencyRollup
+from app.model.audit_log import AuditLog
+from app.model.login_event import LoginEvent
+from app.model.security_event import SecurityEvent
+from app.model.user import User
+from app.routers import auth_router
+from app.scripts import cleanup_logs as cleanup_module
+from app.services import log_archive
+from app.services.log_archive import ArchiveIndex, archive_logs, path_prefix, read_archive
+
+
+DAY = datetime(2026, 9, 1)
+
+
+@pytest.fixture
+def engine():
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    SQLModel.metadata.create_all(
+        engine,
+        tables=[User.__table__, AccessLog.__table__, AuditLog.__table__, LoginEvent.__table__, SecurityEvent.__table__,
+                RouteLatencyRollup.__table__],
+    )
+    with Session(engine) as s:
+        s.add_all([User(id=uid, email=f"u{uid}@example.com", hashed_password="-") for uid in (1, 2)])
+        s.commit()
+        for d in range(3):
+            for h in range(4):
+                created = DAY + timedelta(days=d, hours=6 * h)
+                s.add(AccessLog(method="GET", path=f"/products/{h}", status_code=200, duration_ms=1,
+                                user_id=1 + h % 2, created_at=created))
+            s.add(AccessLog(method="GET", path="/rankings/overview", status_code=200, duration_ms=1,
+                            user_id=None, created_at=DAY + timedelta(days=d, hours=23)))
+            s.add(AuditLog(request_id=f"r{d}", method="POST", path="/runs/1/compute", status_code=200,
+                           duration_ms=5, user_id=1, request_json={"run": d}, created_at=DAY + timedelta(days=d)))
+        s.commit()
+    return engine
+
+
+def count(engine, model):
+    with Session(engine) as s:
+        return s.exec(select(func.count()).select_from(model)).one()
+
+
+def test_path_prefix():
+    assert path_prefix("/products/12/similar?k=3") == "/products"
+    assert path_prefix("/") == "/"
+
+
+def test_archive_exports_whole_days_then_deletes_them(engine, tmp_path):
+    # cutoff a metà del terzo giorno: si archiviano solo i primi due giorni interi
+    summary = archive_logs(engine, before=DAY + timedelta(days=2, hours=12), archive_dir=str(tmp_path))
+
+    assert summary == {"access_logs": 10, "audit_logs": 2}
+    assert count(engine, AccessLog) == 5
+    assert count(engine, AuditLog) == 1
+
+    entries = ArchiveIndex(str(tmp_path)).entries()
+    assert sorted((e["table"], e["day"], e["rows"]) for e in entries) == [
+        ("access_logs", "2026-09-01", 5), ("access_logs", "2026-09-02", 5),
+        ("audit_logs", "2026-09-01", 1), ("audit_logs", "2026-09-02", 1),
+    ]
+    first = next(e for e in entries if e["table"] == "access_logs" and e["day"] == "2026-09-01")
+    assert first["user_ids"] == [1, 2]
+    assert first["path_prefixes"] == ["/products", "/rankings"]
+    assert all(os.path.exists(tmp_path / e["file"]) for e in entries)
+
+    # nuovo giro: niente da esportare, nessun file in più
+    assert archive_logs(engine, before=DAY + timedelta(days=2, hours=12), archive_dir=str(tmp_path)) == {
+        "access_logs": 0, "audit_logs": 0,
+    }
+    assert len(ArchiveIndex(str(tmp_path)).entries()) == 4
+
+
+def test_late_rows_of_an_archived_day_go_to_a_new_part(engine, tmp_path):
+    archive_logs(engine, before=DAY + timedelta(days=1), archive_dir=str(tmp_path))
+    with Session(engine) as s:
+        s.add(AccessLog(method="GET", path="/news", status_code=200, duration_ms=1, created_at=DAY + timedelta(hours=1)))
+        s.commit()
+
+    assert archive_logs(engine, before=DAY + timedelta(days=1), archive_dir=str(tmp_path))["access_logs"] == 1
+    files = sorted(e["file"] for e in ArchiveIndex(str(tmp_path)).entries() if e["table"] == "access_logs")
+    assert [f.split(".")[1] for f in files] == ["0", "1"]
+    rows = read_archive("access_logs", archive_dir=str(tmp_path), path="/news")["rows"]
+    assert [r["path"] for r in rows] == ["/news"]
+
+
+def test_read_archive_filters_by_time_user_and_path(engine, tmp_path):
+    archive_logs(engine, before=DAY + timedelta(days=3), archive_dir=str(tmp_path))
+
+    day2 = read_archive("access_logs", archive_dir=str(tmp_path),
+                        start=DAY + timedelta(days=1), end=DAY + timedelta(days=2))
+    assert day2["files_scanned"] == 1
+    assert len(day2["rows"]) == 5
+
+    user2 = read_archive("access_logs", archive_dir=str(tmp_path), user_id=2)
+    assert {r["user_id"] for r in user2["rows"]} == {2}
+    assert len(user2["rows"]) == 6
+
+    rankings = read_archive("access_logs", archive_dir=str(tmp_path), path="/rankings", limit=2)
+    assert [r["path"] for r in rankings["rows"]] == ["/rankings/overview"] * 2
+    assert rankings["truncated"] is True
+
+    audit = read_archive("audit_logs", archive_dir=str(tmp_path))["rows"]
+    assert [r["request_json"] for r in audit] == [{"run": 0}, {"run": 1}, {"run": 2}]
+
+    assert read_archive("access_logs", archive_dir=str(tmp_path), user_id=99)["files_scanned"] == 0
+
+
+def test_cleanup_archives_before_deleting(engine, tmp_path, monkeypatch):
+    monkeypatch.setattr(cleanup_module, "engine", engine)
+    monkeypatch.setattr(cleanup_module, "LOG_ARCHIVE_DIR", str(tmp_path))
+    monkeypatch.setattr(cleanup_module, "datetime", type("FixedNow", (datetime,), {
+        "utcnow": staticmethod(lambda: DAY + timedelta(days=22, hours=12)),
+    }))
+
+    cleanup_module.cleanup_logs(21)
+
+    # cutoff = 2 settembre 12:00: archiviato e cancellato solo il 1 settembre
+    assert count(engine, AccessLog) == 10
+    assert [e["day"] for e in ArchiveIndex(str(tmp_path)).entries()] == ["2026-09-01", "2026-09-01"]
+
+
+def test_admin_endpoint_reads_the_archive(engine, tmp_path, monkeypatch):
+    archive_logs(engine, before=DAY + timedelta(days=3), archive_dir=str(tmp_path))
+    monkeypatch.setattr(auth_router, "LOG_ARCHIVE_DIR", str(tmp_path))
+
+    def override_get_session():
+        with Session(engine) as session:
+            yield session
+
+    app.dependency_overrides[get_session] = override_get_session
+    try:
+        client = TestClient(app)
+        app.dependency_overrides[get_current_user] = lambda: User(
+            id=1, email="u1@example.com", hashed_password="-", role=UserRole.ADMIN
+        )
+        res = client.get("/auth/security/archive", params={"user_id": 1, "path": "/products", "limit": 3})
+        assert res.status_code == 200, res.text
+        body = res.json()
+        assert len(body["rows"]) == 3 and body["truncated"] is True
+        assert client.get("/auth/security/archive", params={"table": "users"}).status_code == 422
+
+        # datetime con fuso dal client: confrontati come UTC naive, non 500
+        day2 = client.get("/auth/security/archive", params={"start": "2026-09-02T00:00:00Z",
+                                                            "end": "2026-09-03T02:00:00+02:00"})
+        assert day2.status_code == 200, day2.text
+        assert len(day2.json()["rows"]) == 5
+
+        app.dependency_overrides[get_current_user] = lambda: User(
+            id=2, email="u2@example.com", hashed_password="-", role=UserRole.USER
+        )
+        assert client.get("/auth/security/archive").status_code == 403
+    finally:
+        app.dependency_overrides.clear()
+
+
+@pytest.mark.skipif(log_archive.zstandard is None, reason="zstandard not installed")
+def test_zstd_files_round_trip(engine, tmp_path):
+    archive_logs(engine, before=DAY + timedelta(days=1), archive_dir=str(tmp_path))
+    entry = ArchiveIndex(str(tmp_path)).entries()[0]
+    assert entry["file"].endswith(".jsonl.zst")
+    assert len(read_archive(entry["table"], archive_dir=str(tmp_path))["rows"]) == entry["rows"]
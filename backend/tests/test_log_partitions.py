@@ -0,0 +1,155 @@
+from datetime import datetime, timedelta
+
+from sqlalchemy.pool import StaticPool
+from sqlmodel import Session, SQLModel, create_engine, select
+
+from app.model.access_log import AccessLog, RouteLatencyRollup
+from app.model.audit_log import AuditLog
+from app.model.login_event import LoginEvent
+from app.model.security_event import SecurityEvent
+from app.model.user import User
+from app.scripts import cleanup_logs as cleanup_module
+from app.services.log_partitions import chunked_delete, ensure_partitions, partition_name, period_start
+
+
+def build_engine():
+    engine = create_engine(
+        "sqlite://",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    SQLModel.metadata.create_all(
+        engine,
+        tables=[
+            User.__table__,
+            AccessLog.__table__,
+            AuditLog.__table__,
+            LoginEvent.__table__,
+            SecurityEvent.__table__,
+            RouteLatencyRollup.__table__,
+        ],
+    )
+    return engine
+
+
+def add_access_logs(engine, created_ats):
+    with Session(engine) as session:
+        for created_at in created_ats:
+            session.add(
+                AccessLog(
+                    method="GET",
+                    path="/healthz",
+                    status_code=200,
+                    duration_ms=1,
+                    created_at=created_at,
+                )
+            )
+        session.commit()
+
+
+def test_period_start_aligns_days_and_iso_weeks():
+    value = datetime(2026, 10, 22, 15, 30)  # Thursday
+
+    assert period_start(value, "day") == datetime(2026, 10, 22)
+    assert period_start(value, "week") == datetime(2026, 10, 19)
+    assert partition_name("access_logs", datetime(2026, 10, 19)) == "access_logs_p20261019"
+
+
+def test_chunked_delete_removes_only_expired_rows_in_batches():
+    engine = build_engine()
+    now = datetime(2026, 10, 19)
+    add_access_logs(engine, [now - timedelta(days=30)] * 7 + [now - timedelta(days=1)] * 2)
+
+    deleted = chunked_delete(engine, "access_logs", cutoff=now - timedelta(days=21), batch_size=3)
+
+    assert deleted == 7
+    with Session(engine) as session:
+        assert len(session.exec(select(AccessLog)).all()) == 2
+
+
+def test_cleanup_logs_uses_batched_delete_on_sqlite(monkeypatch, capsys):
+    engine = build_engine()
+    add_access_logs(engine, [datetime.utcnow() - timedelta(days=40), datetime.utcnow()])
+    monkeypatch.setattr(cleanup_module, "engine", engine)
+
+    cleanup_module.cleanup_logs(21)
+
+    out = capsys.readouterr().out
+    # le due ore vengono aggregate prima della cancellazione
+    assert "latency_rollup_rows=2" in out
+    assert "access_logs_deleted=1" in out
+    assert "audit_logs_deleted=0" in out
+    with Session(engine) as session:
+        assert len(session.exec(select(AccessLog)).all()) == 1
+
+
+class FakePgConnection:
+    """Answers the catalog queries of log_partitions and records every statement."""
+
+    dialect = type("Dialect", (), {"name": "postgresql"})()
+
+    def __init__(self, partitions, default, stray_start):
+        self.partitions = partitions
+        self.default = default
+        self.stray_start = stray_start
+        self.statements = []
+
+    def execute(self, stmt, params=None):
+        sql = " ".join(str(stmt).split())
+        self.statements.append(sql)
+        rows, rowcount = [], 0
+        if "= 'DEFAULT'" in sql:
+            rows = [(self.default,)]
+        elif "pg_get_expr" in sql:
+            rows = self.partitions
+        elif sql.startswith("SELECT 1") and params["start"] == self.stray_start:
+            rows = [(1,)]
+        elif sql.startswith("INSERT"):
+            rowcount = 3
+        return type("Result", (), {"all": lambda _: rows, "first": lambda _: rows[0] if rows else None, "rowcount": rowcount})()
+
+
+def test_ensure_partitions_moves_default_rows_into_the_new_partition():
+    conn = FakePgConnection(
+        [("access_logs_p_legacy", "FOR VALUES FROM (MINVALUE) TO ('2026-10-19 00:00:00')")],
+        "access_logs_p_default",
+        stray_start=datetime(2026, 10, 19),
+    )
+
+    created = ensure_partitions(conn, "access_logs", interval="day", ahead=1, now=datetime(2026, 10, 19, 8))
+
+    assert created == ["access_logs_p20261019", "access_logs_p20261020"]
+    ddl = [sql for sql in conn.statements if not sql.startswith("SELECT")]
+    assert ddl == [
+        'ALTER TABLE "access_logs" DETACH PARTITION "access_logs_p_default"',
+        'CREATE TABLE IF NOT EXISTS "access_logs_p20261019" PARTITION OF "access_logs" '
+        "FOR VALUES FROM ('2026-10-19 00:00:00') TO ('2026-10-20 00:00:00')",
+        'INSERT INTO "access_logs" SELECT * FROM "access_logs_p_default" '
+        "WHERE created_at >= :start AND created_at < :end",
+        'DELETE FROM "access_logs_p_default" WHERE created_at >= :start AND created_at < :end',
+        'ALTER TABLE "access_logs" ATTACH PARTITION "access_logs_p_default" DEFAULT',
+        # nessuna riga del giorno dopo nel DEFAULT: CREATE diretto
+        'CREATE TABLE IF NOT EXISTS "access_logs_p20261020" PARTITION OF "access_logs" '
+        "FOR VALUES FROM ('2026-10-20 00:00:00') TO ('2026-10-21 00:00:00')",
+    ]
+
+
+def test_cleanup_logs_purges_expired_rows_from_catch_all_partitions(monkeypatch, capsys):
+    engine = build_engine()
+    add_access_logs(engine, [datetime.utcnow() - timedelta(days=40), datetime.utcnow()])
+    monkeypatch.setattr(cleanup_module, "engine", engine)
+    monkeypatch.setattr(cleanup_module, "is_partitioned", lambda conn, table: True)
+    monkeypatch.setattr(cleanup_module, "drop_expired_partitions", lambda conn, table, cutoff: [])
+    monkeypatch.setattr(cleanup_module, "ensure_partitions", lambda conn, table, **kwargs: [])
+    # su SQLite la tabella stessa fa da partizione DEFAULT
+    monkeypatch.setattr(
+        cleanup_module, "catch_all_partitions", lambda conn, table: [table] if table == "access_logs" else []
+    )
+
+    cleanup_module.cleanup_logs(21)
+
+    out = capsys.readouterr().out
+    assert "access_logs_catch_all_deleted=1" in out
+    assert "audit_logs_catch_all_deleted=0" in out
+    with Session(engine) as session:
+        assert len(session.exec(select(AccessLog)).all()) == 1
@@ -0,0 +1,44 @@
+from app.common import lru_cache
+from app.common.lru_cache import LruCache
+
+
+def test_lru_evicts_least_recently_used():
+    cache = LruCache(max_entries=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1
+    cache.put("c", 3)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert len(cache) == 2
+    assert cache.stats()["hits"] == 2
+    assert cache.stats()["misses"] == 1
+
+
+def test_lru_ttl_and_disabled_cache(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(lru_cache.time, "monotonic", lambda: now[0])
+    cache = LruCache(max_entries=10, ttl_seconds=5)
+    cache.put("a", 1)
+    now[0] += 6
+    assert cache.get("a") is None
+    assert len(cache) == 0
+
+    disabled = LruCache(max_entries=0)
+    disabled.put("a", 1)
+    assert disabled.get("a") is None
+
+
+def test_lru_pop_where_and_clear():
+    cache = LruCache(max_entries=10)
+    for key in range(5):
+        cache.put(key, key * 10)
+    assert sorted(cache.pop_where(lambda key, value: value >= 30)) == [3, 4]
+    assert len(cache) == 3
+
+    cache.get(0)
+    cache.clear()
+    assert cache.stats()["hits"] == 1
+    cache.clear(reset_stats=True)
+    assert cache.stats()["hits"] == 0
@@ -0,0 +1,82 @@
+import json
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy.pool import StaticPool
+from sqlmodel import Session, SQLModel, create_engine, select
+
+from app.model.kpi import KpiValue, TestMetric
+from app.model.product import Product, ProductApplication
+from app.services.kpi_persistence import context_fields, upsert_kpi_values, upsert_test_metrics
+from app.services.metric_queries import latest_metric
+
+
+@pytest.fixture
+def engine():
+    engine = create_engine(
+        "sqlite://",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    SQLModel.metadata.create_all(
+        engine,
+        tables=[Product.__table__, ProductApplication.__table__, TestMetric.__table__, KpiValue.__table__],
+    )
+    with Session(engine) as s:
+        product = Product(code="P1", name="Liner", brand="MI", model="M1")
+        s.add(product)
+        s.commit()
+        s.add_all([ProductApplication(id=pa_id, product_id=product.id, size_mm=40 + pa_id) for pa_id in (1, 2)])
+        s.commit()
+    return engine
+
+
+def smt_metrics(run_id, pa_id, code, values, computed_at):
+    return [
+        dict(run_type="SMT_HOOD", run_id=run_id, product_application_id=pa_id, metric_code=code,
+             value_num=value, unit="kPa", context={"flow_lpm": fl}, computed_at=computed_at)
+        for fl, value in zip((0.5, 1.9, 3.6), values)
+    ]
+
+
+def test_context_fields_fill_typed_columns():
+    assert context_fields({"flow_lpm": 1.9}) == {
+        "context_json": '{"flow_lpm": 1.9}', "flow_lpm": 1.9, "pressure_kpa": None, "agg": None,
+    }
+    assert context_fields({"flows": [0.5], "agg": "final"})["agg"] == "final"
+    assert context_fields(None)["context_json"] == "{}"
+
+
+def test_upserts_derive_typed_columns_from_context_json(engine):
+    with Session(engine) as s:
+        upsert_test_metrics(s, [dict(run_type="MASSAGE", run_id=1, product_application_id=1, metric_code="P",
+                                     value_num=1.0, context_json=json.dumps({"pressure_kpa": 45}))])
+        upsert_kpi_values(s, [dict(run_type="TPP", run_id=1, product_application_id=1, kpi_code="CLOSURE",
+                                   value_num=1.0, score=2, context_json=json.dumps({"agg": "final"}))])
+        s.commit()
+
+        assert s.exec(select(TestMetric.pressure_kpa)).one() == 45
+        assert s.exec(select(KpiValue.agg)).one() == "final"
+
+
+def test_latest_metric_uses_typed_context(engine):
+    t0 = datetime(2026, 1, 1)
+    with Session(engine) as s:
+        upsert_test_metrics(s, smt_metrics(1, 1, "RESPRAY_VAL", (1.0, 2.0, 3.0), t0))
+        upsert_test_metrics(s, smt_metrics(2, 1, "RESPRAY_VAL", (10.0, 20.0, 30.0), t0 + timedelta(days=1)))
+        upsert_test_metrics(s, smt_metrics(3, 2, "SLIPPAGE_VAL", (4.0, 5.0, 6.0), t0))
+        s.commit()
+
+        assert latest_metric(s, 1, "RESPRAY_VAL", flow_lpm=1.9).value_num == 20.0
+        assert latest_metric(s, 1, "RESPRAY_VAL", run_type="MASSAGE") is None
+        assert latest_metric(s, 2, "SLIPPAGE_VAL", flow_lpm=3.6).value_num == 6.0
+
+
+def test_per_flow_lookup_is_an_index_seek(engine):
+    with engine.connect() as conn:
+        plan = conn.exec_driver_sql(
+            "EXPLAIN QUERY PLAN SELECT value_num FROM test_metrics "
+            "WHERE product_application_id = 1 AND metric_code = 'RESPRAY_VAL' AND flow_lpm = 1.9"
+        ).all()
+
+    assert "USING INDEX ix_test_metrics_pa_metric_flow" in " ".join(str(row[-1]) for row in plan)
@@ -0,0 +1,129 @@
+import itertools
+
+import pytest
+import sqlalchemy as sa
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+import app.db as db
+from app import middleware_compression
+from app.auth import get_current_user
+from app.common.enums import UserRole
+from app.main import app
+from app.middleware_compression import CompressedResponseCache, CompressionMiddleware
+from app.model.user import User
+from app.services.request_deadline import cancellation_stats
+from app.services.sqlite_writer import SQLiteWriteQueue
+from app.services.request_geo import geoip_cache
+
+
+def as_role(role: UserRole):
+    app.dependency_overrides[get_current_user] = lambda: User(
+        id=1, email="ops@example.com", hashed_password="-", role=role
+    )
+
+
+@pytest.fixture
+def client():
+    as_role(UserRole.ADMIN)
+    try:
+        yield TestClient(app)
+    finally:
+        app.dependency_overrides.clear()
+
+
+def test_ops_stats_is_admin_only(client):
+    assert client.get("/ops/stats").status_code == 200
+    as_role(UserRole.USER)
+    assert client.get("/ops/stats").status_code == 403
+
+
+def test_ops_stats_serves_geoip_cache_counters(client):
+    geoip_cache.clear()
+    geoip_cache.put("8.8.8.8", ("US", None, None, None, None, "geoip2-db"))
+    before = client.get("/ops/stats").json()["geoip_cache"]
+    assert geoip_cache.get("8.8.8.8") is not None
+    assert geoip_cache.get("1.1.1.1") is None
+
+    after = client.get("/ops/stats").json()["geoip_cache"]
+    assert after["hits"] == before["hits"] + 1
+    assert after["misses"] == before["misses"] + 1
+    assert after["size"] == 1
+    geoip_cache.clear()
+
+
+def test_ops_stats_serves_request_log_writer_queue(client):
+    stats = client.get("/ops/stats").json()["request_log_writer"]
+    assert set(stats) == {"queue_depth", "dropped", "async_mode"}
+
+
+def test_ops_stats_serves_setting_calculator_cache_counters(client):
+    stats = client.get("/ops/stats").json()["setting_calculator_cache"]
+    assert {"hits", "misses", "size"} <= set(stats["liner_info"])
+    assert {"hits", "misses", "size"} <= set(stats["side_results"])
+
+
+def test_ops_stats_serves_cancelled_work_counters(client):
+    cancellation_stats.reset()
+    cancellation_stats.record("timeout", "/rankings", 2)
+    cancellation_stats.statement_aborted()
+
+    stats = client.get("/ops/stats").json()["request_cancellation"]
+    assert stats["requests"]["timeout"] == 1
+    assert stats["by_route"] == {"/rankings": 1}
+    assert stats["connections_interrupted"] == 2
+    assert stats["statements_aborted"] == 1
+    cancellation_stats.reset()
+
+
+def test_ops_stats_credits_cpu_saved_by_compressed_cache_hits(client, monkeypatch):
+    # ogni compressione "costa" 0.25 s di CPU
+    ticks = itertools.count(0, 0.25)
+    monkeypatch.setattr(middleware_compression.time, "thread_time", lambda: next(ticks))
+    rankings = FastAPI()
+    rankings.add_middleware(CompressionMiddleware, minimum_size=100, cache=CompressedResponseCache(max_bytes=1 << 20))
+
+    @rankings.get("/rankings")
+    def ranking_rows():
+        return [{"kpi_code": "CLOSURE", "score": i % 5} for i in range(200)]
+
+    rankings_client = TestClient(rankings)
+    # /ops/stats passa dallo stesso middleware (contatori di processo): niente compressione qui
+    plain = {"Accept-Encoding": "identity"}
+    rankings_client.get("/rankings", headers={"Accept-Encoding": "gzip"})
+    before = client.get("/ops/stats", headers=plain).json()["response_compression"]
+    rankings_client.get("/rankings", headers={"Accept-Encoding": "gzip"})
+    after = client.get("/ops/stats", headers=plain).json()["response_compression"]
+
+    assert after["cache_hits"] == before["cache_hits"] + 1
+    assert after["cpu_seconds_saved"] == pytest.approx(before["cpu_seconds_saved"] + 0.25)
+    assert after["by_encoding"]["gzip"]["responses"] == before["by_encoding"]["gzip"]["responses"] + 1
+
+
+def test_ops_stats_serves_product_similarity_index_stats(client):
+    stats = client.get("/ops/stats").json()["product_similarity"]
+    assert {"rebuilds", "queries", "stale"} <= set(stats)
+
+
+def test_ops_stats_serves_replica_routing_counters(client):
+    stats = client.get("/ops/stats").json()["replica_routing"]
+    assert {"enabled", "replica_reads", "pinned_reads", "writes", "active_pins"} <= set(stats)
+
+
+def test_ops_stats_serves_sqlite_writer_queue_and_batches(client, tmp_path, monkeypatch):
+    assert client.get("/ops/stats").json()["sqlite_writer"] == {"enabled": False}
+
+    writer = SQLiteWriteQueue(f"sqlite:///{tmp_path / 'app.db'}", max_batch=8)
+    monkeypatch.setattr(db, "sqlite_writer", writer)
+    try:
+        for _ in range(2):
+            with writer.session() as session:
+                session.execute(sa.text("SELECT 1"))
+        stats = client.get("/ops/stats").json()["sqlite_writer"]
+    finally:
+        writer.close()
+
+    assert stats["enabled"] is True
+    assert stats["queue_depth"] == 0
+    assert stats["last_batch_size"] == 1 and stats["max_batch_size"] == 1
+    assert stats["avg_batch_size"] == 1.0
@@ -0,0 +1,132 @@
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy.pool import StaticPool
+from sqlmodel import Session, SQLModel, create_engine
+
+from app.auth import get_current_user
+from app.common.enums import UserRole
+from app.db import get_session
+from app.main import app
+from app.model.product import Product, ProductApplication
+from app.model.user import User
+from app.services.product_similarity import parse_feature_weights, product_spec_index
+
+
+ADMIN = User(id=1, email="admin@example.com", hashed_password="-", role=UserRole.ADMIN)
+VIEWER = User(id=2, email="viewer@example.com", hashed_password="-", role=UserRole.USER)
+
+# (model, compound, robot_liner, only_admin, barrel_diameter, hardness, liner_length)
+LINERS = [
+    ("Ref", "STD", False, False, 24.0, 50.0, 300.0),
+    ("Twin", "STD", False, False, 24.0, 50.0, 300.0),
+    ("Soft", "STD", False, False, 24.0, 40.0, 300.0),
+    ("Wide", "SIL", False, False, 28.0, 50.0, 300.0),
+    ("Robot", "STD", True, False, 24.5, 50.0, 302.0),
+    ("Hidden", "STD", False, True, 24.0, 50.0, 301.0),
+    ("Sparse", "STD", False, False, None, None, None),
+]
+
+
+@pytest.fixture
+def engine():
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    SQLModel.metadata.create_all(engine, tables=[Product.__table__, ProductApplication.__table__])
+    with Session(engine) as s:
+        for i, (model, compound, robot, only_admin, barrel, hardness, length) in enumerate(LINERS, start=1):
+            s.add(Product(id=i, code=f"P{i}", name=model, brand="MI", model=model, compound=compound,
+                          robot_liner=robot, only_admin=only_admin, barrel_diameter=barrel,
+                          hardness=hardness, liner_length=length))
+        s.commit()
+    # l'indice è globale: ogni test parte da un catalogo nuovo
+    product_spec_index.invalidate()
+    return engine
+
+
+@pytest.fixture
+def client(engine):
+    def override_get_session():
+        with Session(engine) as session:
+            yield session
+
+    app.dependency_overrides[get_session] = override_get_session
+    try:
+        yield TestClient(app)
+    finally:
+        app.dependency_overrides.clear()
+
+
+def as_user(user):
+    app.dependency_overrides[get_current_user] = lambda: user
+
+
+def similar(client, product_id, **params):
+    res = client.get(f"/products/{product_id}/similar", params=params)
+    assert res.status_code == 200, res.text
+    return [(item["model"], item["distance"], item["compared_features"]) for item in res.json()]
+
+
+def test_parse_feature_weights():
+    assert parse_feature_weights("barrel_diameter=2, hardness=0") == {"barrel_diameter": 2.0, "hardness": 0.0}
+    assert parse_feature_weights(None) == {}
+    with pytest.raises(ValueError):
+        parse_feature_weights("color=1")
+    with pytest.raises(ValueError):
+        parse_feature_weights("hardness=-1")
+
+
+def test_nearest_liners_respect_visibility_and_filters(client):
+    as_user(VIEWER)
+    models = [model for model, _, _ in similar(client, 1)]
+    # Hidden è only_admin, Sparse non ha specifiche in comune
+    assert models == ["Twin", "Robot", "Soft", "Wide"]
+    assert similar(client, 1, k=1)[0] == ("Twin", 0.0, 3)
+
+    assert [m for m, _, _ in similar(client, 1, compound="sil")] == ["Wide"]
+    assert [m for m, _, _ in similar(client, 1, robot_liner=True)] == ["Robot"]
+    assert client.get("/products/6/similar").status_code == 404
+
+    as_user(ADMIN)
+    assert [m for m, _, _ in similar(client, 1, k=2)] == ["Twin", "Hidden"]
+
+
+def test_feature_weights_change_the_ranking(client):
+    as_user(VIEWER)
+    # solo la durezza conta: Wide (stessa durezza) vince su Soft, a pari distanza per id
+    by_hardness = similar(client, 1, weights=",".join(f"{f}=0" for f in ("barrel_diameter", "liner_length")))
+    assert [m for m, _, _ in by_hardness][:3] == ["Twin", "Wide", "Robot"]
+    assert by_hardness[-1][0] == "Soft"
+    assert all(compared == 1 for _, _, compared in by_hardness)
+
+    assert client.get("/products/1/similar", params={"weights": "color=1"}).status_code == 422
+
+
+def test_product_writes_refresh_the_index(client):
+    as_user(ADMIN)
+    rebuilds = product_spec_index.rebuilds
+    assert similar(client, 1, k=1)[0][0] == "Twin"
+    assert similar(client, 1, k=1)[0][0] == "Twin"
+    assert product_spec_index.rebuilds == rebuilds + 1
+
+    res = client.put("/products/2", json={"hardness": 70.0})
+    assert res.status_code == 200, res.text
+
+    assert similar(client, 1, k=1)[0][0] != "Twin"
+    assert product_spec_index.rebuilds == rebuilds + 2
+
+
+def test_writes_from_other_workers_trigger_one_rebuild(client, engine):
+    as_user(ADMIN)
+    assert similar(client, 1, k=1)[0][0] == "Twin"
+    rebuilds = product_spec_index.rebuilds
+
+    # scritture di un altro processo: nessuna invalidazione in questo worker
+    with Session(engine) as s:
+        s.delete(s.get(Product, 2))
+        s.add(Product(id=8, code="P8", name="New", brand="MI", model="New", compound="STD",
+                      barrel_diameter=24.0, hardness=50.0, liner_length=300.0))
+        s.commit()
+
+    assert [m for m, _, _ in similar(client, 1, k=2)] == ["New", "Hidden"]
+    assert product_spec_index.rebuilds == rebuilds + 1
+    assert similar(client, 8, k=1)[0][0] == "Ref"
+    assert product_spec_index.rebuilds == rebuilds + 1
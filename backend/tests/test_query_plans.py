@@ -0,0 +1,55 @@
+import sqlite3
+
+import pytest
+
+from benchmarks.query_plans import (
+    HOT_STATEMENTS,
+    build_plan_database,
+    compare_plans,
+    explain_hot_statements,
+    load_golden,
+    seq_scan_violations,
+)
+
+
+@pytest.fixture(scope="module")
+def plans(tmp_path_factory):
+    engine = build_plan_database(workdir=str(tmp_path_factory.mktemp("plans")))
+    try:
+        yield explain_hot_statements(engine)
+    finally:
+        engine.dispose()
+
+
+def test_every_hot_statement_is_explained(plans):
+    assert {name.split("#")[0] for name in plans} == set(HOT_STATEMENTS)
+
+
+def test_hot_statements_never_scan_big_tables(plans):
+    assert seq_scan_violations(plans) == []
+
+
+def test_plans_match_the_sqlite_golden_file(plans):
+    golden = load_golden("sqlite")
+    assert golden is not None
+    if golden["engine_version"] != sqlite3.sqlite_version:
+        pytest.skip(f"golden plans taken on SQLite {golden['engine_version']}")
+
+    assert compare_plans(plans, golden["plans"]) == []
+
+
+def test_compare_plans_reports_shape_cost_and_statement_changes():
+    golden = {
+        "a#0": {"plan": ["SEARCH t USING INDEX ix (x=?)"], "cost": 100.0, "seq_scans": []},
+        "b#0": {"plan": ["SEARCH u USING INDEX ix (y=?)"], "cost": None, "seq_scans": []},
+    }
+    same = {"a#0": {"plan": ["SEARCH t USING INDEX ix (x=?)"], "cost": 110.0, "seq_scans": []}, "b#0": golden["b#0"]}
+    changed = {
+        "a#0": {"plan": ["SCAN t"], "cost": 300.0, "seq_scans": ["t"]},
+        "c#0": {"plan": ["SCAN v"], "cost": None, "seq_scans": []},
+    }
+
+    assert compare_plans(same, golden, cost_tolerance_pct=25) == []
+    changes = compare_plans(changed, golden, cost_tolerance_pct=25)
+    assert [c.split(":")[0] for c in changes] == ["a#0", "a#0", "b#0", "c#0"]
+    assert "plan changed" in changes[0] and "100.0 -> 300.0" in changes[1]
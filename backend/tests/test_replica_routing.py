@@ -0,0 +1,102 @@
+import shutil
+
+import pytest
+import sqlalchemy as sa
+from fastapi import Depends, FastAPI
+from fastapi.testclient import TestClient
+from jose import jwt
+from sqlmodel import Session, create_engine
+
+import app.db as db
+from app.db import get_session
+from app.services.replica_routing import ReadRouter, principal_key
+
+
+metadata = sa.MetaData()
+notes = sa.Table("notes", metadata, sa.Column("id", sa.Integer, primary_key=True), sa.Column("text", sa.String))
+
+
+def bearer(sub):
+    return {"Authorization": "Bearer " + jwt.encode({"sub": sub}, "other-secret", algorithm="HS256")}
+
+
+@pytest.fixture
+def engines(tmp_path, monkeypatch):
+    primary = create_engine(f"sqlite:///{tmp_path / 'primary.db'}")
+    metadata.create_all(primary)
+    with primary.begin() as conn:
+        conn.execute(notes.insert().values(text="seed"))
+    primary.dispose()
+    # replica = copia del file, poi diverge: si vede da quale engine legge la richiesta
+    shutil.copy(tmp_path / "primary.db", tmp_path / "replica.db")
+    primary = create_engine(f"sqlite:///{tmp_path / 'primary.db'}")
+    replica = create_engine(f"sqlite:///{tmp_path / 'replica.db'}")
+
+    router = ReadRouter(primary, replica, pin_seconds=60)
+    monkeypatch.setattr(db, "engine", primary)
+    monkeypatch.setattr(db, "read_router", router)
+    return primary, replica, router
+
+
+@pytest.fixture
+def client(engines):
+    api = FastAPI()
+
+    @api.get("/notes")
+    def list_notes(session: Session = Depends(get_session)):
+        return [text for (text,) in session.execute(sa.select(notes.c.text).order_by(notes.c.id))]
+
+    @api.post("/notes")
+    def add_note(text: str, session: Session = Depends(get_session)):
+        session.execute(notes.insert().values(text=text))
+        session.commit()
+        return {"ok": True}
+
+    return TestClient(api)
+
+
+def test_principal_key_prefers_bearer_subject():
+    class Req:
+        def __init__(self, headers):
+            self.headers = headers
+            self.client = type("C", (), {"host": "10.0.0.1"})()
+
+    headers = {k.lower(): v for k, v in bearer("Ana@Example.com").items()}
+    assert principal_key(Req(headers)) == "user:ana@example.com"
+    assert principal_key(Req({"authorization": "Bearer not-a-jwt"})) == "ip:10.0.0.1"
+    assert principal_key(Req({})) == "ip:10.0.0.1"
+
+
+def test_reads_go_to_replica_and_writers_read_their_writes(client, engines):
+    _, _, router = engines
+
+    assert client.get("/notes", headers=bearer("ana")).json() == ["seed"]
+    assert client.post("/notes", params={"text": "new"}, headers=bearer("ana")).status_code == 200
+
+    # chi ha scritto legge dal primary, gli altri dalla replica (ancora indietro)
+    assert client.get("/notes", headers=bearer("ana")).json() == ["seed", "new"]
+    assert client.get("/notes", headers=bearer("bob")).json() == ["seed"]
+    assert router.stats() == {
+        "enabled": True, "replica_reads": 2, "pinned_reads": 1, "writes": 1, "active_pins": 1,
+    }
+
+    router.pin_seconds = 0
+    router._pins.clear()
+    assert client.get("/notes", headers=bearer("ana")).json() == ["seed"]
+
+
+def test_pins_expire_and_single_engine_disables_routing(engines):
+    primary, replica, router = engines
+    router.pin_seconds = 0.01
+    assert router.engine_for("POST", "user:ana") is primary
+    assert router.engine_for("GET", "user:ana") is primary
+    router._pins["user:ana"] = 0  # scaduto
+    assert router.engine_for("GET", "user:ana") is replica
+
+    single = ReadRouter(primary, None, pin_seconds=5)
+    assert not single.enabled
+    assert single.engine_for("GET", "user:ana") is primary
+
+    # fuori da una richiesta (script): sempre il primary
+    session = next(get_session())
+    assert session.get_bind() is primary
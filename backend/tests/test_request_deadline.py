@@ -0,0 +1,173 @@
+import asyncio
+import threading
+import time
+
+import pytest
+import sqlalchemy as sa
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy.pool import StaticPool
+
+from app.middleware_limits import RequestTimeoutMiddleware
+from app.services import request_deadline
+from app.services.request_deadline import (
+    RequestCancelledError,
+    RequestDeadline,
+    cancellation_stats,
+    install_statement_cancellation,
+    parse_route_timeouts,
+    request_deadline_ctx,
+    route_timeout,
+)
+
+
+SLOW_SQL = (
+    "WITH RECURSIVE c(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM c WHERE x < 200000000) "
+    "SELECT count(*) FROM c"
+)
+
+
+@pytest.fixture
+def engine():
+    engine = sa.create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    install_statement_cancellation(engine)
+    cancellation_stats.reset()
+    return engine
+
+
+def build_app(engine, *, timeout_seconds=5.0, route_timeouts=None):
+    app = FastAPI()
+    app.add_middleware(RequestTimeoutMiddleware, timeout_seconds=timeout_seconds, route_timeouts=route_timeouts)
+    app.state.outcome = {}
+    app.state.finished = threading.Event()
+
+    @app.get("/slow")
+    def slow():
+        started = time.monotonic()
+        try:
+            with engine.connect() as conn:
+                conn.exec_driver_sql(SLOW_SQL).scalar()
+            app.state.outcome["result"] = "completed"
+        except RequestCancelledError:
+            app.state.outcome["result"] = "cancelled"
+            try:
+                with engine.connect() as conn:
+                    conn.exec_driver_sql("SELECT 1")
+            except RequestCancelledError:
+                app.state.outcome["next_statement"] = "rejected"
+            raise
+        finally:
+            app.state.outcome["elapsed"] = time.monotonic() - started
+            app.state.finished.set()
+        return {"ok": True}
+
+    @app.get("/fast")
+    def fast():
+        with engine.connect() as conn:
+            return {"value": conn.exec_driver_sql("SELECT 41 + 1").scalar()}
+
+    return app
+
+
+def test_route_timeouts_use_the_longest_matching_prefix():
+    budgets = parse_route_timeouts("/rankings=20, /rankings/composite/=45,bad,/x=nan?")
+
+    assert budgets == {"/rankings": 20.0, "/rankings/composite": 45.0}
+    assert route_timeout("/rankings/composite", budgets, 60) == 45.0
+    assert route_timeout("/rankings/overview", budgets, 60) == 20.0
+    assert route_timeout("/rankingsx", budgets, 60) == 60
+
+
+def test_timeout_interrupts_the_running_statement(engine):
+    app = build_app(engine, timeout_seconds=5.0, route_timeouts={"/slow": 0.2})
+    client = TestClient(app)
+
+    response = client.get("/slow")
+
+    assert response.status_code == 504
+    assert app.state.finished.wait(5)
+    assert app.state.outcome["result"] == "cancelled"
+    assert app.state.outcome["next_statement"] == "rejected"
+    assert app.state.outcome["elapsed"] < 3
+    stats = cancellation_stats.stats()
+    assert stats["requests"]["timeout"] == 1
+    assert stats["by_route"] == {"/slow": 1}
+    # fermata dal progress handler o dall'interrupt, a seconda di chi arriva prima
+    assert stats["statements_rejected"] == 1 and stats["statements_aborted"] == 1
+
+
+def test_requests_within_budget_leave_connections_clean(engine):
+    client = TestClient(build_app(engine))
+
+    assert client.get("/fast").json() == {"value": 42}
+    # fuori dalla richiesta nessuna deadline resta agganciata alla connessione
+    with engine.connect() as conn:
+        assert conn.exec_driver_sql("SELECT 1").scalar() == 1
+    assert cancellation_stats.stats()["requests"] == {"timeout": 0, "client_disconnect": 0}
+
+
+def test_client_disconnect_cancels_the_handler_statement(engine):
+    app = build_app(engine, timeout_seconds=30)
+    sent = []
+    messages = [{"type": "http.request", "body": b"", "more_body": False}]
+
+    async def receive():
+        if messages:
+            return messages.pop(0)
+        await asyncio.sleep(0.2)  # il client chiude mentre la query gira
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+        "scheme": "http", "path": "/slow", "raw_path": b"/slow", "query_string": b"",
+        "root_path": "", "headers": [], "client": ("127.0.0.1", 1), "server": ("testserver", 80),
+    }
+    asyncio.run(app(scope, receive, send))
+
+    assert app.state.finished.wait(5)
+    assert sent == []
+    assert app.state.outcome["result"] == "cancelled"
+    assert app.state.outcome["elapsed"] < 3
+    stats = cancellation_stats.stats()
+    assert stats["requests"]["client_disconnect"] == 1
+    assert stats["connections_interrupted"] == 1
+
+
+def test_expired_deadline_rejects_statements_before_execution(engine):
+    deadline = RequestDeadline(0)
+    token = request_deadline_ctx.set(deadline)
+    try:
+        with pytest.raises(RequestCancelledError), engine.connect() as conn:
+            conn.exec_driver_sql("SELECT 1")
+    finally:
+        request_deadline_ctx.reset(token)
+
+    assert deadline.cancel("timeout") == 0
+    assert deadline.cancel("timeout") == 0  # idempotente
+    assert cancellation_stats.stats()["requests"]["timeout"] == 1
+
+
+def test_deadline_hook_runs_at_every_transaction_of_a_checkout(engine, monkeypatch):
+    applied = []
+    monkeypatch.setitem(
+        request_deadline.TRANSACTION_DEADLINE_HOOKS, "sqlite", lambda dbapi_conn, deadline: applied.append(deadline)
+    )
+    deadline = RequestDeadline(5.0)
+    token = request_deadline_ctx.set(deadline)
+    try:
+        with engine.connect() as conn:
+            conn.exec_driver_sql("SELECT 1")
+            conn.commit()
+            # stessa connessione dopo il commit: il timeout va riapplicato
+            conn.exec_driver_sql("SELECT 1")
+            conn.commit()
+    finally:
+        request_deadline_ctx.reset(token)
+
+    assert applied == [deadline, deadline]
+    with engine.connect() as conn:
+        conn.exec_driver_sql("SELECT 1")
+    assert len(applied) == 2
@@ -62,3 +62,56 @@ def test_best_effort_geo_falls_back_to_geoip_when_headers_missing(monkeypatch):
         -122.0775,
         "geoip2-db",
     )
+
+
+def test_geoip_cache_counts_hits_and_misses():
+    cache = request_geo.GeoIpCache(max_entries=10, ttl_seconds=60)
+    geo = ("US", "CA", "Mountain View", 37.4056, -122.0775, "geoip2-db")
+
+    assert cache.get("8.8.8.8") is None
+    cache.put("8.8.8.8", geo)
+    assert cache.get("8.8.8.8") == geo
+
+    stats = cache.stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 1
+    assert stats["size"] == 1
+
+
+def test_geoip_cache_evicts_least_recently_used_and_expired_entries(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(request_geo.time, "monotonic", lambda: now[0])
+    cache = request_geo.GeoIpCache(max_entries=2, ttl_seconds=10)
+    geo = ("IT", None, None, None, None, "geoip2-db")
+
+    cache.put("1.1.1.1", geo)
+    cache.put("8.8.8.8", geo)
+    assert cache.get("1.1.1.1") == geo
+    cache.put("9.9.9.9", geo)
+
+    assert cache.get("8.8.8.8") is None
+    assert cache.get("1.1.1.1") == geo
+
+    now[0] += 11
+    assert cache.get("1.1.1.1") is None
+    assert cache.stats()["size"] == 1
+
+
+def test_geoip_lookup_uses_cache_for_repeated_ips(monkeypatch):
+    calls = []
+
+    def fake_uncached(reader, ip):
+        calls.append(ip)
+        return ("US", "CA", "Mountain View", 37.4056, -122.0775, "geoip2-db")
+
+    cache = request_geo.GeoIpCache(max_entries=10, ttl_seconds=60)
+    monkeypatch.setattr(request_geo, "geoip_cache", cache)
+    monkeypatch.setattr(request_geo._reader_holder, "get", lambda: object())
+    monkeypatch.setattr(request_geo, "_geoip_lookup_uncached", fake_uncached)
+
+    first = request_geo._geoip_lookup("8.8.8.8")
+    second = request_geo._geoip_lookup("8.8.8.8")
+
+    assert first == second
+    assert calls == ["8.8.8.8"]
+    assert request_geo._geoip_lookup("10.0.0.1") == request_geo._EMPTY_GEO
@@ -0,0 +1,132 @@
+from fastapi import FastAPI, Request
+from fastapi.responses import StreamingResponse
+from fastapi.testclient import TestClient
+
+from app.common.http_scope import SCOPE_HEADERS_KEY
+from app.middleware_pipeline import RequestPipelineMiddleware
+from app.middleware_rate_limit import RateLimitRule
+
+
+class RecordingWriter:
+    def __init__(self):
+        self.entries = []
+
+    def submit(self, entry):
+        self.entries.append(entry)
+
+
+class FakeUser:
+    id = 7
+    email = "natlog@milkrite-interpuls.com"
+
+
+def build_app(writer, *, max_body_bytes=64, rules=None):
+    app = FastAPI()
+    app.add_middleware(
+        RequestPipelineMiddleware,
+        max_body_bytes=max_body_bytes,
+        rate_limit_rules=tuple(rules or [RateLimitRule("auth_login", "POST", r"^/auth/login$", 1, 60)]),
+        log_writer=writer,
+    )
+
+    @app.post("/echo")
+    async def echo(request: Request):
+        body = await request.body()
+        request.state.user = FakeUser()
+        return {"size": len(body), "cached_headers": SCOPE_HEADERS_KEY in request.scope}
+
+    @app.post("/auth/login")
+    async def login():
+        return {"ok": True}
+
+    @app.get("/stream")
+    async def stream():
+        return StreamingResponse(iter([b"a", b"b", b"c"]), media_type="text/plain")
+
+    @app.get("/items/{item_id}")
+    async def item(item_id: int):
+        return {"id": item_id}
+
+    @app.get("/boom")
+    async def boom():
+        raise RuntimeError("boom")
+
+    return app
+
+
+def test_request_id_is_propagated_and_access_entry_submitted():
+    writer = RecordingWriter()
+    client = TestClient(build_app(writer))
+
+    response = client.post("/echo", json={"a": 1}, headers={"x-request-id": "rid-123", "x-forwarded-for": "203.0.113.9"})
+
+    assert response.status_code == 200
+    assert response.json()["cached_headers"] is True
+    assert response.headers["x-request-id"] == "rid-123"
+    (entry,) = writer.entries
+    assert entry.request_id == "rid-123"
+    assert entry.status_code == 200
+    assert entry.user_id == 7
+    assert entry.ip == "203.0.113.9"
+    assert entry.audit is True
+
+
+def test_access_entry_records_the_route_template():
+    writer = RecordingWriter()
+    client = TestClient(build_app(writer))
+
+    client.get("/items/42")
+    client.get("/missing/42")
+
+    assert [(e.path, e.route) for e in writer.entries] == [("/items/42", "/items/{item_id}"), ("/missing/42", None)]
+
+
+def test_request_id_is_generated_when_missing():
+    writer = RecordingWriter()
+    client = TestClient(build_app(writer))
+
+    response = client.get("/stream")
+
+    assert response.text == "abc"
+    assert response.headers["x-request-id"] == writer.entries[0].request_id
+    assert writer.entries[0].audit is False
+
+
+def test_declared_and_streamed_oversized_bodies_are_rejected():
+    writer = RecordingWriter()
+    client = TestClient(build_app(writer, max_body_bytes=8))
+
+    declared = client.post("/echo", content=b"0123456789")
+
+    def chunks():
+        yield b"01234"
+        yield b"56789"
+
+    streamed = client.post("/echo", content=chunks())
+
+    assert declared.status_code == 413
+    assert streamed.status_code == 413
+    assert [e.status_code for e in writer.entries] == [413, 413]
+
+
+def test_rate_limited_request_is_logged_with_429():
+    writer = RecordingWriter()
+    client = TestClient(build_app(writer))
+
+    assert client.post("/auth/login").status_code == 200
+    blocked = client.post("/auth/login")
+
+    assert blocked.status_code == 429
+    assert blocked.headers["Retry-After"]
+    assert blocked.headers["x-request-id"]
+    assert [e.status_code for e in writer.entries] == [200, 429]
+
+
+def test_unhandled_error_is_logged_as_500():
+    writer = RecordingWriter()
+    client = TestClient(build_app(writer), raise_server_exceptions=False)
+
+    response = client.get("/boom")
+
+    assert response.status_code == 500
+    assert writer.entries[0].status_code == 500
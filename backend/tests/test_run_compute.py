@@ -0,0 +1,208 @@
+import pytest
+import sqlalchemy as sa
+from fastapi.testclient import TestClient
+from sqlalchemy.pool import StaticPool
+from sqlmodel import Session, SQLModel, create_engine, select
+
+from app.auth import get_current_user
+from app.db import get_session
+from app.main import app
+from app.common.enums import FormulaType, TestKind
+from app.model.kpi import CompositeScore, CompositeWeightProfile, KpiDef, KpiScale, KpiValue, TestMetric
+from app.model.massage import MassagePoint, MassageRun
+from app.model.product import Product, ProductApplication
+from app.model.smthood import SmtHoodPoint, SmtHoodRun
+from app.model.speed import SpeedRun
+from app.model.tpp import TppRun
+from app.model.user import User
+from app.services import run_compute
+from app.services.kpi_engine import load_scale_bands, score_from_bands
+from app.services.setting_calculator.cache import clear_setting_calculator_caches
+
+
+KPI_CODES = run_compute.MASSAGE_KPIS + run_compute.SMT_HOOD_KPIS + ("CLOSURE", "SPEED")
+
+
+@pytest.fixture
+def engine():
+    engine = create_engine(
+        "sqlite://",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    SQLModel.metadata.create_all(
+        engine,
+        tables=[
+            Product.__table__,
+            ProductApplication.__table__,
+            KpiScale.__table__,
+            KpiDef.__table__,
+            CompositeWeightProfile.__table__,
+            CompositeScore.__table__,
+            TestMetric.__table__,
+            KpiValue.__table__,
+            TppRun.__table__,
+            SpeedRun.__table__,
+            MassageRun.__table__,
+            MassagePoint.__table__,
+            SmtHoodRun.__table__,
+            SmtHoodPoint.__table__,
+        ],
+    )
+    with Session(engine) as s:
+        product = Product(code="P1", name="Liner", brand="MI", model="M1")
+        s.add(product)
+        s.commit()
+        s.add(ProductApplication(id=1, product_id=product.id, size_mm=50))
+        for code in KPI_CODES:
+            s.add(KpiScale(kpi_code=code, band_min=-1000, band_max=0, score=1))
+            s.add(KpiScale(kpi_code=code, band_min=0, band_max=1000, score=4))
+            s.add(KpiDef(code=code, name=code, test_type_code=TestKind.MASSAGE, formula_type=FormulaType.PY, formula_text="-"))
+        s.commit()
+    clear_setting_calculator_caches()
+    return engine
+
+
+@pytest.fixture
+def client(engine):
+    def override_get_session():
+        with Session(engine) as session:
+            yield session
+
+    app.dependency_overrides[get_session] = override_get_session
+    app.dependency_overrides[get_current_user] = lambda: User(
+        id=1, email="natlog@milkrite-interpuls.com", hashed_password="-", role="admin"
+    )
+    yield TestClient(app)
+    app.dependency_overrides.clear()
+
+
+def record_statements(engine):
+    statements = []
+
+    def record(conn, cursor, statement, *args):
+        statements.append(statement.lstrip().split(None, 1)[0].upper())
+
+    def commit(conn):
+        statements.append("COMMIT")
+
+    sa.event.listen(engine, "before_cursor_execute", record)
+    sa.event.listen(engine, "commit", commit)
+    return statements, lambda: (
+        sa.event.remove(engine, "before_cursor_execute", record),
+        sa.event.remove(engine, "commit", commit),
+    )
+
+
+def massage_run(s) -> MassageRun:
+    run = MassageRun(product_application_id=1)
+    s.add(run)
+    s.flush()
+    s.add_all([
+        MassagePoint(run_id=run.id, pressure_kpa=45, min_val=10.0, max_val=30.0),
+        MassagePoint(run_id=run.id, pressure_kpa=40, min_val=12.0, max_val=28.0),
+        MassagePoint(run_id=run.id, pressure_kpa=35, min_val=14.0, max_val=26.0),
+    ])
+    s.commit()
+    return run
+
+
+def test_score_from_bands_matches_first_band():
+    bands = {"X": [(0.0, 1.0, 1), (1.0, 2.0, 2)]}
+
+    assert score_from_bands(bands, "X", 1.0) == 1
+    assert score_from_bands(bands, "X", 1.5) == 2
+    assert score_from_bands(bands, "X", 3.0) is None
+    assert score_from_bands(bands, "Y", 1.0) is None
+
+
+def test_load_scale_bands_reads_all_codes_at_once(engine):
+    with Session(engine) as s:
+        bands = load_scale_bands(s, ["FITTING", "CLOSURE", "UNKNOWN"])
+
+    assert bands["FITTING"] == [(-1000, 0, 1), (0, 1000, 4)]
+    assert bands["UNKNOWN"] == []
+
+
+def test_massage_compute_endpoint_commits_once(engine, client):
+    with Session(engine) as s:
+        run_id = massage_run(s).id
+
+    statements, stop = record_statements(engine)
+    try:
+        response = client.post(f"/massage/runs/{run_id}/compute")
+    finally:
+        stop()
+
+    assert response.status_code == 200
+    body = response.json()
+    assert body["metrics"]["I45"] == 20.0
+    assert body["kpis"] == {"CONGESTION_RISK": 4, "HYPERKERATOSIS_RISK": 4, "FITTING": 4}
+    # run, punti e bande in lettura; metriche, KPI e punteggio composito in tre upsert; un solo commit
+    assert statements.count("COMMIT") == 1
+    assert statements.count("INSERT") == 3
+    assert "DELETE" not in statements and "UPDATE" not in statements
+
+    with Session(engine) as s:
+        assert len(s.exec(select(TestMetric)).all()) == 9
+        assert {kv.kpi_code for kv in s.exec(select(KpiValue)).all()} == set(run_compute.MASSAGE_KPIS)
+        composite = s.exec(select(CompositeScore)).one()
+        assert (composite.profile_id, composite.score, composite.kpi_count) == (0, 4.0, 3)
+
+
+def test_smt_hood_compute_matches_per_flow_and_final_values(engine):
+    with Session(engine) as s:
+        run = SmtHoodRun(product_application_id=1)
+        s.add(run)
+        s.flush()
+        points = [
+            SmtHoodPoint(run_id=run.id, flow_code=code, flow_lpm=lpm, smt_min=30, smt_max=40 + i, hood_min=31, hood_max=41)
+            for i, (code, lpm) in enumerate(((5, 0.5), (19, 1.9), (36, 3.6)))
+        ]
+        s.add_all(points)
+        s.flush()
+
+        # Percorso importer: punti già in memoria, commit del chiamante
+        result = run_compute.compute_smt_hood_run(s, run, points, commit=False)
+        s.commit()
+
+        assert result["flows"][0.5]["respray"] == {"value": -5.0, "score": 1}
+        assert result["final"]["RESPRAY"] == {"value": -4.0, "unit": "kPa"}
+        assert len(s.exec(select(TestMetric)).all()) == 12
+        kpis = {kv.kpi_code: kv for kv in s.exec(select(KpiValue)).all()}
+        assert set(kpis) == set(run_compute.SMT_HOOD_KPIS)
+        assert kpis["RESPRAY"].value_num == -4.0 and kpis["RESPRAY"].unit == "kPa"
+
+
+def test_missing_points_and_missing_bands_map_to_http_errors(engine, client):
+    with Session(engine) as s:
+        empty = MassageRun(product_application_id=1)
+        tpp = TppRun(product_application_id=1, real_tpp=5000.0)
+        s.add_all([empty, tpp])
+        s.commit()
+        empty_id, tpp_id = empty.id, tpp.id
+
+    missing_points = client.post(f"/massage/runs/{empty_id}/compute")
+    missing_band = client.post(f"/tpp/runs/{tpp_id}/compute")
+
+    assert missing_points.status_code == 400
+    assert missing_band.status_code == 422
+    assert "CLOSURE" in missing_band.json()["detail"]
+    with Session(engine) as s:
+        assert s.exec(select(KpiValue)).all() == []
+
+
+def test_speed_compute_returns_kpi_rows(engine, client):
+    with Session(engine) as s:
+        run = SpeedRun(product_application_id=1, measure_ml=410.0)
+        s.add(run)
+        s.commit()
+        run_id = run.id
+
+    first = client.post(f"/speed/runs/{run_id}/compute").json()
+    again = client.post(f"/speed/runs/{run_id}/compute").json()
+
+    assert [(k["kpi_code"], k["value_num"], k["score"], k["unit"]) for k in first] == [("SPEED", 410.0, 4, "ml")]
+    assert again[0]["computed_at"] >= first[0]["computed_at"]
+    with Session(engine) as s:
+        assert len(s.exec(select(KpiValue)).all()) == 1
@@ -0,0 +1,278 @@
+import contextvars
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+import sqlalchemy as sa
+from fastapi import Depends, FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import registry
+from sqlmodel import Session
+
+import app.db as db
+from app.db import get_session
+from app.services.sqlite_writer import SQLiteWriteQueue, WriteGroupError, create_sqlite_read_engine
+
+
+metadata = sa.MetaData()
+notes = sa.Table(
+    "notes",
+    metadata,
+    sa.Column("id", sa.Integer, primary_key=True),
+    sa.Column("text", sa.String, unique=True),
+)
+
+
+class Note:
+    pass
+
+
+registry().map_imperatively(Note, notes)
+
+
+@pytest.fixture
+def url(tmp_path):
+    url = f"sqlite:///{tmp_path / 'app.db'}"
+    engine = sa.create_engine(url)
+    metadata.create_all(engine)
+    engine.dispose()
+    return url
+
+
+@pytest.fixture
+def writer(url):
+    writer = SQLiteWriteQueue(url, max_batch=8)
+    yield writer
+    writer.close()
+
+
+@pytest.fixture
+def reader(url):
+    reader = create_sqlite_read_engine(url, pool_size=2)
+    yield reader
+    reader.dispose()
+
+
+def texts(engine):
+    with engine.connect() as conn:
+        return sorted(conn.execute(sa.select(notes.c.text)).scalars())
+
+
+def test_concurrent_writers_are_serialized_and_group_committed(writer, reader):
+    errors = []
+
+    def worker(i):
+        try:
+            for j in range(10):
+                with writer.session() as session:
+                    session.execute(notes.insert().values(text=f"{i}-{j}"))
+                    session.commit()
+        except Exception as e:  # pragma: no cover - reported below
+            errors.append(e)
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert errors == []
+    assert len(texts(reader)) == 80
+    stats = writer.stats()
+    assert stats["sessions"] == 80
+    assert stats["queue_depth"] == 0 and not stats["busy"]
+    # almeno un commit ha raggruppato più sessioni
+    assert stats["commits"] < 80 and stats["max_batch_size"] > 1
+    assert stats["max_batch_size"] <= 8
+
+
+def test_failed_session_rolls_back_only_its_own_writes(writer, reader):
+    with writer.session() as session:
+        session.execute(notes.insert().values(text="kept"))
+        session.commit()
+
+    with pytest.raises(sa.exc.IntegrityError):
+        with writer.session() as session:
+            session.execute(notes.insert().values(text="kept"))
+            session.commit()
+
+    with writer.session() as session:
+        session.execute(notes.insert().values(text="discarded"))
+        session.rollback()
+        session.execute(notes.insert().values(text="after-rollback"))
+        session.commit()
+        # mai committato: torna al savepoint alla chiusura
+        session.execute(notes.insert().values(text="uncommitted"))
+
+    assert texts(reader) == ["after-rollback", "kept"]
+
+
+def test_reads_do_not_see_open_group_and_refuse_writes(writer, reader):
+    release = threading.Event()
+    inside = threading.Event()
+
+    def slow_writer():
+        with writer.session() as session:
+            session.execute(notes.insert().values(text="pending"))
+            session.commit()
+            inside.set()
+            release.wait(5)
+
+    t = threading.Thread(target=slow_writer)
+    t.start()
+    inside.wait(5)
+    # il writer tiene la transazione: i lettori (WAL) non si bloccano e non la vedono
+    assert texts(reader) == []
+    release.set()
+    t.join()
+    assert texts(reader) == ["pending"]
+
+    with pytest.raises(sa.exc.OperationalError):
+        with reader.begin() as conn:
+            conn.execute(notes.insert().values(text="nope"))
+
+
+def test_nested_write_session_in_same_thread(writer, reader):
+    with writer.session() as outer:
+        outer.execute(notes.insert().values(text="outer"))
+        outer.commit()
+        with writer.session() as inner:
+            inner.execute(notes.insert().values(text="inner"))
+            inner.commit()
+
+    assert texts(reader) == ["inner", "outer"]
+    assert writer.stats()["commits"] == 1
+
+
+def test_reused_worker_thread_does_not_join_another_session(writer, reader):
+    # come il threadpool di FastAPI: stesso thread, un contesto copiato per ogni chiamata
+    pool = ThreadPoolExecutor(max_workers=1)
+
+    def in_worker(fn, *args):
+        return pool.submit(contextvars.copy_context().run, fn, *args)
+
+    first = writer.session()
+    first_session = in_worker(first.__enter__).result(5)
+    second = writer.session()
+    second_entered = in_worker(second.__enter__)
+    try:
+        # l'altra richiesta resta in coda finché la prima non rilascia il writer
+        with pytest.raises(TimeoutError):
+            second_entered.result(0.2)
+        assert writer.stats()["queue_depth"] == 1
+        first_session.execute(notes.insert().values(text="first"))
+        first_session.commit()
+        # la prima aspetta il commit di gruppo, che arriva quando esce la seconda
+        first_exit = threading.Thread(target=first.__exit__, args=(None, None, None))
+        first_exit.start()
+        second_session = second_entered.result(5)
+        second_session.execute(notes.insert().values(text="second"))
+        second_session.commit()
+        second.__exit__(None, None, None)
+        first_exit.join(5)
+    finally:
+        pool.shutdown(wait=False)
+
+    assert texts(reader) == ["first", "second"]
+    assert writer.stats()["sessions"] == 2
+
+
+def test_lazy_session_takes_the_writer_at_first_flush(writer, reader):
+    with writer.session(read_bind=reader) as session:
+        assert session.execute(sa.select(notes.c.text)).scalars().all() == []
+        assert writer.stats()["sessions"] == 0
+        note = Note()
+        note.text = "orm"
+        session.add(note)
+        session.commit()
+        assert writer.stats()["sessions"] == 1
+        # dopo la scrittura anche le letture passano dal writer
+        assert session.execute(sa.select(notes.c.text)).scalars().all() == ["orm"]
+
+    assert texts(reader) == ["orm"]
+    assert writer.stats()["commits"] == 1
+
+
+def test_failed_group_commit_fails_every_member(writer):
+    with writer.session() as session:
+        session.execute(notes.insert().values(text="x"))
+        session.commit()
+
+    conn = writer._conn
+    original = conn.commit
+
+    def broken_commit():
+        raise sa.exc.OperationalError("COMMIT", {}, Exception("disk I/O error"))
+
+    conn.commit = broken_commit
+    try:
+        with pytest.raises(WriteGroupError):
+            with writer.session() as session:
+                session.execute(notes.insert().values(text="y"))
+                session.commit()
+    finally:
+        conn.commit = original
+    assert writer.stats()["failed_commits"] == 1
+
+    with writer.session() as session:
+        assert session.execute(sa.select(notes.c.text)).scalars().all() == ["x"]
+
+
+def test_session_dependency_routes_writes_through_the_queue(url, writer, reader, monkeypatch):
+    monkeypatch.setattr(db, "sqlite_writer", writer)
+    monkeypatch.setattr(db, "read_router", db.ReadRouter(db.engine, reader, pin_seconds=0))
+
+    api = FastAPI()
+
+    @api.get("/notes")
+    def list_notes(session: Session = Depends(get_session)):
+        return [text for (text,) in session.execute(sa.select(notes.c.text).order_by(notes.c.id))]
+
+    @api.post("/notes")
+    def add_note(text: str, session: Session = Depends(get_session)):
+        session.execute(notes.insert().values(text=text))
+        session.commit()
+        return {"ok": True}
+
+    client = TestClient(api)
+    assert client.post("/notes", params={"text": "a"}).status_code == 200
+    # la risposta arriva dopo il commit di gruppo: la GET dal pool di lettura la vede
+    assert client.get("/notes").json() == ["a"]
+    assert writer.stats()["commits"] == 1
+    assert db.sqlite_writer_stats()["enabled"] is True
+
+
+def test_read_only_post_does_not_wait_for_the_writer(url, writer, reader, monkeypatch):
+    monkeypatch.setattr(db, "sqlite_writer", writer)
+    monkeypatch.setattr(db, "read_router", db.ReadRouter(db.engine, reader, pin_seconds=0))
+
+    api = FastAPI()
+
+    @api.post("/notes/search")
+    def search_notes(prefix: str, session: Session = Depends(get_session)):
+        stmt = sa.select(notes.c.text).where(notes.c.text.startswith(prefix))
+        return [text for (text,) in session.execute(stmt)]
+
+    with writer.session() as session:
+        session.execute(notes.insert().values(text="ac"))
+        session.commit()
+
+    # un'altra sessione tiene il writer: la POST di sola lettura non si mette in coda
+    release = threading.Event()
+    inside = threading.Event()
+
+    def holder():
+        with writer.session():
+            inside.set()
+            release.wait(5)
+
+    t = threading.Thread(target=holder)
+    t.start()
+    inside.wait(5)
+    try:
+        assert TestClient(api).post("/notes/search", params={"prefix": "a"}).json() == ["ac"]
+        assert writer.stats()["queue_depth"] == 0
+    finally:
+        release.set()
+        t.join()
+    assert writer.stats()["sessions"] == 2
@@ -0,0 +1,64 @@
+import threading
+import time
+
+import sqlalchemy as sa
+from alembic.config import Config
+from alembic.script import ScriptDirectory
+
+from app.services.startup_migrations import ALEMBIC_INI, migrate_to_head, script_heads
+
+
+def sqlite_engine(tmp_path):
+    return sa.create_engine(f"sqlite:///{tmp_path / 'app.db'}", connect_args={"check_same_thread": False})
+
+
+def stamp(engine, revisions):
+    with engine.begin() as conn:
+        conn.execute(sa.text("CREATE TABLE IF NOT EXISTS alembic_version (version_num VARCHAR(32) NOT NULL)"))
+        conn.execute(sa.text("DELETE FROM alembic_version"))
+        for rev in revisions:
+            conn.execute(sa.text("INSERT INTO alembic_version VALUES (:rev)"), {"rev": rev})
+
+
+def test_script_heads_match_alembic():
+    assert script_heads() == frozenset(ScriptDirectory.from_config(Config(ALEMBIC_INI)).get_heads())
+
+
+def test_at_head_skips_lock_and_upgrade(tmp_path):
+    engine = sqlite_engine(tmp_path)
+    stamp(engine, script_heads())
+
+    def upgrade(url):
+        raise AssertionError("upgrade must not run")
+
+    report = migrate_to_head(engine, str(engine.url), upgrade=upgrade)
+
+    assert report["outcome"] == "at_head"
+    assert set(report["timings_ms"]) == {"script_heads", "revision_check", "total"}
+    assert not (tmp_path / "app.db.migrate.lock").exists()
+
+
+def test_concurrent_workers_migrate_once(tmp_path):
+    engine = sqlite_engine(tmp_path)
+    calls = []
+
+    def upgrade(url):
+        calls.append(url)
+        time.sleep(0.2)
+        stamp(engine, script_heads())
+
+    reports = []
+
+    def worker():
+        reports.append(migrate_to_head(engine, str(engine.url), poll_seconds=0.02, upgrade=upgrade))
+
+    threads = [threading.Thread(target=worker) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert len(calls) == 1
+    assert sorted(r["outcome"] for r in reports) == ["upgraded"] + ["upgraded_by_peer"] * 3
+    upgraded = next(r for r in reports if r["outcome"] == "upgraded")
+    assert {"lock_wait", "upgrade"} <= set(upgraded["timings_ms"])
@@ -14,6 +14,8 @@ from app.model.audit_log import AuditLog
 from app.model.access_log import AccessLog
 from app.model.setting_comparison_preference import SettingComparisonPreference
 from app.model.search import SearchPreference
+from app.model.kpi import CompositeScore, CompositeWeightProfile
+from app.model.product import Product, ProductApplication
 
 
 def build_engine():
@@ -36,6 +38,10 @@ def build_client(*, role=UserRole.USER):
             AccessLog.__table__,
             SettingComparisonPreference.__table__,
             SearchPreference.__table__,
+            Product.__table__,
+            ProductApplication.__table__,
+            CompositeWeightProfile.__table__,
+            CompositeScore.__table__,
         ],
     )
 
@@ -152,6 +158,11 @@ def test_admin_can_delete_user_with_related_logs():
         session.add(SecurityEvent(user_id=target.id, rule_code="RESET", severity="low", ip="127.0.0.1", request_id="req-2", created_at=datetime(2020, 1, 1)))
         session.add(AuditLog(request_id="req-3", user_id=target.id, method="DELETE", path=f"/users/{target.id}", status_code=204, duration_ms=10, created_at=datetime(2020, 1, 1)))
         session.add(AccessLog(request_id="req-4", user_id=target.id, method="DELETE", path=f"/users/{target.id}", status_code=204, duration_ms=10, created_at=datetime(2020, 1, 1)))
+        session.add(Product(id=1, code="P1", name="Liner"))
+        session.add(ProductApplication(id=1, product_id=1, size_mm=60))
+        session.add(CompositeWeightProfile(id=7, user_id=target.id, name="mine", weights={"SPEED": 1}))
+        session.commit()
+        session.add(CompositeScore(profile_id=7, product_application_id=1, score=3.0, coverage=1.0, kpi_count=1))
         session.commit()
 
         response = client.delete(f"/users/{target.id}")
@@ -162,5 +173,7 @@ def test_admin_can_delete_user_with_related_logs():
         assert session.exec(select(SecurityEvent).where(SecurityEvent.user_id == target.id)).all() == []
         assert session.exec(select(AuditLog).where(AuditLog.user_id == target.id)).all() == []
         assert session.exec(select(AccessLog).where(AccessLog.user_id == target.id)).all() == []
+        assert session.exec(select(CompositeWeightProfile)).all() == []
+        assert session.exec(select(CompositeScore)).all() == []
     finally:
         teardown_client(client)
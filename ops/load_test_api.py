@@ -1,155 +1,503 @@
 #!/usr/bin/env python3
+"""Asyncio load-test harness for the Liner Characteristic API.
+
+Stdlib only. Requests go through a pool of keep-alive HTTP/1.1 connections.
+
+Modes:
+  login     closed-loop load against POST /auth/login
+  compute   closed-loop load against a compute endpoint (default /setting-calculator/compare)
+  scenario  open-model replay of user journeys described in a JSON scenario file
+  compare   diff two JSON result files (e.g. two releases)
+"""
 import argparse
+import asyncio
 import json
-import statistics
+import math
+import os
+import random
+import re
+import ssl
 import sys
-import threading
 import time
-import urllib.error
 import urllib.parse
-import urllib.request
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timezone
 
 
 DEFAULT_HEADERS = {
-    "User-Agent": "liner-controlled-loadtest/1.0",
+    "User-Agent": "liner-controlled-loadtest/2.0",
 }
 
-
-def percentile(sorted_values, ratio):
-    if not sorted_values:
-        return 0.0
-    index = int(round((len(sorted_values) - 1) * ratio))
-    index = max(0, min(index, len(sorted_values) - 1))
-    return sorted_values[index]
-
-
-def build_request(url, *, method="GET", headers=None, body=None):
-    req_headers = dict(DEFAULT_HEADERS)
-    if headers:
-        req_headers.update(headers)
-    return urllib.request.Request(url, data=body, headers=req_headers, method=method)
-
-
-def do_request(url, *, method="GET", headers=None, body=None, timeout=30):
-    started = time.perf_counter()
-    try:
-        request = build_request(url, method=method, headers=headers, body=body)
-        with urllib.request.urlopen(request, timeout=timeout) as response:
-            payload = response.read()
-            duration_ms = (time.perf_counter() - started) * 1000
-            return {
-                "ok": True,
-                "status": response.status,
-                "duration_ms": duration_ms,
-                "body": payload.decode("utf-8", errors="replace"),
-            }
-    except urllib.error.HTTPError as exc:
-        duration_ms = (time.perf_counter() - started) * 1000
-        body_text = exc.read().decode("utf-8", errors="replace")
+RESULT_SCHEMA_VERSION = "2.0"
+
+
+# ---------------------------------------------------------------------------
+# --------------------------- HISTOGRAMS ------------------------------------
+# ---------------------------------------------------------------------------
+
+class LatencyHistogram:
+    """Log-bucketed latency histogram (~4% relative error), mergeable and JSON friendly."""
+
+    GROWTH = 1.04
+    MIN_MS = 0.1
+
+    def __init__(self):
+        self.counts = {}
+        self.total = 0
+        self.sum_ms = 0.0
+        self.min_ms = None
+        self.max_ms = 0.0
+
+    def _bucket(self, value_ms):
+        if value_ms <= self.MIN_MS:
+            return 0
+        return int(math.log(value_ms / self.MIN_MS, self.GROWTH)) + 1
+
+    def _bucket_upper_ms(self, bucket):
+        return self.MIN_MS * (self.GROWTH ** bucket)
+
+    def record(self, value_ms):
+        bucket = self._bucket(value_ms)
+        self.counts[bucket] = self.counts.get(bucket, 0) + 1
+        self.total += 1
+        self.sum_ms += value_ms
+        self.min_ms = value_ms if self.min_ms is None else min(self.min_ms, value_ms)
+        self.max_ms = max(self.max_ms, value_ms)
+
+    def quantile(self, ratio):
+        if not self.total:
+            return 0.0
+        rank = max(1, int(math.ceil(ratio * self.total)))
+        seen = 0
+        for bucket in sorted(self.counts):
+            seen += self.counts[bucket]
+            if seen >= rank:
+                return min(self._bucket_upper_ms(bucket), self.max_ms)
+        return self.max_ms
+
+    def to_dict(self):
         return {
-            "ok": False,
-            "status": exc.code,
-            "duration_ms": duration_ms,
-            "body": body_text,
+            "count": self.total,
+            "mean_ms": round(self.sum_ms / self.total, 3) if self.total else 0.0,
+            "min_ms": round(self.min_ms or 0.0, 3),
+            "p50_ms": round(self.quantile(0.50), 3),
+            "p90_ms": round(self.quantile(0.90), 3),
+            "p95_ms": round(self.quantile(0.95), 3),
+            "p99_ms": round(self.quantile(0.99), 3),
+            "max_ms": round(self.max_ms, 3),
+            # bucket upper bound (ms) -> count, sorted, for plotting/merging
+            "buckets": [
+                [round(self._bucket_upper_ms(b), 3), self.counts[b]]
+                for b in sorted(self.counts)
+            ],
         }
-    except Exception as exc:
-        duration_ms = (time.perf_counter() - started) * 1000
+
+
+class EndpointStats:
+    def __init__(self):
+        self.histogram = LatencyHistogram()
+        self.status_counts = {}
+        self.errors = 0
+        self.sample_failures = []
+
+    def record(self, result):
+        self.histogram.record(result["duration_ms"])
+        key = str(result["status"])
+        self.status_counts[key] = self.status_counts.get(key, 0) + 1
+        if not result["ok"]:
+            self.errors += 1
+            if len(self.sample_failures) < 5:
+                snippet = (result.get("body") or "").strip().replace("\n", " ")
+                self.sample_failures.append(
+                    {"status": result["status"], "duration_ms": round(result["duration_ms"], 2), "body": snippet[:180]}
+                )
+
+    def to_dict(self):
+        out = self.histogram.to_dict()
+        out["errors"] = self.errors
+        out["error_rate"] = round(self.errors / out["count"], 4) if out["count"] else 0.0
+        out["status_counts"] = dict(sorted(self.status_counts.items()))
+        out["sample_failures"] = self.sample_failures
+        return out
+
+
+class ResultCollector:
+    def __init__(self):
+        self.endpoints = {}
+        self.journeys = EndpointStats()
+        self.started = time.perf_counter()
+        self.finished = None
+
+    def record(self, name, result):
+        self.endpoints.setdefault(name, EndpointStats()).record(result)
+
+    def record_journey(self, result):
+        self.journeys.record(result)
+
+    def to_dict(self, meta):
+        elapsed = (self.finished or time.perf_counter()) - self.started
+        total = sum(s.histogram.total for s in self.endpoints.values())
         return {
-            "ok": False,
-            "status": "EXC",
-            "duration_ms": duration_ms,
-            "body": str(exc),
+            "schema_version": RESULT_SCHEMA_VERSION,
+            "meta": meta,
+            "elapsed_seconds": round(elapsed, 3),
+            "total_requests": total,
+            "throughput_rps": round(total / elapsed, 2) if elapsed > 0 else 0.0,
+            "endpoints": {name: stats.to_dict() for name, stats in sorted(self.endpoints.items())},
+            "journeys": self.journeys.to_dict(),
         }
 
 
-class ControlledLoadRunner:
-    def __init__(self, *, total_requests, concurrency, delay_seconds):
-        self.total_requests = total_requests
-        self.concurrency = concurrency
-        self.delay_seconds = delay_seconds
-        self._lock = threading.Lock()
-        self._next_index = 0
+# ---------------------------------------------------------------------------
+# ------------------------ KEEP-ALIVE HTTP CLIENT ---------------------------
+# ---------------------------------------------------------------------------
+
+class HttpConnection:
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+        self.reusable = True
+
+    async def request(self, method, target, host_header, headers, body):
+        lines = [f"{method} {target} HTTP/1.1", f"Host: {host_header}", "Connection: keep-alive"]
+        for key, value in headers.items():
+            lines.append(f"{key}: {value}")
+        lines.append(f"Content-Length: {len(body or b'')}")
+        self.writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1") + (body or b""))
+        await self.writer.drain()
+
+        status_line = await self.reader.readline()
+        if not status_line:
+            raise ConnectionError("connection closed by server")
+        parts = status_line.decode("latin-1").split(" ", 2)
+        status = int(parts[1])
+
+        response_headers = {}
+        while True:
+            line = await self.reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            key, _, value = line.decode("latin-1").partition(":")
+            response_headers[key.strip().lower()] = value.strip()
+
+        connection_close = response_headers.get("connection", "").lower() == "close"
+        if method == "HEAD" or status < 200 or status in (204, 304):
+            # mai un body (RFC 9112 6.3), anche se c'è Content-Length (HEAD)
+            payload = b""
+        elif response_headers.get("transfer-encoding", "").lower() == "chunked":
+            chunks = []
+            while True:
+                size_line = await self.reader.readline()
+                size = int(size_line.split(b";")[0].strip() or b"0", 16)
+                if size == 0:
+                    await self.reader.readline()
+                    break
+                chunks.append(await self.reader.readexactly(size))
+                await self.reader.readexactly(2)
+            payload = b"".join(chunks)
+        elif "content-length" in response_headers:
+            payload = await self.reader.readexactly(int(response_headers["content-length"]))
+        elif connection_close:
+            # body delimitato dalla chiusura della connessione
+            payload = await self.reader.read()
+        else:
+            payload = b""
+
+        if connection_close:
+            self.reusable = False
+        return status, response_headers, payload
+
+    def close(self):
+        try:
+            self.writer.close()
+        except Exception:
+            pass
+
+
+class ConnectionPool:
+    """Bounded pool of keep-alive connections to a single origin."""
+
+    def __init__(self, base_url, *, max_connections, timeout_seconds):
+        parsed = urllib.parse.urlsplit(base_url.rstrip("/"))
+        self.scheme = parsed.scheme or "http"
+        self.host = parsed.hostname or "127.0.0.1"
+        self.port = parsed.port or (443 if self.scheme == "https" else 80)
+        self.base_path = parsed.path or ""
+        default_port = (self.scheme == "https" and self.port == 443) or (self.scheme == "http" and self.port == 80)
+        self.host_header = self.host if default_port else f"{self.host}:{self.port}"
+        self.timeout_seconds = timeout_seconds
+        self._ssl = ssl.create_default_context() if self.scheme == "https" else None
+        self._idle = []
+        self._slots = asyncio.Semaphore(max_connections)
+        self.opened = 0
+
+    async def _connect(self):
+        reader, writer = await asyncio.open_connection(
+            self.host,
+            self.port,
+            ssl=self._ssl,
+            server_hostname=self.host if self._ssl else None,
+        )
+        self.opened += 1
+        return HttpConnection(reader, writer)
+
+    async def request(self, method, path, *, headers=None, body=None):
+        req_headers = dict(DEFAULT_HEADERS)
+        if headers:
+            req_headers.update(headers)
+        target = self.base_path + path
+        started = time.perf_counter()
+        async with self._slots:
+            conn = self._idle.pop() if self._idle else None
+            try:
+                if conn is None:
+                    conn = await asyncio.wait_for(self._connect(), timeout=self.timeout_seconds)
+                status, _headers, payload = await asyncio.wait_for(
+                    conn.request(method, target, self.host_header, req_headers, body),
+                    timeout=self.timeout_seconds,
+                )
+            except Exception as exc:
+                if conn is not None:
+                    conn.close()
+                return {
+                    "ok": False,
+                    "status": "EXC",
+                    "duration_ms": (time.perf_counter() - started) * 1000,
+                    "body": f"{type(exc).__name__}: {exc}",
+                }
+            if conn.reusable:
+                self._idle.append(conn)
+            else:
+                conn.close()
+        return {
+            "ok": status < 400,
+            "status": status,
+            "duration_ms": (time.perf_counter() - started) * 1000,
+            "body": payload.decode("utf-8", errors="replace"),
+        }
 
-    def _next_job(self):
-        with self._lock:
-            if self._next_index >= self.total_requests:
-                return None
-            current = self._next_index
-            self._next_index += 1
-            return current
+    def close(self):
+        for conn in self._idle:
+            conn.close()
+        self._idle = []
+
+
+# ---------------------------------------------------------------------------
+# ----------------------------- SCENARIOS -----------------------------------
+# ---------------------------------------------------------------------------
+
+_VAR_RE = re.compile(r"\{([A-Za-z_][A-Za-z0-9_]*)\}")
+
+
+def render(value, variables):
+    if isinstance(value, str):
+        whole = _VAR_RE.fullmatch(value)
+        if whole and whole.group(1) in variables:
+            # "{var}" alone keeps the variable's type (e.g. ints in JSON bodies)
+            return variables[whole.group(1)]
+        return _VAR_RE.sub(lambda m: str(variables.get(m.group(1), m.group(0))), value)
+    if isinstance(value, list):
+        return [render(v, variables) for v in value]
+    if isinstance(value, dict):
+        return {k: render(v, variables) for k, v in value.items()}
+    return value
+
+
+def load_scenario(path):
+    with open(path, "r", encoding="utf-8") as fh:
+        scenario = json.load(fh)
+    base_dir = os.path.dirname(os.path.abspath(path))
+    for step in scenario.get("setup", []) + scenario.get("journey", []):
+        body_file = step.get("json_file")
+        if body_file:
+            with open(os.path.join(base_dir, body_file), "r", encoding="utf-8") as fh:
+                step["json"] = json.load(fh)
+    return scenario
+
+
+def extract_json_path(payload, dotted):
+    current = payload
+    for part in dotted.split("."):
+        if isinstance(current, list):
+            current = current[int(part)] if part.isdigit() and int(part) < len(current) else None
+        elif isinstance(current, dict):
+            current = current.get(part)
+        else:
+            return None
+    return current
+
+
+def set_json_path(payload, dotted, value):
+    parts = dotted.split(".")
+    current = payload
+    for part in parts[:-1]:
+        current = current.setdefault(part, {})
+    current[parts[-1]] = value
+
+
+async def run_step(pool, step, variables, collector):
+    method = step.get("method", "GET").upper()
+    path = render(step["path"], variables)
+    query = step.get("query")
+    if query:
+        path += "?" + urllib.parse.urlencode(render(query, variables))
+    headers = render(step.get("headers", {}), variables)
+    if variables.get("token") and step.get("auth", True):
+        headers.setdefault("Authorization", f"Bearer {variables['token']}")
+
+    body = None
+    if "json" in step:
+        payload = render(step["json"], variables)
+        for dotted, value in (step.get("json_set") or {}).items():
+            set_json_path(payload, dotted, render(value, variables))
+        body = json.dumps(payload).encode("utf-8")
+        headers.setdefault("Content-Type", "application/json")
+    elif "form" in step:
+        body = urllib.parse.urlencode(render(step["form"], variables)).encode("utf-8")
+        headers.setdefault("Content-Type", "application/x-www-form-urlencoded")
+
+    result = await pool.request(method, path, headers=headers, body=body)
+    collector.record(step.get("name") or f"{method} {step['path']}", result)
+
+    extract = step.get("extract") or {}
+    if extract and result["ok"]:
+        try:
+            payload = json.loads(result["body"] or "null")
+        except ValueError:
+            payload = None
+        for var_name, json_path in extract.items():
+            value = extract_json_path(payload, json_path)
+            if value is not None:
+                variables[var_name] = value
+    return result
+
+
+async def run_journey(pool, steps, variables, collector, think_time_seconds):
+    started = time.perf_counter()
+    ok = True
+    status = 200
+    for step in steps:
+        parallel = step.get("parallel")
+        if parallel:
+            # A "bundle" of requests the frontend fires concurrently
+            results = await asyncio.gather(*(run_step(pool, s, variables, collector) for s in parallel))
+        else:
+            results = [await run_step(pool, step, variables, collector)]
+        failed = [r for r in results if not r["ok"]]
+        if failed:
+            ok = False
+            status = failed[0]["status"]
+            if step.get("stop_on_error", True):
+                break
+        if think_time_seconds > 0:
+            await asyncio.sleep(random.expovariate(1.0 / think_time_seconds))
+    collector.record_journey(
+        {"ok": ok, "status": status, "duration_ms": (time.perf_counter() - started) * 1000, "body": ""}
+    )
 
-    def run(self, fn):
-        results = []
 
-        def worker():
-            local_results = []
-            while True:
-                idx = self._next_job()
-                if idx is None:
-                    return local_results
-                local_results.append(fn(idx))
-                if self.delay_seconds > 0:
-                    time.sleep(self.delay_seconds)
-
-        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
-            futures = [executor.submit(worker) for _ in range(self.concurrency)]
-            for future in as_completed(futures):
-                results.extend(future.result())
-        return results
-
-
-def summarize_results(label, results):
-    if not results:
-        print(f"{label}: no results")
-        return 1
-
-    durations = sorted(r["duration_ms"] for r in results)
-    by_status = {}
-    failures = []
-    for item in results:
-        key = str(item["status"])
-        by_status[key] = by_status.get(key, 0) + 1
-        if not item["ok"] or (isinstance(item["status"], int) and item["status"] >= 400):
-            failures.append(item)
-
-    print(f"{label}:")
-    print(f"  total_requests: {len(results)}")
-    print(f"  status_counts: {json.dumps(by_status, ensure_ascii=True, sort_keys=True)}")
-    print(f"  avg_ms: {statistics.mean(durations):.2f}")
-    print(f"  p50_ms: {percentile(durations, 0.50):.2f}")
-    print(f"  p95_ms: {percentile(durations, 0.95):.2f}")
-    print(f"  max_ms: {max(durations):.2f}")
-
-    if failures:
-        print("  sample_failures:")
-        for item in failures[:5]:
-            snippet = (item["body"] or "").strip().replace("\n", " ")
-            print(f"    - status={item['status']} dur_ms={item['duration_ms']:.2f} body={snippet[:180]}")
-        return 1
-    return 0
+async def scenario_mode_async(args):
+    scenario = load_scenario(args.scenario_file)
+    variables = dict(scenario.get("variables", {}))
+    for item in args.var or []:
+        key, _, value = item.partition("=")
+        variables[key] = value
+    if args.username:
+        variables["username"] = args.username
+    if args.password:
+        variables["password"] = args.password
+    if args.bearer_token:
+        variables["token"] = args.bearer_token
+
+    pool = ConnectionPool(args.url, max_connections=args.max_connections, timeout_seconds=args.timeout_seconds)
+    collector = ResultCollector()
+
+    # Setup (e.g. login) runs once; extracted variables are shared by every journey
+    for step in scenario.get("setup", []):
+        if step.get("skip_if_set") and variables.get(step["skip_if_set"]):
+            continue
+        result = await run_step(pool, step, variables, collector)
+        if not result["ok"]:
+            print(f"setup step {step.get('name')} failed: status={result['status']} body={result['body'][:180]}")
+            pool.close()
+            return 1
+
+    steps = scenario.get("journey", [])
+    think_time = args.think_time_seconds if args.think_time_seconds is not None else scenario.get("think_time_seconds", 0)
+    rng = random.Random(args.seed)
+    in_flight = set()
+    deadline = time.perf_counter() + args.duration_seconds
+    collector.started = time.perf_counter()
+    skipped = 0
+
+    # Open model: journeys arrive as a Poisson process, independent of completions
+    while time.perf_counter() < deadline:
+        if len(in_flight) < args.max_in_flight:
+            task = asyncio.create_task(run_journey(pool, steps, dict(variables), collector, think_time))
+            in_flight.add(task)
+            task.add_done_callback(in_flight.discard)
+        else:
+            skipped += 1
+        await asyncio.sleep(rng.expovariate(args.arrival_rate))
+
+    if in_flight:
+        await asyncio.gather(*in_flight)
+    collector.finished = time.perf_counter()
+    pool.close()
+
+    meta = {
+        "mode": "scenario",
+        "scenario": scenario.get("name") or os.path.basename(args.scenario_file),
+        "url": args.url,
+        "arrival_rate_per_s": args.arrival_rate,
+        "duration_seconds": args.duration_seconds,
+        "max_in_flight": args.max_in_flight,
+        "max_connections": args.max_connections,
+        "connections_opened": pool.opened,
+        "arrivals_skipped_max_in_flight": skipped,
+        "label": args.label,
+        "started_at": datetime.now(timezone.utc).isoformat(),
+    }
+    return finish(collector.to_dict(meta), args)
+
+
+# ---------------------------------------------------------------------------
+# ------------------------ CLOSED-LOOP MODES --------------------------------
+# ---------------------------------------------------------------------------
+
+async def closed_loop(args, name, method, path, headers, body):
+    pool = ConnectionPool(args.url, max_connections=args.concurrency, timeout_seconds=args.timeout_seconds)
+    collector = ResultCollector()
+    remaining = args.requests
+
+    async def worker():
+        nonlocal remaining
+        while remaining > 0:
+            remaining -= 1
+            collector.record(name, await pool.request(method, path, headers=headers, body=body))
+            if args.delay_seconds > 0:
+                await asyncio.sleep(args.delay_seconds)
+
+    await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+    collector.finished = time.perf_counter()
+    pool.close()
+    meta = {
+        "mode": args.mode,
+        "url": args.url,
+        "requests": args.requests,
+        "concurrency": args.concurrency,
+        "connections_opened": pool.opened,
+        "label": args.label,
+        "started_at": datetime.now(timezone.utc).isoformat(),
+    }
+    return finish(collector.to_dict(meta), args)
 
 
 def login_mode(args):
     body = urllib.parse.urlencode(
         {"username": args.username, "password": args.password}
     ).encode("utf-8")
-
-    def hit(_index):
-        return do_request(
-            args.url.rstrip("/") + "/auth/login",
-            method="POST",
-            headers={"Content-Type": "application/x-www-form-urlencoded"},
-            body=body,
-            timeout=args.timeout_seconds,
-        )
-
-    runner = ControlledLoadRunner(
-        total_requests=args.requests,
-        concurrency=args.concurrency,
-        delay_seconds=args.delay_seconds,
-    )
-    return summarize_results("login_load_test", runner.run(hit))
+    headers = {"Content-Type": "application/x-www-form-urlencoded"}
+    return asyncio.run(closed_loop(args, "login", "POST", "/auth/login", headers, body))
 
 
 def compute_mode(args):
@@ -159,42 +507,97 @@ def compute_mode(args):
     headers = {"Content-Type": "application/json"}
     if args.bearer_token:
         headers["Authorization"] = f"Bearer {args.bearer_token}"
+    return asyncio.run(closed_loop(args, "compute", args.method.upper(), args.path, headers, body))
 
-    def hit(_index):
-        return do_request(
-            args.url.rstrip("/") + args.path,
-            method=args.method.upper(),
-            headers=headers,
-            body=body,
-            timeout=args.timeout_seconds,
-        )
 
-    runner = ControlledLoadRunner(
-        total_requests=args.requests,
-        concurrency=args.concurrency,
-        delay_seconds=args.delay_seconds,
-    )
-    return summarize_results("compute_load_test", runner.run(hit))
+def scenario_mode(args):
+    return asyncio.run(scenario_mode_async(args))
+
+
+# ---------------------------------------------------------------------------
+# ------------------------------ OUTPUT -------------------------------------
+# ---------------------------------------------------------------------------
+
+def print_summary(result):
+    print(f"{result['meta'].get('mode')} load test: {result['total_requests']} requests "
+          f"in {result['elapsed_seconds']:.2f}s ({result['throughput_rps']:.2f} req/s)")
+    header = f"  {'endpoint':<32} {'count':>7} {'err%':>6} {'p50':>9} {'p95':>9} {'p99':>9} {'max':>9}"
+    print(header)
+    rows = list(result["endpoints"].items())
+    if result["journeys"]["count"]:
+        rows.append(("<journey>", result["journeys"]))
+    for name, stats in rows:
+        print(
+            f"  {name[:32]:<32} {stats['count']:>7} {stats['error_rate'] * 100:>5.1f}% "
+            f"{stats['p50_ms']:>9.2f} {stats['p95_ms']:>9.2f} {stats['p99_ms']:>9.2f} {stats['max_ms']:>9.2f}"
+        )
+    for name, stats in result["endpoints"].items():
+        for item in stats["sample_failures"]:
+            print(f"  ! {name} status={item['status']} dur_ms={item['duration_ms']} body={item['body']}")
+
+
+def finish(result, args):
+    print_summary(result)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as fh:
+            json.dump(result, fh, indent=2, sort_keys=True)
+        print(f"results written to {args.output}")
+    has_errors = any(s["errors"] for s in result["endpoints"].values())
+    return 1 if has_errors else 0
+
+
+def compare_mode(args):
+    with open(args.baseline, "r", encoding="utf-8") as fh:
+        baseline = json.load(fh)
+    with open(args.candidate, "r", encoding="utf-8") as fh:
+        candidate = json.load(fh)
+
+    regressions = 0
+    names = sorted(set(baseline["endpoints"]) | set(candidate["endpoints"]))
+    print(f"  {'endpoint':<32} {'metric':<8} {'baseline':>10} {'candidate':>10} {'delta':>8}")
+    for name in names:
+        base = baseline["endpoints"].get(name)
+        cand = candidate["endpoints"].get(name)
+        if base is None or cand is None:
+            print(f"  {name[:32]:<32} only in {'candidate' if base is None else 'baseline'}")
+            continue
+        for metric in ("p50_ms", "p95_ms", "p99_ms", "error_rate"):
+            old, new = base[metric], cand[metric]
+            delta = ((new - old) / old * 100) if old else 0.0
+            flag = ""
+            if metric != "error_rate" and old and delta > args.threshold_pct:
+                flag = "  REGRESSION"
+                regressions += 1
+            if metric == "error_rate" and new > old:
+                flag = "  MORE ERRORS"
+                regressions += 1
+            print(f"  {name[:32]:<32} {metric:<8} {old:>10.3f} {new:>10.3f} {delta:>7.1f}%{flag}")
+    return 1 if regressions else 0
 
 
 def main():
     parser = argparse.ArgumentParser(
-        description="Controlled load test for login and compute endpoints."
+        description="Async load test for login, compute endpoints and user-journey scenarios."
     )
     subparsers = parser.add_subparsers(dest="mode", required=True)
 
+    def add_common(p):
+        p.add_argument("--url", required=True, help="Base API URL, e.g. http://127.0.0.1:8080")
+        p.add_argument("--timeout-seconds", type=float, default=30)
+        p.add_argument("--output", help="Write JSON results to this file")
+        p.add_argument("--label", default="", help="Free-form label stored in results (e.g. release tag)")
+
     login = subparsers.add_parser("login", help="Run controlled load against /auth/login")
-    login.add_argument("--url", required=True, help="Base API URL, e.g. http://127.0.0.1:8080")
+    add_common(login)
     login.add_argument("--username", required=True)
     login.add_argument("--password", required=True)
     login.add_argument("--requests", type=int, default=10)
     login.add_argument("--concurrency", type=int, default=2)
     login.add_argument("--delay-seconds", type=float, default=0.25)
-    login.add_argument("--timeout-seconds", type=float, default=15)
     login.set_defaults(func=login_mode)
 
     compute = subparsers.add_parser("compute", help="Run controlled load against a compute endpoint")
-    compute.add_argument("--url", required=True, help="Base API URL, e.g. http://127.0.0.1:8080")
+    add_common(compute)
     compute.add_argument(
         "--path",
         default="/setting-calculator/compare",
@@ -206,9 +609,32 @@ def main():
     compute.add_argument("--requests", type=int, default=10)
     compute.add_argument("--concurrency", type=int, default=2)
     compute.add_argument("--delay-seconds", type=float, default=0.5)
-    compute.add_argument("--timeout-seconds", type=float, default=30)
     compute.set_defaults(func=compute_mode)
 
+    scenario = subparsers.add_parser("scenario", help="Replay user journeys at an open-model arrival rate")
+    add_common(scenario)
+    scenario.add_argument(
+        "--scenario-file",
+        default=os.path.join(os.path.dirname(os.path.abspath(__file__)), "loadtest-scenario-journey.json"),
+    )
+    scenario.add_argument("--username")
+    scenario.add_argument("--password")
+    scenario.add_argument("--bearer-token", help="Skip the login setup step and use this token")
+    scenario.add_argument("--var", action="append", help="Override a scenario variable, e.g. --var productId=3")
+    scenario.add_argument("--arrival-rate", type=float, default=1.0, help="New journeys per second")
+    scenario.add_argument("--duration-seconds", type=float, default=30)
+    scenario.add_argument("--max-in-flight", type=int, default=50, help="Cap on concurrent journeys")
+    scenario.add_argument("--max-connections", type=int, default=20, help="Keep-alive connection pool size")
+    scenario.add_argument("--think-time-seconds", type=float, default=None)
+    scenario.add_argument("--seed", type=int, default=None)
+    scenario.set_defaults(func=scenario_mode)
+
+    compare = subparsers.add_parser("compare", help="Diff two JSON result files")
+    compare.add_argument("baseline")
+    compare.add_argument("candidate")
+    compare.add_argument("--threshold-pct", type=float, default=10.0)
+    compare.set_defaults(func=compare_mode)
+
     args = parser.parse_args()
     sys.exit(args.func(args))
 